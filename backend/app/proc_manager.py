@@ -96,6 +96,17 @@ def list_runs() -> List[dict]:
 # ─────────────────────────────────────────────────────────────
 # SPawn – הרצת תהליך חדש עם לוג UTF-8 וסביבת UTF-8
 # ─────────────────────────────────────────────────────────────
+HUB_INTERVAL = "hub"   # ה-hub נשמר ב-state תחת key בסגנון "BTCUSDT,ETHUSDT:hub"
+
+def _hub_for_symbol(state: Dict[str, dict], symbol: str) -> dict | None:
+    """מחזיר meta של hub חי שמפרסם את הסימבול, אם יש."""
+    for meta in state.values():
+        if meta.get("interval") != HUB_INTERVAL or not _is_alive(meta.get("pid")):
+            continue
+        if symbol.upper() in (meta.get("symbols") or []):
+            return meta
+    return None
+
 def spawn_run(symbol: str, interval: str, bot_main_path: str) -> dict:
     # נרמול
     symbol   = (symbol or "").strip()
@@ -116,8 +127,10 @@ def spawn_run(symbol: str, interval: str, bot_main_path: str) -> dict:
     log_path.parent.mkdir(parents=True, exist_ok=True)
     log_f = open(log_path, "a", encoding="utf-8", errors="replace", buffering=1)
 
-    # פקודה: python <main.py> --symbol X --interval Y
+    # פקודה: python <main.py> --symbol X --interval Y [--hub]
     args = [sys.executable, bot_main_path, "--symbol", symbol, "--interval", interval]
+    if _hub_for_symbol(state, symbol):
+        args.append("--hub")  # יש hub חי לסימבול → קוראים מזיכרון משותף, בלי WS נוסף
 
     # סביבה עם UTF-8 לפייתון הבן
     env = os.environ.copy()
@@ -160,6 +173,60 @@ def spawn_run(symbol: str, interval: str, bot_main_path: str) -> dict:
 
     return {"ok": True, "id": k, "key": k, "pid": proc.pid, "status": "running", "meta": meta}
 
+# ─────────────────────────────────────────────────────────────
+# Market-data hub – תהליך אחד לכל קבוצת סימבולים (WS → shared memory)
+# ─────────────────────────────────────────────────────────────
+def spawn_hub(symbols: List[str], bot_root: str) -> dict:
+    symbols = sorted({(s or "").strip().upper() for s in symbols if (s or "").strip()})
+    if not symbols:
+        return {"ok": False, "detail": "symbols required"}
+    k = _key(",".join(symbols), HUB_INTERVAL)
+
+    state = _load_state()
+    ex = state.get(k)
+    if ex and _is_alive(ex.get("pid")):
+        return {"ok": True, "id": k, "key": k, "pid": ex.get("pid"), "status": "running", "meta": ex}
+    state.pop(k, None)
+
+    log_path = (LOGS_DIR / f"hub-{'_'.join(symbols)}.log").resolve()
+    log_f = open(log_path, "a", encoding="utf-8", errors="replace", buffering=1)
+    args = [sys.executable, "-m", "live_data.hub", "--symbols", ",".join(symbols)]
+
+    env = os.environ.copy()
+    env["PYTHONUTF8"] = "1"
+    env["PYTHONIOENCODING"] = "utf-8"
+
+    creation = 0
+    if os.name == "nt":
+        if hasattr(subprocess, "CREATE_NO_WINDOW"):
+            creation |= subprocess.CREATE_NO_WINDOW
+        if hasattr(subprocess, "CREATE_NEW_PROCESS_GROUP"):
+            creation |= subprocess.CREATE_NEW_PROCESS_GROUP
+
+    proc = subprocess.Popen(
+        args,
+        cwd=str(Path(bot_root).resolve()),
+        stdout=log_f,
+        stderr=log_f,
+        stdin=subprocess.DEVNULL,
+        shell=False,
+        creationflags=creation,
+        env=env,
+    )
+
+    meta = {
+        "pid": proc.pid,
+        "symbol": ",".join(symbols),
+        "symbols": symbols,
+        "interval": HUB_INTERVAL,
+        "started_at": int(time.time()),
+        "cmd": args,
+        "log_path": str(log_path),
+    }
+    state[k] = meta
+    _save_state(state)
+    return {"ok": True, "id": k, "key": k, "pid": proc.pid, "status": "running", "meta": meta}
+
 # ─────────────────────────────────────────────────────────────
 # עצירת ריצה לפי key או לפי (symbol, interval)
 # ─────────────────────────────────────────────────────────────
@@ -2,7 +2,7 @@ from pathlib import Path
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from .proc_manager import spawn_run, list_runs, stop_run_key, tail_log
+from .proc_manager import spawn_run, spawn_hub, list_runs, stop_run_key, tail_log
 from pydantic import BaseModel, Field
 from typing import Optional, Dict
 from ai.analyze import router as ai_router
@@ -22,6 +22,9 @@ class SpawnReq(BaseModel):
     symbol: str
     interval: str
 
+class HubReq(BaseModel):
+    symbols: list[str]
+
 class StopReq(BaseModel):
     id: str | None = None
     key: str | None = None
@@ -38,6 +41,12 @@ def status():
 def spawn(payload: SpawnReq):
     return spawn_run(payload.symbol, payload.interval, BOT_MAIN_PATH)
 
+# ─── HUB (WS אחד לכל הסימבולים, בוטים קוראים מזיכרון משותף) ───
+@app.post("/hub/spawn")
+@app.post("/api/hub/spawn")
+def hub_spawn(payload: HubReq):
+    return spawn_hub(payload.symbols, str(Path(BOT_MAIN_PATH).parent))
+
 # ─── LIST ───
 @app.get("/list")
 @app.get("/api/list")
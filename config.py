@@ -8,6 +8,104 @@ SETTINGS_DEFAULTS = {
     "symbol": "BTCUSDT",
     "interval_sec": 30,                 # גודל נר בשניות
 
+    # ----- סגירת חלונות בלייב -----
+    "windows": {
+        "close_grace_ms": 250,          # טיימר סוגר חלון ב-t1 + grace (זמן בורסה), בלי לחכות לטרייד הבא
+        "late_policy": "amend",         # טרייד מאוחר: "amend" = תיקון הנר שנסגר / "next" = נספר בחלון הבא
+        "timer_max_sleep_ms": 1000,     # תקרת שינה של הטיימר כשאין עדיין חלון פתוח
+    },
+
+    # ----- שורות זמניות לנר הפתוח (לא נכתבות ל-df_all) -----
+    "provisional": {
+        "enabled": True,
+        "every_sec": 5,                 # כל כמה שניות לפרסם snapshot של הנר הפתוח למנויים
+        "queue_max": 100,               # תור לכל מנוי; מנוי איטי מאבד את השורות הישנות
+    },
+
+    # ----- Order Book -----
+    "orderbook": {
+        "tob_features": True,           # spread/imbalance/microprice משוקללי-זמן לכל נר (מכל עדכון ספר)
+        "ofi_levels": 5,                # OFI לנר: ob_ofi_l1 + ob_ofi_l{n} (סכום רמות 1..n); 0 = כבוי
+        "walls_enabled": True,          # מעקב קירות מתמשך (technical_live.wall_tracker)
+        "wall_median_k": 3.0,           # קיר = כמות ≥ max(k·חציון, אחוזון) של גדלי הרמות בצד
+        "wall_percentile": 97,
+        "wall_exit_ratio": 0.5,         # הקיר נסגר מתחת ל-ratio·סף (היסטרזיס)
+        "wall_change_frac": 0.5,        # ירידה/עלייה יחסית שנספרת כמשיכה/מילוי
+        "wall_flash_ms": 1000,          # קיר שחי פחות מזה → ob_wall_flash
+        "wall_min_samples": 200,        # עד אז אין סף (אין קירות)
+    },
+
+    # ----- תנודתיות ממומשת -----
+    "volatility": {
+        "roll_windows": [20],           # <estimator>_roll<N>: sqrt של ממוצע השונות ב-N נרות אחרונים
+    },
+
+    # ----- Footprint (volume profile לנר) -----
+    "footprint": {
+        "enabled": True,
+        "tick_size": None,              # גודל דלי = tick (כשידוע לסימבול); None → bucket_bps
+        "bucket_bps": 5.0,              # גודל דלי ב-bps מה-open של הנר
+        "value_area": 0.70,             # חלק הנפח ב-value area (VAH/VAL)
+        "store_profiles": True,         # מערכי buy/sell לכל דלי → <symbol>_<interval>_footprint.parquet
+        "max_rows": 20000,              # פרופילים אחרונים שנשמרים (בזיכרון ובקובץ); None = הכול
+        "compact_every": 64,            # save() כותב רק שורות חדשות כ-part; כל N parts – כתיבה מלאה וחיתוך ל-max_rows
+    },
+
+    # ----- נרמול אונליין של השורה (dataset.normalizer) -----
+    "normalize": {
+        "enabled": True,
+        "mode": "ewm",                  # "ewm" (ממוצע/שונות דועכים) / "cumulative" (Welford על כל ההיסטוריה)
+        "halflife": 500,                # בנרות (mode="ewm")
+        "min_count": 30,                # פחות תצפיות בעמודה → z = NaN
+        "clip": 8.0,                    # חיתוך |z|; None = בלי
+        "exclude": [],                  # regex נוספים לעמודות שלא מנורמלות (היעדים מוחרגים תמיד)
+        "price_levels": False,          # גם רמות מחיר (open/close/ema/bb/vwap/*_price) – לא סטציונריות, כבוי כברירת מחדל
+        "output": "table",              # "table" → <symbol>_<interval>_normalized.parquet / "columns" → <col>_z ב-df_all (מכפיל את רוחבו)
+        "max_rows": 20000,              # output="table": שורות אחרונות שנשמרות; None = הכול
+        "compact_every": 64,            # save() כותב רק שורות חדשות כ-part; כל N parts – כתיבה מלאה וחיתוך ל-max_rows
+    },
+
+    # ----- יעדים תלויי-מסלול מהטריידים (dataset.path_labels) – לכל אופק של TargetFiller -----
+    "path_labels": {
+        "enabled": True,                # tb_label_/tb_touch_sec_/mfe_/mae_{h}s
+        "pt_bps": 20.0,                 # take-profit מעל ה-close (bps)
+        "sl_bps": 20.0,                 # stop-loss מתחת ל-close (bps)
+        "vol_col": None,                # למשל "rv_1s_roll20" → מחסומים = vol_mult · vol (ו-bps כשאין ערך)
+        "vol_mult": 2.0,
+    },
+
+    # ----- אינדיקטורים של טיימפריימים גבוהים על שורות הבסיס (core.multi_timeframe.HigherTimeframeJoin) -----
+    "multi_timeframe": {
+        "enabled": True,
+        "timeframes": ["5m", "1h"],     # רק כפולות של אינטרוול הצינור שגדולות ממנו; עמודות htf_<tf>_*
+        "in_progress": False,           # גם htf_<tf>_*_live – הנר הגבוה הפתוח כולל נר הבסיס הנוכחי
+        "ema_periods": None,            # None → indicators.ema_periods (RSI/BB תמיד לפי indicators.*)
+        "bootstrap_rows": 20000,        # כמה שורות בסיס לגלגל מחדש אחרי ריסטארט
+        "rollup": True,                 # צינורות זמן שהם כפולה של האינטרוול הקטן של הסימבול נסגרים מגלגול נרות הבסיס
+    },
+
+    # ----- פיצ'רים חוצי-סימבולים (כמה סימבולים בתהליך אחד) -----
+    "cross_section": {
+        "pairs": [],                    # [[target, reference], ...] למשל [["ETHUSDT", "BTCUSDT"]] → x_btcusdt_* בשורות ETH
+        "window": 20,                   # חלון המתאם/בטא המתגלגלים (בנרות)
+        "lags": 3,                      # cross-correlation מול ה-reference בפיגור 1..lags נרות
+        "rel_windows": [5],             # תשואה יחסית מצטברת על N נרות
+        "max_pending": 256,             # נרות target שמחכים ל-reference שעוד לא סגר את אותו ts
+    },
+
+    # ----- Volume Delta -----
+    "volume_delta": {
+        "side_mode": "exchange",        # צד האגרסור ל-VD/TH: "exchange" (דגל הבורסה) / "auto" (דגל, ובלעדיו Lee-Ready)
+                                        # / "lee_ready" (quote מול top of book + tick rule) / "infer_tick"
+        "large_trade_pctl": 90.0,       # "טרייד גדול" = מעל האחוזון הזה של גדלי הטריידים באופק
+        "sketch_enabled": True,         # סף מסקיצה מתגלגלת לכל סימבול (במקום אחוזון של הנר הנוכחי בלבד)
+        "sketch_horizon_hours": 24,
+        "sketch_slot_minutes": 60,      # גרנולריות היציאה מהאופק
+        "sketch_rel_acc": 0.01,         # דיוק יחסי של האחוזון
+        "sketch_min_count": 500,        # פחות טריידים באופק → חוזרים לאחוזון של הנר
+        "checkpoint_every_sec": 300,    # שמירת הסקיצה ל-data/state (וגם ביציאה)
+    },
+
     # ----- קבצים/פלט -----
     # שים לב: כרגע הנתיבים “קשיחים” לפי הסימבול והאינטרבל שלמעלה.
     # אם תשנה symbol/interval_sec – עדכן גם את שני הנתיבים האלו, או שנוסיף בהמשך לוגיקה דינמית.
@@ -22,11 +120,19 @@ SETTINGS_DEFAULTS = {
     },
 
     # ----- אינדיקטורים בסיסיים -----
-    # add_all_indicators יקרא את זה (למשל EMA5/12/21, BB, VWAP)
+    # add_all_indicators קורא את זה דרך indicator/feature_plan (EMA/RSI/BB/VWAP + ה-EMA שהטכניקל צריך)
     "indicators": {
         "ema_periods": [5, 12, 21],
+        "rsi_periods": [14],            # 14 → עמודה "rsi", תקופות נוספות → "rsi_<n>"
         "bb_window": 20,
         "bb_num_std": 2.0,
+        "vwap": True,
+        "vwap_session": "day",          # "day" (איפוס בשעות הפתיחה) / "anchored" (איפוס רק בעוגן)
+        "vwap_tz": "UTC",
+        "vwap_session_starts": ["00:00"],  # שעות פתיחת סשן ב-vwap_tz; ["00:00","08:00","16:00"] = 3 סשנים ביום
+        "vwap_bands": [],               # מכפילי סטיית תקן, למשל [1.0, 2.0] → vwap_std, vwap_up_1, vwap_low_1 ...
+        "vwap_anchor_col": None,        # עמודה בוליאנית (למשל swing high) שמאפסת את ה-VWAP בנר שלה
+        "matrix_chunk": 512,            # מנוע ה-batch הדו-ממדי (matrix_engine): עמודות זמן לצ'אנק – זיכרון ~ סימבולים × chunk
         # "vwap_source": "close",       # אופציונלי אם תרצה לשלוט במקור VWAP
     },
 
@@ -0,0 +1,124 @@
+# core/bar_clocks.py
+# שעוני ברים מבוססי-אירועים: הבר נסגר כשהגיע מספיק מידע, לא כשעבר זמן.
+#   tick500        – כל 500 טריידים
+#   vol25          – כל 25 יחידות מטבע בסיס (למשל 25 BTC)
+#   dollar1000000  – כל 1,000,000 נומינלי (quote)
+# EventBarAggregator חושף את אותו ממשק כמו ReusableAggregator (on_trade → list[CloseResult]),
+# כך ש-on_candle_ready רץ בלי שינוי.
+
+from __future__ import annotations
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from core.window_aggregator import CloseResult, _to_ms, _ms_to_ts
+
+_CHUNK_COLUMNS = ["ts", "symbol", "price", "size", "side", "best_bid", "best_ask", "id"]
+
+
+class BarClock(ABC):
+    """מונה מצטבר: add(price, size) → True כשהבר התמלא. תת-מחלקה מגדירה measure."""
+    kind = ""
+
+    def __init__(self, threshold: float):
+        if float(threshold) <= 0:
+            raise ValueError("threshold חייב להיות חיובי")
+        self.threshold = float(threshold)
+        self.acc = 0.0
+
+    @abstractmethod
+    def measure(self, price: float, size: float) -> float:
+        """כמה הטרייד מקדם את הבר."""
+
+    def add(self, price: float, size: float) -> bool:
+        self.acc += self.measure(price, size)
+        return self.acc >= self.threshold
+
+    def reset(self) -> None:
+        self.acc = 0.0
+
+
+class TickBarClock(BarClock):
+    kind = "tick"
+
+    def measure(self, price: float, size: float) -> float:
+        return 1.0
+
+
+class VolumeBarClock(BarClock):
+    kind = "vol"
+
+    def measure(self, price: float, size: float) -> float:
+        return size
+
+
+class DollarBarClock(BarClock):
+    kind = "dollar"
+
+    def measure(self, price: float, size: float) -> float:
+        return price * size
+
+
+_CLOCKS = {c.kind: c for c in (TickBarClock, VolumeBarClock, DollarBarClock)}
+_SPEC_RE = re.compile(r"\s*(tick|vol|dollar)\s*(\d+(?:\.\d+)?(?:e\d+)?)\s*", re.IGNORECASE)
+
+
+def parse_bar_spec(spec: str) -> Optional[BarClock]:
+    """"tick500" / "vol25" / "dollar1e6" → BarClock; None אם זה אינטרוול זמן רגיל."""
+    m = _SPEC_RE.fullmatch(str(spec))
+    if not m:
+        return None
+    return _CLOCKS[m.group(1).lower()](float(m.group(2)))
+
+
+class EventBarAggregator:
+    """
+    מצבר את הטריידים של הבר הפתוח תוך כדי (בלי לחתוך מה-Buffer) וסוגר כשהשעון מתמלא.
+    הטרייד שחוצה את הסף נכלל בבר. t0 = ts הטרייד הראשון, t1 = ts האחרון + 1ms,
+    ולפחות t1 הקודם + 1ms – כמה ברים באותה מילישנייה (טריידים צפופים) לא מקבלים אותו מפתח ב-df_all.
+    """
+
+    def __init__(self, clock: BarClock, symbol: Optional[str]):
+        self.clock = clock
+        self.symbol = symbol
+        self._rows: List[Dict[str, Any]] = []
+        self._last_t1_ms: Optional[int] = None
+
+    def on_trade(self, ts, trade: Optional[Dict[str, Any]] = None) -> list[CloseResult]:
+        if trade is None:
+            return []
+        self._rows.append(trade)
+        if self.clock.add(float(trade.get("price") or 0.0), float(trade.get("size") or 0.0)):
+            return [self._close()]
+        return []
+
+    # ממשק זהה ל-ReusableAggregator – לבר אירועים אין דדליין של זמן
+    def close_due(self, now_ms: int) -> list[CloseResult]:
+        return []
+
+    def next_deadline_ms(self) -> Optional[int]:
+        return None
+
+    def _close(self, now_ms: Optional[int] = None) -> CloseResult:
+        rows, self._rows = self._rows, []
+        self.clock.reset()
+        df = pd.DataFrame(rows)
+        if df.empty:
+            # בר ריק ברוחב 0 בסוף הבר הקודם (זמן הטריידים, לא שעון הקיר); לפני הבר הראשון – שעון הבורסה של הקורא
+            ms = self._last_t1_ms if self._last_t1_ms is not None else int(now_ms or 0)
+            return CloseResult(t0=_ms_to_ts(ms), t1=_ms_to_ts(ms), df_chunk=pd.DataFrame(columns=_CHUNK_COLUMNS))
+        df["price"] = pd.to_numeric(df["price"], errors="coerce")
+        df["size"] = pd.to_numeric(df["size"], errors="coerce")
+        df = df.sort_values("ts", kind="stable").reset_index(drop=True)
+        t0_ms = _to_ms(df["ts"].iloc[0])
+        t1_ms = _to_ms(df["ts"].iloc[-1]) + 1
+        if self._last_t1_ms is not None:
+            t1_ms = max(t1_ms, self._last_t1_ms + 1)
+        self._last_t1_ms = t1_ms
+        return CloseResult(t0=_ms_to_ts(t0_ms), t1=_ms_to_ts(t1_ms), df_chunk=df)
+
+    def force_close_current(self, now_ms: Optional[int] = None) -> CloseResult:
+        """סגירה כפויה של הבר החלקי (למשל לפני כיבוי). now_ms – שעון הבורסה, רק לבר ריק לפני הבר הראשון."""
+        return self._close(now_ms)
@@ -0,0 +1,206 @@
+# core/cross_section.py
+# שלב חוצה-סימבולים לפריסה מרובת סימבולים בתהליך אחד (build_feeds): נרות סגורים של כל הצינורות
+# מיושרים לפי ts (as-of: ה-close האחרון של ה-reference עם ts ≤ ts של ה-target), ולכל זוג מוגדר
+# (target, reference) באותו אינטרוול נשמרים בזרם, O(1 + lags) לזוג לנר:
+#   תשואת ה-reference בנר, מתאם ובטא מתגלגלים (RollingCovariance), cross-correlation בפיגור
+#   (reference מקדים ב-k נרות) ותשואה יחסית מצטברת על N נרות.
+# הזוג מעובד רק כשה-reference כבר סגר נר עם ts ≥ ts של ה-target – אחרת as-of היה לוקח נר ישן
+# ומייצר lead-lag מדומה. הפיצ'רים נכתבים לשורה של ה-target ב-df_all (x_<ref>_*), גם אם היא כבר לא האחרונה.
+
+from __future__ import annotations
+import bisect
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.rolling_stats import RollingCovariance
+from technical_analysis.stream_technical import assign_row
+
+
+def cross_prefix(ref: str) -> str:
+    return f"x_{ref.lower()}_"
+
+
+class _Closes:
+    """(ts_ms, close) ממוינים של צינור אחד, עם גיזום – ל-as-of ב-bisect."""
+
+    def __init__(self, keep: int):
+        self.keep = int(keep)
+        self.ts: List[int] = []
+        self.close: List[float] = []
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        return self.ts[-1] if self.ts else None
+
+    def add(self, ts_ms: int, close: float) -> None:
+        if self.ts and ts_ms <= self.ts[-1]:
+            i = bisect.bisect_left(self.ts, ts_ms)
+            if i < len(self.ts) and self.ts[i] == ts_ms:
+                self.close[i] = close  # amend
+                return
+            self.ts.insert(i, ts_ms)
+            self.close.insert(i, close)
+        else:
+            self.ts.append(ts_ms)
+            self.close.append(close)
+        if len(self.ts) > 2 * self.keep:
+            del self.ts[:-self.keep], self.close[:-self.keep]
+
+    def asof(self, ts_ms: int) -> float:
+        i = bisect.bisect_right(self.ts, ts_ms) - 1
+        return self.close[i] if i >= 0 else np.nan
+
+
+def _push(rc: RollingCovariance, x: float, y: float, amend: bool) -> None:
+    if amend:
+        rc.replace_last(x, y)
+    else:
+        rc.update(x, y)
+
+
+class _Pair:
+    """מצב זרם של זוג (target, reference) באינטרוול אחד."""
+
+    def __init__(self, target: str, ref: str, window: int, lags: int, rel_windows: Sequence[int]):
+        self.target = target
+        self.ref = ref
+        self.window = int(window)
+        self.lags = int(lags)
+        self.rel_windows = [int(n) for n in rel_windows]
+        self.prefix = cross_prefix(ref)
+        self.cov = RollingCovariance(window)
+        self.lag_cov = [RollingCovariance(window) for _ in range(self.lags)]
+        self.pending: Deque[Tuple[int, float]] = deque()
+        self.last_ts: Optional[int] = None
+        # מצב שמתגלגל מנר לנר (ו-snapshot שלו לפני הנר האחרון – ל-amend)
+        self.prev_t = np.nan
+        self.prev_r = np.nan
+        self.ref_rets: Deque[float] = deque(maxlen=self.lags + 1)
+        self.rel: Deque[Tuple[float, float]] = deque(maxlen=max(self.rel_windows, default=1))
+        self._undo: Optional[Tuple[Any, ...]] = None
+
+    def _snapshot(self) -> Tuple[Any, ...]:
+        return (self.prev_t, self.prev_r, tuple(self.ref_rets), tuple(self.rel))
+
+    def _restore(self, snap: Tuple[Any, ...]) -> None:
+        self.prev_t, self.prev_r = snap[0], snap[1]
+        self.ref_rets = deque(snap[2], maxlen=self.lags + 1)
+        self.rel = deque(snap[3], maxlen=max(self.rel_windows, default=1))
+
+    def step(self, ts_ms: int, c_t: float, c_r: float) -> Dict[str, float]:
+        amend = self.last_ts is not None and ts_ms == self.last_ts
+        if amend and self._undo is not None:
+            self._restore(self._undo)
+        self._undo = self._snapshot()
+        self.last_ts = ts_ms
+
+        r_t = math.log(c_t / self.prev_t) if c_t > 0 and self.prev_t > 0 else np.nan
+        r_r = math.log(c_r / self.prev_r) if c_r > 0 and self.prev_r > 0 else np.nan
+        self.prev_t, self.prev_r = c_t, c_r
+        self.ref_rets.appendleft(r_r)  # [0] = הנר הנוכחי, [k] = לפני k נרות
+        self.rel.appendleft((r_t, r_r))
+
+        _push(self.cov, r_t, r_r, amend)
+        p = self.prefix
+        out = {f"{p}ret": r_r, f"{p}corr{self.window}": self.cov.corr, f"{p}beta{self.window}": self.cov.beta}
+        for k in range(1, self.lags + 1):
+            lagged = self.ref_rets[k] if k < len(self.ref_rets) else np.nan
+            rc = self.lag_cov[k - 1]
+            _push(rc, r_t, lagged, amend)
+            out[f"{p}xcorr_lag{k}"] = rc.corr
+        for n in self.rel_windows:
+            if len(self.rel) >= n:
+                last = list(self.rel)[:n]
+                out[f"{p}rel_ret{n}"] = sum(a for a, _ in last) - sum(b for _, b in last)
+            else:
+                out[f"{p}rel_ret{n}"] = np.nan
+        return out
+
+
+class CrossSectionStage:
+    """
+    pairs = [(target, reference), ...]. register(pipeline) לכל צינור, on_close(...) אחרי כל נר שנכנס ל-df_all.
+    הזוגות נפרדים לכל אינטרוול; זוג שאחד הסימבולים שלו לא רץ באינטרוול – לא פעיל.
+    """
+
+    def __init__(self, pairs: Iterable[Sequence[str]], *, window: int = 20, lags: int = 3,
+                 rel_windows: Sequence[int] = (5,), max_pending: int = 256, keep: int = 512):
+        self.pairs = [(str(t).upper(), str(r).upper()) for t, r in pairs]
+        self.window = int(window)
+        self.lags = int(lags)
+        self.rel_windows = list(rel_windows)
+        self.max_pending = int(max_pending)
+        self.keep = int(keep)
+        self._pipelines: Dict[Tuple[str, str], Any] = {}
+        self._closes: Dict[Tuple[str, str], _Closes] = {}
+        self._state: Dict[Tuple[str, str, str], _Pair] = {}   # (target, ref, interval)
+
+    def register(self, pipeline) -> None:
+        key = (pipeline.symbol, pipeline.interval)
+        self._pipelines[key] = pipeline
+        self._closes.setdefault(key, _Closes(self.keep))
+        for t, r in self.pairs:
+            if (t, pipeline.interval) in self._pipelines and (r, pipeline.interval) in self._pipelines:
+                self._state.setdefault((t, r, pipeline.interval),
+                                       _Pair(t, r, self.window, self.lags, self.rel_windows))
+
+    def columns(self, ref: str) -> List[str]:
+        p = cross_prefix(ref)
+        return ([f"{p}ret", f"{p}corr{self.window}", f"{p}beta{self.window}"]
+                + [f"{p}xcorr_lag{k}" for k in range(1, self.lags + 1)]
+                + [f"{p}rel_ret{n}" for n in self.rel_windows])
+
+    def on_close(self, symbol: str, interval: str, ts_ms: int, close: float) -> None:
+        ts_ms = int(ts_ms)
+        closes = self._closes.get((symbol, interval))
+        if closes is None:
+            return
+        closes.add(ts_ms, float(close))
+        for (t, r, iv), pair in self._state.items():
+            if iv != interval or symbol not in (t, r):
+                continue
+            if symbol == t:
+                pair.pending.append((ts_ms, float(close)))
+                while len(pair.pending) > self.max_pending:  # ה-reference תקוע – לא צוברים בלי סוף
+                    pair.pending.popleft()
+            self._drain(pair, interval)
+
+    def _drain(self, pair: _Pair, interval: str) -> None:
+        ref_closes = self._closes[(pair.ref, interval)]
+        ref_last = ref_closes.last_ts
+        while pair.pending and ref_last is not None and ref_last >= pair.pending[0][0]:
+            ts_ms, c_t = pair.pending.popleft()
+            if pair.last_ts is not None and ts_ms < pair.last_ts:
+                continue  # amend לנר ישן שכבר נכנס לחלון – לא משכתבים היסטוריה
+            feats = pair.step(ts_ms, c_t, ref_closes.asof(ts_ms))
+            self._write(self._pipelines[(pair.target, interval)], ts_ms, feats)
+
+    @staticmethod
+    def _write(pipeline, ts_ms: int, feats: Dict[str, float]) -> None:
+        df = pipeline.ctx["df_all"]
+        if df.empty or "ts" not in df.columns:
+            return
+        ts = pd.Timestamp(ts_ms * 1_000_000, tz="UTC")
+        tail = df["ts"].iloc[-64:]  # השורה כמעט תמיד האחרונה או קרובה לסוף
+        hit = tail.index[tail == ts]
+        if len(hit):
+            pipeline.ctx["df_all"] = assign_row(df, hit[-1], feats)
+
+
+def cross_section_from_config() -> Optional[CrossSectionStage]:
+    """CrossSectionStage לפי cross_section.* (None כשאין זוגות מוגדרים)."""
+    from core.settings_manager import CFG
+    pairs = CFG("cross_section.pairs", []) or []
+    if not pairs:
+        return None
+    return CrossSectionStage(
+        pairs,
+        window=int(CFG("cross_section.window", 20)),
+        lags=int(CFG("cross_section.lags", 3)),
+        rel_windows=[int(n) for n in CFG("cross_section.rel_windows", [5])],
+        max_pending=int(CFG("cross_section.max_pending", 256)),
+    )
@@ -0,0 +1,406 @@
+# core/multi_timeframe.py
+# אגרגציה היררכית: חלון בסיס (למשל 30s) נסגר מהטריידים דרך ReusableAggregator,
+# וכל טיימפריים גבוה יותר (1m/5m/1h) מגולגל מנרות הבסיס הסגורים – בלי לחתוך שוב טריידים.
+# SymbolFeed משתמש בזה לצינורות שהאינטרוול שלהם כפולה של הקטן ביותר של הסימבול: רק צינור הבסיס
+# חותך את ה-TradeBuffer ומחזיק נר רץ; הצינורות הגבוהים מקבלים את הצ'אנקים והנר המגולגלים.
+# HigherTimeframeJoin – אותו גלגול מתוך שורות הבסיס של הצינור, עם מצב EMA/RSI/BB מצטבר לכל טיימפריים
+# (ProvisionalIndicators – נוסחאות indicator/), שמוצמד לכל שורת בסיס as-of: הנר הגבוה האחרון שנסגר עד t1,
+# ואופציונלית הנר הגבוה הפתוח (כולל נר הבסיס הנוכחי). אין הצצה קדימה – הכול עד t1 של שורת הבסיס.
+
+from __future__ import annotations
+import copy
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from live_data.trade_buffer import TradeBuffer
+from core.window_aggregator import ReusableAggregator, CloseResult, _to_ms
+from graphs.graphs_time import LiveCandle
+from dataset.provisional import ProvisionalIndicators
+
+
+@dataclass
+class Bar:
+    """נר מסוכם: OHLCV + נפחי קנייה/מכירה, מונים ונומינלי. נר ריק → OHLC = NaN."""
+    t0: pd.Timestamp
+    t1: pd.Timestamp
+    interval_sec: int
+    open: float = np.nan
+    high: float = np.nan
+    low: float = np.nan
+    close: float = np.nan
+    volume: float = 0.0
+    buy_vol: float = 0.0
+    sell_vol: float = 0.0
+    trades: int = 0
+    buy_count: int = 0
+    sell_count: int = 0
+    notional: float = 0.0
+    df_chunk: Optional[pd.DataFrame] = field(default=None, repr=False)  # רק בנר הבסיס
+    amended: bool = False  # תיקון לנר שכבר נפלט (טרייד מאוחר בנר הבסיס האחרון)
+    # הנר הרץ (LiveCandle) המגולגל – כשלכל נרות הבסיס עם טריידים היה נר רץ תואם; אחרת None
+    candle: Optional[LiveCandle] = field(default=None, repr=False)
+    candle_ok: bool = field(default=True, repr=False)
+
+    @property
+    def vwap(self) -> float:
+        return self.notional / self.volume if self.volume > 0 else np.nan
+
+    @property
+    def delta_vol(self) -> float:
+        return self.buy_vol - self.sell_vol
+
+    def merge(self, other: "Bar") -> None:
+        """מגלגל נר צעיר יותר (other) לתוך הנר הזה. נר ריק לא משנה OHLC."""
+        if other.trades > 0 and self.candle_ok:
+            oc = other.candle
+            if oc is None or oc.trades != other.trades:
+                self.candle, self.candle_ok = None, False  # אין נר רץ אמין – הצינור יחשב מהצ'אנק
+            else:
+                if self.candle is None:
+                    self.candle = LiveCandle(_to_ms(self.t0), _to_ms(self.t1))
+                self.candle.merge(oc)
+        if other.trades > 0:
+            if self.trades == 0:
+                self.open, self.high, self.low = other.open, other.high, other.low
+            else:
+                self.high = max(self.high, other.high)
+                self.low = min(self.low, other.low)
+            self.close = other.close
+        self.volume += other.volume
+        self.buy_vol += other.buy_vol
+        self.sell_vol += other.sell_vol
+        self.trades += other.trades
+        self.buy_count += other.buy_count
+        self.sell_count += other.sell_count
+        self.notional += other.notional
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "open": self.open, "high": self.high, "low": self.low, "close": self.close,
+            "volume": self.volume, "buy_vol": self.buy_vol, "sell_vol": self.sell_vol,
+            "trades": self.trades, "buy_count": self.buy_count, "sell_count": self.sell_count,
+            "notional": self.notional, "vwap": self.vwap,
+        }
+
+
+def bar_from_chunk(t0: pd.Timestamp, t1: pd.Timestamp, interval_sec: int, df_chunk: pd.DataFrame) -> Bar:
+    """סיכום צ'אנק RAW (ממוין לפי ts, כמו ש-TradeBuffer.slice מחזיר) לנר אחד – מעבר יחיד ב-numpy."""
+    bar = Bar(t0=t0, t1=t1, interval_sec=int(interval_sec), df_chunk=df_chunk)
+    if df_chunk is None or df_chunk.empty:
+        return bar
+    price = pd.to_numeric(df_chunk["price"], errors="coerce").to_numpy(dtype=float)
+    size = pd.to_numeric(df_chunk["size"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    side = df_chunk["side"].astype(str).str.lower().to_numpy() if "side" in df_chunk.columns else None
+
+    bar.open, bar.close = float(price[0]), float(price[-1])
+    bar.high, bar.low = float(np.nanmax(price)), float(np.nanmin(price))
+    bar.volume = float(size.sum())
+    bar.trades = int(len(price))
+    bar.notional = float(np.nansum(price * size))
+    if side is not None:
+        is_buy = side == "buy"
+        is_sell = side == "sell"
+        bar.buy_vol = float(size[is_buy].sum())
+        bar.sell_vol = float(size[is_sell].sum())
+        bar.buy_count = int(is_buy.sum())
+        bar.sell_count = int(is_sell.sum())
+    return bar
+
+
+def _concat_chunks(parts: List[Bar]) -> Optional[pd.DataFrame]:
+    chunks = [p.df_chunk for p in parts if p.df_chunk is not None and not p.df_chunk.empty]
+    if not chunks:
+        return parts[0].df_chunk if parts else None
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+
+def _floor_ts(ts: pd.Timestamp, interval_sec: int) -> pd.Timestamp:
+    ms = _to_ms(ts)
+    return pd.Timestamp((ms - ms % (int(interval_sec) * 1000)) * 1_000_000, tz="UTC")  # אותה יחידה כמו WindowClock
+
+
+class MultiTimeframeAggregator:
+    """
+    טרייד אחד → כל הטיימפריימים:
+      • הבסיס נסגר מה-Buffer (ReusableAggregator, חיתוך אחד לחלון).
+      • כל טיימפריים גבוה מגולגל מנרות הבסיס הסגורים (חייב להיות כפולה של הבסיס).
+      • לכל טיימפריים callback סגירה משלו: on_close(interval_sec, fn(bar)).
+    נר גבוה נפלט עם df_chunk = הטריידים של כל נרות הבסיס שלו, ו-candle = הנר הרץ המגולגל.
+    base (אופציונלי) – אגרגטור בסיס קיים שמישהו אחר מזין (SymbolFeed): אז on_base_closed לכל סגירה שלו.
+    """
+
+    def __init__(self, buffer: TradeBuffer, symbol: Optional[str], base_interval_sec: int,
+                 higher_intervals_sec: List[int] = (), *, base: Optional[ReusableAggregator] = None):
+        self.base_sec = int(base_interval_sec)
+        self.base = base if base is not None else ReusableAggregator(buffer, symbol=symbol, interval_sec=self.base_sec)
+        self.higher: List[int] = sorted({int(x) for x in higher_intervals_sec if int(x) != self.base_sec})
+        for tf in self.higher:
+            if tf % self.base_sec != 0:
+                raise ValueError(f"טיימפריים {tf}s אינו כפולה של הבסיס {self.base_sec}s")
+        self._open: Dict[int, Optional[Bar]] = {tf: None for tf in self.higher}
+        # נרות הבסיס שבנר הגבוה הפתוח / בנר הגבוה האחרון שנפלט – לתיקון (amend) של נר הבסיס האחרון
+        self._parts: Dict[int, List[Bar]] = {tf: [] for tf in self.higher}
+        self._last: Dict[int, Optional[Bar]] = {tf: None for tf in self.higher}
+        self._last_parts: Dict[int, List[Bar]] = {tf: [] for tf in self.higher}
+        self._callbacks: Dict[int, List[Callable[[Bar], None]]] = {tf: [] for tf in [self.base_sec, *self.higher]}
+
+    @property
+    def intervals(self) -> List[int]:
+        return [self.base_sec, *self.higher]
+
+    def on_close(self, interval_sec: int, fn: Callable[[Bar], None]) -> None:
+        interval_sec = int(interval_sec)
+        if interval_sec not in self._callbacks:
+            raise KeyError(f"טיימפריים {interval_sec}s לא מוגדר באגרגטור")
+        self._callbacks[interval_sec].append(fn)
+
+    def _emit(self, bar: Bar, out: List[Bar]) -> None:
+        out.append(bar)
+        for fn in self._callbacks[bar.interval_sec]:
+            fn(bar)
+
+    def _close_tf(self, tf: int, cur: Bar, out: List[Bar]) -> None:
+        cur.df_chunk = _concat_chunks(self._parts[tf])
+        self._last[tf], self._last_parts[tf] = cur, self._parts[tf]
+        self._open[tf], self._parts[tf] = None, []
+        self._emit(cur, out)
+
+    def _roll(self, base_bar: Bar, out: List[Bar]) -> None:
+        for tf in self.higher:
+            b0 = _floor_ts(base_bar.t0, tf)
+            cur = self._open[tf]
+            if cur is not None and cur.t0 != b0:
+                # הגענו לדלי חדש בלי שהקודם נסגר בגבול (למשל אחרי set_interval) – סוגרים אותו
+                self._close_tf(tf, cur, out)
+                cur = None
+            if cur is None:
+                cur = Bar(t0=b0, t1=b0 + pd.Timedelta(seconds=tf), interval_sec=tf)
+            cur.merge(base_bar)
+            self._open[tf] = cur
+            self._parts[tf].append(base_bar)
+            if base_bar.t1 >= cur.t1:
+                self._close_tf(tf, cur, out)
+
+    @staticmethod
+    def _rebuild(like: Bar, parts: List[Bar]) -> Bar:
+        bar = Bar(t0=like.t0, t1=like.t1, interval_sec=like.interval_sec)
+        for p in parts:
+            bar.merge(p)
+        return bar
+
+    def _amend(self, base_bar: Bar, out: List[Bar]) -> None:
+        """נר הבסיס האחרון תוקן: מחליפים את התרומה שלו בנר הגבוה במקום להוסיף אותה שוב."""
+        for tf in self.higher:
+            parts = self._parts[tf]
+            if parts and parts[-1].t0 == base_bar.t0:
+                parts[-1] = base_bar
+                self._open[tf] = self._rebuild(self._open[tf], parts)
+                continue
+            last, last_parts = self._last[tf], self._last_parts[tf]
+            if last is not None and last_parts and last_parts[-1].t0 == base_bar.t0:
+                # הנר הגבוה נסגר על נר הבסיס הזה – נפלט שוב כתיקון
+                last_parts[-1] = base_bar
+                bar = self._rebuild(last, last_parts)
+                bar.df_chunk = _concat_chunks(last_parts)
+                bar.amended = True
+                self._last[tf] = bar
+                self._emit(bar, out)
+
+    def _on_base_closed(self, closed: CloseResult, out: List[Bar], candle: Optional[LiveCandle] = None) -> None:
+        bar = bar_from_chunk(closed.t0, closed.t1, self.base_sec, closed.df_chunk)
+        bar.amended = bool(closed.amended)
+        bar.candle = candle
+        self._emit(bar, out)
+        if bar.amended:
+            self._amend(bar, out)
+        else:
+            self._roll(bar, out)
+
+    def on_base_closed(self, closed: CloseResult, candle: Optional[LiveCandle] = None) -> List[Bar]:
+        """סגירה של אגרגטור הבסיס שמוזן מבחוץ (+ הנר הרץ שלה) → הנרות הגבוהים שנסגרו/תוקנו בעקבותיה."""
+        out: List[Bar] = []
+        self._on_base_closed(closed, out, candle)
+        return [b for b in out if b.interval_sec != self.base_sec]
+
+    def open_candle(self, interval_sec: int, current: Optional[LiveCandle] = None) -> Optional[LiveCandle]:
+        """הנר הגבוה הפתוח כנר רץ: נרות הבסיס שכבר נסגרו בו + נר הבסיס הפתוח (current) – לתצוגה זמנית."""
+        tf = int(interval_sec)
+        cur = self._open.get(tf)
+        out = cur.candle.copy() if cur is not None and cur.candle is not None else None
+        if current is not None and current.trades > 0 and current.start_ms is not None:
+            b0 = current.start_ms - current.start_ms % (tf * 1000)
+            if out is None or out.start_ms != b0:
+                out = LiveCandle(b0, b0 + tf * 1000)
+            out.merge(current)
+        return out
+
+    def on_trade(self, ts: pd.Timestamp) -> List[Bar]:
+        """מחזיר את כל הנרות שנסגרו בעקבות הטרייד, בסדר: בסיס ואז הגבוהים (לכל חלון בסיס)."""
+        out: List[Bar] = []
+        for closed in self.base.on_trade(ts):
+            self._on_base_closed(closed, out)
+        return out
+
+    def force_close_current(self) -> List[Bar]:
+        """סגירה כפויה של חלון הבסיס + הנרות הגבוהים הפתוחים (חלקיים) – למשל לפני כיבוי."""
+        out: List[Bar] = []
+        self._on_base_closed(self.base.force_close_current(), out)
+        for tf in self.higher:
+            cur = self._open[tf]
+            if cur is not None:
+                self._close_tf(tf, cur, out)
+        return out
+
+
+def tf_label(interval_sec: int) -> str:
+    """300 → "5m", 3600 → "1h", 45 → "45s" – לשמות העמודות."""
+    for unit, sec in (("d", 86_400), ("h", 3_600), ("m", 60)):
+        if interval_sec % sec == 0:
+            return f"{interval_sec // sec}{unit}"
+    return f"{interval_sec}s"
+
+
+class _TfState:
+    __slots__ = ("sec", "prefix", "open", "ind", "completed", "snap_open", "snap_ind")
+
+    def __init__(self, sec: int, ind: ProvisionalIndicators):
+        self.sec = sec
+        self.prefix = f"htf_{tf_label(sec)}_"
+        self.open: Optional[Bar] = None
+        self.ind = ind
+        self.completed: Dict[str, float] = {}
+        # מצב לפני שורת הבסיס האחרונה – ל-amend (המחוונים מועתקים רק כשהשורה סגרה נר גבוה)
+        self.snap_open: Optional[Bar] = None
+        self.snap_ind: Optional[ProvisionalIndicators] = None
+
+
+class HigherTimeframeJoin:
+    """
+    update(t0, t1, candle, key) לכל נר בסיס סגור → {htf_<tf>_<col>: ...} לשורה:
+      htf_5m_ema_12 …           – הנר הגבוה האחרון שנסגר עד t1 (כולל נר שנסגר בדיוק עם נר הבסיס הזה)
+      htf_5m_ema_12_live …      – in_progress=True: הנר הגבוה הפתוח, כולל נר הבסיס הנוכחי
+    אותו key שוב = amend של שורת הבסיס האחרונה. O(טיימפריימים) לשורה.
+    """
+
+    def __init__(
+        self,
+        base_sec: int,
+        timeframes_sec: Sequence[int],
+        *,
+        in_progress: bool = False,
+        ema_spans: Sequence[int] = (5, 12, 21),
+        rsi_period: int = 14,
+        bb_window: int = 20,
+        bb_num_std: float = 2.0,
+    ):
+        self.base_sec = int(base_sec)
+        self.in_progress = bool(in_progress)
+        self._ind_kw = dict(ema_spans=tuple(ema_spans), rsi_period=rsi_period,
+                            bb_window=bb_window, bb_num_std=bb_num_std)
+        tfs = sorted({int(x) for x in timeframes_sec})
+        for tf in tfs:
+            if tf <= self.base_sec or tf % self.base_sec != 0:
+                raise ValueError(f"טיימפריים {tf}s חייב להיות כפולה גדולה של הבסיס {self.base_sec}s")
+        self.states = [_TfState(tf, ProvisionalIndicators(**self._ind_kw)) for tf in tfs]
+        self._last_key: Any = None
+        self.started = False
+
+    def columns(self) -> List[str]:
+        cols = [f"ema_{s}" for s in self._ind_kw["ema_spans"]] + ["rsi", "bb_mid", "bb_up", "bb_low", "bb_width"]
+        out = []
+        for st in self.states:
+            out += [st.prefix + c for c in cols]
+            if self.in_progress:
+                out += [st.prefix + c + "_live" for c in cols]
+        return out
+
+    @staticmethod
+    def _close(st: _TfState, bar: Bar) -> None:
+        if st.snap_ind is None:
+            st.snap_ind = copy.deepcopy(st.ind)
+        st.ind.push(bar.close)
+        st.completed = st.ind.values()
+
+    def update(self, t0, t1, candle: Dict[str, float], key: Any = None) -> Dict[str, float]:
+        t0 = pd.to_datetime(t0, utc=True)
+        t1 = pd.to_datetime(t1, utc=True)
+        amend = key is not None and key == self._last_key
+        self._last_key = key
+        self.started = True
+
+        base = Bar(t0=t0, t1=t1, interval_sec=self.base_sec)
+        c = candle.get("close", np.nan)
+        if c is not None and np.isfinite(c):
+            base.open, base.high, base.low, base.close = candle["open"], candle["high"], candle["low"], c
+            base.volume = float(candle.get("volume") or 0.0)
+            base.trades = 1
+
+        out: Dict[str, float] = {}
+        for st in self.states:
+            if amend:
+                st.open = replace(st.snap_open) if st.snap_open is not None else None
+                if st.snap_ind is not None:
+                    st.ind = copy.deepcopy(st.snap_ind)
+                    st.completed = st.ind.values()
+            else:
+                st.snap_open = replace(st.open) if st.open is not None else None
+                st.snap_ind = None
+
+            b0 = _floor_ts(t0, st.sec)
+            cur = st.open
+            if cur is not None and cur.t0 != b0:
+                self._close(st, cur)  # דילוג על גבול (פער בנרות הבסיס) – הנר הקודם הושלם
+                cur = None
+            if cur is None:
+                cur = Bar(t0=b0, t1=b0 + pd.Timedelta(seconds=st.sec), interval_sec=st.sec)
+            cur.merge(base)
+            if t1 >= cur.t1:
+                self._close(st, cur)
+                cur = None
+            st.open = cur
+
+            for col, v in st.completed.items():
+                out[st.prefix + col] = v
+            if self.in_progress:
+                live = st.ind.preview(cur.close) if cur is not None and cur.trades > 0 else st.completed
+                for col, v in live.items():
+                    out[st.prefix + col + "_live"] = v
+        return out
+
+    def bootstrap(self, df_all: pd.DataFrame, max_rows: Optional[int] = None) -> None:
+        """משחזר את המצב משורות הבסיס השמורות (אחרי ריסטארט) – O(שורות) פעם אחת."""
+        self.started = True
+        if df_all is None or df_all.empty or "ts" not in df_all.columns:
+            return
+        tail = df_all.tail(max_rows) if max_rows else df_all
+        cols = [c for c in ("open", "high", "low", "close", "volume") if c in tail.columns]
+        step = pd.Timedelta(seconds=self.base_sec)
+        for ts, rec in zip(pd.to_datetime(tail["ts"], utc=True), tail[cols].to_dict("records")):
+            self.update(ts - step, ts, rec)
+        self._last_key = None
+
+
+def htf_join_from_config(base_sec: Optional[int], parse=None) -> Optional[HigherTimeframeJoin]:
+    """
+    HigherTimeframeJoin לפי multi_timeframe.* ותקופות האינדיקטורים (indicators.*), או None
+    (בר אירועים / אין טיימפריים גבוה מהבסיס). parse – "5m" → 300.
+    """
+    from core.settings_manager import CFG
+    if not base_sec or not CFG("multi_timeframe.enabled", True):
+        return None
+    tfs = [parse(x) if parse is not None else int(x) for x in CFG("multi_timeframe.timeframes", ["5m", "1h"]) or []]
+    tfs = [tf for tf in tfs if tf > base_sec and tf % base_sec == 0]
+    if not tfs:
+        return None
+    rsi_periods = CFG("indicators.rsi_periods", [14]) or [14]
+    return HigherTimeframeJoin(
+        base_sec, tfs,
+        in_progress=bool(CFG("multi_timeframe.in_progress", False)),
+        ema_spans=[int(x) for x in CFG("multi_timeframe.ema_periods", None) or CFG("indicators.ema_periods", [5, 12, 21])],
+        rsi_period=14 if 14 in rsi_periods else int(rsi_periods[0]),
+        bb_window=int(CFG("indicators.bb_window", 20)),
+        bb_num_std=float(CFG("indicators.bb_num_std", 2.0)),
+    )
@@ -0,0 +1,229 @@
+# core/quantile_sketch.py
+# סקיצת אחוזונים מתמזגת (בסגנון DDSketch) לגדלי טריידים:
+#   LogSketch      – היסטוגרמה בדליים לוגריתמיים (דיוק יחסי rel_acc), מערך NumPy צפוף.
+#                    add O(1), merge/subtract = חיבור/חיסור מערכים, quantile = cumsum על ~אלפיים דליים.
+#   RollingSketch  – אופק מתגלגל (למשל 24 שעות) כסלוטים (למשל שעה): סלוט שיצא מהאופק מופחת מהסכום.
+# ה-checkpoint הוא JSON דליל (רק דליים לא-ריקים), כך שאחרי ריסטארט הסף יציב מהטרייד הראשון.
+
+from __future__ import annotations
+import json
+import math
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class LogSketch:
+    """
+    דלי i מכסה (gamma^(i-1), gamma^i] כש-gamma = (1+a)/(1-a) → כל אחוזון בשגיאה יחסית ≤ a.
+    ערכים מתחת ל-min_value נספרים בדלי הראשון, מעל max_value באחרון; ≤0 נספרים בנפרד (zero).
+    """
+
+    def __init__(self, rel_acc: float = 0.01, min_value: float = 1e-8, max_value: float = 1e9):
+        if not 0.0 < float(rel_acc) < 1.0:
+            raise ValueError("rel_acc must be in (0, 1)")
+        self.rel_acc = float(rel_acc)
+        self.min_value = float(min_value)
+        self.max_value = float(max_value)
+        self.gamma = (1.0 + self.rel_acc) / (1.0 - self.rel_acc)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = int(math.ceil(math.log(self.min_value) / self._log_gamma))
+        n = int(math.ceil(math.log(self.max_value) / self._log_gamma)) - self._offset + 1
+        self.counts = np.zeros(n, dtype=np.float64)
+        self.zero = 0.0
+        self.count = 0.0
+
+    def _index(self, x: float) -> int:
+        i = int(math.ceil(math.log(x) / self._log_gamma)) - self._offset
+        return min(max(i, 0), len(self.counts) - 1)
+
+    def compatible(self, other: "LogSketch") -> bool:
+        return (self.rel_acc, self.min_value, self.max_value) == (other.rel_acc, other.min_value, other.max_value)
+
+    def add(self, x: float, weight: float = 1.0) -> None:
+        x = float(x)
+        if not math.isfinite(x):
+            return
+        if x <= 0.0:
+            self.zero += weight
+        else:
+            self.counts[self._index(x)] += weight
+        self.count += weight
+
+    def add_many(self, xs) -> None:
+        """הוספת מערך ערכים בבת אחת (np.add.at) – לבקפיל/bootstrap."""
+        xs = np.asarray(xs, dtype=float)
+        xs = xs[np.isfinite(xs)]
+        pos = xs[xs > 0]
+        self.zero += float(len(xs) - len(pos))
+        if len(pos):
+            idx = np.ceil(np.log(pos) / self._log_gamma).astype(np.int64) - self._offset
+            np.add.at(self.counts, np.clip(idx, 0, len(self.counts) - 1), 1.0)
+        self.count += float(len(xs))
+
+    def merge(self, other: "LogSketch") -> "LogSketch":
+        if not self.compatible(other):
+            raise ValueError("אי אפשר למזג סקיצות עם פרמטרים שונים")
+        self.counts += other.counts
+        self.zero += other.zero
+        self.count += other.count
+        return self
+
+    def subtract(self, other: "LogSketch") -> "LogSketch":
+        """ההפך מ-merge (סלוט שיצא מהאופק). סופרים לא יורדים מתחת ל-0."""
+        if not self.compatible(other):
+            raise ValueError("אי אפשר לחסר סקיצות עם פרמטרים שונים")
+        np.subtract(self.counts, other.counts, out=self.counts)
+        np.maximum(self.counts, 0.0, out=self.counts)
+        self.zero = max(self.zero - other.zero, 0.0)
+        self.count = max(self.count - other.count, 0.0)
+        return self
+
+    def quantile(self, q: float) -> float:
+        """אחוזון q∈[0,1] (rank = q·(n-1), כמו DDSketch). ריקה → NaN."""
+        if self.count <= 0:
+            return np.nan
+        rank = float(q) * (self.count - 1)
+        if rank < self.zero:
+            return 0.0
+        cum = np.cumsum(self.counts)
+        i = int(np.searchsorted(cum, rank - self.zero, side="right"))
+        i = min(i, len(self.counts) - 1)
+        # נציג הדלי: 2·gamma^i/(gamma+1) – באמצע (יחסית) בין הגבולות
+        return 2.0 * self.gamma ** (i + self._offset) / (self.gamma + 1.0)
+
+    # ---------- checkpoint ----------
+    def to_dict(self) -> Dict[str, Any]:
+        nz = np.flatnonzero(self.counts)
+        return {
+            "rel_acc": self.rel_acc, "min_value": self.min_value, "max_value": self.max_value,
+            "zero": self.zero, "count": self.count,
+            "idx": nz.tolist(), "cnt": self.counts[nz].tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "LogSketch":
+        sk = cls(d["rel_acc"], d["min_value"], d["max_value"])
+        sk.counts[np.asarray(d["idx"], dtype=np.int64)] = np.asarray(d["cnt"], dtype=float)
+        sk.zero = float(d["zero"])
+        sk.count = float(d["count"])
+        return sk
+
+
+class RollingSketch:
+    """
+    סקיצה על אופק זמן מתגלגל: total = סכום הסלוטים שבאופק.
+    add(ts_ms, x) O(1) (כולל טרייד מאוחר לסלוט קיים); quantile O(#דליים) – קבוע, בלי תלות במספר הטריידים.
+    """
+
+    def __init__(self, horizon_ms: int = 24 * 3_600_000, slot_ms: int = 3_600_000, *,
+                 rel_acc: float = 0.01, min_value: float = 1e-8, max_value: float = 1e9):
+        if slot_ms <= 0 or horizon_ms < slot_ms:
+            raise ValueError("נדרש 0 < slot_ms <= horizon_ms")
+        self.horizon_ms = int(horizon_ms)
+        self.slot_ms = int(slot_ms)
+        self._params = (float(rel_acc), float(min_value), float(max_value))
+        self.total = LogSketch(*self._params)
+        self._slots: Deque[Tuple[int, LogSketch]] = deque()  # (slot_start_ms, sketch), ממוין
+        self.last_ts_ms: Optional[int] = None
+
+    @property
+    def count(self) -> float:
+        return self.total.count
+
+    def _expire(self, now_ms: int) -> None:
+        cutoff = now_ms - self.horizon_ms
+        while self._slots and self._slots[0][0] + self.slot_ms <= cutoff:
+            _, old = self._slots.popleft()
+            self.total.subtract(old)
+
+    def _slot_for(self, ts_ms: int) -> Optional[LogSketch]:
+        start = ts_ms - ts_ms % self.slot_ms
+        if not self._slots or start > self._slots[-1][0]:
+            sk = LogSketch(*self._params)
+            self._slots.append((start, sk))
+            return sk
+        for s, sk in reversed(self._slots):  # טרייד מאוחר – בדרך כלל הסלוט האחרון
+            if s == start:
+                return sk
+            if s < start:
+                break
+        return None  # מחוץ לאופק / לפני הסלוט הוותיק – לא נספר
+
+    def add(self, ts_ms: int, x: float) -> None:
+        ts_ms = int(ts_ms)
+        if self.last_ts_ms is None or ts_ms > self.last_ts_ms:
+            self.last_ts_ms = ts_ms
+            self._expire(ts_ms)
+        sk = self._slot_for(ts_ms)
+        if sk is None:
+            return
+        before = sk.count
+        sk.add(x)
+        if sk.count != before:
+            self.total.add(x)
+
+    def quantile(self, q: float) -> float:
+        return self.total.quantile(q)
+
+    def merge(self, other: "RollingSketch") -> "RollingSketch":
+        """איחוד (למשל סקיצות של כמה תהליכים/סימבולים) – סלוט לסלוט לפי זמן ההתחלה."""
+        if (self.slot_ms, self._params) != (other.slot_ms, other._params):
+            raise ValueError("אי אפשר למזג סקיצות מתגלגלות עם פרמטרים שונים")
+        mine = {s: sk for s, sk in self._slots}
+        for s, sk in other._slots:
+            if s in mine:
+                mine[s].merge(sk)
+            else:
+                mine[s] = LogSketch(*self._params).merge(sk)
+        self._slots = deque(sorted(mine.items()))
+        self.total.merge(other.total)
+        if other.last_ts_ms is not None and (self.last_ts_ms is None or other.last_ts_ms > self.last_ts_ms):
+            self.last_ts_ms = other.last_ts_ms
+        if self.last_ts_ms is not None:
+            self._expire(self.last_ts_ms)
+        return self
+
+    # ---------- checkpoint ----------
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "horizon_ms": self.horizon_ms, "slot_ms": self.slot_ms, "last_ts_ms": self.last_ts_ms,
+            "slots": [[s, sk.to_dict()] for s, sk in self._slots],
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "RollingSketch":
+        slots = [(int(s), LogSketch.from_dict(sd)) for s, sd in d.get("slots", [])]
+        first = slots[0][1] if slots else LogSketch()
+        rs = cls(int(d["horizon_ms"]), int(d["slot_ms"]),
+                 rel_acc=first.rel_acc, min_value=first.min_value, max_value=first.max_value)
+        for s, sk in slots:
+            rs._slots.append((s, sk))
+            rs.total.merge(sk)
+        rs.last_ts_ms = d.get("last_ts_ms")
+        return rs
+
+    def save(self, path: str) -> None:
+        """כתיבה אטומית (קובץ זמני ואז replace), כמו save_df."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, **defaults) -> "RollingSketch":
+        """טעינת checkpoint; קובץ חסר/פגום או פרמטרים אחרים מהקונפיג → סקיצה ריקה לפי defaults."""
+        fresh = cls(**defaults)
+        if not os.path.exists(path):
+            return fresh
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rs = cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return fresh
+        if (rs.horizon_ms, rs.slot_ms, rs._params) != (fresh.horizon_ms, fresh.slot_ms, fresh._params):
+            return fresh
+        return rs
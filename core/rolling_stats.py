@@ -0,0 +1,549 @@
+# core/rolling_stats.py
+# סטטיסטיקות חלון מתגלגל בעדכון O(1) לכל ערך – לשימוש משותף ב-indicator/, technical_analysis/, technical_live/.
+#   RingBuffer       – מאגר NumPy מעגלי (ערך + זמן), חלון לפי מספר ערכים או לפי זמן (horizon_ms)
+#   RollingMoments   – ממוצע/שונות Welford עם הוספה והסרה
+#   RollingCovariance – קו-וריאנס/מתאם/בטא בין שתי סדרות בחלון ספירה (Welford דו-ממדי)
+#   RollingMinMax    – min/max בדק מונוטוני (amortized O(1))
+#   RollingQuantile  – אחוזון מדויק בחלון (רשימה ממוינת, bisect)
+#   P2Quantile       – אחוזון מקורב P² (Jain & Chlamtac) על כל הזרם, 5 סמנים, בלי לשמור ערכים
+# לכל מעריך יש מקבילה batch (rolling_*) – pandas.rolling באותה הגדרה, לבקפיל ולבדיקה.
+# חלון זמן: כמו pandas rolling("Nms") – נשמרים ערכים עם t > t_now - horizon_ms.
+# NaN: נכנס לחלון (תופס מקום בחלון ספירה) אבל לא לסטטיסטיקה – כמו pandas.
+
+from __future__ import annotations
+import bisect
+import math
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _check_window(window: Optional[int], horizon_ms: Optional[int]) -> None:
+    if (window is None) == (horizon_ms is None):
+        raise ValueError("צריך בדיוק אחד מ-window (ספירה) או horizon_ms (זמן)")
+    if window is not None and int(window) <= 0:
+        raise ValueError("window must be positive")
+    if horizon_ms is not None and int(horizon_ms) <= 0:
+        raise ValueError("horizon_ms must be positive")
+
+
+# ---------- מאגר מעגלי ----------
+class RingBuffer:
+    """
+    FIFO מעגלי על מערכי NumPy (ערך float + זמן int64).
+    capacity קבוע לחלון ספירה; grow=True מכפיל קיבולת כשמתמלא (חלון זמן, אורך לא ידוע מראש).
+    """
+
+    __slots__ = ("_vals", "_ts", "_head", "_n", "grow")
+
+    def __init__(self, capacity: int, *, grow: bool = False):
+        cap = max(int(capacity), 1)
+        self._vals = np.empty(cap, dtype=float)
+        self._ts = np.empty(cap, dtype=np.int64)
+        self._head = 0  # אינדקס הערך הוותיק
+        self._n = 0
+        self.grow = bool(grow)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def capacity(self) -> int:
+        return len(self._vals)
+
+    def _grow(self) -> None:
+        vals, ts = self.values(), self.times()
+        cap = self.capacity * 2
+        self._vals = np.empty(cap, dtype=float)
+        self._ts = np.empty(cap, dtype=np.int64)
+        self._vals[:self._n] = vals
+        self._ts[:self._n] = ts
+        self._head = 0
+
+    def push(self, x: float, t_ms: int = 0) -> Optional[Tuple[float, int]]:
+        """מוסיף בסוף. מאגר מלא (ולא grow) → הוותיק נדרס ומוחזר (value, t)."""
+        evicted = None
+        if self._n == self.capacity:
+            if self.grow:
+                self._grow()
+            else:
+                evicted = self.popleft()
+        i = (self._head + self._n) % self.capacity
+        self._vals[i] = x
+        self._ts[i] = t_ms
+        self._n += 1
+        return evicted
+
+    def popleft(self) -> Tuple[float, int]:
+        if self._n == 0:
+            raise IndexError("pop from empty RingBuffer")
+        i = self._head
+        out = (float(self._vals[i]), int(self._ts[i]))
+        self._head = (i + 1) % self.capacity
+        self._n -= 1
+        return out
+
+    def pop(self) -> Tuple[float, int]:
+        """מסיר את האחרון (לביטול push – amend)."""
+        if self._n == 0:
+            raise IndexError("pop from empty RingBuffer")
+        i = (self._head + self._n - 1) % self.capacity
+        self._n -= 1
+        return float(self._vals[i]), int(self._ts[i])
+
+    def appendleft(self, x: float, t_ms: int = 0) -> None:
+        """מחזיר ערך לראש התור (לביטול eviction – amend)."""
+        if self._n == self.capacity:
+            if not self.grow:
+                raise IndexError("RingBuffer full")
+            self._grow()
+        self._head = (self._head - 1) % self.capacity
+        self._vals[self._head] = x
+        self._ts[self._head] = t_ms
+        self._n += 1
+
+    def oldest(self) -> Tuple[float, int]:
+        return float(self._vals[self._head]), int(self._ts[self._head])
+
+    def last(self) -> Tuple[float, int]:
+        i = (self._head + self._n - 1) % self.capacity
+        return float(self._vals[i]), int(self._ts[i])
+
+    def _ordered(self, arr: np.ndarray) -> np.ndarray:
+        end = self._head + self._n
+        if end <= self.capacity:
+            return arr[self._head:end].copy()
+        return np.concatenate([arr[self._head:], arr[:end - self.capacity]])
+
+    def values(self) -> np.ndarray:
+        """הערכים בסדר כניסה (עותק)."""
+        return self._ordered(self._vals)
+
+    def times(self) -> np.ndarray:
+        return self._ordered(self._ts)
+
+
+class _Windowed:
+    """
+    בסיס משותף: RingBuffer + eviction לפי ספירה/זמן. מחלקה יורשת מממשת _add/_remove.
+    update(x, t_ms) → מוסיף ומפנה; replace_last(x) → amend של הערך האחרון (מבטל push + evictions שלו).
+    """
+
+    def __init__(self, window: Optional[int] = None, horizon_ms: Optional[int] = None):
+        _check_window(window, horizon_ms)
+        self.window = None if window is None else int(window)
+        self.horizon_ms = None if horizon_ms is None else int(horizon_ms)
+        self._buf = RingBuffer(self.window or 64, grow=self.window is None)
+        self._last_evicted: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def _add(self, x: float) -> None:
+        raise NotImplementedError
+
+    def _remove(self, x: float) -> None:
+        raise NotImplementedError
+
+    def update(self, x: float, t_ms: int = 0) -> None:
+        x = float(x)
+        t_ms = int(t_ms)
+        evicted: List[Tuple[float, int]] = []
+        ev = self._buf.push(x, t_ms)
+        if ev is not None:
+            evicted.append(ev)
+        if self.horizon_ms is not None:
+            cutoff = t_ms - self.horizon_ms
+            while len(self._buf) > 1 and self._buf.oldest()[1] <= cutoff:
+                evicted.append(self._buf.popleft())
+        for v, _ in evicted:
+            self._remove(v)
+        self._add(x)
+        self._last_evicted = evicted
+
+    def replace_last(self, x: float, t_ms: Optional[int] = None) -> None:
+        """ה-update האחרון מוחלף (נר שתוקן): מבטלים אותו, מחזירים את מה שפונה, ומוסיפים מחדש."""
+        if not len(self._buf):
+            self.update(x, 0 if t_ms is None else t_ms)
+            return
+        v, t = self._buf.pop()
+        self._remove(v)
+        for ev in reversed(self._last_evicted):
+            self._buf.appendleft(*ev)
+            self._add(ev[0])
+        self._last_evicted = []
+        self.update(x, t if t_ms is None else t_ms)
+
+    def values(self) -> np.ndarray:
+        return self._buf.values()
+
+    def times(self) -> np.ndarray:
+        return self._buf.times()
+
+
+# ---------- ממוצע/שונות (Welford) ----------
+class RollingMoments(_Windowed):
+    """
+    ממוצע ושונות בחלון, O(1) לכל עדכון (Welford עם הסרה).
+    min_periods (ברירת מחדל = window, או 1 בחלון זמן) – כמו pandas: פחות ערכים תקינים → NaN.
+    """
+
+    def __init__(self, window: Optional[int] = None, horizon_ms: Optional[int] = None,
+                 min_periods: Optional[int] = None):
+        super().__init__(window, horizon_ms)
+        self.min_periods = int(min_periods) if min_periods is not None else (self.window or 1)
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def _add(self, x: float) -> None:
+        if not math.isfinite(x):
+            return
+        self.count += 1
+        d = x - self._mean
+        self._mean += d / self.count
+        self._m2 += d * (x - self._mean)
+
+    def _remove(self, x: float) -> None:
+        if not math.isfinite(x):
+            return
+        self.count -= 1
+        if self.count <= 0:
+            self.count, self._mean, self._m2 = 0, 0.0, 0.0
+            return
+        d = x - self._mean
+        self._mean -= d / self.count
+        self._m2 = max(self._m2 - d * (x - self._mean), 0.0)
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.min_periods
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.ready and self.count > 0 else np.nan
+
+    def var(self, ddof: int = 0) -> float:
+        if not self.ready or self.count - ddof <= 0:
+            return np.nan
+        return self._m2 / (self.count - ddof)
+
+    def std(self, ddof: int = 0) -> float:
+        v = self.var(ddof)
+        return math.sqrt(v) if np.isfinite(v) else np.nan
+
+    def peek(self, x: float, ddof: int = 0) -> Tuple[float, float]:
+        """(mean, std) אילו x היה נכנס עכשיו לחלון ספירה – בלי לשנות מצב (preview של נר פתוח)."""
+        if self.window is None:
+            raise ValueError("peek נתמך רק בחלון ספירה")
+        n, mean, m2 = self.count, self._mean, self._m2
+        if len(self._buf) == self.window:
+            old = self._buf.oldest()[0]
+            if math.isfinite(old):
+                n -= 1
+                if n <= 0:
+                    n, mean, m2 = 0, 0.0, 0.0
+                else:
+                    d = old - mean
+                    mean -= d / n
+                    m2 = max(m2 - d * (old - mean), 0.0)
+        x = float(x)
+        if math.isfinite(x):
+            n += 1
+            d = x - mean
+            mean += d / n
+            m2 += d * (x - mean)
+        if n < self.min_periods or n - ddof <= 0:
+            return np.nan, np.nan
+        return mean, math.sqrt(m2 / (n - ddof))
+
+
+# ---------- קו-וריאנס (שתי סדרות) ----------
+class RollingCovariance:
+    """
+    cov/corr/beta של (x, y) ב-window הזוגות האחרונים, O(1) לעדכון (Welford דו-ממדי עם הסרה).
+    זוג עם NaN תופס מקום בחלון ולא נכנס לסטטיסטיקה. replace_last – amend של הזוג האחרון.
+    """
+
+    def __init__(self, window: int, min_periods: Optional[int] = None):
+        _check_window(window, None)
+        self.window = int(window)
+        self.min_periods = int(min_periods) if min_periods is not None else self.window
+        self._buf: Deque[Tuple[float, float]] = deque()
+        self._last_evicted: Optional[Tuple[float, float]] = None
+        self.count = 0
+        self._mx = self._my = 0.0
+        self._cxx = self._cyy = self._cxy = 0.0
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def _add(self, x: float, y: float) -> None:
+        if not (math.isfinite(x) and math.isfinite(y)):
+            return
+        self.count += 1
+        dx = x - self._mx
+        dy = y - self._my
+        self._mx += dx / self.count
+        self._my += dy / self.count
+        self._cxx += dx * (x - self._mx)
+        self._cyy += dy * (y - self._my)
+        self._cxy += dx * (y - self._my)
+
+    def _remove(self, x: float, y: float) -> None:
+        if not (math.isfinite(x) and math.isfinite(y)):
+            return
+        self.count -= 1
+        if self.count <= 0:
+            self.count, self._mx, self._my = 0, 0.0, 0.0
+            self._cxx = self._cyy = self._cxy = 0.0
+            return
+        mx_old = self._mx - (x - self._mx) / self.count
+        my_old = self._my - (y - self._my) / self.count
+        self._cxx = max(self._cxx - (x - mx_old) * (x - self._mx), 0.0)
+        self._cyy = max(self._cyy - (y - my_old) * (y - self._my), 0.0)
+        self._cxy -= (x - mx_old) * (y - self._my)
+        self._mx, self._my = mx_old, my_old
+
+    def update(self, x: float, y: float) -> None:
+        x, y = float(x), float(y)
+        self._last_evicted = None
+        if len(self._buf) == self.window:
+            self._last_evicted = self._buf.popleft()
+            self._remove(*self._last_evicted)
+        self._buf.append((x, y))
+        self._add(x, y)
+
+    def replace_last(self, x: float, y: float) -> None:
+        if not self._buf:
+            self.update(x, y)
+            return
+        self._remove(*self._buf.pop())
+        if self._last_evicted is not None:
+            self._buf.appendleft(self._last_evicted)
+            self._add(*self._last_evicted)
+        self.update(x, y)
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.min_periods and self.count > 1
+
+    def cov(self, ddof: int = 1) -> float:
+        if not self.ready or self.count - ddof <= 0:
+            return np.nan
+        return self._cxy / (self.count - ddof)
+
+    @property
+    def corr(self) -> float:
+        if not self.ready or self._cxx <= 0 or self._cyy <= 0:
+            return np.nan
+        return self._cxy / math.sqrt(self._cxx * self._cyy)
+
+    @property
+    def beta(self) -> float:
+        """בטא של x על y: cov(x, y) / var(y)."""
+        if not self.ready or self._cyy <= 0:
+            return np.nan
+        return self._cxy / self._cyy
+
+
+# ---------- min / max ----------
+class RollingMinMax(_Windowed):
+    """min ו-max בחלון בדקים מונוטוניים: כל ערך נכנס ויוצא פעם אחת (amortized O(1))."""
+
+    def __init__(self, window: Optional[int] = None, horizon_ms: Optional[int] = None):
+        super().__init__(window, horizon_ms)
+        self._seq = 0      # מספר סידורי של הערך הבא
+        self._first = 0    # מספר סידורי של הוותיק שבחלון
+        self._min: Deque[Tuple[int, float]] = deque()
+        self._max: Deque[Tuple[int, float]] = deque()
+
+    def _add(self, x: float) -> None:
+        seq = self._seq
+        self._seq += 1
+        if not math.isfinite(x):
+            return
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((seq, x))
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((seq, x))
+
+    def _remove(self, x: float) -> None:
+        self._first += 1
+        while self._min and self._min[0][0] < self._first:
+            self._min.popleft()
+        while self._max and self._max[0][0] < self._first:
+            self._max.popleft()
+
+    def replace_last(self, x: float, t_ms: Optional[int] = None) -> None:
+        # הדקים לא הפיכים – בונים מחדש מהחלון (נדיר: amend)
+        super().replace_last(x, t_ms)
+        vals = self._buf.values()
+        self._seq, self._first = 0, 0
+        self._min.clear()
+        self._max.clear()
+        for v in vals:
+            self._add(float(v))
+
+    @property
+    def min(self) -> float:
+        return self._min[0][1] if self._min else np.nan
+
+    @property
+    def max(self) -> float:
+        return self._max[0][1] if self._max else np.nan
+
+
+# ---------- אחוזונים ----------
+class RollingQuantile(_Windowed):
+    """
+    אחוזון מדויק בחלון (אינטרפולציה לינארית, כמו pandas/NumPy).
+    רשימה ממוינת: חיפוש O(log n) + הזזת זיכרון – מהיר מאוד לחלונות של מאות/אלפים.
+    """
+
+    def __init__(self, q: float, window: Optional[int] = None, horizon_ms: Optional[int] = None,
+                 min_periods: Optional[int] = None):
+        super().__init__(window, horizon_ms)
+        if not 0.0 <= float(q) <= 1.0:
+            raise ValueError("q must be in [0, 1]")
+        self.q = float(q)
+        self.min_periods = int(min_periods) if min_periods is not None else (self.window or 1)
+        self._sorted: List[float] = []
+
+    def _add(self, x: float) -> None:
+        if math.isfinite(x):
+            bisect.insort(self._sorted, x)
+
+    def _remove(self, x: float) -> None:
+        if math.isfinite(x):
+            del self._sorted[bisect.bisect_left(self._sorted, x)]
+
+    def quantile(self, q: Optional[float] = None) -> float:
+        s = self._sorted
+        if len(s) < max(self.min_periods, 1):
+            return np.nan
+        pos = (len(s) - 1) * (self.q if q is None else float(q))
+        lo = int(math.floor(pos))
+        hi = min(lo + 1, len(s) - 1)
+        return s[lo] + (s[hi] - s[lo]) * (pos - lo)
+
+    @property
+    def value(self) -> float:
+        return self.quantile()
+
+
+class P2Quantile:
+    """
+    אחוזון מקורב P² על כל הזרם: 5 סמנים, O(1) זיכרון וזמן, בלי לשמור ערכים.
+    עד 5 ערכים – מדויק (NumPy linear). מתאים לספים ארוכי-טווח (למשל "טרייד גדול").
+    """
+
+    __slots__ = ("q", "_h", "_pos", "_want", "_dn", "count")
+
+    def __init__(self, q: float):
+        if not 0.0 < float(q) < 1.0:
+            raise ValueError("q must be in (0, 1)")
+        self.q = float(q)
+        self._h: List[float] = []
+        self._pos = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self._want = [1.0, 1 + 2 * self.q, 1 + 4 * self.q, 3 + 2 * self.q, 5.0]
+        self._dn = [0.0, self.q / 2, self.q, (1 + self.q) / 2, 1.0]
+        self.count = 0
+
+    def update(self, x: float) -> None:
+        x = float(x)
+        if not math.isfinite(x):
+            return
+        self.count += 1
+        h = self._h
+        if len(h) < 5:
+            bisect.insort(h, x)
+            return
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = max(h[4], x)
+            k = 3
+        else:
+            k = bisect.bisect_right(h, x) - 1
+            k = min(max(k, 0), 3)
+        pos, want, dn = self._pos, self._want, self._dn
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            want[i] += dn[i]
+        for i in (1, 2, 3):
+            d = want[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                s = 1.0 if d > 0 else -1.0
+                # פרבולי; אם יוצא מהסדר → לינארי
+                hp = h[i] + s / (pos[i + 1] - pos[i - 1]) * (
+                    (pos[i] - pos[i - 1] + s) * (h[i + 1] - h[i]) / (pos[i + 1] - pos[i])
+                    + (pos[i + 1] - pos[i] - s) * (h[i] - h[i - 1]) / (pos[i] - pos[i - 1]))
+                if not (h[i - 1] < hp < h[i + 1]):
+                    j = i + int(s)
+                    hp = h[i] + s * (h[j] - h[i]) / (pos[j] - pos[i])
+                h[i] = hp
+                pos[i] += s
+
+    @property
+    def value(self) -> float:
+        if not self._h:
+            return np.nan
+        if self.count <= 5:
+            return float(np.quantile(np.asarray(self._h), self.q))
+        return self._h[2]
+
+
+# ---------- מקבילות batch ----------
+def _roller(values, window: Optional[int], horizon_ms: Optional[int], times_ms, min_periods: Optional[int]):
+    _check_window(window, horizon_ms)
+    s = pd.Series(np.asarray(values, dtype=float))
+    if window is not None:
+        return s.rolling(int(window), min_periods=int(min_periods) if min_periods is not None else int(window))
+    if times_ms is None:
+        raise ValueError("חלון זמן דורש times_ms")
+    s.index = pd.to_datetime(np.asarray(times_ms, dtype=np.int64), unit="ms")
+    return s.rolling(f"{int(horizon_ms)}ms", min_periods=int(min_periods) if min_periods is not None else 1)
+
+
+def rolling_mean_std(values, *, window: Optional[int] = None, horizon_ms: Optional[int] = None,
+                     times_ms=None, ddof: int = 0, min_periods: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """batch של RollingMoments: (mean, std) לכל נקודה."""
+    r = _roller(values, window, horizon_ms, times_ms, min_periods)
+    return r.mean().to_numpy(), r.std(ddof=ddof).to_numpy()
+
+
+def rolling_min_max(values, *, window: Optional[int] = None, horizon_ms: Optional[int] = None,
+                    times_ms=None) -> Tuple[np.ndarray, np.ndarray]:
+    """batch של RollingMinMax."""
+    r = _roller(values, window, horizon_ms, times_ms, 1)
+    return r.min().to_numpy(), r.max().to_numpy()
+
+
+def rolling_quantile(values, q: float, *, window: Optional[int] = None, horizon_ms: Optional[int] = None,
+                     times_ms=None, min_periods: Optional[int] = None) -> np.ndarray:
+    """batch של RollingQuantile (linear)."""
+    r = _roller(values, window, horizon_ms, times_ms, min_periods)
+    return r.quantile(float(q), interpolation="linear").to_numpy()
+
+
+def nearest_rank(values: Sequence[float], q: float) -> float:
+    """
+    אחוזון Nearest-Rank (q ב-[0,100]) בלי מיון מלא – np.partition, O(n).
+    רשימה ריקה → 0.0 (כמו _percentile ב-orderbook_technical).
+    """
+    if len(values) == 0:
+        return 0.0
+    arr = np.asarray(values, dtype=float)
+    if q <= 0:
+        return float(arr.min())
+    if q >= 100:
+        return float(arr.max())
+    k = max(0, min(math.ceil((q / 100.0) * len(arr)) - 1, len(arr) - 1))
+    return float(np.partition(arr, k)[k])
@@ -0,0 +1,530 @@
+# core/symbol_pipeline.py
+# ריצה של כמה (symbol, interval) בתוך תהליך אחד:
+#   • SymbolFeed     – ingest משותף לסימבול: באפר טריידים + באפר ספר, פענוח פעם אחת.
+#   • SymbolPipeline – מצב פרטי לכל (symbol, interval): אגרגטור, filler, df_all, שמירה.
+#   צינורות זמן שהאינטרוול שלהם כפולה של הקטן ביותר של הסימבול לא חותכים טריידים בעצמם:
+#   הם נסגרים מגלגול נרות הבסיס (core.multi_timeframe.MultiTimeframeAggregator).
+
+from __future__ import annotations
+import re
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from live_data.trade_buffer import TradeBuffer
+from live_data.orderbook_buffer import OrderBookBuffer
+from core.window_aggregator import ReusableAggregator, ExchangeClock, CloseResult, _to_ms
+from core.bar_clocks import EventBarAggregator, parse_bar_spec
+from core.settings_manager import CFG
+from core.quantile_sketch import RollingSketch
+from graphs.graphs_time import CandleEngine, LiveCandle
+
+from dataset.schema_registry import SCHEMA, empty_df, ensure_feature_cols, ensure_target_cols, ensure_path_label_cols
+from dataset.pipeline import on_candle_ready
+from dataset.target_filler import TargetFiller
+from dataset.path_labels import PathLabeler, path_labeler_from_config
+from dataset.provisional import ProvisionalStage
+from dataset.feature_builder import build_feature_row
+from dataset.normalizer import OnlineNormalizer, NormalizedTable, DEFAULT_EXCLUDE, PRICE_LEVEL_EXCLUDE
+from io_utils.storage import load_df, save_df, state_path
+
+from indicator.run_indikators import add_all_indicators, vwap_stream_from_config
+from technical_analysis.run_technical import add_all_technical
+from technical_analysis.stream_technical import TechnicalStream
+from technical_live.orderbook_technical import process_orderbook
+from technical_live.book_accumulator import TopOfBookAccumulator, OrderFlowImbalance
+from technical_live.wall_tracker import WallTracker
+from technical_live.footprint import FootprintTable
+from technical_live.realized_vol import RealizedVolStream
+from core.cross_section import CrossSectionStage, cross_section_from_config
+from core.multi_timeframe import Bar, MultiTimeframeAggregator, htf_join_from_config
+from technical_live.trade_history_technical import compute_trade_history_technical as compute_th
+from technical_live.volume_technical_delta import compute_vd_for_chunk as compute_vd
+
+_UNIT_SEC = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_interval(interval: str) -> int:
+    """
+    "30s" → 30, "1m" → 60, "5m" → 300, "1h" → 3600. מספר בלי יחידה = שניות.
+    (ברי אירועים – tick500 / vol25 / dollar1e6 – מטופלים ב-core.bar_clocks.parse_bar_spec.)
+    """
+    m = re.fullmatch(r"\s*(\d+)\s*([smhd]?)\s*", str(interval).lower())
+    if not m:
+        raise ValueError(f"interval לא חוקי: {interval!r}")
+    sec = int(m.group(1)) * _UNIT_SEC.get(m.group(2) or "s", 1)
+    if sec <= 0:
+        raise ValueError(f"interval חייב להיות חיובי: {interval!r}")
+    return sec
+
+
+class SymbolPipeline:
+    """
+    צינור אחד לכל (symbol, interval). הבאפרים מגיעים מבחוץ (משותפים לסימבול),
+    כל השאר – אגרגטור, filler, סכימה, df_all ושמירה – פרטי לצינור.
+    interval יכול להיות זמן ("30s") או בר אירועים ("tick500", "vol25", "dollar1e6").
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        interval: str,
+        *,
+        trade_buf: TradeBuffer,
+        ob_buf: OrderBookBuffer,
+        horizons: List[int],
+        save_every: int = 50,
+        size_sketch: Optional[RollingSketch] = None,
+        wall_tracker: Optional[WallTracker] = None,
+    ):
+        self.symbol = symbol
+        self.interval = interval
+        bar_clock = parse_bar_spec(interval)
+        self.is_event_bar = bar_clock is not None
+        # הנר הרץ (OHLCV + סכומי טריידים ב-O(1)) – לברי זמן דרך CandleEngine, לברי אירועים ישירות
+        self.candles: Optional[CandleEngine] = None
+        self._event_bar = LiveCandle()
+        if bar_clock is not None:
+            self.interval_sec = None
+            self.agg = EventBarAggregator(bar_clock, symbol=symbol)
+        else:
+            self.interval_sec = parse_interval(interval)
+            late_policy = CFG("windows.late_policy", "amend")
+            self.agg = ReusableAggregator(
+                trade_buf, symbol=symbol, interval_sec=self.interval_sec,
+                grace_ms=int(CFG("windows.close_grace_ms", 250)),
+                late_policy=late_policy,
+            )
+            self.candles = CandleEngine(self.interval_sec, late_policy=late_policy)
+        self.filler = TargetFiller(horizons, commission_bps=5.0, slippage_bps=2.0)
+        self.schema = ensure_target_cols(schema=SCHEMA, horizons=horizons)
+        vol_windows = [int(w) for w in CFG("volatility.roll_windows", [20]) or []]
+        # triple barrier / MFE / MAE מהמסלול הגולמי – מוזן מכל טרייד, נכתב לשורה כשהאופק נסגר
+        self.path_labels: Optional[PathLabeler] = path_labeler_from_config(horizons)
+        if self.path_labels is not None:
+            self.schema = ensure_path_label_cols(self.schema, horizons)
+        self._persisted = False
+        self.ob_buf = ob_buf
+        # footprint: סיכום לשורה (th_fp_*), פרופיל הדליים לטבלת צד לפי ts של הנר
+        self.footprint: Optional[Dict[str, Any]] = None
+        self.footprint_table: Optional[FootprintTable] = None
+        if CFG("footprint.enabled", True):
+            self.footprint = {
+                "tick_size": CFG("footprint.tick_size", None),
+                "bucket_bps": float(CFG("footprint.bucket_bps", 5.0)),
+                "value_area": float(CFG("footprint.value_area", 0.70)),
+            }
+            if CFG("footprint.store_profiles", True):
+                self.footprint_table = FootprintTable(
+                    symbol, interval, max_rows=CFG("footprint.max_rows", 20000),
+                    compact_every=int(CFG("footprint.compact_every", 64)),
+                )
+        # spread/imbalance/microprice משוקללי-זמן + סכומי OFI לנר – מוזן מכל עדכון ספר, נחתך על רשת הנרות
+        self.tob: Optional[TopOfBookAccumulator] = None
+        if CFG("orderbook.tob_features", True):
+            self.tob = TopOfBookAccumulator(self.interval_sec * 1000 if self.interval_sec else None,
+                                            ofi_levels=int(CFG("orderbook.ofi_levels", 5)))
+        self.schema = ensure_feature_cols(
+            self.schema, vol_windows=vol_windows, tob=self.tob is not None,
+            ofi_levels=self.tob.ofi_levels if self.tob is not None else 0, walls=wall_tracker is not None,
+        )
+        # נרמול אונליין (z מול mean/var מצטברים) – הסטטיסטיקות נטענות מה-checkpoint ונשמרות עם df_all
+        self.normalizer: Optional[OnlineNormalizer] = None
+        self.normalized_table: Optional[NormalizedTable] = None
+        self._normalizer_path = str(state_path(symbol, f"{interval}_normalizer"))
+        if CFG("normalize.enabled", True):
+            self.normalizer = OnlineNormalizer.load(
+                self._normalizer_path,
+                mode=str(CFG("normalize.mode", "ewm")),
+                halflife=float(CFG("normalize.halflife", 500)),
+                min_count=int(CFG("normalize.min_count", 30)),
+                clip=CFG("normalize.clip", 8.0),
+                exclude=list(DEFAULT_EXCLUDE) + ([] if CFG("normalize.price_levels", False) else list(PRICE_LEVEL_EXCLUDE))
+                + list(CFG("normalize.exclude", []) or []),
+            )
+            if CFG("normalize.output", "table") == "table":
+                self.normalized_table = NormalizedTable(
+                    symbol, interval, max_rows=CFG("normalize.max_rows", 20000),
+                    compact_every=int(CFG("normalize.compact_every", 64)),
+                )
+        # פיצ'רים חוצי-סימבולים (x_<ref>_*) – משותף לכל הצינורות, נקבע ב-build_feeds
+        self.cross: Optional[CrossSectionStage] = None
+        # גלגול מצינור הבסיס של הסימבול (SymbolFeed._link_timeframes): הנר הפתוח המגולגל, ובבסיס – היעד של הסגירות
+        self.rollup: Optional[Callable[[], Optional[LiveCandle]]] = None
+        self.rollup_sink: Optional[Callable[[CloseResult, Optional[LiveCandle]], Any]] = None
+        self._closed_t0_ms = 0  # תחילת הנר האחרון שנסגר – book_keep_ms
+        # snapshot זמני של הנר הפתוח – למנויים בלבד, לא ל-df_all
+        self.provisional = ProvisionalStage(
+            symbol, interval,
+            queue_max=int(CFG("provisional.queue_max", 100)),
+            ema_spans=CFG("indicators.ema_periods", [5, 12, 21]),
+            bb_window=int(CFG("indicators.bb_window", 20)),
+            bb_num_std=float(CFG("indicators.bb_num_std", 2.0)),
+        )
+
+        self.ctx: Dict[str, Any] = {
+            "SYMBOL": symbol, "INTERVAL": interval, "HORIZONS": horizons,
+            "df_all": self._load_df_all(), "schema": self.schema, "price_lookup": self.price_lookup,
+            "orderbook_buffer": ob_buf, "filler": self.filler, "path_labeler": self.path_labels,
+            "add_all_indicators": add_all_indicators,
+            "add_all_technical":  add_all_technical,
+            "build_feature_row":  build_feature_row,
+            "compute_th": compute_th, "compute_vd": compute_vd, "process_ob": process_orderbook,
+            "save_df": save_df, "SAVE_EVERY": save_every,
+            "technical_stream": TechnicalStream(
+                vwap_on_tol_pct=float(CFG("technical.vwap_on_tol_pct", 0.02)),
+                bb_window=int(CFG("technical.bb_window", 20)),
+                bb_num_std=float(CFG("technical.bb_num_std", 2.0)),
+                ema_pairs=[tuple(p) for p in CFG("technical.ema_pairs", [(12, 21)])],
+            ),
+            "vwap_stream": vwap_stream_from_config(),
+            "vol_stream": RealizedVolStream(vol_windows),
+            "htf_join": htf_join_from_config(self.interval_sec, parse_interval),
+            "htf_bootstrap_rows": int(CFG("multi_timeframe.bootstrap_rows", 20000)),
+            "tob_accumulator": self.tob,
+            "wall_tracker": wall_tracker,
+            "footprint": self.footprint,
+            "footprint_table": self.footprint_table,
+            "normalizer": self.normalizer,
+            "normalizer_path": self._normalizer_path,
+            "normalized_table": self.normalized_table,
+            "trade_size_sketch": size_sketch,
+            "side_mode": str(CFG("volume_delta.side_mode", "exchange")),
+            "large_trade_pctl": float(CFG("volume_delta.large_trade_pctl", 90.0)),
+            "sketch_min_count": int(CFG("volume_delta.sketch_min_count", 500)),
+        }
+
+    @property
+    def key(self) -> str:
+        return f"{self.symbol}:{self.interval}"
+
+    @property
+    def df_all(self) -> pd.DataFrame:
+        # on_candle_ready מחזיר את df_all המעודכן דרך ctx
+        return self.ctx["df_all"]
+
+    def _load_df_all(self) -> pd.DataFrame:
+        df = load_df(self.symbol, self.interval)
+        if df is None or df.empty:
+            return empty_df(self.schema)
+        if "ts" in df.columns:
+            df["ts"] = pd.to_datetime(df["ts"], utc=True)
+        return df
+
+    # ---------- lookup לצורך TargetFiller ----------
+    def price_lookup(self, ts_target: pd.Timestamp) -> Optional[float]:
+        df_all = self.df_all
+        if df_all.empty or "ts" not in df_all.columns:
+            return None
+        ts_norm = pd.to_datetime(ts_target, utc=True)
+        if self.is_event_bar:
+            # לברי אירועים אין נר בדיוק ב-ts+h: לוקחים את ה-close האחרון עד היעד (as-of)
+            pos = int(df_all["ts"].searchsorted(ts_norm, side="right")) - 1
+            if pos < 0:
+                return None
+            v = df_all["close"].iloc[pos]
+            return None if pd.isna(v) else float(v)
+        m = df_all["ts"] == ts_norm
+        if not m.any():
+            return None
+        v = df_all.loc[m, "close"].iloc[0]
+        return None if pd.isna(v) else float(v)
+
+    # ---------- זרימה ----------
+    @property
+    def open_candle(self) -> Optional[LiveCandle]:
+        if self.rollup is not None:
+            return self.rollup()
+        return self._event_bar if self.candles is None else self.candles.current
+
+    def _bar_for(self, closed: CloseResult, by_start: Dict[int, LiveCandle]) -> Optional[LiveCandle]:
+        t0_ms = _to_ms(closed.t0)
+        bar = by_start.get(t0_ms)
+        if bar is None and closed.amended and self.candles is not None:
+            lc = self.candles.last_closed
+            if lc is not None and lc.start_ms == t0_ms:
+                bar = lc
+        return bar
+
+    async def _dispatch(self, closed_list: List[CloseResult], bars: List[LiveCandle] = ()) -> None:
+        by_start = {b.start_ms: b for b in bars}
+        for closed in closed_list:
+            bar = self._bar_for(closed, by_start)
+            self._closed_t0_ms = max(self._closed_t0_ms, _to_ms(closed.t0))
+            await on_candle_ready(t0=closed.t0, t1=closed.t1, df_chunk=closed.df_chunk,
+                                  ctx=self.ctx, amend=closed.amended, bar=bar)
+            if self.cross is not None:
+                self._cross_close(closed)
+            if self.rollup_sink is not None:
+                await self.rollup_sink(closed, bar)
+        self.provisional.indicators.on_close(self.df_all)
+
+    async def on_rolled(self, bar: Bar) -> None:
+        """נר גבוה שנסגר מגלגול הבסיס – אותו מסלול כמו סגירה מהאגרגטור של הצינור."""
+        closed = CloseResult(t0=bar.t0, t1=bar.t1, df_chunk=bar.df_chunk, amended=bar.amended)
+        await self._dispatch([closed], [bar.candle] if bar.candle is not None else [])
+
+    def buffer_keep_ms(self) -> Optional[int]:
+        """
+        מאיזה ms הצינור עוד צריך טריידים RAW מה-TradeBuffer: החלון הפתוח + הקודם (לתיקון amend).
+        None – הצינור לא חותך את הבאפר (בר אירועים / גלגול מהבסיס).
+        """
+        if self.rollup is not None or self.is_event_bar:
+            return None
+        clock = self.agg.clock
+        return 0 if clock.t0_ms is None else clock.t0_ms - clock.step_ms
+
+    def book_keep_ms(self) -> int:
+        """
+        מאיזה ms הצינור עוד צריך היסטוריית ספר (quotes ל-side inference, snapshot ב-t1):
+        תחילת הנר האחרון שנסגר (amend סוגר אותו שוב). גם בבר אירועים ובגלגול – שם ה-chunk ארוך מחלון הבסיס.
+        """
+        return self._closed_t0_ms
+
+    def _cross_close(self, closed: CloseResult) -> None:
+        # רק נר שנכנס בפועל כשורה האחרונה (לא נר שנדחה כ-out-of-order)
+        df_all = self.df_all
+        if df_all.empty or df_all["ts"].iloc[-1] != pd.to_datetime(closed.t1, utc=True):
+            return
+        self.cross.on_close(self.symbol, self.interval, _to_ms(closed.t1), df_all["close"].iloc[-1])
+
+    async def on_trade(self, ts_ms: int, trade: Optional[Dict[str, Any]] = None) -> None:
+        if self.path_labels is not None and trade is not None:
+            self.path_labels.on_trade(ts_ms, trade["price"])  # לפני הסגירה – הטרייד כבר במסלול של הנר שנסגר
+        if self.rollup is not None:
+            return  # נסגר מגלגול הבסיס
+        if self.candles is None:
+            # בבר אירועים הטרייד החוצה נכלל בבר שנסגר – צוברים לפני, מחליפים נר אחרי
+            if trade is not None:
+                self._event_bar.add(ts_ms, trade["price"], trade["size"], trade["side"])
+            closed = self.agg.on_trade(ts_ms, trade)
+            if closed:
+                bars, self._event_bar = [self._event_bar], LiveCandle()
+                await self._dispatch(closed, bars)
+            return
+        bars = self.candles.on_trade(ts_ms, trade["price"], trade["size"], trade["side"]) if trade is not None else []
+        closed = self.agg.on_trade(ts_ms, trade)
+        if closed:
+            await self._dispatch(closed, bars)
+
+    async def on_timer(self, now_ms: int) -> None:
+        """סגירה לפי שעון הבורסה המוערך (t1 + grace), גם כשאין טריידים."""
+        if self.rollup is not None:
+            return
+        bars = self.candles.advance_to(now_ms - self.agg.grace_ms) if self.candles is not None else []
+        closed = self.agg.close_due(now_ms)
+        if closed:
+            await self._dispatch(closed, bars)
+
+    def on_book(self, ts_ms: int, bid: float, ask: float, bid_qty: float, ask_qty: float, ofi=None) -> None:
+        if self.tob is not None:
+            self.tob.on_book(ts_ms, bid, ask, bid_qty, ask_qty, ofi=ofi)
+
+    def publish_provisional(self, now: pd.Timestamp) -> Optional[Dict[str, Any]]:
+        """snapshot של הנר הפתוח → מנויי self.provisional. לעולם לא נוגע ב-df_all."""
+        return self.provisional.publish(self.open_candle, now, self.ob_buf, tob=self.tob)
+
+    def persist(self) -> None:
+        if self._persisted:
+            return
+        try:
+            save_df(self.df_all, self.symbol, self.interval)
+            if self.footprint_table is not None:
+                self.footprint_table.save()
+            if self.normalizer is not None:
+                self.normalizer.save(self._normalizer_path)
+            if self.normalized_table is not None:
+                self.normalized_table.save()
+            print(f"[persist] rows={len(self.df_all)} saved ({self.symbol} {self.interval})")
+        except Exception:
+            traceback.print_exc()
+        self._persisted = True
+
+
+class SymbolFeed:
+    """
+    ingest משותף לסימבול אחד: טרייד מפוענח פעם אחת, נכנס לבאפר אחד,
+    ומשם מופץ לכל הצינורות (אינטרוולים) של אותו סימבול.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.trade_buf = TradeBuffer()
+        self._buf_keep_ms = 0
+        self._book_keep_ms = 0
+        self.ob_buf = OrderBookBuffer()
+        self.exchange_clock = ExchangeClock()
+        self.pipelines: List[SymbolPipeline] = []
+        self.mtf: Optional[MultiTimeframeAggregator] = None  # גלגול צינורות הזמן מהבסיס (_link_timeframes)
+        # OFI לכל עדכון ספר – פעם אחת לסימבול, הצינורות רק סוכמים לנר
+        levels = int(CFG("orderbook.ofi_levels", 5))
+        self.ofi: Optional[OrderFlowImbalance] = OrderFlowImbalance(levels) if levels > 0 else None
+        # קירות מתמשכים (גיל/משיכות/מילויים) – משותף לכל האינטרוולים של הסימבול
+        self.walls: Optional[WallTracker] = None
+        if CFG("orderbook.walls_enabled", True):
+            self.walls = WallTracker(
+                median_k=float(CFG("orderbook.wall_median_k", 3.0)),
+                percentile=float(CFG("orderbook.wall_percentile", 97)),
+                exit_ratio=float(CFG("orderbook.wall_exit_ratio", 0.5)),
+                change_frac=float(CFG("orderbook.wall_change_frac", 0.5)),
+                flash_ms=int(CFG("orderbook.wall_flash_ms", 1000)),
+                min_samples=int(CFG("orderbook.wall_min_samples", 200)),
+            )
+        # גדלי טריידים על אופק מתגלגל – סף "טרייד גדול" משותף לכל האינטרוולים של הסימבול
+        self.size_sketch: Optional[RollingSketch] = None
+        self._sketch_path = str(state_path(symbol, "trade_sizes"))
+        self._sketch_every_ms = int(float(CFG("volume_delta.checkpoint_every_sec", 300)) * 1000)
+        self._sketch_next_ms: Optional[int] = None
+        if CFG("volume_delta.sketch_enabled", True):
+            self.size_sketch = RollingSketch.load(
+                self._sketch_path,
+                horizon_ms=int(float(CFG("volume_delta.sketch_horizon_hours", 24)) * 3_600_000),
+                slot_ms=int(float(CFG("volume_delta.sketch_slot_minutes", 60)) * 60_000),
+                rel_acc=float(CFG("volume_delta.sketch_rel_acc", 0.01)),
+            )
+
+    def add_pipeline(self, interval: str, *, horizons: List[int], save_every: int = 50) -> SymbolPipeline:
+        p = SymbolPipeline(
+            self.symbol, interval,
+            trade_buf=self.trade_buf, ob_buf=self.ob_buf,
+            horizons=horizons, save_every=save_every, size_sketch=self.size_sketch,
+            wall_tracker=self.walls,
+        )
+        self.pipelines.append(p)
+        self._link_timeframes()
+        return p
+
+    def _link_timeframes(self) -> None:
+        """
+        הצינור עם אינטרוול הזמן הקטן ביותר הוא הבסיס; כל צינור זמן שהאינטרוול שלו כפולה שלו נסגר
+        מגלגול נרות הבסיס (MultiTimeframeAggregator) – מעבר אחד על הטריידים וחיתוך אחד של ה-Buffer לחלון.
+        """
+        for p in self.pipelines:
+            p.rollup = p.rollup_sink = None
+        self.mtf = None
+        timed = [p for p in self.pipelines if p.interval_sec is not None]
+        if not CFG("multi_timeframe.rollup", True) or len(timed) < 2:
+            return
+        base = min(timed, key=lambda p: p.interval_sec)
+        derived = [p for p in timed if p is not base and p.interval_sec % base.interval_sec == 0]
+        if not derived:
+            return
+        self.mtf = mtf = MultiTimeframeAggregator(
+            self.trade_buf, self.symbol, base.interval_sec, [p.interval_sec for p in derived], base=base.agg,
+        )
+        by_tf: Dict[int, List[SymbolPipeline]] = {}
+        for p in derived:
+            by_tf.setdefault(p.interval_sec, []).append(p)
+            p.rollup = (lambda tf=p.interval_sec: mtf.open_candle(tf, base.open_candle))
+
+        async def sink(closed: CloseResult, candle: Optional[LiveCandle]) -> None:
+            for bar in mtf.on_base_closed(closed, candle):
+                for p in by_tf.get(bar.interval_sec, ()):
+                    await p.on_rolled(bar)
+
+        base.rollup_sink = sink
+
+    async def on_trade(self, tr: Dict[str, Any]) -> None:
+        ts_ms = int(tr.get("ts_ms"))
+        self.exchange_clock.observe(ts_ms)
+        row = {
+            "ts": pd.Timestamp(ts_ms * 1_000_000, tz="UTC"),
+            "symbol": self.symbol,
+            "price": float(tr.get("price", 0.0)),
+            "size":  float(tr.get("qty", tr.get("size", 0.0))),
+            "side":  str(tr.get("side", "")).lower(),
+        }
+        if tr.get("trade_id"):
+            row["id"] = str(tr["trade_id"])
+        if not self.trade_buf.append(row):
+            return  # כפילות (reconnect/replay) – לא לנר, לסקיצה או ליעדי המסלול
+        if self.size_sketch is not None:
+            self.size_sketch.add(ts_ms, row["size"])
+            self._maybe_checkpoint(ts_ms)
+        for p in self.pipelines:
+            await p.on_trade(ts_ms, row)
+        self._purge_buffers()
+
+    def _purge_buffers(self) -> None:
+        """
+        אחרי סגירה: זורק מהבאפר טריידים שקודמים לחלון הפתוח האיטי ביותר (searchsorted, לא סריקה),
+        ומבאפר הספר עדכונים שקודמים לנר האחרון שנסגר בצינור האיטי ביותר.
+        """
+        keeps = [k for k in (p.buffer_keep_ms() for p in self.pipelines) if k is not None]
+        keep = min(keeps) if keeps else None
+        if keep is not None and keep > self._buf_keep_ms:
+            self._buf_keep_ms = keep
+            self.trade_buf.purge_before_ms(keep)
+        book = min((p.book_keep_ms() for p in self.pipelines), default=0)
+        if book > self._book_keep_ms:
+            self._book_keep_ms = book
+            self.ob_buf.purge_older_than(book / 1000.0)
+
+    def _maybe_checkpoint(self, ts_ms: int) -> None:
+        if self._sketch_next_ms is None:
+            self._sketch_next_ms = ts_ms + self._sketch_every_ms
+        elif ts_ms >= self._sketch_next_ms:
+            self._sketch_next_ms = ts_ms + self._sketch_every_ms
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """שמירת מצב ה-stream של הסימבול (כרגע: סקיצת גדלי הטריידים)."""
+        if self.size_sketch is None:
+            return
+        try:
+            self.size_sketch.save(self._sketch_path)
+        except Exception:
+            traceback.print_exc()
+
+    def next_deadline_ms(self) -> Optional[int]:
+        deadlines = [d for d in (p.agg.next_deadline_ms() for p in self.pipelines if p.rollup is None) if d is not None]
+        return min(deadlines) if deadlines else None
+
+    async def on_timer(self) -> None:
+        now_ms = self.exchange_clock.now_ms()
+        for p in self.pipelines:
+            await p.on_timer(now_ms)
+        self._purge_buffers()
+
+    def publish_provisional(self) -> None:
+        now = pd.Timestamp(self.exchange_clock.now_ms() * 1_000_000, tz="UTC")
+        for p in self.pipelines:
+            p.publish_provisional(now)
+
+    def on_orderbook(self, up: Dict[str, Any]) -> None:
+        ts_ms = int(up.get("ts_ms", 0))
+        self.ob_buf.add_update(
+            bids=up.get("bids", []),
+            asks=up.get("asks", []),
+            ts=ts_ms / 1000.0,
+            kind=up.get("type"),
+        )
+        if self.walls is not None:
+            self.walls.on_update(ts_ms, up.get("bids", []), up.get("asks", []), up.get("type"), book=self.ob_buf.book)
+        top = self.ob_buf.last_top
+        if top is not None:
+            flow = self.ofi.update(*self.ob_buf.depth(self.ofi.levels)) if self.ofi is not None else None
+            for p in self.pipelines:
+                p.on_book(ts_ms, *top[1:], ofi=flow)
+
+
+def build_feeds(pairs: List[tuple[str, str]], *, horizons: List[int], save_every: int = 50) -> Dict[str, SymbolFeed]:
+    """[(symbol, interval), ...] → {symbol: SymbolFeed} עם צינור לכל אינטרוול (בלי כפילויות)."""
+    feeds: Dict[str, SymbolFeed] = {}
+    seen = set()
+    for symbol, interval in pairs:
+        symbol = symbol.strip().upper()
+        interval = interval.strip().lower()
+        if (symbol, interval) in seen:
+            continue
+        seen.add((symbol, interval))
+        feed = feeds.setdefault(symbol, SymbolFeed(symbol))
+        feed.add_pipeline(interval, horizons=horizons, save_every=save_every)
+    cross = cross_section_from_config()
+    if cross is not None:
+        for feed in feeds.values():
+            for p in feed.pipelines:
+                p.cross = cross
+                cross.register(p)
+    return feeds
@@ -1,15 +1,45 @@
 from __future__ import annotations
+import time
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from live_data.trade_buffer import TradeBuffer
+from core.rolling_stats import RollingMinMax
 
 # ---------- שעון חלונות כללי (ניתן להחלפה תוך כדי ריצה) ----------
+def _to_ms(ts) -> int:
+    """int (מילישניות) / pd.Timestamp / datetime → מילישניות UTC."""
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    ts = pd.Timestamp(ts)
+    if ts.tz is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.value // 1_000_000)
+
+
+def _ms_to_ts(ms: int) -> pd.Timestamp:
+    return pd.Timestamp(int(ms) * 1_000_000, tz="UTC")
+
+
 class WindowClock:
+    """
+    גבולות החלון נשמרים כמספרים שלמים (ms) – ההשוואה בנתיב החם היא int < int.
+    t0/t1 כ-pd.Timestamp נשארים זמינים כ-properties לתאימות.
+    """
     def __init__(self, interval_sec: int):
         self.interval_sec = int(interval_sec)
-        self.t0: Optional[pd.Timestamp] = None
-        self.t1: Optional[pd.Timestamp] = None
+        self.step_ms = self.interval_sec * 1000
+        self.t0_ms: Optional[int] = None
+        self.t1_ms: Optional[int] = None
+
+    @property
+    def t0(self) -> Optional[pd.Timestamp]:
+        return None if self.t0_ms is None else _ms_to_ts(self.t0_ms)
+
+    @property
+    def t1(self) -> Optional[pd.Timestamp]:
+        return None if self.t1_ms is None else _ms_to_ts(self.t1_ms)
 
     @staticmethod
     def _floor_to_interval(ts: pd.Timestamp, interval_sec: int) -> pd.Timestamp:
@@ -22,28 +52,64 @@ class WindowClock:
         base = epoch - (epoch % interval_sec)
         return pd.to_datetime(base, unit="s", utc=True)
 
-    def ensure_started(self, now_ts: pd.Timestamp) -> None:
-        if self.t0 is None:
-            self.t0 = self._floor_to_interval(now_ts, self.interval_sec)
-            self.t1 = self.t0 + pd.Timedelta(seconds=self.interval_sec)
+    def _start_at_ms(self, ts_ms: int) -> None:
+        self.t0_ms = ts_ms - (ts_ms % self.step_ms)
+        self.t1_ms = self.t0_ms + self.step_ms
 
-    def advance_until(self, ts: pd.Timestamp) -> int:
-        """Advance window boundaries until ts is before the current t1; return how many windows moved."""
-        if self.t0 is None:
-            self.ensure_started(ts)
+    def ensure_started(self, now_ts) -> None:
+        if self.t0_ms is None:
+            self._start_at_ms(_to_ms(now_ts))
+
+    def advance_to_ms(self, ts_ms: int) -> int:
+        """
+        מקדם את החלון בצעד אחד כך ש-ts_ms < t1; מחזיר כמה חלונות נסגרו.
+        (n חלונות = חלוקה שלמה אחת, בלי לולאה על כל חלון.)
+        """
+        if self.t0_ms is None:
+            self._start_at_ms(ts_ms)
             return 0
-        moved = 0
-        while ts >= self.t1:
-            self.t0 = self.t1
-            self.t1 = self.t0 + pd.Timedelta(seconds=self.interval_sec)
-            moved += 1
-        return moved
+        if ts_ms < self.t1_ms:
+            return 0
+        moved = (ts_ms - self.t0_ms) // self.step_ms
+        self.t0_ms += moved * self.step_ms
+        self.t1_ms = self.t0_ms + self.step_ms
+        return int(moved)
+
+    def advance_until(self, ts) -> int:
+        """Advance window boundaries until ts is before the current t1; return how many windows moved."""
+        return self.advance_to_ms(_to_ms(ts))
 
     def set_interval(self, interval_sec: int, now_ts: Optional[pd.Timestamp] = None) -> None:
         self.interval_sec = int(interval_sec)
+        self.step_ms = self.interval_sec * 1000
         ref = now_ts or pd.Timestamp.utcnow().tz_localize("UTC")
-        self.t0 = self._floor_to_interval(ref, self.interval_sec)
-        self.t1 = self.t0 + pd.Timedelta(seconds=self.interval_sec)
+        self._start_at_ms(_to_ms(self._floor_to_interval(pd.Timestamp(ref), self.interval_sec)))
+
+# ---------- שעון הבורסה (הערכת drift מול השעון המקומי) ----------
+class ExchangeClock:
+    """
+    מעריך "עכשיו" בזמן הבורסה: offset = ts_ms - local_ms לכל טרייד.
+    ה-latency רק מקטין את ההפרש, ולכן המקסימום על הדגימות האחרונות הוא ההערכה הטובה ביותר
+    (max מתגלגל בדק מונוטוני – O(1) לדגימה).
+    """
+    def __init__(self, max_samples: int = 256):
+        self._offsets = RollingMinMax(window=max_samples)
+
+    @staticmethod
+    def local_ms() -> int:
+        return time.time_ns() // 1_000_000
+
+    def observe(self, ts_ms: int, local_ms: Optional[int] = None) -> None:
+        off = int(ts_ms) - (self.local_ms() if local_ms is None else int(local_ms))
+        self._offsets.update(off)
+
+    @property
+    def offset_ms(self) -> int:
+        return int(self._offsets.max) if len(self._offsets) else 0
+
+    def now_ms(self) -> int:
+        return self.local_ms() + self.offset_ms
+
 
 # ---------- אגרגטור רב-פעמי (חותך כל חלון מה-Buffer) ----------
 @dataclass
@@ -51,47 +117,118 @@ class CloseResult:
     t0: pd.Timestamp
     t1: pd.Timestamp
     df_chunk: pd.DataFrame  # RAW trades בחלון
+    amended: bool = False   # True → תיקון לנר שכבר נסגר (טרייד מאוחר, late_policy="amend")
+
+LATE_POLICIES = ("amend", "next")
 
 class ReusableAggregator:
-    """סכין רב-פעמית: בכל מעבר חלון חותך מה-Buffer את [t0,t1) ומחזיר את הצ'אנק."""
-    def __init__(self, buffer: TradeBuffer, symbol: Optional[str], interval_sec: int):
+    """
+    סכין רב-פעמית: בכל מעבר חלון חותך מה-Buffer את [t0,t1) ומחזיר את הצ'אנק.
+    סגירה מתבצעת גם בטיימר (close_due) ב-t1 + grace, בלי לחכות לטרייד הבא.
+    טרייד מאוחר (ts < t0 של החלון הפתוח):
+      • late_policy="amend" – מחזיר CloseResult(amended=True) של החלון הקודם עם הטרייד.
+      • late_policy="next"  – הטרייד נספר בחלון הפתוח (ts מוחלף ל-t0 בעותק בלבד).
+    """
+    def __init__(self, buffer: TradeBuffer, symbol: Optional[str], interval_sec: int,
+                 *, grace_ms: int = 0, late_policy: str = "amend"):
+        if late_policy not in LATE_POLICIES:
+            raise ValueError(f"late_policy must be one of {LATE_POLICIES}")
         self.buffer = buffer
         self.symbol = symbol
         self.clock = WindowClock(interval_sec)
+        self.grace_ms = int(grace_ms)
+        self.late_policy = late_policy
+        self._carry: List[Dict[str, Any]] = []  # טריידים מאוחרים שהועברו לחלון הפתוח ("next")
+        self.late_trades = 0
 
-    def on_trade(self, ts: pd.Timestamp) -> list[CloseResult]:
+    def on_trade(self, ts, trade: Optional[Dict[str, Any]] = None) -> list[CloseResult]:
         """
-        מקבל timestamp של הטרייד האחרון, מקדם חלונות לפי הצורך,
+        מקבל timestamp של הטרייד האחרון (int ms או pd.Timestamp), מקדם חלונות לפי הצורך,
         ומחזיר רשימת CloseResult (ייתכן יותר מאחד אם דילגנו על כמה חלונות).
+        נתיב חם: הטרייד בתוך החלון הנוכחי → שתי השוואות int ויציאה.
+        trade (אופציונלי) – הרשומה עצמה, נדרשת רק ל-late_policy="next".
         """
-        # ensure we work with UTC-aware timestamps
-        ts = pd.to_datetime(ts, utc=True)
-        self.clock.ensure_started(ts)
+        ts_ms = ts if type(ts) is int else _to_ms(ts)
+        clock = self.clock
+        if clock.t1_ms is not None and ts_ms < clock.t1_ms:
+            if ts_ms >= clock.t0_ms:
+                return []
+            return self._on_late(ts_ms, trade)
+        return self._advance(ts_ms)
 
-        closed: list[CloseResult] = []
-        moved = self.clock.advance_until(ts)
-        for _ in range(moved):
-            # after advance, self.clock.t0 is the new window start; the window
-            # that just closed is the previous interval [t0_prev, t0)
-            t0, t1 = self.clock.t0, self.clock.t1
-            t0_prev = t0 - pd.Timedelta(seconds=self.clock.interval_sec)
-            df_chunk = self.buffer.slice(t0_prev, t0, self.symbol)
-            # ensure returned t0/t1 are UTC-aware
-            closed.append(CloseResult(t0=pd.to_datetime(t0_prev, utc=True), t1=pd.to_datetime(t0, utc=True), df_chunk=df_chunk))
+    def close_due(self, now_ms: int) -> list[CloseResult]:
+        """סגירה לפי שעון: כל חלון עם t1 + grace ≤ now_ms נסגר גם בלי טרייד חדש."""
+        if self.clock.t1_ms is None or now_ms - self.grace_ms < self.clock.t1_ms:
+            return []
+        return self._advance(now_ms - self.grace_ms)
+
+    def next_deadline_ms(self) -> Optional[int]:
+        """מתי (בזמן בורסה) החלון הפתוח אמור להיסגר בטיימר."""
+        return None if self.clock.t1_ms is None else self.clock.t1_ms + self.grace_ms
 
+    def _on_late(self, ts_ms: int, trade: Optional[Dict[str, Any]]) -> list[CloseResult]:
+        self.late_trades += 1
+        step = self.clock.step_ms
+        if self.late_policy == "next":
+            if trade is not None:
+                row = dict(trade)
+                row["ts"] = _ms_to_ts(self.clock.t0_ms)
+                self._carry.append(row)
+            return []
+        # amend: רק החלון האחרון שנסגר ניתן לתיקון; מאוחר מזה – נזנח
+        prev_t0 = self.clock.t0_ms - step
+        if ts_ms < prev_t0:
+            return []
+        res = self._close_range(prev_t0, 1, with_carry=False)[0]
+        res.amended = True
+        return [res]
+
+    def _advance(self, ts_ms: int) -> list[CloseResult]:
+        clock = self.clock
+        first_t0_ms = clock.t0_ms
+        moved = clock.advance_to_ms(ts_ms)
+        if not moved:
+            return []
+        return self._close_range(first_t0_ms, moved)
+
+    def _close_range(self, first_t0_ms: int, n: int, *, with_carry: bool = True) -> list[CloseResult]:
+        """
+        סוגר n חלונות רצופים החל מ-first_t0_ms עם חיתוך יחיד של ה-Buffer,
+        ומפצל לפי גבולות החלונות ב-searchsorted. חלונות ריקים מקבלים צ'אנק ריק.
+        """
+        step = self.clock.step_ms
+        end_ms = first_t0_ms + n * step
+        df = self.buffer.slice(_ms_to_ts(first_t0_ms), _ms_to_ts(end_ms), self.symbol)
+        if with_carry and self._carry:
+            # טריידים מאוחרים שהועברו לחלון הראשון בטווח (ts שלהם כבר = t0 שלו)
+            df = pd.concat([pd.DataFrame(self._carry), df], ignore_index=True).sort_values("ts", kind="stable").reset_index(drop=True)
+            self._carry = []
+        if n == 1:
+            return [CloseResult(t0=_ms_to_ts(first_t0_ms), t1=_ms_to_ts(end_ms), df_chunk=df)]
+
+        bounds = first_t0_ms + step * np.arange(n + 1, dtype=np.int64)
+        if df.empty:
+            cuts = np.zeros(n + 1, dtype=np.int64)
+        else:
+            ts_ms = pd.DatetimeIndex(pd.to_datetime(df["ts"], utc=True)).as_unit("ms").asi8
+            cuts = np.searchsorted(ts_ms, bounds, side="left")
+
+        closed: list[CloseResult] = []
+        for k in range(n):
+            a, b = int(cuts[k]), int(cuts[k + 1])
+            chunk = df.iloc[a:b].reset_index(drop=True)
+            closed.append(CloseResult(t0=_ms_to_ts(bounds[k]), t1=_ms_to_ts(bounds[k + 1]), df_chunk=chunk))
         return closed
 
     def force_close_current(self) -> CloseResult:
         """סגירה כפויה (למשל לפני כיבוי) של החלון הנוכחי עד עכשיו."""
-        if self.clock.t0 is None:
+        if self.clock.t0_ms is None:
             now = pd.Timestamp.utcnow().tz_localize("UTC")
             self.clock.ensure_started(now)
-        t0, t1 = self.clock.t0, self.clock.t1
-        df_chunk = self.buffer.slice(t0, t1, self.symbol)
+        t0_ms = self.clock.t0_ms
         # מקדמים לחלון הבא כדי שהסכין ימשיך לעבוד אחרי force-close
-        self.clock.t0 = t1
-        self.clock.t1 = t1 + pd.Timedelta(seconds=self.clock.interval_sec)
-        return CloseResult(t0=pd.to_datetime(t0, utc=True), t1=pd.to_datetime(t1, utc=True), df_chunk=df_chunk)
+        self.clock.advance_to_ms(self.clock.t1_ms)
+        return self._close_range(t0_ms, 1)[0]
 
     def set_interval(self, interval_sec: int, now_ts: Optional[pd.Timestamp] = None) -> None:
         """שינוי אינטרוול בזמן אמת (30s/60s/3600s) – הסכין נשארת אותה סכין."""
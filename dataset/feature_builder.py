@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import pandas as pd
 
 def build_feature_row(
@@ -11,6 +11,7 @@ def build_feature_row(
     orderbook: Dict[str, Any],
     trade_history: Dict[str, Any],
     volume_delta: Dict[str, Any],
+    volatility: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     מאחד את כל השכבות לשורה אחת אחידה של פיצ'רים.
@@ -52,6 +53,10 @@ def build_feature_row(
     if volume_delta:
         row.update(volume_delta)
 
+    # תנודתיות ממומשת לנר (rv_tick, rv_1s, vol_parkinson, vol_gk, vol_rs)
+    if volatility:
+        row.update(volatility)
+
     # שדות עתידיים (Targets) – יתמלאו אחר כך
     horizons = [30, 60, 90, 120]
     for h in horizons:
@@ -0,0 +1,298 @@
+# dataset/normalizer.py
+# נרמול אונליין של השורה האחרונה (אחרי add_all_technical): z = (x - mean) / std לכל עמודה נומרית,
+# עם mean/var מצטברים בזרם – O(עמודות) לנר, וקטורי ב-NumPy:
+#   mode="cumulative" – Welford על כל ההיסטוריה
+#   mode="ewm"        – ממוצע/שונות דועכים (alpha = 1 - 2^(-1/halflife), ‏halflife בנרות)
+# ה-z של שורה מחושב מהסטטיסטיקות *לפני* השורה (רק נרות קודמים) ורק אז השורה נכנסת – אין הצצה קדימה,
+# ואותו מספר יוצא גם בבקפיל וגם בלייב. הסטטיסטיקות נשמרות ל-data/state (JSON, כתיבה אטומית) יחד עם df_all,
+# כך שאחרי ריסטארט ובאינפרנס (transform) משתמשים באותו scaler – בלי לסרוק את הטבלה מחדש.
+# עמודות יעד (close_t+…, dpp_…, filled_at_…, tb_…/mfe_…/mae_… ודומיהן) לא מנורמלות – לפי normalize.exclude;
+# רמות מחיר (open/close/ema/bb/vwap/*_price) מוחרגות כברירת מחדל – PRICE_LEVEL_EXCLUDE.
+
+from __future__ import annotations
+import json
+import math
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from io_utils.storage import append_side_table, load_side_table, save_side_table
+
+DEFAULT_EXCLUDE = (
+    r"^ts$", r"^close_t\+", r"^dpp_", r"^long_profitable_", r"^short_profitable_",
+    r"^filled_at_", r"^friction_pct_used$", r"^tb_label_", r"^tb_touch_sec_", r"^mfe_", r"^mae_", r"_z$",
+)
+
+# רמות מחיר (לא סטציונריות – z מול ממוצע היסטורי של המחיר הוא בעיקר מגמה): מוחרגות אלא אם normalize.price_levels.
+# גם עמודות htf_<tf>_* ו-*_live שלהן.
+PRICE_LEVEL_EXCLUDE = (
+    r"^(open|high|low|close)$", r"(^|_)ema_\d+(_live)?$", r"(^|_)bb_(mid|up|low)(_live)?$",
+    r"(^|_)vwap(_up_[\d.]+|_low_[\d.]+)?(_live)?$", r"_price$", r"^th_fp_(vah|val)$",
+    r"^ob_(mid_twap|microprice_tw)$",
+)
+
+
+class OnlineNormalizer:
+    """
+    update(values, key) → {col: z} לשורה אחת; אותו key שוב = amend (חוזרים למצב שלפני השורה).
+    transform(df) – z עם הסטטיסטיקות הנוכחיות (קפואות) לכל הטבלה, לאינפרנס.
+    """
+
+    def __init__(
+        self,
+        *,
+        mode: str = "ewm",
+        halflife: float = 500.0,
+        min_count: int = 30,
+        clip: Optional[float] = 8.0,
+        exclude: Iterable[str] = DEFAULT_EXCLUDE,
+        suffix: str = "_z",
+    ):
+        if mode not in ("cumulative", "ewm"):
+            raise ValueError("mode must be 'cumulative' or 'ewm'")
+        self.mode = mode
+        self.halflife = float(halflife)
+        self.alpha = 1.0 - 2.0 ** (-1.0 / self.halflife) if mode == "ewm" else 0.0
+        self.min_count = int(min_count)
+        self.clip = float(clip) if clip else None
+        self.exclude = [str(p) for p in exclude]
+        self._exclude_re = [re.compile(p) for p in self.exclude]
+        self.suffix = suffix
+
+        self.cols: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)   # cumulative: סכום ריבועי הסטיות; ewm: השונות עצמה
+        self._prev: Optional[tuple] = None
+        self._last_key: Any = None
+        self._frame_cols: Optional[pd.Index] = None
+        self._frame_pick: List[str] = []
+        self._frame_pos = np.zeros(0, dtype=np.int64)
+        self._frame_idx = np.zeros(0, dtype=np.int64)
+        self._frame_names: List[str] = []
+
+    # ---------- עמודות ----------
+    def _params(self) -> tuple:
+        return (self.mode, self.halflife, self.min_count, self.clip, tuple(self.exclude), self.suffix)
+
+    def select(self, df: pd.DataFrame) -> List[str]:
+        """העמודות הנומריות שמנורמלות (cache לפי ה-Index של העמודות של df)."""
+        cols = df.columns
+        if cols is not self._frame_cols and not (self._frame_cols is not None and cols.equals(self._frame_cols)):
+            self._frame_cols = cols
+            self._frame_pick = [
+                c for c in cols
+                if pd.api.types.is_numeric_dtype(df[c].dtype) and not pd.api.types.is_bool_dtype(df[c].dtype)
+                and not any(r.search(c) for r in self._exclude_re)
+            ]
+            self._frame_pos = cols.get_indexer(self._frame_pick)
+            self._frame_names = [c + self.suffix for c in self._frame_pick]
+            self._grow(self._frame_pick)
+            self._frame_idx = np.array([self._index[c] for c in self._frame_pick], dtype=np.int64)
+        return self._frame_pick
+
+    def _grow(self, cols: Iterable[str]) -> None:
+        new = [c for c in cols if c not in self._index]
+        if not new:
+            return
+        for c in new:
+            self._index[c] = len(self.cols)
+            self.cols.append(c)
+        k = len(new)
+        self.count = np.concatenate([self.count, np.zeros(k, dtype=np.int64)])
+        self.mean = np.concatenate([self.mean, np.zeros(k)])
+        self.m2 = np.concatenate([self.m2, np.zeros(k)])
+        if self._prev is not None:
+            c, m, v = self._prev
+            self._prev = (np.concatenate([c, np.zeros(k, dtype=np.int64)]),
+                          np.concatenate([m, np.zeros(k)]), np.concatenate([v, np.zeros(k)]))
+
+    # ---------- סטטיסטיקות ----------
+    def std(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if self.mode == "ewm":
+                var = self.m2
+            else:
+                var = np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), np.nan)
+        return np.sqrt(np.maximum(var, 0.0))
+
+    def _z(self, idx: np.ndarray, x: np.ndarray) -> np.ndarray:
+        std = self.std()[idx]
+        ok = (self.count[idx] >= self.min_count) & (std > 0) & np.isfinite(x)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = np.where(ok, (x - self.mean[idx]) / np.where(ok, std, 1.0), np.nan)
+        if self.clip is not None:
+            z = np.clip(z, -self.clip, self.clip)
+        return z
+
+    def _absorb(self, idx: np.ndarray, x: np.ndarray) -> None:
+        ok = np.isfinite(x)
+        i, v = idx[ok], x[ok]
+        n = self.count[i] + 1
+        d = v - self.mean[i]
+        if self.mode == "ewm":
+            first = n == 1
+            a = np.where(first, 1.0, self.alpha)
+            self.mean[i] += a * d
+            # West (1979): var ← (1-a)·(var + a·d²)
+            self.m2[i] = np.where(first, 0.0, (1.0 - a) * (self.m2[i] + a * d * d))
+        else:
+            self.mean[i] += d / n
+            self.m2[i] += d * (v - self.mean[i])
+        self.count[i] = n
+
+    def _step(self, idx: np.ndarray, x: np.ndarray, key: Any) -> np.ndarray:
+        if key is not None and key == self._last_key and self._prev is not None:
+            self.count, self.mean, self.m2 = (a.copy() for a in self._prev)
+        else:
+            self._prev = (self.count.copy(), self.mean.copy(), self.m2.copy())
+        self._last_key = key
+        z = self._z(idx, x)
+        self._absorb(idx, x)
+        return z
+
+    def update(self, values: Dict[str, float], key: Any = None) -> Dict[str, float]:
+        cols = list(values)
+        x = np.fromiter((_to_float(values[c]) for c in cols), dtype=float, count=len(cols))
+        self._grow(cols)
+        idx = np.fromiter((self._index[c] for c in cols), dtype=np.int64, count=len(cols))
+        z = self._step(idx, x, key)
+        return dict(zip([c + self.suffix for c in cols], z.tolist()))
+
+    def update_frame(self, df: pd.DataFrame, key: Any = None) -> Dict[str, float]:
+        """השורה האחרונה של df (העמודות של select)."""
+        cols = self.select(df)
+        # פרוסה של שורה אחת → float ישר (df.iloc[-1] על טבלה מעורבת בונה Series של object – איטי)
+        x = df.iloc[-1:, self._frame_pos].to_numpy(dtype=float, na_value=np.nan)[0] if cols else np.zeros(0)
+        z = self._step(self._frame_idx, x, key)
+        return dict(zip(self._frame_names, z.tolist()))
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """z לכל השורות עם הסטטיסטיקות הנוכחיות (בלי לעדכן) – אותו scaler כמו בלייב."""
+        cols = [c for c in self.select(df) if c in self._index]
+        idx = np.array([self._index[c] for c in cols], dtype=np.int64)
+        x = df[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        z = self._z(idx, x) if len(cols) else np.empty((len(df), 0))
+        return pd.DataFrame(z, index=df.index, columns=[c + self.suffix for c in cols])
+
+    # ---------- checkpoint ----------
+    def to_dict(self) -> Dict[str, Any]:
+        d = {
+            "mode": self.mode, "halflife": self.halflife, "min_count": self.min_count, "clip": self.clip,
+            "exclude": self.exclude, "suffix": self.suffix,
+            "cols": self.cols, "count": self.count.tolist(), "mean": self.mean.tolist(), "m2": self.m2.tolist(),
+            # ב-pipeline ה-key הוא ts של השורה
+            "last_key": self._last_key.isoformat() if isinstance(self._last_key, pd.Timestamp) else self._last_key,
+        }
+        if self._prev is not None:
+            d["prev"] = [a.tolist() for a in self._prev]
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "OnlineNormalizer":
+        nz = cls(mode=d["mode"], halflife=d["halflife"], min_count=d["min_count"], clip=d["clip"],
+                 exclude=d["exclude"], suffix=d["suffix"])
+        nz.cols = list(d["cols"])
+        nz._index = {c: i for i, c in enumerate(nz.cols)}
+        nz.count = np.asarray(d["count"], dtype=np.int64)
+        nz.mean = np.asarray(d["mean"], dtype=float)
+        nz.m2 = np.asarray(d["m2"], dtype=float)
+        if len({len(nz.cols), len(nz.count), len(nz.mean), len(nz.m2)}) != 1:
+            raise ValueError("checkpoint לא עקבי")
+        if d.get("prev") is not None:
+            c, m, v = d["prev"]
+            nz._prev = (np.asarray(c, dtype=np.int64), np.asarray(m, dtype=float), np.asarray(v, dtype=float))
+        key = d.get("last_key")
+        nz._last_key = pd.Timestamp(key) if isinstance(key, str) else key
+        return nz
+
+    def save(self, path: str) -> None:
+        """כתיבה אטומית (קובץ זמני ואז replace), כמו RollingSketch.save."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, **defaults) -> "OnlineNormalizer":
+        """טעינת checkpoint; קובץ חסר/פגום או פרמטרים אחרים מהקונפיג → נרמול ריק לפי defaults."""
+        fresh = cls(**defaults)
+        if not os.path.exists(path):
+            return fresh
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                nz = cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return fresh
+        if nz._params() != fresh._params():
+            return fresh
+        return nz
+
+
+def _to_float(v: Any) -> float:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return math.nan
+    return f
+
+
+class NormalizedTable:
+    """
+    הווקטור המנורמל בטבלת צד (output="table") במקום עמודות _z ב-df_all:
+    data/processed/<symbol>_<interval>_normalized.parquet, שורה לכל ts. אותו ts שוב (amend) מחליף.
+    כמו FootprintTable: max_rows אחרונות, save() כותב רק שורות חדשות כ-part, וכל compact_every parts – כתיבה מלאה.
+    """
+
+    NAME = "normalized"
+
+    def __init__(self, symbol: str, interval: str, max_rows: Optional[int] = None, compact_every: int = 64):
+        self.symbol = symbol
+        self.interval = interval
+        self.max_rows = max_rows
+        self.compact_every = max(int(compact_every), 1)
+        self._rows: Dict[pd.Timestamp, Dict[str, float]] = {}
+        self._dirty: set = set()
+        old = load_side_table(symbol, interval, self.NAME)
+        if old is not None and not old.empty:
+            if max_rows:
+                old = old.tail(max_rows)
+            for r in old.to_dict("records"):
+                ts = pd.Timestamp(r.pop("ts"))
+                self._rows[ts.tz_localize("UTC") if ts.tzinfo is None else ts] = r
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, ts, z: Dict[str, float]) -> None:
+        ts = pd.to_datetime(ts, utc=True)
+        self._rows[ts] = z
+        self._dirty.add(ts)
+        if self.max_rows and len(self._rows) > self.max_rows:
+            for k in list(self._rows)[:len(self._rows) - self.max_rows]:
+                del self._rows[k]
+
+    @staticmethod
+    def _frame(rows: Dict[pd.Timestamp, Dict[str, float]]) -> pd.DataFrame:
+        if not rows:
+            return pd.DataFrame(columns=["ts"])
+        df = pd.DataFrame.from_dict(rows, orient="index")
+        df.index.name = "ts"
+        return df.sort_index().reset_index()
+
+    def to_frame(self) -> pd.DataFrame:
+        return self._frame(self._rows)
+
+    def save(self) -> None:
+        fresh = {ts: self._rows[ts] for ts in self._dirty if ts in self._rows}
+        self._dirty.clear()
+        if not fresh:
+            return
+        parts = append_side_table(self._frame(fresh), self.symbol, self.interval, self.NAME)
+        if parts >= self.compact_every:
+            save_side_table(self.to_frame(), self.symbol, self.interval, self.NAME)
@@ -0,0 +1,387 @@
+# dataset/path_labels.py
+# יעדים תלויי-מסלול מהטריידים הגולמיים (משלים את TargetFiller, שמסתכל רק על close מול close):
+#   tb_label_{h}s     – triple barrier: ‎+1 אם המחיר נגע קודם ב-take-profit, ‎-1 אם קודם ב-stop-loss, 0 אם אף אחד עד h
+#   tb_touch_sec_{h}s – שניות מ-t1 עד הנגיעה הראשונה (NaN כשאין נגיעה בתוך h)
+#   mfe_{h}s / mae_{h}s – max favourable / adverse excursion באחוזים מה-close (לונג), על כל האופק
+# המסלול של שורה עם ts = t1 הוא הטריידים ב-[t1, t1 + h) – בדיוק החלונות שבונים את הנרות הבאים.
+# בלייב (PathLabeler) כל טרייד מעדכן O(H) דקים מונוטוניים של max/min וערימות של מחסומים פתוחים,
+# ושורה נסגרת לפי סדר ה-expiry – בלי לסרוק מחדש את הטריידים. בהיסטוריה (path_labels_batch)
+# אותם מספרים יוצאים וקטורית משאילתות טווח על sparse table של max/min.
+
+from __future__ import annotations
+import heapq
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from technical_analysis.stream_technical import assign_row
+
+
+def path_label_columns(horizons_sec: Iterable[int]) -> List[str]:
+    cols: List[str] = []
+    for h in sorted(set(int(x) for x in horizons_sec)):
+        cols += [f"tb_label_{h}s", f"tb_touch_sec_{h}s", f"mfe_{h}s", f"mae_{h}s"]
+    return cols
+
+
+def _labels(h: int, entry: float, t1_ms: int, touch_ms: Optional[int], side: int,
+            hi: float, lo: float, exp_ms: int) -> Dict[str, float]:
+    hit = touch_ms is not None and touch_ms < exp_ms
+    return {
+        f"tb_label_{h}s": float(side) if hit else 0.0,
+        f"tb_touch_sec_{h}s": (touch_ms - t1_ms) / 1000.0 if hit else np.nan,
+        f"mfe_{h}s": (hi - entry) / entry * 100.0,
+        f"mae_{h}s": (lo - entry) / entry * 100.0,
+    }
+
+
+class _Open:
+    """שורה שמחכה לעתיד: מחיר כניסה, מחסומים, והנגיעה הראשונה (אם כבר הייתה)."""
+
+    __slots__ = ("ts", "entry", "up", "dn", "touch_ms", "side", "ver", "left")
+
+    def __init__(self, ts: int, entry: float, up: float, dn: float, left: int):
+        self.ts = ts
+        self.entry = entry
+        self.up = up
+        self.dn = dn
+        self.touch_ms: Optional[int] = None
+        self.side = 0
+        self.ver = 0
+        self.left = left  # כמה אופקים עוד לא נסגרו
+
+
+class PathLabeler:
+    """
+    on_trade(ts_ms, price) לכל טרייד של הסימבול; open_row(ts_ms, close, vol) כשהשורה נכנסת ל-df_all
+    (אותו ts שוב = amend: מחיר כניסה/מחסומים חדשים, הנגיעה מחושבת מחדש מהטריידים שכבר הגיעו);
+    advance(now_ms) סוגר שורות שה-expiry שלהן עבר גם כשאין טריידים; flush(df) כותב את מה שנסגר.
+
+    המחסומים: take-profit = close·(1 + pt), stop-loss = close·(1 - sl), כאשר pt/sl = pt_bps/sl_bps,
+    או vol_mult·vol כשניתנה תנודתיות סופית לשורה (למשל rv_1s_roll20). טריידים שמגיעים מחוץ לסדר נזרקים.
+    """
+
+    def __init__(self, horizons_sec: Sequence[int], *, pt_bps: float = 20.0, sl_bps: float = 20.0,
+                 vol_col: Optional[str] = None, vol_mult: Optional[float] = None):
+        self.h = sorted(set(int(x) for x in horizons_sec))
+        self.vol_col = vol_col  # עמודת התנודתיות של השורה שהצינור מעביר ל-open_row
+        self.pt = float(pt_bps) / 1e4
+        self.sl = float(sl_bps) / 1e4
+        self.vol_mult = float(vol_mult) if vol_mult and vol_col else None
+        self._last_ts: Optional[int] = None
+        self._seq = 0
+        self._up: List[Tuple[float, int, int, _Open]] = []   # min-heap על מחיר ה-take-profit
+        self._dn: List[Tuple[float, int, int, _Open]] = []   # min-heap על -stop-loss
+        self._live = 0
+        self._open: Dict[int, Deque[_Open]] = {h: deque() for h in self.h}   # לפי expiry (= לפי ts)
+        self._hi: Dict[int, Deque[Tuple[int, float]]] = {h: deque() for h in self.h}  # (ts, px) יורד
+        self._lo: Dict[int, Deque[Tuple[int, float]]] = {h: deque() for h in self.h}  # (ts, px) עולה
+        self._recent: Deque[Tuple[int, float]] = deque()    # טריידים מה-ts של השורה האחרונה והלאה
+        self._last_row: Optional[_Open] = None
+        self._done: List[Tuple[int, Dict[str, float]]] = []
+
+    def columns(self) -> List[str]:
+        return path_label_columns(self.h)
+
+    # ─────────────────────────────────────────────────────────────
+
+    def on_trade(self, ts_ms: int, price: float) -> None:
+        ts_ms, price = int(ts_ms), float(price)
+        if not math.isfinite(price) or (self._last_ts is not None and ts_ms < self._last_ts):
+            return
+        self._expire(ts_ms)  # טרייד ב-ts ≥ expiry כבר מחוץ לחלון
+        self._last_ts = ts_ms
+        self._recent.append((ts_ms, price))
+        for h in self.h:
+            hi, lo = self._hi[h], self._lo[h]
+            while hi and hi[-1][1] <= price:
+                hi.pop()
+            hi.append((ts_ms, price))
+            while lo and lo[-1][1] >= price:
+                lo.pop()
+            lo.append((ts_ms, price))
+        while self._up and self._up[0][0] <= price:
+            self._touch(heapq.heappop(self._up), ts_ms, +1)
+        while self._dn and -self._dn[0][0] >= price:
+            self._touch(heapq.heappop(self._dn), ts_ms, -1)
+
+    def _touch(self, item: Tuple[float, int, int, _Open], ts_ms: int, side: int) -> None:
+        rec = item[3]
+        if item[2] == rec.ver and rec.touch_ms is None and rec.left > 0:
+            rec.touch_ms, rec.side = ts_ms, side
+
+    def advance(self, now_ms: int) -> None:
+        """סוגר שורות עם expiry ≤ now_ms – כל הטריידים לפני now_ms כבר עברו כאן."""
+        self._expire(int(now_ms))
+
+    def _expire(self, now_ms: int) -> None:
+        for h in self.h:
+            q, h_ms = self._open[h], h * 1000
+            while q and q[0].ts + h_ms <= now_ms:
+                rec = q.popleft()
+                hi, lo = self._hi[h], self._lo[h]
+                while hi and hi[0][0] < rec.ts:
+                    hi.popleft()
+                while lo and lo[0][0] < rec.ts:
+                    lo.popleft()
+                top = hi[0][1] if hi else np.nan
+                bot = lo[0][1] if lo else np.nan
+                self._resolve(rec, h, top, bot)
+
+    def _resolve(self, rec: _Open, h: int, top: float, bot: float) -> None:
+        self._done.append((rec.ts, _labels(h, rec.entry, rec.ts, rec.touch_ms, rec.side, top, bot, rec.ts + h * 1000)))
+        rec.left -= 1
+        if rec.left == 0:
+            self._live -= 1
+            if len(self._up) + len(self._dn) > 4 * self._live + 256:  # ניקוי רשומות ישנות מהערימות
+                self._up = [x for x in self._up if x[3].left > 0 and x[2] == x[3].ver and x[3].touch_ms is None]
+                self._dn = [x for x in self._dn if x[3].left > 0 and x[2] == x[3].ver and x[3].touch_ms is None]
+                heapq.heapify(self._up)
+                heapq.heapify(self._dn)
+
+    # ─────────────────────────────────────────────────────────────
+
+    def barriers(self, close: float, vol: Optional[float] = None) -> Tuple[float, float]:
+        if self.vol_mult is not None and vol is not None and math.isfinite(vol) and vol > 0:
+            w = self.vol_mult * float(vol)
+            return close * (1.0 + w), close * (1.0 - w)
+        return close * (1.0 + self.pt), close * (1.0 - self.sl)
+
+    def open_row(self, ts_ms: int, close: float, vol: Optional[float] = None) -> None:
+        ts_ms, close = int(ts_ms), float(close) if close is not None else np.nan
+        if not (math.isfinite(close) and close > 0):
+            return
+        up, dn = self.barriers(close, vol)
+        last = self._last_row
+        if last is not None and last.ts == ts_ms and last.left == len(self.h):
+            rec = last  # amend: השורה עוד לא נסגרה באף אופק – מחליפים כניסה/מחסומים
+            rec.entry, rec.up, rec.dn = close, up, dn
+            rec.touch_ms, rec.side = None, 0
+            rec.ver += 1
+        elif last is not None and ts_ms <= last.ts:
+            return  # שורה ישנה/כבר נסגרה חלקית – לא משכתבים
+        else:
+            rec = _Open(ts_ms, close, up, dn, len(self.h))
+            self._live += 1
+            self._last_row = rec
+            while self._recent and self._recent[0][0] < ts_ms:
+                self._recent.popleft()
+            for h in self.h:
+                self._open[h].append(rec)
+
+        # הנגיעה מהטריידים שכבר הגיעו אחרי t1 (grace / תיקון) – מכאן והלאה דרך הערימות
+        for t, px in self._recent:
+            if px >= up:
+                rec.touch_ms, rec.side = t, +1
+                break
+            if px <= dn:
+                rec.touch_ms, rec.side = t, -1
+                break
+        if rec.touch_ms is None:
+            self._seq += 1
+            heapq.heappush(self._up, (up, self._seq, rec.ver, rec))
+            heapq.heappush(self._dn, (-dn, self._seq, rec.ver, rec))
+
+        # אופק שכבר עבר (h קצר מה-grace) – לא ניתן לשחזר מהדקים, סוגרים מ-_recent
+        if self._last_ts is not None:
+            for h in self.h:
+                q = self._open[h]
+                exp = ts_ms + h * 1000
+                if q and q[-1] is rec and exp <= self._last_ts:
+                    q.pop()
+                    px = [p for t, p in self._recent if ts_ms <= t < exp]
+                    self._resolve(rec, h, max(px, default=np.nan), min(px, default=np.nan))
+
+    # ─────────────────────────────────────────────────────────────
+
+    def pop_resolved(self) -> List[Tuple[int, Dict[str, float]]]:
+        done, self._done = self._done, []
+        return done
+
+    def flush(self, df: pd.DataFrame) -> pd.DataFrame:
+        """כותב את היעדים שנסגרו לשורות שלהם ב-df (לפי ts); שורות שכבר לא ב-df – מדולגות."""
+        done = self.pop_resolved()
+        if not done or df.empty or "ts" not in df.columns:
+            return df
+        merged: Dict[int, Dict[str, float]] = {}
+        for ts_ms, vals in done:
+            merged.setdefault(ts_ms, {}).update(vals)
+        keys = np.fromiter(merged.keys(), dtype=np.int64, count=len(merged))
+        ts_col = df["ts"]
+        pos = ts_col.searchsorted(pd.to_datetime(keys, unit="ms", utc=True).as_unit(ts_col.dt.unit))
+        for k, p in zip(keys.tolist(), pos.tolist()):
+            if p < len(df) and int(ts_col.iat[p].value // 1_000_000) == k:
+                df = assign_row(df, df.index[p], merged[k])
+        return df
+
+
+def path_labeler_from_config(horizons_sec: Sequence[int]) -> Optional[PathLabeler]:
+    """PathLabeler לפי path_labels.* (None כשכבוי)."""
+    from core.settings_manager import CFG
+    if not CFG("path_labels.enabled", True):
+        return None
+    return PathLabeler(
+        horizons_sec,
+        pt_bps=float(CFG("path_labels.pt_bps", 20.0)),
+        sl_bps=float(CFG("path_labels.sl_bps", 20.0)),
+        vol_col=CFG("path_labels.vol_col", None),
+        vol_mult=CFG("path_labels.vol_mult", 2.0),
+    )
+
+
+# ─────────────────────────────────────────────────────────────
+# Batch – אותם יעדים לכל ההיסטוריה (וקטורי, sparse table)
+
+def _sparse_table(x: np.ndarray, op) -> List[np.ndarray]:
+    table = [x]
+    step = 1
+    while 2 * step <= len(x):
+        prev = table[-1]
+        table.append(op(prev[:-step], prev[step:]))
+        step *= 2
+    return table
+
+
+def _range_query(table: List[np.ndarray], op, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """op על x[lo:hi] לכל שורה, O(1) לשאילתה; טווח ריק → NaN."""
+    n = hi - lo
+    out = np.full(len(lo), np.nan)
+    ok = n > 0
+    k = np.zeros(len(lo), dtype=np.int64)
+    k[ok] = np.floor(np.log2(n[ok])).astype(np.int64)
+    for j in np.unique(k[ok]):
+        m = ok & (k == j)
+        t = table[j]
+        out[m] = op(t[lo[m]], t[hi[m] - (1 << j)])
+    return out
+
+
+def _first_cross(table: List[np.ndarray], lo: np.ndarray, hi: np.ndarray, level: np.ndarray,
+                 above: bool) -> np.ndarray:
+    """האינדקס הראשון ב-[lo, hi) עם x ≥ level (above) או x ≤ level; אין → hi. ירידה בינארית על הטבלה."""
+    pos = lo.copy()
+    for j in range(len(table) - 1, -1, -1):
+        step = 1 << j
+        t = table[j]
+        fits = pos + step <= hi
+        v = t[np.where(fits, pos, 0)]
+        miss = (v < level) if above else (v > level)
+        pos = np.where(fits & miss, pos + step, pos)
+    return pos
+
+
+def path_labels_batch(
+    row_ts_ms: np.ndarray,
+    entry: np.ndarray,
+    up: np.ndarray,
+    dn: np.ndarray,
+    trade_ts_ms: np.ndarray,
+    trade_px: np.ndarray,
+    horizons_sec: Sequence[int],
+) -> Dict[str, np.ndarray]:
+    """
+    יעדי מסלול לשורות (row_ts_ms ממוין) מול טריידים ממוינים לפי זמן. up/dn = מחירי המחסומים לכל שורה.
+    זיכרון ~ טריידים × log(טריידים) – להיסטוריה ארוכה לקרוא בצ'אנקים (add_path_labels).
+    """
+    row_ts = np.asarray(row_ts_ms, dtype=np.int64)
+    entry = np.asarray(entry, dtype=float)
+    up = np.asarray(up, dtype=float)
+    dn = np.asarray(dn, dtype=float)
+    tts = np.asarray(trade_ts_ms, dtype=np.int64)
+    px = np.asarray(trade_px, dtype=float)
+    hs = sorted(set(int(x) for x in horizons_sec))
+    out: Dict[str, np.ndarray] = {}
+    if len(row_ts) == 0:
+        return {c: np.empty(0) for c in path_label_columns(hs)}
+    if len(px) == 0:
+        px, tts = np.empty(0), np.empty(0, dtype=np.int64)
+    tmax = _sparse_table(px, np.maximum) if len(px) else []
+    tmin = _sparse_table(px, np.minimum) if len(px) else []
+
+    lo = np.searchsorted(tts, row_ts, side="left")
+    hi_all = np.searchsorted(tts, row_ts + hs[-1] * 1000, side="left")
+    if len(px):
+        i_up = _first_cross(tmax, lo, hi_all, up, above=True)
+        i_dn = _first_cross(tmin, lo, hi_all, dn, above=False)
+    else:
+        i_up = i_dn = lo
+    first = np.minimum(i_up, i_dn)
+    side = np.where(i_up < i_dn, 1.0, -1.0)
+
+    valid = np.isfinite(entry) & (entry > 0)
+    for h in hs:
+        hi = np.searchsorted(tts, row_ts + h * 1000, side="left")
+        hit = first < hi
+        touch_ms = tts[np.minimum(first, len(tts) - 1)] if len(tts) else row_ts
+        label = np.where(hit, side, 0.0)
+        touch_sec = np.where(hit, (touch_ms - row_ts) / 1000.0, np.nan)
+        top = _range_query(tmax, np.maximum, lo, hi) if len(px) else np.full(len(row_ts), np.nan)
+        bot = _range_query(tmin, np.minimum, lo, hi) if len(px) else np.full(len(row_ts), np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f"tb_label_{h}s"] = np.where(valid, label, np.nan)
+            out[f"tb_touch_sec_{h}s"] = np.where(valid, touch_sec, np.nan)
+            out[f"mfe_{h}s"] = np.where(valid, (top - entry) / entry * 100.0, np.nan)
+            out[f"mae_{h}s"] = np.where(valid, (bot - entry) / entry * 100.0, np.nan)
+    return out
+
+
+def add_path_labels(
+    df: pd.DataFrame,
+    trades: pd.DataFrame,
+    horizons_sec: Sequence[int],
+    *,
+    pt_bps: float = 20.0,
+    sl_bps: float = 20.0,
+    vol_col: Optional[str] = None,
+    vol_mult: Optional[float] = None,
+    chunk_rows: int = 50_000,
+) -> pd.DataFrame:
+    """
+    בקפיל של יעדי המסלול ל-df (ts, close) מטבלת טריידים (ts, price) – אותם מחסומים ואותם מספרים כמו PathLabeler.
+    השורות מעובדות בצ'אנקים, ולכל צ'אנק נבנית sparse table רק על הטריידים בטווח שלו.
+    """
+    hs = sorted(set(int(x) for x in horizons_sec))
+    cols = path_label_columns(hs)
+    if df.empty:
+        return _assign_cols(df, {c: np.empty(0) for c in cols})
+
+    def _ms(s: pd.Series) -> np.ndarray:
+        s = pd.to_datetime(s, utc=True)
+        return s.dt.as_unit("ms").astype("int64").to_numpy()
+
+    row_ts = _ms(df["ts"])
+    close = pd.to_numeric(df["close"], errors="coerce").to_numpy(dtype=float)
+    w_up = np.full(len(df), float(pt_bps) / 1e4)
+    w_dn = np.full(len(df), float(sl_bps) / 1e4)
+    if vol_mult and vol_col and vol_col in df.columns:
+        vol = pd.to_numeric(df[vol_col], errors="coerce").to_numpy(dtype=float)
+        ok = np.isfinite(vol) & (vol > 0)
+        w_up[ok] = w_dn[ok] = float(vol_mult) * vol[ok]
+    up, dn = close * (1.0 + w_up), close * (1.0 - w_dn)
+
+    tr = trades[["ts", "price"]].dropna()
+    tts = _ms(tr["ts"])
+    tpx = pd.to_numeric(tr["price"], errors="coerce").to_numpy(dtype=float)
+    order = np.argsort(tts, kind="stable")
+    tts, tpx = tts[order], tpx[order]
+
+    order_rows = np.argsort(row_ts, kind="stable")
+    res = {c: np.full(len(df), np.nan) for c in cols}
+    span = hs[-1] * 1000
+    for s in range(0, len(df), int(chunk_rows)):
+        idx = order_rows[s:s + int(chunk_rows)]
+        a = np.searchsorted(tts, row_ts[idx[0]], side="left")
+        b = np.searchsorted(tts, row_ts[idx[-1]] + span, side="left")
+        part = path_labels_batch(row_ts[idx], close[idx], up[idx], dn[idx], tts[a:b], tpx[a:b], hs)
+        for c in cols:
+            res[c][idx] = part[c]
+    return _assign_cols(df, res)
+
+
+def _assign_cols(df: pd.DataFrame, values: Dict[str, Any]) -> pd.DataFrame:
+    """עמודות שלמות בבת אחת (concat אחד במקום הכנסה עמודה-עמודה)."""
+    new = pd.DataFrame(values, index=df.index)
+    return pd.concat([df.drop(columns=[c for c in new.columns if c in df.columns]), new], axis=1)
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 from dataset.schema_registry import append_row
+from technical_live.realized_vol import candle_variances, to_vols
+from technical_analysis.stream_technical import assign_last_row
 
 def _ob_snapshot_to_features(snapshot: dict | None) -> dict:
     if not snapshot:
@@ -18,15 +20,29 @@ def _ob_snapshot_to_features(snapshot: dict | None) -> dict:
         "spread_abs": spread,
     }
 
-async def on_candle_ready(*, t0, t1, df_chunk, ctx):
+async def on_candle_ready(*, t0, t1, df_chunk, ctx, amend: bool = False, bar=None):
     """
+    amend=True → תיקון הנר האחרון (טרייד מאוחר הגיע אחרי סגירה בטיימר):
+    השורה האחרונה ב-df_all עם ts == t1 מוחלפת בשורה מחושבת מחדש.
+    bar (LiveCandle מ-graphs_time.CandleEngine) → OHLCV וסכומי הטריידים מגיעים מוכנים, O(1).
+
     ctx: {
       "SYMBOL","INTERVAL","HORIZONS",
       "df_all","schema","price_lookup",
       "orderbook_buffer","filler",
       "add_all_indicators","add_all_technical",
       "build_feature_row","compute_th","compute_vd","process_ob",
-      "save_df","SAVE_EVERY"
+      "save_df","SAVE_EVERY",
+      "technical_stream"  (אופציונלי – TechnicalStream למצב stream מתמשך)
+      "vwap_stream"       (אופציונלי – VwapStream: VWAP/רצועות לנר החדש בלי groupby על כל הטבלה)
+      "tob_accumulator"   (אופציונלי – TopOfBookAccumulator: spread/imbalance/microprice משוקללי-זמן + OFI לנר)
+      "wall_tracker"      (אופציונלי – WallTracker של הסימבול: קירות מתמשכים, גיל/משיכות/flash)
+      "vol_stream"        (אופציונלי – RealizedVolStream: גרסאות מתגלגלות של התנודתיות הממומשת)
+      "footprint","footprint_table"
+                          (אופציונלי – פרמטרי ה-footprint ל-compute_th + FootprintTable לפרופילים לפי ts)
+      "side_mode"         (אופציונלי – "exchange" / "auto" / "lee_ready" / "infer_tick")
+      "trade_size_sketch","large_trade_pctl","sketch_min_count"
+                          (אופציונלי – RollingSketch של הסימבול לסף טרייד גדול)
     }
     """
     SYMBOL   = ctx["SYMBOL"]
@@ -56,22 +72,49 @@ async def on_candle_ready(*, t0, t1, df_chunk, ctx):
             sample_tz = None
         print("VERIFY: df_chunk.ts dtype ->", df_chunk["ts"].dtype, " sample tz ->", sample_tz)
 
-    candle = {
-        "open":  float(df_chunk["price"].iloc[0]),
-        "high":  float(df_chunk["price"].max()),
-        "low":   float(df_chunk["price"].min()),
-        "close": float(df_chunk["price"].iloc[-1]),
-        "volume":float(df_chunk["size"].sum()),
-    }
+    if bar is not None and bar.trades > 0:
+        candle = bar.ohlcv()
+    else:
+        bar = None
+        candle = {
+            "open":  float(df_chunk["price"].iloc[0]),
+            "high":  float(df_chunk["price"].max()),
+            "low":   float(df_chunk["price"].min()),
+            "close": float(df_chunk["price"].iloc[-1]),
+            "volume":float(df_chunk["size"].sum()),
+        }
 
     # 2) OB snapshot לא-הרסני (עדכון אחרון <= t1)
     ob_buf = ctx["orderbook_buffer"]
     snapshot = ob_buf.last_at_or_before(t1)
     ob_dict = _ob_snapshot_to_features(snapshot)
+    tob = ctx.get("tob_accumulator")
+    if tob is not None:
+        ob_dict.update(tob.take(t0.value // 1_000_000, t1.value // 1_000_000))
+    walls = ctx.get("wall_tracker")
+    if walls is not None:
+        bid, ask = ob_buf.quotes_asof([t1.value / 1e9])
+        walls_mid = (bid[0] + ask[0]) / 2.0
+        ob_dict.update(walls.features(t0.value // 1_000_000, t1.value // 1_000_000, walls_mid))
 
     # 3) Trade History + Volume Delta על אותו chunk
-    th_row = ctx["compute_th"](df_chunk, t0).to_dict("records")[0]
-    vd_row = ctx["compute_vd"](df_chunk, t0).to_dict("records")[0]
+    # בלי דגל אגרסור מהבורסה: as-of join של כל טרייד ל-top of book התקף (Lee-Ready) + tick rule
+    side_mode = ctx.get("side_mode", "exchange")
+    side_kw = {} if side_mode == "exchange" else {"side_mode": side_mode, "quotes": ob_buf.top_of_book()[:3]}
+    th_kw = {"bar": bar} if bar is not None else {}
+    if ctx.get("footprint") is not None:
+        th_kw["footprint"] = ctx["footprint"]
+    th_row = ctx["compute_th"](df_chunk, t0, **th_kw, **side_kw).to_dict("records")[0]
+    fp_profile = th_row.pop("th_fp_profile", None)  # מערכי הדליים → טבלת הצד, לא ל-df_all
+    # סף "טרייד גדול" יציב מהסקיצה המתגלגלת של הסימבול (אם יש מספיק טריידים באופק)
+    vd_kw = dict(side_kw)
+    sketch = ctx.get("trade_size_sketch")
+    if sketch is not None and sketch.count >= ctx.get("sketch_min_count", 0):
+        vd_kw["large_trade_thr"] = sketch.quantile(ctx.get("large_trade_pctl", 90.0) / 100.0)
+    vd_row = ctx["compute_vd"](df_chunk, t0, **vd_kw).to_dict("records")[0]
+
+    # 3א) תנודתיות ממומשת: מהנר הרץ (מצטבר טרייד-טרייד) או מהצ'אנק כשאין נר רץ
+    vol_vars = candle_variances(bar, candle=candle, df_chunk=df_chunk)
 
     # 4) בניית feature row בסיסי (בלי אינדיקטורים עדיין)
     row = ctx["build_feature_row"](
@@ -81,16 +124,62 @@ async def on_candle_ready(*, t0, t1, df_chunk, ctx):
         orderbook=ob_dict,
         trade_history=th_row,
         volume_delta=vd_row,
+        volatility=to_vols(vol_vars),
     )
 
     # 5) הוספה ל־df_all עם סכימה יציבה
     df_all = ctx["df_all"]
     schema = ctx["schema"]
+    if amend:
+        if df_all.empty or "ts" not in df_all.columns or df_all["ts"].iloc[-1] != row["ts"]:
+            return  # הנר לתיקון כבר לא האחרון – לא נוגעים בהיסטוריה
+        df_all = df_all.iloc[:-1]
+    fp_table = ctx.get("footprint_table")
+    if fp_table is not None:
+        fp_table.add(row["ts"], fp_profile)
+
+    # 5א) תנודתיות מתגלגלת על N נרות – O(1), אותו ts שוב = amend
+    vol_stream = ctx.get("vol_stream")
+    if vol_stream is not None:
+        if not vol_stream.started:
+            vol_stream.bootstrap(df_all)
+        row.update(vol_stream.update(vol_vars, key=row["ts"]))
+
+    # 5ב) EMA/RSI/BB של טיימפריימים גבוהים (5m/1h) – מגולגלים מנרות הבסיס, as-of עד t1 בלבד
+    htf = ctx.get("htf_join")
+    if htf is not None:
+        if not htf.started:
+            htf.bootstrap(df_all, ctx.get("htf_bootstrap_rows"))
+        row.update(htf.update(t0, t1, candle, key=row["ts"]))
+
+    # 5ג) VWAP לפי סשן – O(1) מהסכומים המצטברים (זמן הנר = ts-1ms, כמו בבקפיל)
+    ind_kw = {}
+    vwap_stream = ctx.get("vwap_stream")
+    if vwap_stream is not None:
+        if not vwap_stream.started:
+            vwap_stream.bootstrap(df_all)
+        anchor = bool(row.get(vwap_stream.anchor_col) or False) if vwap_stream.anchor_col else False
+        row.update(vwap_stream.update(
+            int(row["ts"].value // 1_000_000) - 1,
+            candle["high"], candle["low"], candle["close"], candle["volume"], anchor=anchor,
+        ))
+        ind_kw["provided"] = vwap_stream.columns()
     df_all = append_row(df_all, row, schema)
 
-    # 6) עכשיו – אינדיקטורים וטכני על כל df_all (או tail אם ממומש)
-    df_all = ctx["add_all_indicators"](df_all)
-    df_all = ctx["add_all_technical"](df_all)
+    # 6) עכשיו – אינדיקטורים וטכני על כל df_all; התוכנית מריצה רק צמתים שתלויים בעמודות שהשורה הביאה
+    df_all = ctx["add_all_indicators"](df_all, changed=set(row), **ind_kw)
+    tech_kw = {"state": ctx["technical_stream"]} if ctx.get("technical_stream") is not None else {}
+    df_all = ctx["add_all_technical"](df_all, **tech_kw)
+
+    # 6א) נרמול אונליין: z מהסטטיסטיקות של הנרות הקודמים, ואז השורה נכנסת לסטטיסטיקות – O(עמודות)
+    normalizer = ctx.get("normalizer")
+    nz_table = ctx.get("normalized_table")
+    if normalizer is not None:
+        z = normalizer.update_frame(df_all, key=row["ts"])
+        if nz_table is not None:
+            nz_table.add(row["ts"], z)
+        else:
+            df_all = assign_last_row(df_all, z)
 
     # 7) Targets – רישום נר חדש ועדכון לפי הזמן הנוכחי t1
     filler = ctx["filler"]
@@ -98,9 +187,24 @@ async def on_candle_ready(*, t0, t1, df_chunk, ctx):
     filler.register_row(df_all, idx)
     filler.on_tick(df_all, current_ts=pd.to_datetime(t1, utc=True), price_lookup=ctx["price_lookup"])
 
+    # 7א) יעדי מסלול: השורה נפתחת מול הטריידים שאחרי t1, ומה שה-expiry שלו עבר נכתב לשורה שלו
+    labeler = ctx.get("path_labeler")
+    if labeler is not None:
+        t1_ms = int(row["ts"].value // 1_000_000)
+        vol = df_all[labeler.vol_col].iat[-1] if labeler.vol_col and labeler.vol_col in df_all.columns else None
+        labeler.open_row(t1_ms, candle["close"], None if vol is None or pd.isna(vol) else float(vol))
+        labeler.advance(t1_ms)
+        df_all = labeler.flush(df_all)
+
     # 8) Persist תקופתי
     if idx % ctx["SAVE_EVERY"] == 0:
         ctx["save_df"](df_all, SYMBOL, INTERVAL)
+        if fp_table is not None:
+            fp_table.save()
+        if normalizer is not None:
+            normalizer.save(ctx["normalizer_path"])  # יחד עם df_all – הסטטיסטיקות תואמות לשורות השמורות
+        if nz_table is not None:
+            nz_table.save()
 
     # 9) החזר df_all המעודכן ל־ctx (כי אנחנו ב-asyncland)
     ctx["df_all"] = df_all
@@ -0,0 +1,228 @@
+# dataset/provisional.py
+# שורות פיצ'רים "זמניות" לנר שעדיין פתוח – מתפרסמות כל N שניות למנויים,
+# ולעולם לא נכתבות ל-df_all (השורה הסופית נכתבת רק בסגירת החלון).
+#
+#   הנר הפתוח עצמו (OHLCV + סכומי טריידים) – LiveCandle של graphs_time.CandleEngine בצינור.
+#   ProvisionalIndicators  – מצב EMA/RSI/BB מהנר הסגור האחרון → ערך זמני O(1) לפי המחיר הנוכחי.
+#   ProvisionalPublisher   – pub/sub פשוט מעל asyncio.Queue (המנוי האיטי מאבד את הישן, לא חוסם).
+
+from __future__ import annotations
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.rolling_stats import RollingMoments
+from dataset.pipeline import _ob_snapshot_to_features
+
+
+def _bar_trade_aggregates(bar, epsilon: float = 1e-9) -> Dict[str, Any]:
+    """סכומי th/vd מהנר הרץ (אותן נוסחאות כמו בסגירה)."""
+    total = bar.buy_vol + bar.sell_vol
+    delta = bar.buy_vol - bar.sell_vol
+    return {
+        "th_buy_vol_total": bar.buy_vol, "th_sell_vol_total": bar.sell_vol, "th_total_vol": total,
+        "th_buy_trades_count": bar.buy_count, "th_sell_trades_count": bar.sell_count,
+        "th_trades_count_total": bar.buy_count + bar.sell_count,
+        "th_delta_vol": delta,
+        "th_vwap_trades": bar.notional / (bar.volume + epsilon) if bar.volume > 0 else 0.0,
+        "th_max_gap_ms": float(bar.max_gap_ms),
+        "vd_buy_vol": bar.buy_vol, "vd_sell_vol": bar.sell_vol, "vd_total_vol": total,
+        "vd_delta_vol": delta,
+        "vd_delta_ratio": delta / (total + epsilon) if total > 0 else 0.0,
+    }
+
+
+class ProvisionalIndicators:
+    """
+    שומר את מצב האינדיקטורים אחרי הנר הסגור האחרון ומחשב ערך זמני למחיר נתון –
+    באותן נוסחאות של indicator/ (EMA adjust=False, RSI Wilder, BB עם ddof=0).
+    """
+
+    def __init__(self, ema_spans=(5, 12, 21), rsi_period: int = 14,
+                 bb_window: int = 20, bb_num_std: float = 2.0):
+        self.ema_spans = tuple(int(x) for x in ema_spans)
+        self.rsi_period = int(rsi_period)
+        self.bb_window = int(bb_window)
+        self.bb_num_std = float(bb_num_std)
+        self._ema: Dict[int, float] = {}
+        self._bb = RollingMoments(window=self.bb_window)  # mean/std של closes ב-O(1)
+        self._avg_gain = self._avg_loss = np.nan
+        self._last_close = np.nan
+        self._last_ts = None
+        self._prev_state = None  # לתיקון (amend) של הנר האחרון
+
+    def _state(self):
+        return (dict(self._ema), self._avg_gain, self._avg_loss, self._last_close)
+
+    def _restore(self, st) -> None:
+        ema, self._avg_gain, self._avg_loss, self._last_close = st
+        self._ema = dict(ema)
+
+    def _bootstrap(self, df_all: pd.DataFrame) -> None:
+        """אתחול חד-פעמי מההיסטוריה (O(n) פעם אחת); אחר כך רק עדכונים."""
+        close = pd.to_numeric(df_all["close"], errors="coerce").astype(float)
+        for span in self.ema_spans:
+            col = f"ema_{span}"
+            self._ema[span] = float(df_all[col].iloc[-1]) if col in df_all.columns else \
+                float(close.ewm(span=span, adjust=False).mean().iloc[-1])
+        delta = close.diff()
+        a = 1.0 / self.rsi_period
+        self._avg_gain = float(delta.clip(lower=0.0).ewm(alpha=a, adjust=False).mean().iloc[-1])
+        self._avg_loss = float((-delta.clip(upper=0.0)).ewm(alpha=a, adjust=False).mean().iloc[-1])
+        for c in close.iloc[-self.bb_window:].tolist():
+            self._bb.update(c)
+        self._last_close = float(close.iloc[-1])
+        self._last_ts = df_all["ts"].iloc[-1] if "ts" in df_all.columns else None
+
+    def _apply_close(self, c: float, amend: bool = False) -> None:
+        for span in self.ema_spans:
+            a = 2.0 / (span + 1.0)
+            prev = self._ema.get(span, np.nan)
+            self._ema[span] = c if not np.isfinite(prev) else prev + a * (c - prev)
+        if np.isfinite(self._last_close):
+            d = c - self._last_close
+            a = 1.0 / self.rsi_period
+            g, l = max(d, 0.0), max(-d, 0.0)
+            self._avg_gain = g if not np.isfinite(self._avg_gain) else (1 - a) * self._avg_gain + a * g
+            self._avg_loss = l if not np.isfinite(self._avg_loss) else (1 - a) * self._avg_loss + a * l
+        if amend:
+            self._bb.replace_last(c)
+        else:
+            self._bb.update(c)
+        self._last_close = c
+
+    def push(self, c: float, amend: bool = False) -> None:
+        """נר סגור אחד (amend=True – תיקון של הנר האחרון שנדחף) – בלי df_all."""
+        if not np.isfinite(c):
+            return
+        if amend:
+            if self._prev_state is None:
+                return
+            self._restore(self._prev_state)
+        else:
+            self._prev_state = self._state()
+        self._apply_close(float(c), amend=amend)
+
+    def values(self) -> Dict[str, float]:
+        """ערכי האינדיקטורים בנר הסגור האחרון (כמו השורה האחרונה של add_all_indicators)."""
+        out: Dict[str, float] = {f"ema_{span}": v for span, v in self._ema.items()}
+        if np.isfinite(self._last_close):
+            g, l = self._avg_gain, self._avg_loss
+            out["rsi"] = 100.0 - 100.0 / (1.0 + g / l) if np.isfinite(g) and np.isfinite(l) and l > 0 else 50.0
+        mid, std = self._bb.mean, self._bb.std()
+        if np.isfinite(mid):
+            up, low = mid + self.bb_num_std * std, mid - self.bb_num_std * std
+            out.update({"bb_mid": mid, "bb_up": up, "bb_low": low,
+                        "bb_width": (up - low) / mid * 100 if mid else np.nan})
+        return out
+
+    def on_close(self, df_all: pd.DataFrame) -> None:
+        """לקרוא אחרי כל on_candle_ready. מעבד רק שורות חדשות (או תיקון של האחרונה)."""
+        if df_all.empty or "close" not in df_all.columns:
+            return
+        if self._last_ts is None:
+            self._bootstrap(df_all)
+            return
+        ts = df_all["ts"]
+        last_ts = ts.iloc[-1]
+        amend = last_ts == self._last_ts
+        if amend:
+            if self._prev_state is None:
+                return
+            self._restore(self._prev_state)  # הנר האחרון תוקן – מחילים אותו מחדש
+            new_rows = df_all.iloc[-1:]
+        else:
+            new_rows = df_all.iloc[int(ts.searchsorted(self._last_ts, side="right")):]  # ts ממוין – בלי מסכה על כל הטבלה
+        for c in pd.to_numeric(new_rows["close"], errors="coerce").tolist():
+            if not np.isfinite(c):
+                continue
+            if not amend:
+                self._prev_state = self._state()
+            self._apply_close(float(c), amend=amend)
+        self._last_ts = last_ts
+
+    def preview(self, price: float) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        if not np.isfinite(price):
+            return out
+        for span, prev in self._ema.items():
+            a = 2.0 / (span + 1.0)
+            out[f"ema_{span}"] = price if not np.isfinite(prev) else prev + a * (price - prev)
+
+        if np.isfinite(self._last_close) and np.isfinite(self._avg_gain) and np.isfinite(self._avg_loss):
+            d = price - self._last_close
+            a = 1.0 / self.rsi_period
+            g = (1 - a) * self._avg_gain + a * max(d, 0.0)
+            l = (1 - a) * self._avg_loss + a * max(-d, 0.0)
+            out["rsi"] = 100.0 - 100.0 / (1.0 + g / l) if l > 0 else 50.0
+
+        mid, std = self._bb.peek(price)
+        if np.isfinite(mid):
+            up, low = mid + self.bb_num_std * std, mid - self.bb_num_std * std
+            out.update({"bb_mid": mid, "bb_up": up, "bb_low": low,
+                        "bb_width": (up - low) / mid * 100 if mid else np.nan})
+        return out
+
+
+class ProvisionalPublisher:
+    """מנויים מקבלים asyncio.Queue; publish לא חוסם – בתור מלא נזרקת השורה הישנה."""
+
+    def __init__(self, queue_max: int = 100):
+        self.queue_max = int(queue_max)
+        self._subs: List[asyncio.Queue] = []
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_max)
+        self._subs.append(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        if q in self._subs:
+            self._subs.remove(q)
+
+    def publish(self, row: Dict[str, Any]) -> None:
+        for q in self._subs:
+            if q.full():
+                try:
+                    q.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            q.put_nowait(row)
+
+
+class ProvisionalStage:
+    """מחבר את שלושת החלקים לצינור אחד (symbol, interval)."""
+
+    def __init__(self, symbol: str, interval: str, *, queue_max: int = 100, **indicator_kwargs):
+        self.symbol = symbol
+        self.interval = interval
+        self.indicators = ProvisionalIndicators(**indicator_kwargs)
+        self.publisher = ProvisionalPublisher(queue_max)
+
+    def subscribe(self) -> asyncio.Queue:
+        return self.publisher.subscribe()
+
+    def build_row(self, bar, now: pd.Timestamp, ob_buf=None, tob=None) -> Optional[Dict[str, Any]]:
+        """bar = LiveCandle של הנר הפתוח (None / בלי טריידים → אין מה לפרסם). tob = TopOfBookAccumulator."""
+        if bar is None or bar.trades == 0:
+            return None
+        row: Dict[str, Any] = {
+            "ts": now, "symbol": self.symbol, "interval": self.interval, "provisional": True,
+            "t0": None if bar.start_ms is None else pd.Timestamp(bar.start_ms * 1_000_000, tz="UTC"),
+        }
+        row.update(bar.ohlcv())
+        row.update(_bar_trade_aggregates(bar))
+        if ob_buf is not None:
+            row.update(_ob_snapshot_to_features(ob_buf.last_at_or_before(now)))
+        if tob is not None:
+            row.update(tob.peek(int(now.value // 1_000_000)))
+        row.update(self.indicators.preview(bar.close))
+        return row
+
+    def publish(self, bar, now: pd.Timestamp, ob_buf=None, tob=None) -> Optional[Dict[str, Any]]:
+        row = self.build_row(bar, now, ob_buf, tob)
+        if row is not None:
+            self.publisher.publish(row)
+        return row
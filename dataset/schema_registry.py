@@ -1,6 +1,10 @@
 import pandas as pd
 import numpy as np
 
+from technical_live.book_accumulator import TOB_FEATURES, ofi_columns
+from technical_live.realized_vol import vol_columns
+from technical_live.wall_tracker import WALL_FEATURES
+
 DT  = "datetime64[ns, UTC]"
 F64 = "float64"
 I64 = "Int64"
@@ -21,11 +25,37 @@ SCHEMA = {
     # דלתא/טרייד היסטורי (דוגמאות שכיחות)
     "th_buy_vol_total": F64, "th_sell_vol_total": F64, "th_total_vol": F64,
     "vd_buy_vol": F64, "vd_sell_vol": F64, "vd_total_vol": F64,
+    # footprint לנר (technical_live.footprint; הפרופיל המלא בטבלת צד)
+    "th_fp_poc_price": F64, "th_fp_poc_vol_pct": F64, "th_fp_poc_delta": F64,
+    "th_fp_vah": F64, "th_fp_val": F64, "th_fp_va_width_bps": F64, "th_fp_close_vs_poc_bps": F64,
+    "th_fp_buckets": F64, "th_fp_bucket_size": F64,
     # OB בסיסי
     "best_bid_price": F64, "best_ask_price": F64, "mid_price": F64, "spread_abs": F64,
+    # תנודתיות / OB משוקלל-זמן / קירות – לפי הקונפיג של המפיקים (ensure_feature_cols)
     # Targets (נוסיף לפי אופק בריצה)
 }
 
+def ensure_feature_cols(schema: dict, *, vol_windows=(), tob: bool = False, ofi_levels: int = 0,
+                        walls: bool = False) -> dict:
+    """
+    עמודות שהשמות/הקיום שלהן תלויים בקונפיג – מאותן פונקציות שהמפיקים משתמשים בהן:
+    rv_*/vol_* + <estimator>_roll<w> (realized_vol.vol_columns), ob_* משוקלל-זמן + ob_ofi_l{n}
+    (book_accumulator), ob_wall_* (wall_tracker).
+    """
+    sc = dict(schema)
+    for c in vol_columns(int(w) for w in vol_windows):
+        sc[c] = F64
+    if tob:
+        for c in TOB_FEATURES:
+            sc[c] = F64
+        if ofi_levels > 0:
+            for c in ofi_columns(int(ofi_levels)):
+                sc[c] = F64
+    if walls:
+        for c in WALL_FEATURES:
+            sc[c] = F64
+    return sc
+
 def ensure_target_cols(schema: dict, horizons: list[int]) -> dict:
     sc = dict(schema)
     for h in sorted(set(int(x) for x in horizons)):
@@ -34,6 +64,16 @@ def ensure_target_cols(schema: dict, horizons: list[int]) -> dict:
         sc[f"long_profitable_{h}s"]  = BOL
         sc[f"short_profitable_{h}s"] = BOL
         sc[f"filled_at_{h}s"] = DT
+    sc["friction_pct_used"] = F64  # TargetFiller.register_row
+    return sc
+
+def ensure_path_label_cols(schema: dict, horizons: list[int]) -> dict:
+    sc = dict(schema)
+    for h in sorted(set(int(x) for x in horizons)):
+        sc[f"tb_label_{h}s"] = F64          # +1 / -1 / 0 (dataset.path_labels)
+        sc[f"tb_touch_sec_{h}s"] = F64
+        sc[f"mfe_{h}s"] = F64
+        sc[f"mae_{h}s"] = F64
     return sc
 
 def empty_df(schema: dict) -> pd.DataFrame:
@@ -61,8 +101,9 @@ def coerce_row(row: dict, schema: dict) -> pd.DataFrame:
     for c, t in schema.items():
         if t == DT:
             df[c] = _coerce_dt_utc(df[c])
-    # סדר ו־dtype
-    df = df.reindex(columns=list(schema.keys()))
+    # סדר ו־dtype (עמודות שאינן בסכימה נשמרות בסוף – הסכימה "גדלה תוך כדי")
+    extra = [c for c in df.columns if c not in schema]
+    df = df.reindex(columns=list(schema.keys()) + extra)
     with pd.option_context("future.no_silent_downcasting", True):
         try:
             df = df.astype(schema, errors="ignore")
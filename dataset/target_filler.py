@@ -43,7 +43,9 @@ class TargetFiller:
         """לקרוא מיד אחרי הוספת שורה חדשה ל-DF (כדי לסמן שמחכים לעתיד)."""
         self.ensure_target_columns(df)
         for h in self.h:
-            self.waiting[h].append(idx)
+            w = self.waiting[h]
+            if not w or w[-1] != idx:  # נר שתוקן (amend) הוא תמיד האחרון שנרשם – בלי חיפוש ברשימה
+                w.append(idx)
         # נרשום את עלות החיכוך ששימשה בעת יצירת השורה (לשקיפות/שחזור)
         df.at[idx, "friction_pct_used"] = self.friction_pct
 
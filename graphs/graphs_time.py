@@ -1,11 +1,272 @@
 import asyncio
+import math
 from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+NAN = float("nan")
+
 
 def _floor_to_bucket_ms(ts_ms: int, interval_sec: int) -> int:
     """מעגל timestamp להתחלת אינטרוול (bucket) בגודל נתון בשניות."""
     step = interval_sec * 1000
     return (ts_ms // step) * step
 
+
+class LiveCandle:
+    """
+    נר רץ בלי pandas: כל טרייד מעדכן מונים בזמן O(1).
+    OHLC לפי סדר ts (טרייד מאוחר שנופל באמצע לא מזיז open/close).
+    max_gap_ms נמדד בין טריידים עוקבים שהגיעו בסדר.
+    שונות ממומשת (סכום ריבועי log-returns) מצטברת באותו מעבר, גם היא רק על טריידים שהגיעו בסדר:
+      rv_tick – בין טריידים עוקבים; rv_grid – על רשת RV_GRID_MS (המחיר האחרון בכל שנייה, מעוגן ב-open).
+    """
+    RV_GRID_MS = 1000
+
+    __slots__ = (
+        "start_ms", "end_ms", "open", "high", "low", "close",
+        "volume", "buy_vol", "sell_vol", "buy_count", "sell_count", "trades",
+        "notional", "buy_notional", "sell_notional",
+        "first_ts_ms", "last_ts_ms", "max_gap_ms",
+        "rv_tick", "_rv_grid", "_grid_bucket", "_grid_px", "_grid_anchor", "_g1_px",
+    )
+
+    def __init__(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.open = self.high = self.low = self.close = NAN
+        self.volume = self.buy_vol = self.sell_vol = 0.0
+        self.notional = self.buy_notional = self.sell_notional = 0.0
+        self.buy_count = self.sell_count = self.trades = 0
+        self.first_ts_ms: Optional[int] = None
+        self.last_ts_ms: Optional[int] = None
+        self.max_gap_ms = 0
+        self.rv_tick = 0.0
+        self._rv_grid = 0.0
+        self._grid_bucket: Optional[int] = None
+        self._grid_px = self._grid_anchor = NAN
+        self._g1_px = NAN  # המחיר בסוף השנייה הראשונה ברשת (ל-merge מדויק של rv_grid)
+
+    @classmethod
+    def flat(cls, start_ms: int, end_ms: int, price: float) -> "LiveCandle":
+        """נר ריק לדלי בלי טריידים: OHLC = ה-close הקודם, נפח 0."""
+        c = cls(start_ms, end_ms)
+        c.open = c.high = c.low = c.close = price
+        return c
+
+    def add(self, ts_ms: int, price: float, qty: float, side: str = "") -> None:
+        if self.trades == 0:
+            self.open = self.high = self.low = self.close = price
+            self.first_ts_ms = self.last_ts_ms = ts_ms
+            if self.start_ms is None:  # נר ללא דלי קבוע (ברי אירועים)
+                self.start_ms = ts_ms
+            self._grid_bucket = ts_ms // self.RV_GRID_MS
+            self._grid_px = self._grid_anchor = price
+        else:
+            if price > self.high:
+                self.high = price
+            elif price < self.low:
+                self.low = price
+            if ts_ms >= self.last_ts_ms:
+                gap = ts_ms - self.last_ts_ms
+                if gap > self.max_gap_ms:
+                    self.max_gap_ms = gap
+                if price > 0 and self.close > 0:
+                    r = math.log(price / self.close)
+                    self.rv_tick += r * r
+                    b = ts_ms // self.RV_GRID_MS
+                    if b != self._grid_bucket:
+                        # שנייה חדשה: התשואה של השנייה שנסגרה (המחיר האחרון שלה מול הנקודה הקודמת ברשת)
+                        g = math.log(self._grid_px / self._grid_anchor)
+                        self._rv_grid += g * g
+                        if self._g1_px != self._g1_px:
+                            self._g1_px = self._grid_px
+                        self._grid_anchor = self._grid_px
+                        self._grid_bucket = b
+                    self._grid_px = price
+                self.close = price
+                self.last_ts_ms = ts_ms
+            elif ts_ms < self.first_ts_ms:
+                gap = self.first_ts_ms - ts_ms
+                if gap > self.max_gap_ms:
+                    self.max_gap_ms = gap
+                self.open = price
+                self.first_ts_ms = ts_ms
+        n = price * qty
+        self.trades += 1
+        self.volume += qty
+        self.notional += n
+        if side == "buy":
+            self.buy_vol += qty
+            self.buy_count += 1
+            self.buy_notional += n
+        elif side == "sell":
+            self.sell_vol += qty
+            self.sell_count += 1
+            self.sell_notional += n
+
+    def copy(self) -> "LiveCandle":
+        c = LiveCandle.__new__(LiveCandle)
+        for k in self.__slots__:
+            setattr(c, k, getattr(self, k))
+        return c
+
+    def merge(self, other: "LiveCandle") -> None:
+        """
+        מגלגל נר צמוד מאוחר יותר (other) לתוך הנר – אותה תוצאה כאילו כל הטריידים נכנסו לנר אחד
+        (כולל rv_tick/rv_grid), בתנאי שהגבול ביניהם על רשת RV_GRID_MS (אינטרוול בשניות שלמות).
+        start_ms/end_ms של הנר הזה לא משתנים.
+        """
+        if other.trades == 0:
+            return
+        if self.trades == 0:
+            start, end = self.start_ms, self.end_ms
+            for k in self.__slots__:
+                setattr(self, k, getattr(other, k))
+            if start is not None:
+                self.start_ms, self.end_ms = start, end
+            return
+        self.high = max(self.high, other.high)
+        self.low = min(self.low, other.low)
+        self.max_gap_ms = max(self.max_gap_ms, other.max_gap_ms, other.first_ts_ms - self.last_ts_ms)
+        if other.open > 0 and self.close > 0:
+            r = math.log(other.open / self.close)
+            self.rv_tick += r * r
+            # השנייה הפתוחה כאן נסגרת; השנייה הראשונה של other מעוגנת במחיר שלה ולא ב-open של other
+            g = math.log(self._grid_px / self._grid_anchor)
+            closed = self._rv_grid + g * g
+            if self._g1_px != self._g1_px:
+                self._g1_px = self._grid_px
+            if other._g1_px == other._g1_px:
+                g1o = math.log(other._g1_px / other.open)
+                g1m = math.log(other._g1_px / self._grid_px)
+                self._rv_grid = closed + other._rv_grid - g1o * g1o + g1m * g1m
+                self._grid_anchor = other._grid_anchor
+            else:
+                self._rv_grid = closed
+                self._grid_anchor = self._grid_px
+            self._grid_px = other._grid_px
+            self._grid_bucket = other._grid_bucket
+        self.rv_tick += other.rv_tick
+        self.close = other.close
+        self.last_ts_ms = other.last_ts_ms
+        self.volume += other.volume
+        self.buy_vol += other.buy_vol
+        self.sell_vol += other.sell_vol
+        self.notional += other.notional
+        self.buy_notional += other.buy_notional
+        self.sell_notional += other.sell_notional
+        self.buy_count += other.buy_count
+        self.sell_count += other.sell_count
+        self.trades += other.trades
+
+    @property
+    def vwap(self) -> float:
+        return self.notional / self.volume if self.volume > 0 else NAN
+
+    @property
+    def rv_grid(self) -> float:
+        """סכום ריבועי התשואות על הרשת, כולל השנייה הפתוחה (בלי לשנות מצב)."""
+        if self.trades == 0 or not (self._grid_anchor > 0):
+            return 0.0
+        g = math.log(self._grid_px / self._grid_anchor)
+        return self._rv_grid + g * g
+
+    @property
+    def duration_ms(self) -> int:
+        return 0 if self.trades < 2 else self.last_ts_ms - self.first_ts_ms
+
+    def ohlcv(self) -> Dict[str, float]:
+        return {"open": self.open, "high": self.high, "low": self.low, "close": self.close, "volume": self.volume}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "start_ms": self.start_ms,
+            "start_iso": datetime.fromtimestamp(self.start_ms / 1000, tz=timezone.utc).isoformat()
+                         if self.start_ms is not None else None,
+            **self.ohlcv(),
+            "buy_vol": self.buy_vol, "sell_vol": self.sell_vol,
+            "buy_count": self.buy_count, "sell_count": self.sell_count, "trades": self.trades,
+            "notional": self.notional, "vwap": self.vwap,
+            "first_ts_ms": self.first_ts_ms, "last_ts_ms": self.last_ts_ms, "max_gap_ms": self.max_gap_ms,
+        }
+
+
+class CandleEngine:
+    """
+    מנוע נרות זמן מטריידים, חשבון דליים שלם (int ms) – אותם גבולות כמו WindowClock.
+      on_trade(...)   → רשימת נרות שנסגרו (כשהטרייד פתח דלי חדש)
+      advance_to(ms)  → סגירה לפי שעון (טיימר), גם בלי טרייד
+    דלגים על כמה דליים: fill_gaps=True פולט נר שטוח לכל דלי ריק, אחרת הם מדולגים.
+    טרייד מאוחר: late_policy="amend" → נכנס לנר הקודם (last_closed), "next" → לנר הפתוח.
+    """
+
+    def __init__(self, interval_sec: int, *, late_policy: str = "amend", fill_gaps: bool = False):
+        self.step_ms = int(interval_sec) * 1000
+        self.late_policy = late_policy
+        self.fill_gaps = fill_gaps
+        self.start_ms: Optional[int] = None      # תחילת הדלי הפתוח
+        self.current: Optional[LiveCandle] = None  # None = הדלי הפתוח עוד בלי טריידים
+        self.last_closed: Optional[LiveCandle] = None
+        self._last_price = NAN
+
+    def _close_until(self, bucket_ms: int) -> List[LiveCandle]:
+        """סוגר את הדלי הפתוח (ואת הדליים הריקים אחריו) עד bucket_ms, שנהיה הדלי הפתוח."""
+        out: List[LiveCandle] = []
+        step = self.step_ms
+        cur = self.current
+        if cur is not None:
+            out.append(cur)
+            self.last_closed = cur
+            self._last_price = cur.close
+        elif self.fill_gaps and self._last_price == self._last_price:
+            out.append(LiveCandle.flat(self.start_ms, self.start_ms + step, self._last_price))
+        if self.fill_gaps and self._last_price == self._last_price:
+            for b in range(self.start_ms + step, bucket_ms, step):
+                out.append(LiveCandle.flat(b, b + step, self._last_price))
+        self.start_ms = bucket_ms
+        self.current = None
+        return out
+
+    def advance_to(self, ts_ms: int) -> List[LiveCandle]:
+        if self.start_ms is None:
+            return []
+        bucket = ts_ms - ts_ms % self.step_ms
+        if bucket <= self.start_ms:
+            return []
+        return self._close_until(bucket)
+
+    def on_trade(self, ts_ms: int, price: float, qty: float, side: str = "") -> List[LiveCandle]:
+        step = self.step_ms
+        bucket = ts_ms - ts_ms % step
+        closed: List[LiveCandle] = []
+        if self.start_ms is None:
+            self.start_ms = bucket
+        elif bucket > self.start_ms:
+            closed = self._close_until(bucket)
+        elif bucket < self.start_ms:
+            self._on_late(bucket, ts_ms, price, qty, side)
+            return closed
+        if self.current is None:
+            self.current = LiveCandle(self.start_ms, self.start_ms + step)
+        self.current.add(ts_ms, price, qty, side)
+        return closed
+
+    def _on_late(self, bucket: int, ts_ms: int, price: float, qty: float, side: str) -> None:
+        step = self.step_ms
+        if self.late_policy == "next":
+            if self.current is None:
+                self.current = LiveCandle(self.start_ms, self.start_ms + step)
+            self.current.add(self.start_ms, price, qty, side)  # ts מוחלף ל-t0 של החלון הפתוח
+            return
+        # amend: רק הדלי הצמוד לפתוח ניתן לתיקון
+        if bucket != self.start_ms - step:
+            return
+        lc = self.last_closed
+        if lc is None or lc.start_ms != bucket:
+            lc = self.last_closed = LiveCandle(bucket, bucket + step)
+        lc.add(ts_ms, price, qty, side)
+
+
 async def build_candles_from_stream(
     trades_q: asyncio.Queue,
     candles_q: asyncio.Queue,
@@ -15,50 +276,18 @@ async def build_candles_from_stream(
     """
     קורא מטריידים בפורמט:
       {"ts_ms": int, "price": float, "qty": float, "side": "Buy"|"Sell"}
-    ופולט נרות ל-candles_q עם:
-      {"start_ms": int, "start_iso": str, "open": float, "high": float, "low": float, "close": float, "volume": float}
+    ופולט נרות ל-candles_q (LiveCandle.to_dict):
+      {"start_ms", "start_iso", "open", "high", "low", "close", "volume",
+       "buy_vol", "sell_vol", "buy_count", "sell_count", "trades", "notional", "vwap",
+       "first_ts_ms", "last_ts_ms", "max_gap_ms"}
+    דליים בלי טריידים בין שני טריידים נפלטים כנרות שטוחים (נפח 0).
     """
-    current_bucket = None
-    o = h = l = c = None
-    vol = 0.0
-
+    engine = CandleEngine(interval_sec, fill_gaps=True)
     while True:
         tr = await trades_q.get()
-        ts = tr["ts_ms"]
-        price = tr["price"]
-        qty = tr["qty"]
-
-        bucket = _floor_to_bucket_ms(ts, interval_sec)
-
-        # טרייד ראשון – פתיחת נר ראשון
-        if current_bucket is None:
-            current_bucket = bucket
-            o = h = l = c = price
-            vol = qty
-            continue
-
-        # אותו דלי – עדכון הנר
-        if bucket == current_bucket:
-            c = price
-            if price > h:
-                h = price
-            if price < l:
-                l = price
-            vol += qty
-            continue
-
-        # דלי חדש – סוגרים את הנר הקודם ושולחים לפלט
-        await candles_q.put({
-            "start_ms": current_bucket,
-            "start_iso": datetime.fromtimestamp(current_bucket/1000, tz=timezone.utc).isoformat(),
-            "open": o,
-            "high": h,
-            "low": l,
-            "close": c,
-            "volume": vol,
-        })
-
-        # נר חדש
-        current_bucket = bucket
-        o = h = l = c = price
-        vol = qty
+        closed = engine.on_trade(
+            int(tr["ts_ms"]), float(tr["price"]), float(tr["qty"]),
+            str(tr.get("side", "")).lower(),
+        )
+        for c in closed:
+            await candles_q.put(c.to_dict())
@@ -2,6 +2,14 @@ import pandas as pd
 import numpy as np
 
 
+def bollinger_bands(mid: pd.Series, std: pd.Series, num_std: float = 2.0) -> dict:
+    """mid/std מתגלגלים מוכנים → {mid, up, low, width}; משותף ל-add_bollinger ולתוכנית הפיצ'רים."""
+    up = mid + num_std * std
+    low = mid - num_std * std
+    width = ((up - low) / mid * 100).replace([np.inf, -np.inf], np.nan)
+    return {"mid": mid, "up": up, "low": low, "width": width}
+
+
 def add_bollinger(df: pd.DataFrame, window: int = 20, num_std: float = 2.0,
                   mid_col='bb_mid', up_col='bb_up', low_col='bb_low', width_col='bb_width') -> pd.DataFrame:
     """
@@ -13,11 +21,10 @@ def add_bollinger(df: pd.DataFrame, window: int = 20, num_std: float = 2.0,
     """
     mid = df['close'].rolling(window=window, min_periods=window).mean()
     std = df['close'].rolling(window=window, min_periods=window).std(ddof=0)
-    up = mid + num_std * std
-    low = mid - num_std * std
+    bb = bollinger_bands(mid, std, num_std)
 
-    df[mid_col] = mid
-    df[up_col] = up
-    df[low_col] = low
-    df[width_col] = ((up - low) / mid * 100).replace([np.inf, -np.inf], np.nan)
+    df[mid_col] = bb["mid"]
+    df[up_col] = bb["up"]
+    df[low_col] = bb["low"]
+    df[width_col] = bb["width"]
     return df
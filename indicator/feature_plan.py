@@ -0,0 +1,315 @@
+# indicator/feature_plan.py
+# תוכנית פיצ'רים הצהרתית: כל אינדיקטור/טכניקל מצהיר על inputs, outputs ו-lookback,
+# והקומפיילר בונה ממנה DAG מתוך config.py (דרך CFG):
+#   • ביניים משותפים (close.diff, rolling mean/std) מחושבים בעצלות, פעם אחת לכל run,
+#     ונשמרים ב-cache של הריצה – לא כעמודות ב-df.
+#   • run(df, changed=...) מריץ רק צמתים שאחד ה-inputs שלהם השתנה, או שעמודות הפלט שלהם חסרות
+#     (הוספת תקופה חדשה בקונפיג → רק הצומת החדש רץ).
+#   • שמות עמודות נקבעים כאן (ema_col) – בלי לנחש בין ema12 ל-ema_12.
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import pandas as pd
+
+from core.settings_manager import CFG
+from indicator.bb import bollinger_bands
+from indicator.rsi import rsi_from_diff
+from indicator.vwap import add_vwap, band_cols
+
+def ema_col(period: int) -> str:
+    """השם הקנוני של עמודת EMA (כמו add_ema): ema_12."""
+    return f"ema_{int(period)}"
+
+
+def rsi_col(period: int, default_period: int = 14) -> str:
+    return "rsi" if int(period) == int(default_period) else f"rsi_{int(period)}"
+
+
+@dataclass(frozen=True)
+class FeatureNode:
+    """
+    צומת בתוכנית. fn(env) → {output: Series}.
+    keep=False → ביניים: מחושב לפי דרישה, נשמר ב-cache של הריצה ולא נכתב ל-df.
+    """
+    name: str
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    fn: Callable[["_Env"], Dict[str, pd.Series]]
+    lookback: int = 1
+    group: str = "indicators"
+    keep: bool = True
+
+
+class _Env:
+    """גישה לעמודות: ביניים מחושבים בעצלות (פעם אחת לריצה), כל השאר מ-df."""
+
+    def __init__(self, df: pd.DataFrame, lazy: Dict[str, FeatureNode]):
+        self.df = df
+        self.lazy = lazy
+        self.cache: Dict[str, pd.Series] = {}
+
+    def __getitem__(self, col: str) -> pd.Series:
+        if col in self.cache:
+            return self.cache[col]
+        node = self.lazy.get(col)
+        if node is not None:
+            self.cache.update(node.fn(self))
+            return self.cache[col]
+        return self.df[col]
+
+
+class FeaturePlan:
+    def __init__(self, nodes: Iterable[FeatureNode]):
+        by_name: Dict[str, FeatureNode] = {}
+        for n in nodes:
+            by_name.setdefault(n.name, n)  # אותו צומת פעמיים (למשל EMA שגם הטכניקל צריך) → פעם אחת
+        self.nodes: List[FeatureNode] = self._toposort(list(by_name.values()))
+        self._lazy = {o: n for n in self.nodes if not n.keep for o in n.outputs}
+        # inputs אפקטיביים: דרך צמתי ביניים עד עמודות אמיתיות (כדי ש-changed={"close"} יגיע ל-RSI)
+        self._deps: Dict[str, Set[str]] = {n.name: self._expand(n.inputs) for n in self.nodes}
+
+    def _expand(self, inputs: Iterable[str]) -> Set[str]:
+        out: Set[str] = set()
+        stack = list(inputs)
+        while stack:
+            c = stack.pop()
+            if c in out:
+                continue
+            out.add(c)
+            if c in self._lazy:
+                stack.extend(self._lazy[c].inputs)
+        return out
+
+    @staticmethod
+    def _toposort(nodes: List[FeatureNode]) -> List[FeatureNode]:
+        producer = {o: n for n in nodes for o in n.outputs}
+        order: List[FeatureNode] = []
+        state: Dict[str, int] = {}
+
+        def visit(n: FeatureNode) -> None:
+            s = state.get(n.name, 0)
+            if s == 2:
+                return
+            if s == 1:
+                raise ValueError(f"מעגל בתוכנית הפיצ'רים סביב {n.name}")
+            state[n.name] = 1
+            for i in n.inputs:
+                if i in producer:
+                    visit(producer[i])
+            state[n.name] = 2
+            order.append(n)
+
+        for n in nodes:
+            visit(n)
+        return order
+
+    @property
+    def lookback(self) -> int:
+        """כמה נרות אחורה צריך כדי שכל הצמתים יהיו מלאים (לחיתוך tail בהמשך)."""
+        return max((n.lookback for n in self.nodes), default=1)
+
+    def outputs(self, group: Optional[str] = None) -> List[str]:
+        return [o for n in self.nodes if n.keep and (group is None or n.group == group) for o in n.outputs]
+
+    def run(self, df: pd.DataFrame, *, changed: Optional[Iterable[str]] = None,
+            group: Optional[str] = None, provided: Iterable[str] = ()) -> pd.DataFrame:
+        """
+        changed=None → כל הצמתים (של group, ואלה שהם תלויים בהם).
+        changed={"volume"} → רק מה שתלוי ב-volume, ועוד צמתים שעמודות הפלט שלהם חסרות ב-df.
+        provided – עמודות שכבר חושבו מחוץ לתוכנית (למשל VwapStream בזמן אמת):
+        צומת שכל הפלטים שלו ב-provided וקיימים ב-df לא רץ.
+        """
+        if df.empty:
+            return df
+        dirty: Optional[Set[str]] = None if changed is None else set(changed)
+        given = set(provided)
+        needed = self._needed_for(group)
+        env = _Env(df, self._lazy)
+        for node in self.nodes:
+            if not node.keep or node.name not in needed:
+                continue
+            missing = any(o not in df.columns for o in node.outputs)
+            if not missing and given.issuperset(node.outputs):
+                continue
+            if not (missing or dirty is None or dirty.intersection(self._deps[node.name])):
+                continue
+            for col, val in node.fn(env).items():
+                df[col] = val
+            if dirty is not None:
+                dirty.update(node.outputs)
+        return df
+
+    def _needed_for(self, group: Optional[str]) -> Set[str]:
+        if group is None:
+            return {n.name for n in self.nodes}
+        producer = {o: n for n in self.nodes for o in n.outputs}
+        need: Set[str] = set()
+        stack = [n for n in self.nodes if n.group == group]
+        while stack:
+            n = stack.pop()
+            if n.name in need:
+                continue
+            need.add(n.name)
+            stack.extend(producer[i] for i in n.inputs if i in producer)
+        return need
+
+
+# ---------- צמתים ----------
+def _ema_node(p: int) -> FeatureNode:
+    col = ema_col(p)
+    return FeatureNode(col, ("close",), (col,),
+                       lambda env: {col: env["close"].ewm(span=p, adjust=False).mean()},
+                       lookback=p)
+
+
+def _rsi_node(period: int, default_period: int) -> FeatureNode:
+    col = rsi_col(period, default_period)
+
+    def fn(env):
+        return {col: rsi_from_diff(env["close_diff"], period)}
+    return FeatureNode(col, ("close_diff",), (col,), fn, lookback=period)
+
+
+def _rolling_nodes(window: int) -> List[FeatureNode]:
+    m, s = f"close_roll_mean_{window}", f"close_roll_std_{window}"
+    return [
+        FeatureNode(m, ("close",), (m,),
+                    lambda env: {m: env["close"].rolling(window=window, min_periods=window).mean()},
+                    lookback=window, keep=False),
+        FeatureNode(s, ("close",), (s,),
+                    lambda env: {s: env["close"].rolling(window=window, min_periods=window).std(ddof=0)},
+                    lookback=window, keep=False),
+    ]
+
+
+def _bb_node(window: int, num_std: float) -> FeatureNode:
+    m, s = f"close_roll_mean_{window}", f"close_roll_std_{window}"
+
+    def fn(env):
+        bb = bollinger_bands(env[m], env[s], num_std)
+        return {"bb_mid": bb["mid"], "bb_up": bb["up"], "bb_low": bb["low"], "bb_width": bb["width"]}
+    return FeatureNode("bb", (m, s), ("bb_mid", "bb_up", "bb_low", "bb_width"), fn, lookback=window)
+
+
+def _vwap_node(session: str, tz: str, starts, bands, anchor_col) -> FeatureNode:
+    outputs = ("vwap", *band_cols("vwap", bands))
+    inputs = ("high", "low", "close", "volume", "ts") + ((anchor_col,) if anchor_col else ())
+
+    def fn(env):
+        cols = [c for c in env.df.columns
+                if c in ("high", "low", "close", "volume", "start_iso", "start_ms", "ts", anchor_col)]
+        tmp = add_vwap(env.df[cols].copy(), col_name="vwap", session=session, tz=tz, starts=starts,
+                       bands=bands, anchors=anchor_col if anchor_col in env.df.columns else None)
+        return {c: tmp[c] for c in outputs}
+    return FeatureNode("vwap", inputs, outputs, fn, lookback=1)
+
+
+def _technical_nodes(ema_pairs, vwap_on_tol_pct: float, bb_window: int, bb_num_std: float) -> List[FeatureNode]:
+    # ייבוא מאוחר: technical_analysis תלוי ב-indicator, לא להפך
+    from technical_analysis.vwap_technical import vwap_update
+    from technical_analysis.bb_technical import bb_update
+    from technical_analysis.ema_technical import ema_update
+    from technical_analysis.candle_technical import candle_technical_update
+
+    def _call(update, inputs, outputs, **kw):
+        def fn(env):
+            tmp = pd.DataFrame({c: env[c] for c in inputs})
+            tmp = update(tmp, mode="batch", **kw)
+            return {c: tmp[c] for c in outputs if c in tmp.columns}
+        return fn
+
+    nodes = [
+        FeatureNode("vwap_tech", ("close", "vwap"), ("vwap_status", "vwap_dist_pct", "vwap_score"),
+                    _call(vwap_update, ("close", "vwap"), ("vwap_status", "vwap_dist_pct", "vwap_score"),
+                          on_tol_pct=vwap_on_tol_pct), lookback=2, group="technical"),
+        FeatureNode("bb_tech", ("close", "bb_mid", "bb_up", "bb_low"), ("bb_status", "bb_score"),
+                    _call(bb_update, ("close", "bb_mid", "bb_up", "bb_low", "bb_width"), ("bb_status", "bb_score"),
+                          window=bb_window, num_std=bb_num_std), lookback=bb_window, group="technical"),
+        FeatureNode("candle_tech", ("open", "high", "low", "close"), ("candle_pattern", "candle_pattern_multi"),
+                    _call(candle_technical_update, ("open", "high", "low", "close"),
+                          ("candle_pattern", "candle_pattern_multi")), lookback=3, group="technical"),
+    ]
+    for fast, slow in ema_pairs:
+        fc, sc = ema_col(fast), ema_col(slow)
+        pair_out = (f"ema_pair_status_{fast}_{slow}", f"ema_pair_abs_diff_{fast}_{slow}",
+                    f"ema_pair_spread_pct_{fast}_{slow}", f"ema_pair_score_{fast}_{slow}")
+        nodes.append(FeatureNode(
+            f"ema_pair_tech_{fast}_{slow}", (fc, sc), pair_out,
+            _call(ema_update, (fc, sc, "close"), pair_out, ema_col=None, ema_fast_col=fc, ema_slow_col=sc,
+                  pair_status_col=pair_out[0], pair_abs_col=pair_out[1],
+                  pair_pct_col=pair_out[2], pair_score_col=pair_out[3]),
+            lookback=2, group="technical"))
+        single_out = (f"ema_status_{slow}", f"ema_dist_pct_{slow}", f"ema_score_{slow}")
+        nodes.append(FeatureNode(
+            f"ema_tech_{slow}", ("close", sc), single_out,
+            _call(ema_update, ("close", sc), single_out, ema_col=sc, ema_fast_col=None, ema_slow_col=None,
+                  status_col=single_out[0], dist_col=single_out[1], score_col=single_out[2], on_tol_pct=0.02),
+            lookback=2, group="technical"))
+    return nodes
+
+
+# ---------- קומפילציה מהקונפיג ----------
+def plan_config(settings: Optional[Mapping] = None) -> Dict:
+    """הערכים שמהם נבנית התוכנית (settings מפורש, או CFG)."""
+    def get(path, default):
+        if settings is None:
+            return CFG(path, default)
+        cur = settings
+        for part in path.split("."):
+            if not isinstance(cur, Mapping) or part not in cur:
+                return default
+            cur = cur[part]
+        return cur
+    return {
+        "ema_periods": tuple(int(p) for p in get("indicators.ema_periods", [5, 12, 21])),
+        "rsi_periods": tuple(int(p) for p in get("indicators.rsi_periods", [14])),
+        "bb_window": int(get("indicators.bb_window", 20)),
+        "bb_num_std": float(get("indicators.bb_num_std", 2.0)),
+        "vwap": bool(get("indicators.vwap", True)),
+        "vwap_session": str(get("indicators.vwap_session", "day")),
+        "vwap_tz": str(get("indicators.vwap_tz", "UTC")),
+        "vwap_session_starts": tuple(get("indicators.vwap_session_starts", ["00:00"]) or ["00:00"]),
+        "vwap_bands": tuple(float(k) for k in (get("indicators.vwap_bands", []) or [])),
+        "vwap_anchor_col": get("indicators.vwap_anchor_col", None),
+        "ema_pairs": tuple((int(f), int(s)) for f, s in get("technical.ema_pairs", [(12, 21)])),
+        "vwap_on_tol_pct": float(get("technical.vwap_on_tol_pct", 0.02)),
+        "tech_bb_window": int(get("technical.bb_window", 20)),
+        "tech_bb_num_std": float(get("technical.bb_num_std", 2.0)),
+    }
+
+
+def compile_plan(settings: Optional[Mapping] = None) -> FeaturePlan:
+    cfg = plan_config(settings)
+    nodes: List[FeatureNode] = []
+    # EMA: תקופות האינדיקטורים + כל מה שזוגות הטכניקל צריכים
+    periods = list(cfg["ema_periods"]) + [p for pair in cfg["ema_pairs"] for p in pair]
+    nodes += [_ema_node(p) for p in dict.fromkeys(periods)]
+
+    if cfg["rsi_periods"]:
+        nodes.append(FeatureNode("close_diff", ("close",), ("close_diff",),
+                                 lambda env: {"close_diff": env["close"].diff()}, lookback=2, keep=False))
+        default_rsi = cfg["rsi_periods"][0]
+        nodes += [_rsi_node(p, 14 if 14 in cfg["rsi_periods"] else default_rsi) for p in cfg["rsi_periods"]]
+
+    nodes += _rolling_nodes(cfg["bb_window"])
+    nodes.append(_bb_node(cfg["bb_window"], cfg["bb_num_std"]))
+    if cfg["vwap"]:
+        nodes.append(_vwap_node(cfg["vwap_session"], cfg["vwap_tz"], cfg["vwap_session_starts"],
+                                cfg["vwap_bands"], cfg["vwap_anchor_col"]))
+
+    nodes += _technical_nodes(cfg["ema_pairs"], cfg["vwap_on_tol_pct"], cfg["tech_bb_window"], cfg["tech_bb_num_std"])
+    return FeaturePlan(nodes)
+
+
+_PLANS: Dict[Tuple, FeaturePlan] = {}
+
+
+def get_plan(settings: Optional[Mapping] = None) -> FeaturePlan:
+    """תוכנית מקומפלת אחת לכל קונפיג (cache לפי הערכים עצמם)."""
+    key = tuple(sorted(plan_config(settings).items()))
+    plan = _PLANS.get(key)
+    if plan is None:
+        plan = _PLANS[key] = compile_plan(settings)
+    return plan
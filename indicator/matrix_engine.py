@@ -0,0 +1,308 @@
+# indicator/matrix_engine.py
+# מנוע אינדיקטורים batch על מטריצות symbols × time (למחקר ולבקפיל של הרבה סימבולים):
+# EMA (כמה תקופות בבת אחת), RSI, BB ו-VWAP כפעולות NumPy דו-ממדיות, בצ'אנקים לאורך הזמן
+# (זיכרון חסום ב-S × chunk), עם מצב שעובר מצ'אנק לצ'אנק. התוצאה מפוזרת חזרה לפריימים לפי סימבול
+# באותם שמות עמודות כמו indicator/ (ema_col / rsi_col / band_cols) ובאותם ערכים עד שגיאת עיגול.
+#   • EMA/RSI (adjust=False): הרקורסיה בצורה סגורה בתוך בלוק – y_t = D_t·(y₀ + Σ a·x_i / D_i),
+#     D = cumprod של (1-a) – בלי לולאת פייתון על הזמן; אורך הבלוק חסום כך ש-D לא יורד מתחת ל-1e-200.
+#   • BB: חלון מתגלגל דרך sliding_window_view על הצ'אנק + w-1 העמודות הקודמות (std בשני מעברים, לא cumsum של x²).
+#   • VWAP: cumsum מפולח לפי סשן (session_keys של vwap.py) – היסט בתחילת כל סשן, ffill לאורך הזמן;
+#     הסכומים סביב מחיר ייחוס לסימבול, כך שהחיסור לא מאבד את השונות (vwap_std).
+# NaN במטריצה = אין נר: EMA/RSI ממשיכים מהנר הקודם של אותו סימבול, חלון BB שמכיל חור הוא NaN.
+# stack_frames מיישר לפי מיקום (השורה ה-i של כל סימבול בעמודה i, ריפוד NaN בסוף) – כך אין חורים
+# והתוצאה זהה ל-add_all_indicators על כל פריים בנפרד.
+
+from __future__ import annotations
+import math
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from indicator.feature_plan import ema_col, rsi_col, plan_config
+from indicator.vwap import session_keys, bar_time_ms, band_cols
+
+_NO_KEY = np.iinfo(np.int64).min
+
+
+def _ffill_idx(valid: np.ndarray) -> np.ndarray:
+    """לכל (s, t) – האינדקס האחרון ≤ t שבו valid (‎-1 אם אין)."""
+    idx = np.where(valid, np.arange(valid.shape[-1]), -1)
+    return np.maximum.accumulate(idx, axis=-1)
+
+
+def _block_len(alpha: float) -> int:
+    """אורך בלוק מקסימלי כך ש-(1-a)^L ≥ 1e-200."""
+    if alpha <= 0.0:
+        return 1 << 30
+    return max(1, int(200.0 * math.log(10.0) / -math.log1p(-alpha)))
+
+
+def ewm_2d(x: np.ndarray, alphas: np.ndarray, state: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ewm(adjust=False) לאורך הציר האחרון, לכל alpha בבת אחת.
+    x: (S, L); alphas: (K,); state: (K, S) – הערך האחרון מהצ'אנק הקודם (NaN = עוד אין).
+    → (y (K, S, L) עם NaN בעמדות בלי נר, state חדש).
+    """
+    alphas = np.asarray(alphas, dtype=float)
+    k, (s, n) = len(alphas), x.shape
+    out = np.full((k, s, n), np.nan)
+    state = state.copy()
+    step = min(_block_len(float(alphas[alphas < 1.0].max(initial=0.0))), n) if n else 1
+    a = alphas[:, None, None]
+    for lo in range(0, n, step):
+        xb = x[:, lo:lo + step]
+        valid = np.isfinite(xb)
+        # סימבול בלי היסטוריה מתחיל מהערך הראשון שלו (כמו pandas: y₀ = x₀)
+        first = xb[np.arange(s), np.argmax(valid, axis=1)]
+        seed = np.where(np.isnan(state) & valid.any(axis=1), first, state)
+        d = np.where(valid, 1.0 - a, 1.0)
+        D = np.cumprod(d, axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            y = D * (seed[..., None] + np.cumsum(np.where(valid, a * xb, 0.0) / D, axis=-1))
+        if (alphas >= 1.0).any():
+            # a=1 (span 1): D מתאפס – y = הערך האחרון עם נר
+            ff = _ffill_idx(valid)
+            last = np.where(ff >= 0, np.take_along_axis(xb, np.maximum(ff, 0), axis=1), state[..., None])
+            y = np.where((alphas >= 1.0)[:, None, None], last, y)
+        state = y[..., -1]
+        out[..., lo:lo + step] = np.where(valid, y, np.nan)
+    return out, state
+
+
+class MatrixIndicatorEngine:
+    """
+    run(close, high, low, volume, bar_ms, anchors) → {עמודה: מטריצה (S, T)}.
+    הפרמטרים כמו בתוכנית של feature_plan (matrix_engine_from_config) – אותם שמות עמודות.
+    """
+
+    def __init__(
+        self,
+        *,
+        ema_periods: Sequence[int] = (5, 12, 21),
+        rsi_periods: Sequence[int] = (14,),
+        bb_window: int = 20,
+        bb_num_std: float = 2.0,
+        vwap: bool = True,
+        vwap_session: str = "day",
+        vwap_tz: str = "UTC",
+        vwap_session_starts: Sequence[str] = ("00:00",),
+        vwap_bands: Sequence[float] = (),
+        chunk: int = 512,
+    ):
+        self.ema_periods = [int(p) for p in dict.fromkeys(ema_periods)]
+        self.rsi_periods = [int(p) for p in dict.fromkeys(rsi_periods)]
+        self._rsi_default = 14 if 14 in self.rsi_periods else (self.rsi_periods[0] if self.rsi_periods else 14)
+        self.bb_window = int(bb_window)
+        self.bb_num_std = float(bb_num_std)
+        self.vwap = bool(vwap)
+        self.vwap_session = vwap_session
+        self.vwap_tz = vwap_tz
+        self.vwap_session_starts = tuple(vwap_session_starts)
+        self.vwap_bands = [float(k) for k in vwap_bands]
+        self.chunk = max(int(chunk), 1)
+
+    def columns(self) -> List[str]:
+        cols = [ema_col(p) for p in self.ema_periods]
+        cols += [rsi_col(p, self._rsi_default) for p in self.rsi_periods]
+        cols += ["bb_mid", "bb_up", "bb_low", "bb_width"]
+        if self.vwap:
+            cols += ["vwap", *band_cols("vwap", self.vwap_bands)]
+        return cols
+
+    def run(
+        self,
+        close: np.ndarray,
+        high: Optional[np.ndarray] = None,
+        low: Optional[np.ndarray] = None,
+        volume: Optional[np.ndarray] = None,
+        bar_ms: Optional[np.ndarray] = None,
+        anchors: Optional[np.ndarray] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        close/high/low/volume: (S, T) float, NaN = אין נר. bar_ms: (S, T) int64 – זמן הנר לשיוך סשן
+        (bar_time_ms), נדרש ל-VWAP. anchors: (S, T) bool – עוגני VWAP (אופציונלי).
+        """
+        close = np.asarray(close, dtype=float)
+        s, t = close.shape
+        do_vwap = self.vwap and high is not None and low is not None and volume is not None and bar_ms is not None
+        out = {c: np.full((s, t), np.nan) for c in self.columns() if do_vwap or not c.startswith("vwap")}
+
+        ema_alpha = np.array([2.0 / (p + 1.0) for p in self.ema_periods])
+        ema_state = np.full((len(ema_alpha), s), np.nan)
+        rsi_state = {p: np.full((1, 2 * s), np.nan) for p in self.rsi_periods}
+        last_close = np.full(s, np.nan)
+        halo = np.full((s, max(self.bb_window - 1, 0)), np.nan)
+        vw_key = np.full(s, _NO_KEY, dtype=np.int64)
+        vw_sums = np.zeros((3, s))
+        # VWAP נצבר סביב מחיר ייחוס קבוע לכל סימבול (ה-close הראשון) – השונות לא נבלעת בעיגול של tp²·v
+        has = np.isfinite(close).any(axis=1)
+        vw_ref = np.where(has, close[np.arange(s), np.argmax(np.isfinite(close), axis=1)], 0.0)
+
+        for lo in range(0, t, self.chunk):
+            hi = min(lo + self.chunk, t)
+            c = close[:, lo:hi]
+            valid = np.isfinite(c)
+
+            if len(ema_alpha):
+                y, ema_state = ewm_2d(c, ema_alpha, ema_state)
+                for i, p in enumerate(self.ema_periods):
+                    out[ema_col(p)][:, lo:hi] = y[i]
+
+            if self.rsi_periods:
+                # delta מול הנר הקודם של אותו סימבול (גם מעבר לגבול הצ'אנק)
+                ff = _ffill_idx(valid)
+                filled = np.where(ff >= 0, np.take_along_axis(c, np.maximum(ff, 0), axis=1), last_close[:, None])
+                prev = np.concatenate([last_close[:, None], filled[:, :-1]], axis=1)
+                delta = np.where(valid, c - prev, np.nan)
+                last_close = filled[:, -1]
+                gain = np.where(np.isfinite(delta), np.maximum(delta, 0.0), np.nan)
+                loss = np.where(np.isfinite(delta), np.maximum(-delta, 0.0), np.nan)
+                gl = np.concatenate([gain, loss])  # (2S, L): gain ו-loss באותה קריאה
+                for p in self.rsi_periods:
+                    y, rsi_state[p] = ewm_2d(gl, np.array([1.0 / p]), rsi_state[p])
+                    g, l = y[0, :s], y[0, s:]
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        rs = g / np.where(l == 0, np.nan, l)
+                        rsi = 100.0 - 100.0 / (1.0 + rs)
+                    out[rsi_col(p, self._rsi_default)][:, lo:hi] = np.where(
+                        valid, np.where(np.isfinite(rsi), rsi, 50.0), np.nan)
+
+            self._bb(c, halo, out, lo, hi)
+            if self.bb_window > 1:
+                halo = np.concatenate([halo, c], axis=1)[:, -(self.bb_window - 1):]
+
+            if do_vwap:
+                vw_key, vw_sums = self._vwap(
+                    np.asarray(high[:, lo:hi], dtype=float), np.asarray(low[:, lo:hi], dtype=float), c,
+                    np.asarray(volume[:, lo:hi], dtype=float), np.asarray(bar_ms[:, lo:hi], dtype=np.int64), valid,
+                    None if anchors is None else np.asarray(anchors[:, lo:hi], dtype=bool),
+                    vw_key, vw_sums, vw_ref, out, lo, hi)
+        return out
+
+    def _bb(self, c: np.ndarray, halo: np.ndarray, out: Dict[str, np.ndarray], lo: int, hi: int) -> None:
+        w = self.bb_window
+        win = sliding_window_view(np.concatenate([halo, c], axis=1), w, axis=1)  # (S, L, w)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mid = win.mean(axis=-1)
+            dev = win - mid[..., None]
+            std = np.sqrt(np.einsum("slw,slw->sl", dev, dev) / w)  # ddof=0 כמו add_bollinger
+            up = mid + self.bb_num_std * std
+            low = mid - self.bb_num_std * std
+            width = (up - low) / mid * 100.0
+        valid = np.isfinite(c)
+        out["bb_mid"][:, lo:hi] = np.where(valid, mid, np.nan)
+        out["bb_up"][:, lo:hi] = np.where(valid, up, np.nan)
+        out["bb_low"][:, lo:hi] = np.where(valid, low, np.nan)
+        out["bb_width"][:, lo:hi] = np.where(valid & np.isfinite(width), width, np.nan)
+
+    def _vwap(self, h, l, c, v, bar_ms, valid, anchors, key_state, sums, ref, out, lo, hi):
+        s, n = c.shape
+        key = session_keys(np.where(valid, bar_ms, 0).ravel(), session=self.vwap_session, tz=self.vwap_tz,
+                           starts=self.vwap_session_starts).reshape(s, n)
+        # עמדה בלי נר לא פותחת סשן – יורשת את המפתח הקודם
+        ff = _ffill_idx(valid)
+        key = np.where(ff >= 0, np.take_along_axis(key, np.maximum(ff, 0), axis=1), key_state[:, None])
+        prev = np.concatenate([key_state[:, None], key[:, :-1]], axis=1)
+        new = key != prev
+        if anchors is not None:
+            new |= anchors & valid
+
+        tp = (h + l + c) / 3.0
+        ok = valid & np.isfinite(tp) & np.isfinite(v)
+        dp = tp - ref[:, None]
+        parts = np.stack([np.where(ok, dp * v, 0.0), np.where(ok, v, 0.0), np.where(ok, dp * dp * v, 0.0)])
+        raw = np.cumsum(parts, axis=-1)
+        # היסט: בתחילת סשן = הסכום שלפניו; לפני תחילת הסשן הראשון בצ'אנק = -סכומי הסשן הנמשך
+        start = _ffill_idx(new)
+        at = np.take_along_axis(raw - parts, np.maximum(start, 0)[None].repeat(3, axis=0), axis=-1)
+        cum = raw - np.where(start[None] >= 0, at, -sums[..., None])
+        cum_dpv, cum_v, cum_dpv2 = cum
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            good = ok & (cum_v > 0)
+            mean_dp = np.where(good, cum_dpv / np.where(good, cum_v, 1.0), np.nan)
+            vwap = ref[:, None] + mean_dp
+            var = np.where(good, cum_dpv2 / np.where(good, cum_v, 1.0) - mean_dp * mean_dp, np.nan)
+        out["vwap"][:, lo:hi] = vwap
+        if self.vwap_bands:
+            std = np.sqrt(np.maximum(var, 0.0))
+            out["vwap_std"][:, lo:hi] = std
+            for k in self.vwap_bands:
+                out[f"vwap_up_{k:g}"][:, lo:hi] = vwap + k * std
+                out[f"vwap_low_{k:g}"][:, lo:hi] = vwap - k * std
+        return key[:, -1], cum[..., -1]
+
+
+def matrix_engine_from_config(settings: Optional[Mapping] = None, *, chunk: Optional[int] = None) -> MatrixIndicatorEngine:
+    """אותם פרמטרים כמו תוכנית האינדיקטורים (כולל תקופות ה-EMA שזוגות הטכניקל צריכים)."""
+    cfg = plan_config(settings)
+    if chunk is None:
+        from core.settings_manager import CFG
+        chunk = int(CFG("indicators.matrix_chunk", 512))
+    return MatrixIndicatorEngine(
+        ema_periods=list(cfg["ema_periods"]) + [p for pair in cfg["ema_pairs"] for p in pair],
+        rsi_periods=cfg["rsi_periods"],
+        bb_window=cfg["bb_window"],
+        bb_num_std=cfg["bb_num_std"],
+        vwap=cfg["vwap"],
+        vwap_session=cfg["vwap_session"],
+        vwap_tz=cfg["vwap_tz"],
+        vwap_session_starts=cfg["vwap_session_starts"],
+        vwap_bands=cfg["vwap_bands"],
+        chunk=chunk,
+    )
+
+
+def stack_frames(
+    frames: Mapping[str, pd.DataFrame],
+    anchor_col: Optional[str] = None,
+) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    {symbol: df} → (סדר הסימבולים, {"close","high","low","volume","bar_ms"[,"anchors"]: (S, T)}),
+    מיושר לפי מיקום: T = האורך המקסימלי, ריפוד NaN בסוף.
+    """
+    symbols = list(frames)
+    t = max((len(df) for df in frames.values()), default=0)
+    mats = {c: np.full((len(symbols), t), np.nan) for c in ("close", "high", "low", "volume")}
+    mats["bar_ms"] = np.zeros((len(symbols), t), dtype=np.int64)
+    if anchor_col:
+        mats["anchors"] = np.zeros((len(symbols), t), dtype=bool)
+    for i, sym in enumerate(symbols):
+        df = frames[sym]
+        n = len(df)
+        if not n:
+            continue
+        for c in ("close", "high", "low", "volume"):
+            if c in df.columns:
+                mats[c][i, :n] = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+        if any(c in df.columns for c in ("ts", "start_iso", "start_ms")):
+            mats["bar_ms"][i, :n] = bar_time_ms(df)
+        if anchor_col and anchor_col in df.columns:
+            mats["anchors"][i, :n] = pd.Series(df[anchor_col]).fillna(False).astype(bool).to_numpy()
+    return symbols, mats
+
+
+def add_indicators_matrix(
+    frames: Mapping[str, pd.DataFrame],
+    engine: Optional[MatrixIndicatorEngine] = None,
+    anchor_col: Optional[str] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    כמו add_all_indicators לכל פריים, בריצה אחת על כל הסימבולים → {symbol: df עם עמודות האינדיקטורים}.
+    פריימים חדשים (concat אחד לסימבול – הוספת עמודות אחת-אחת לפריים היא רוב הזמן כשיש מאות סימבולים).
+    """
+    if engine is None:
+        engine = matrix_engine_from_config()
+        if anchor_col is None:
+            anchor_col = plan_config()["vwap_anchor_col"]
+    symbols, m = stack_frames(frames, anchor_col)
+    res = engine.run(m["close"], m["high"], m["low"], m["volume"], m["bar_ms"], m.get("anchors"))
+    out: Dict[str, pd.DataFrame] = {}
+    for i, sym in enumerate(symbols):
+        df = frames[sym]
+        n = len(df)
+        new = pd.DataFrame({c: mat[i, :n] for c, mat in res.items()}, index=df.index)
+        out[sym] = pd.concat([df.drop(columns=[c for c in res if c in df.columns]), new], axis=1)
+    return out
@@ -1,11 +1,9 @@
 import pandas as pd
 import numpy as np
-def add_rsi(df: pd.DataFrame, period: int = 14, col_name: str = 'rsi') -> pd.DataFrame:
-    """
-    RSI לפי הגדרה סטנדרטית (Wilder).
-    """
-    delta = df['close'].diff()
 
+
+def rsi_from_diff(delta: pd.Series, period: int = 14) -> pd.Series:
+    """RSI מ-close.diff() מוכן (כך שתוכנית הפיצ'רים משתפת את ה-diff בין כמה תקופות)."""
     gain = delta.clip(lower=0.0)
     loss = -delta.clip(upper=0.0)
 
@@ -15,5 +13,12 @@ def add_rsi(df: pd.DataFrame, period: int = 14, col_name: str = 'rsi') -> pd.Dat
 
     rs = avg_gain / (avg_loss.replace(0, np.nan))
     rsi = 100 - (100 / (1 + rs))
-    df[col_name] = rsi.fillna(50.0)  # התחלה ניטרלית
-    return df
\ No newline at end of file
+    return rsi.fillna(50.0)  # התחלה ניטרלית
+
+
+def add_rsi(df: pd.DataFrame, period: int = 14, col_name: str = 'rsi') -> pd.DataFrame:
+    """
+    RSI לפי הגדרה סטנדרטית (Wilder).
+    """
+    df[col_name] = rsi_from_diff(df['close'].diff(), period)
+    return df
@@ -1,14 +1,29 @@
-from indicator.ema import add_ema
-from indicator.rsi import add_rsi
-from indicator.bb import add_bollinger
-from indicator.vwap import add_vwap_daily  # ← ה־VWAP היומי החדש
-
-def add_all_indicators(df):
-    df = add_ema(df, 5)
-    df = add_ema(df, 12)
-    df = add_ema(df, 21)
-    df = add_rsi(df, 14)
-    df = add_bollinger(df)
-    df = add_vwap_daily(df, col_name="vwap", tz="UTC")  # ← VWAP מתאפס כל יום
-    return df
+from indicator.vwap import VwapStream  # VWAP לפי סשן: stream (ה-batch בתוכנית)
+from indicator.feature_plan import get_plan
 
+def add_all_indicators(df, *, changed=None, provided=()):
+    """
+    האינדיקטורים לפי התוכנית המקומפלת מ-config.py ("indicators" + ה-EMA שהטכניקל צריך).
+    changed – אילו עמודות השתנו (None = הכול); עמודות פלט חסרות מחושבות תמיד.
+    provided – עמודות שכבר מולאו בשורה מ-stream (VWAP) – לא מחושבות מחדש על כל הטבלה.
+    """
+    return get_plan().run(df, changed=changed, group="indicators", provided=provided)
+
+
+def vwap_stream_from_config():
+    """VwapStream לפי indicators.vwap_* (None אם VWAP כבוי)."""
+    from core.settings_manager import CFG
+    if not CFG("indicators.vwap", True):
+        return None
+    return VwapStream(
+        col_name="vwap",
+        session=CFG("indicators.vwap_session", "day"),
+        tz=CFG("indicators.vwap_tz", "UTC"),
+        starts=CFG("indicators.vwap_session_starts", ["00:00"]) or ["00:00"],
+        bands=CFG("indicators.vwap_bands", []) or [],
+        anchor_col=CFG("indicators.vwap_anchor_col", None),
+    )
+
+def add_all_features(df, *, changed=None):
+    """אינדיקטורים + טכניקל (batch) מאותה תוכנית – לבקפיל היסטוריה."""
+    return get_plan().run(df, changed=changed)
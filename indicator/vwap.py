@@ -1,40 +1,257 @@
+import bisect
+from typing import Any, Dict, Iterable, Optional, Sequence, Union
+
 import pandas as pd
 import numpy as np
 
+# VWAP לפי סשנים: סכומים מצטברים של TP·vol, vol ו-TP²·vol מתאפסים בכל תחילת סשן.
+#   session="day"      – יום ב-tz, עם רשימת שעות פתיחה ("00:00" בלבד = יום קלנדרי; "00:00","08:00","16:00" = 3 סשנים)
+#   session="anchored" – בלי איפוס לפי זמן; מתאפס רק בעוגן (anchor=True – למשל swing high)
+# עוגן מתאפס גם ב-"day". הנר שסומן כעוגן הוא הנר הראשון בסשן החדש.
+# זמן הנר לצורך השיוך לסשן: start_ms/start_iso אם יש, אחרת ts-1ms (ts = סגירת הנר),
+# כך שנר שנסגר בדיוק בחצות שייך ליום הקודם.
+# VwapStream (O(1) לנר) ו-add_vwap (batch לבקפיל) נותנים תוצאה זהה לכל נר.
+
+DAY_MS = 86_400_000
+
+
+def _parse_starts(starts: Iterable[str]) -> list:
+    """["00:00", "13:30"] → [0, 48600000] (ms מתחילת היום, ממוין)."""
+    out = []
+    for s in starts:
+        hh, mm = str(s).split(":")[:2]
+        out.append((int(hh) * 60 + int(mm)) * 60_000)
+    if not out:
+        raise ValueError("נדרשת לפחות שעת פתיחה אחת לסשן")
+    return sorted(set(out))
+
+
+def _local_ms(ts_ms: np.ndarray, tz: str) -> np.ndarray:
+    if tz in ("UTC", "utc", None):
+        return ts_ms
+    local = pd.to_datetime(ts_ms, unit="ms", utc=True).tz_convert(tz).tz_localize(None)
+    return np.asarray(local.as_unit("ms").asi8, dtype=np.int64)
+
+
+def session_keys(ts_ms, *, session: str = "day", tz: str = "UTC",
+                 starts: Sequence[str] = ("00:00",)) -> np.ndarray:
+    """מזהה סשן (int64) לכל זמן נר. "anchored" → 0 לכולם (איפוס רק מעוגנים)."""
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    if session == "anchored":
+        return np.zeros(len(ts_ms), dtype=np.int64)
+    if session != "day":
+        raise ValueError("session must be 'day' or 'anchored'")
+    st = np.asarray(_parse_starts(starts), dtype=np.int64)
+    local = _local_ms(ts_ms, tz)
+    day, tod = np.divmod(local, DAY_MS)
+    idx = np.searchsorted(st, tod, side="right") - 1
+    day = np.where(idx < 0, day - 1, day)       # לפני הפתיחה הראשונה → הסשן האחרון של אתמול
+    idx = np.where(idx < 0, len(st) - 1, idx)
+    return day * len(st) + idx
+
+
+def bar_time_ms(df: pd.DataFrame) -> np.ndarray:
+    """זמן הנר לשיוך סשן: start_iso / start_ms, אחרת ts-1ms."""
+    if "start_iso" in df.columns:
+        t = pd.to_datetime(df["start_iso"], utc=True)
+    elif "start_ms" in df.columns:
+        return pd.to_numeric(df["start_ms"], errors="coerce").to_numpy(dtype=np.int64)
+    elif "ts" in df.columns:
+        ts = df["ts"]
+        if not isinstance(ts.dtype, pd.DatetimeTZDtype):  # כבר UTC-aware → בלי to_datetime (איטי על Series גדול)
+            ts = pd.to_datetime(ts, utc=True)
+        return np.asarray(ts.dt.as_unit("ms").astype("int64"), dtype=np.int64) - 1
+    else:
+        raise ValueError("נדרש ts, start_iso או start_ms לחישוב VWAP לפי סשן")
+    return np.asarray(t.dt.as_unit("ms").astype("int64"), dtype=np.int64)
+
+
+def band_cols(col_name: str, bands: Iterable[float]) -> list:
+    """שמות עמודות הרצועות: vwap_std, vwap_up_1, vwap_low_1, vwap_up_2 ..."""
+    bands = list(bands)
+    if not bands:
+        return []
+    out = [f"{col_name}_std"]
+    for k in bands:
+        out += [f"{col_name}_up_{float(k):g}", f"{col_name}_low_{float(k):g}"]
+    return out
+
+
+def _outputs(col_name: str, bands: Sequence[float], vwap, var) -> Dict[str, Any]:
+    out = {col_name: vwap}
+    if bands:
+        std = np.sqrt(np.maximum(var, 0.0))
+        out[f"{col_name}_std"] = std
+        for k in bands:
+            out[f"{col_name}_up_{float(k):g}"] = vwap + float(k) * std
+            out[f"{col_name}_low_{float(k):g}"] = vwap - float(k) * std
+    return out
+
+
+def add_vwap(
+    df: pd.DataFrame,
+    *,
+    col_name: str = "vwap",
+    session: str = "day",
+    tz: str = "UTC",
+    starts: Sequence[str] = ("00:00",),
+    bands: Sequence[float] = (),
+    anchors: Union[None, str, pd.Series, np.ndarray] = None,
+) -> pd.DataFrame:
+    """
+    VWAP לפי סשן (batch – לבקפיל). זהה לנר-לנר ל-VwapStream.update על אותם נרות.
+    anchors – עמודה/מסכה בוליאנית: True = הסשן מתחיל מחדש בנר הזה.
+    bands – מכפילי סטיית תקן משוקללת-נפח: (1, 2) → vwap_std, vwap_up_1/low_1, vwap_up_2/low_2.
+    """
+    if df.empty:
+        return df
+
+    key = session_keys(bar_time_ms(df), session=session, tz=tz, starts=starts)
+    if anchors is not None:
+        a = df[anchors] if isinstance(anchors, str) else anchors
+        a = np.asarray(pd.Series(a).fillna(False).astype(bool), dtype=bool)
+        # מזהה חדש בכל שינוי סשן-זמן או עוגן
+        new = a.copy()
+        new[1:] |= key[1:] != key[:-1]
+        key = np.cumsum(new)
+
+    h = pd.to_numeric(df["high"], errors="coerce").to_numpy(dtype=float)
+    l = pd.to_numeric(df["low"], errors="coerce").to_numpy(dtype=float)
+    c = pd.to_numeric(df["close"], errors="coerce").to_numpy(dtype=float)
+    v = pd.to_numeric(df["volume"], errors="coerce").to_numpy(dtype=float)
+    tp = (h + l + c) / 3.0
+    ok = np.isfinite(tp) & np.isfinite(v)
+
+    parts = np.column_stack([
+        np.where(ok, tp * v, 0.0),
+        np.where(ok, v, 0.0),
+        np.where(ok, tp * tp * v, 0.0),
+    ])
+    # np.cumsum לכל סשן בנפרד (groupby().cumsum של pandas מפצה Kahan – לא זהה לחיבור רציף ב-stream)
+    cum = np.empty_like(parts)
+    edges = np.flatnonzero(key[1:] != key[:-1]) + 1
+    for a, b in zip(np.r_[0, edges], np.r_[edges, len(key)]):
+        cum[a:b] = np.cumsum(parts[a:b], axis=0)
+    cum_pv, cum_v, cum_pv2 = cum[:, 0], cum[:, 1], cum[:, 2]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valid = ok & (cum_v > 0)
+        vwap = np.where(valid, cum_pv / np.where(valid, cum_v, 1.0), np.nan)
+        var = np.where(valid, cum_pv2 / np.where(valid, cum_v, 1.0) - vwap * vwap, np.nan)
+
+    for col, val in _outputs(col_name, list(bands), vwap, var).items():
+        df[col] = val
+    return df
+
+
 def add_vwap_daily(df: pd.DataFrame, col_name: str = "vwap", tz: str = "UTC") -> pd.DataFrame:
     """
     מחשב VWAP יומי: לכל יום קלנדרי באזור זמן tz נעשה cumsum מחדש.
     מתאים לקריפטו: יום = 00:00 לפי tz (ברירת מחדל UTC).
-    הנחות: df מכיל עמודות: high, low, close, volume וגם start_iso או start_ms.
+    הנחות: df מכיל עמודות: high, low, close, volume וגם ts (או start_iso / start_ms).
     """
-    if df.empty:
-        return df
+    return add_vwap(df, col_name=col_name, session="day", tz=tz)
 
-    # זיהוי ציר הזמן (מעדיף start_iso; אם אין – משתמש ב-start_ms)
-    if "start_iso" in df.columns:
-        t = pd.to_datetime(df["start_iso"], utc=True).dt.tz_convert(tz)
-    elif "start_ms" in df.columns:
-        t = pd.to_datetime(df["start_ms"], unit="ms", utc=True).dt.tz_convert(tz)
-    else:
-        raise ValueError("נדרש start_iso או start_ms לחישוב VWAP יומי")
 
-    # מפתח סשן יומי (מתאפס כל חצות ב-tz)
-    session_key = t.dt.date
+class VwapStream:
+    """
+    VWAP לפי סשן בזמן אמת: update() לכל נר שנסגר, O(1) – סכומים מצטברים בלבד.
+    אותו key פעמיים ברצף (amend של הנר האחרון) → חוזרים למצב שלפני הנר ומחשבים מחדש.
+    """
+
+    def __init__(
+        self,
+        *,
+        col_name: str = "vwap",
+        session: str = "day",
+        tz: str = "UTC",
+        starts: Sequence[str] = ("00:00",),
+        bands: Sequence[float] = (),
+        anchor_col: Optional[str] = None,
+    ):
+        if session not in ("day", "anchored"):
+            raise ValueError("session must be 'day' or 'anchored'")
+        self.col_name = col_name
+        self.session = session
+        self.tz = tz
+        self.starts = tuple(starts)
+        self.bands = [float(k) for k in bands]
+        self.anchor_col = anchor_col   # עמודה בוליאנית בשורה שמסמנת עוגן (ל-bootstrap ולמי שקורא ל-update)
+        self._starts_ms = _parse_starts(self.starts)
+
+        self._key: Optional[int] = None
+        self._pv = self._v = self._pv2 = 0.0
+        self._saved: Optional[tuple] = None
+        self._last_key: Any = None
+        self.started = False
+
+    def columns(self) -> list:
+        return [self.col_name, *band_cols(self.col_name, self.bands)]
 
-    # מחיר טיפוסי לנר
-    tp = (pd.to_numeric(df["high"], errors="coerce")
-        + pd.to_numeric(df["low"], errors="coerce")
-        + pd.to_numeric(df["close"], errors="coerce")) / 3.0
+    def _session_key(self, t_ms: int) -> int:
+        if self.session == "anchored":
+            return 0
+        local = int(_local_ms(np.asarray([t_ms], dtype=np.int64), self.tz)[0])
+        day, tod = divmod(local, DAY_MS)
+        idx = bisect.bisect_right(self._starts_ms, tod) - 1
+        if idx < 0:
+            day, idx = day - 1, len(self._starts_ms) - 1
+        return day * len(self._starts_ms) + idx
 
-    vol = pd.to_numeric(df["volume"], errors="coerce")
+    def update(self, t_ms: int, high: float, low: float, close: float, volume: float,
+               *, anchor: bool = False, key: Any = None) -> Dict[str, float]:
+        """
+        t_ms – זמן הנר לשיוך סשן (כמו bar_time_ms: start, או ts-1ms).
+        anchor=True – סשן חדש מתחיל בנר הזה. key – מזהה הנר ל-amend (ברירת מחדל t_ms).
+        """
+        key = t_ms if key is None else key
+        if key == self._last_key and self._saved is not None:
+            self._key, self._pv, self._v, self._pv2 = self._saved
+        self._saved = (self._key, self._pv, self._v, self._pv2)
+        self._last_key = key
 
-    # סכומים מצטברים לכל יום בנפרד
-    cum_vol   = vol.groupby(session_key).cumsum()
-    cum_tpvol = (tp * vol).groupby(session_key).cumsum()
+        skey = self._session_key(int(t_ms))
+        if anchor or skey != self._key:
+            self._key, self._pv, self._v, self._pv2 = skey, 0.0, 0.0, 0.0
 
-    # VWAP יומי
-    vwap_daily = cum_tpvol / cum_vol.replace(0, np.nan)
+        tp = (float(high) + float(low) + float(close)) / 3.0
+        v = float(volume)
+        ok = np.isfinite(tp) and np.isfinite(v)
+        if ok:
+            self._pv += tp * v
+            self._v += v
+            self._pv2 += tp * tp * v
+        if ok and self._v > 0:
+            vwap = self._pv / self._v
+            var = self._pv2 / self._v - vwap * vwap
+        else:
+            vwap = var = np.nan
+        return {c: float(x) for c, x in _outputs(self.col_name, self.bands, vwap, var).items()}
 
-    # כתיבה לעמודה
-    df[col_name] = vwap_daily
-    return df
\ No newline at end of file
+    def bootstrap(self, df: pd.DataFrame, anchors: Union[None, str, pd.Series] = None) -> None:
+        """אתחול חד-פעמי מההיסטוריה: הסכומים של הסשן האחרון (מהעוגן האחרון, אם יש) בלבד."""
+        self.started = True
+        if df.empty:
+            return
+        t = bar_time_ms(df)
+        keys = session_keys(t, session=self.session, tz=self.tz, starts=self.starts)
+        a = np.zeros(len(df), dtype=bool)
+        if anchors is None and self.anchor_col and self.anchor_col in df.columns:
+            anchors = self.anchor_col
+        if anchors is not None:
+            s = df[anchors] if isinstance(anchors, str) else anchors
+            a = np.asarray(pd.Series(s).fillna(False).astype(bool), dtype=bool)
+        first = int(np.flatnonzero(keys != keys[-1])[-1] + 1) if (keys != keys[-1]).any() else 0
+        if a[first:].any():
+            first += int(np.flatnonzero(a[first:])[-1])
+        h, l, c, v = (pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)[first:]
+                      for col in ("high", "low", "close", "volume"))
+        tp = (h + l + c) / 3.0
+        ok = np.isfinite(tp) & np.isfinite(v)
+        # cumsum (ולא sum) – אותו סדר חיבור כמו update/add_vwap → תוצאה זהה בביט
+        self._key = int(keys[-1])
+        self._pv = float(np.cumsum(np.where(ok, tp * v, 0.0))[-1])
+        self._v = float(np.cumsum(np.where(ok, v, 0.0))[-1])
+        self._pv2 = float(np.cumsum(np.where(ok, tp * tp * v, 0.0))[-1])
+        self._saved = None
+        self._last_key = None
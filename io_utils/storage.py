@@ -14,6 +14,18 @@ def parquet_path(symbol: str, interval: str) -> Path:
     return base / f"{symbol}_{interval}.parquet"
 
 
+def side_table_path(symbol: str, interval: str, name: str) -> Path:
+    """טבלת צד לצינור (למשל footprint לפי ts של הנר) – data/processed/<symbol>_<interval>_<name>.parquet"""
+    return parquet_path(symbol, interval).with_name(f"{symbol}_{interval}_{name}.parquet")
+
+
+def state_path(symbol: str, name: str) -> Path:
+    """מצב מתמשך של רכיבי stream (סקיצות וכו') – data/state/<symbol>_<name>.json"""
+    base = Path("data/state")
+    base.mkdir(parents=True, exist_ok=True)
+    return base / f"{symbol}_{name}.json"
+
+
 # ─────────────────────────────────────────────────────────────
 # טעינה ושמירה
 def load_df(symbol: str, interval: str) -> pd.DataFrame:
@@ -33,6 +45,58 @@ def save_df(df: pd.DataFrame, symbol: str, interval: str) -> None:
     tmp.replace(p)  # atomic-ish move
 
 
+def side_table_parts_dir(symbol: str, interval: str, name: str) -> Path:
+    """קבצי ה-append של טבלת הצד (part-<n>.parquet) – נדחסים לקובץ הראשי ב-save_side_table."""
+    return side_table_path(symbol, interval, name).with_suffix(".parts")
+
+
+def _side_parts(symbol: str, interval: str, name: str) -> list[Path]:
+    d = side_table_parts_dir(symbol, interval, name)
+    return sorted(d.glob("part-*.parquet")) if d.exists() else []
+
+
+def load_side_table(symbol: str, interval: str, name: str, key: str = "ts") -> Optional[pd.DataFrame]:
+    """הקובץ הראשי + קבצי ה-append; אותו key בכמה קבצים → האחרון (amend) מנצח."""
+    p = side_table_path(symbol, interval, name)
+    frames = [pd.read_parquet(p)] if p.exists() else []
+    parts = _side_parts(symbol, interval, name)
+    frames += [pd.read_parquet(f) for f in parts]
+    if not frames:
+        return None
+    if not parts:
+        return frames[0]
+    df = pd.concat([f for f in frames if not f.empty] or frames[:1], ignore_index=True)
+    if key in df.columns:
+        df = df.drop_duplicates(key, keep="last").sort_values(key, kind="stable").reset_index(drop=True)
+    return df
+
+
+def save_side_table(df: pd.DataFrame, symbol: str, interval: str, name: str) -> None:
+    """כמו save_df – קובץ זמני ואז replace. כתיבה מלאה: קבצי ה-append נמחקים (נדחסו לתוכה)."""
+    p = side_table_path(symbol, interval, name)
+    tmp = p.with_suffix(".parquet.tmp")
+    df.to_parquet(tmp, index=False)
+    tmp.replace(p)
+    for f in _side_parts(symbol, interval, name):
+        f.unlink(missing_ok=True)
+
+
+def append_side_table(df: pd.DataFrame, symbol: str, interval: str, name: str) -> int:
+    """
+    כותב רק את השורות החדשות/המתוקנות כ-part נוסף (בלי לקרוא/לכתוב מחדש את כל הטבלה).
+    מחזיר כמה parts יש עכשיו – הקורא מחליט מתי לדחוס (save_side_table עם הטבלה המלאה).
+    """
+    d = side_table_parts_dir(symbol, interval, name)
+    d.mkdir(parents=True, exist_ok=True)
+    parts = _side_parts(symbol, interval, name)
+    n = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+    p = d / f"part-{n:08d}.parquet"
+    tmp = p.with_suffix(".parquet.tmp")
+    df.to_parquet(tmp, index=False)
+    tmp.replace(p)
+    return len(parts) + 1
+
+
 # ─────────────────────────────────────────────────────────────
 # הוספת שורה/ות
 def append_row(row: Dict[str, Any], symbol: str, interval: str) -> int:
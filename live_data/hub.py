@@ -0,0 +1,171 @@
+# live_data/hub.py
+# Market-data hub: תהליך אחד שמחזיק את חיבורי ה-WS לכל הסימבולים, מפענח פעם אחת,
+# ומפרסם טריידים ועדכוני ספר מנורמלים ל-ring buffers בזיכרון משותף.
+# בוטים (main.py --hub) מתחברים כקוראים – מספר החיבורים ועלות הפענוח לא גדלים עם מספר הבוטים.
+#
+# הרצה:  python -m live_data.hub --symbols BTCUSDT,ETHUSDT
+
+from __future__ import annotations
+import argparse
+import asyncio
+import signal
+import time
+from typing import Dict, List
+
+from live_data.trade_history import stream_trades
+from live_data.orderbook import stream_orderbook
+from live_data.shm_ring import (
+    ShmRing, attach_reader, ring_name,
+    TRADE_DTYPE, BOOK_DTYPE, MAX_BOOK_LEVELS,
+    SIDE_BUY, SIDE_SELL, BOOK_SNAPSHOT, BOOK_DELTA,
+)
+
+POLL_IDLE_SEC = 0.005     # כמה לישון כשאין רשומות חדשות בצד הקורא
+REATTACH_IDLE_SEC = 5.0   # אחרי כמה זמן שקט לנסות להתחבר מחדש (hub עלה מחדש)
+
+
+# ---------- צד ה-hub (כותב) ----------
+def _trade_record(t: dict) -> tuple:
+    side = SIDE_BUY if t.get("side") == "buy" else SIDE_SELL
+    tid = str(t.get("trade_id") or "").encode("utf-8")[:40]
+    return (int(t["ts_ms"]), float(t["price"]), float(t["qty"]), side, tid)
+
+
+def _book_records(up: dict) -> List[tuple]:
+    """עדכון ספר → רשומה אחת או יותר (אם יש יותר מ-MAX_BOOK_LEVELS רמות בצד)."""
+    bids = up.get("bids") or []
+    asks = up.get("asks") or []
+    kind = BOOK_SNAPSHOT if up.get("type") == "snapshot" else BOOK_DELTA
+    out: List[tuple] = []
+    n = max(len(bids), len(asks), 1)
+    for i in range(0, n, MAX_BOOK_LEVELS):
+        b = bids[i:i + MAX_BOOK_LEVELS]
+        a = asks[i:i + MAX_BOOK_LEVELS]
+        rec_b = [(0.0, 0.0)] * MAX_BOOK_LEVELS
+        rec_a = [(0.0, 0.0)] * MAX_BOOK_LEVELS
+        rec_b[:len(b)] = [(float(p), float(q)) for p, q in b]
+        rec_a[:len(a)] = [(float(p), float(q)) for p, q in a]
+        # רק החלק הראשון של snapshot הוא snapshot; ההמשך הוא תוספת לאותו מצב
+        out.append((int(up.get("ts_ms", 0)), kind if i == 0 else BOOK_DELTA, len(b), len(a), rec_b, rec_a))
+    return out
+
+
+async def _pump_trades(ring: ShmRing, q: asyncio.Queue) -> None:
+    while True:
+        t = await q.get()
+        try:
+            ring.publish(_trade_record(t))
+        finally:
+            q.task_done()
+
+
+async def _pump_book(ring: ShmRing, q: asyncio.Queue) -> None:
+    while True:
+        up = await q.get()
+        try:
+            for rec in _book_records(up):
+                ring.publish(rec)
+        finally:
+            q.task_done()
+
+
+async def run_hub(symbols: List[str], *, trade_capacity: int = 262_144, book_capacity: int = 32_768) -> None:
+    rings: Dict[str, ShmRing] = {}
+    tasks = []
+    try:
+        for sym in symbols:
+            tr = rings[f"{sym}:trades"] = ShmRing(ring_name(sym, "trades"), TRADE_DTYPE, trade_capacity)
+            bk = rings[f"{sym}:book"] = ShmRing(ring_name(sym, "book"), BOOK_DTYPE, book_capacity)
+            q_tr: asyncio.Queue = asyncio.Queue(maxsize=20_000)
+            q_bk: asyncio.Queue = asyncio.Queue(maxsize=5_000)
+            tasks += [
+                asyncio.create_task(stream_trades(sym, q_tr)),
+                asyncio.create_task(_pump_trades(tr, q_tr)),
+                asyncio.create_task(stream_orderbook(sym, q_bk)),
+                asyncio.create_task(_pump_book(bk, q_bk)),
+            ]
+            print(f"[hub] publishing {ring_name(sym, 'trades')} / {ring_name(sym, 'book')}")
+        await asyncio.gather(*tasks)
+    finally:
+        for t in tasks:
+            t.cancel()
+        for ring in rings.values():
+            ring.close(unlink=True)
+
+
+# ---------- צד הבוט (קורא) ----------
+async def _attach(symbol: str, stream: str):
+    while True:
+        r = attach_reader(symbol, stream)
+        if r is not None:
+            return r
+        await asyncio.sleep(REATTACH_IDLE_SEC / 5)
+
+
+async def stream_trades_shm(symbol: str, out_q: asyncio.Queue) -> None:
+    """
+    תחליף ל-stream_trades: קורא מה-ring של ה-hub ודוחף ל-out_q פריטים באותו פורמט בדיוק
+    ({"symbol","ts_ms","price","qty","side","trade_id"}).
+    """
+    reader = await _attach(symbol, "trades")
+    last_data = time.monotonic()
+    while True:
+        recs = reader.poll()
+        if not len(recs):
+            if time.monotonic() - last_data > REATTACH_IDLE_SEC:
+                reader.close()
+                reader = await _attach(symbol, "trades")
+                last_data = time.monotonic()
+            await asyncio.sleep(POLL_IDLE_SEC)
+            continue
+        last_data = time.monotonic()
+        for ts_ms, price, qty, side, tid in recs.tolist():
+            await out_q.put({
+                "symbol": symbol,
+                "ts_ms": ts_ms,
+                "price": price,
+                "qty": qty,
+                "side": "buy" if side == SIDE_BUY else "sell",
+                "trade_id": tid.decode("utf-8", "replace"),
+            })
+
+
+async def stream_orderbook_shm(symbol: str, out_q: asyncio.Queue) -> None:
+    """תחליף ל-stream_orderbook: {"ts_ms","bids","asks","type"} מתוך ה-ring של ה-hub."""
+    reader = await _attach(symbol, "book")
+    last_data = time.monotonic()
+    while True:
+        recs = reader.poll(max_n=512)
+        if not len(recs):
+            if time.monotonic() - last_data > REATTACH_IDLE_SEC:
+                reader.close()
+                reader = await _attach(symbol, "book")
+                last_data = time.monotonic()
+            await asyncio.sleep(POLL_IDLE_SEC)
+            continue
+        last_data = time.monotonic()
+        for rec in recs:
+            nb, na = int(rec["n_bids"]), int(rec["n_asks"])
+            await out_q.put({
+                "ts_ms": int(rec["ts_ms"]),
+                "bids": [tuple(x) for x in rec["bids"][:nb].tolist()],
+                "asks": [tuple(x) for x in rec["asks"][:na].tolist()],
+                "type": "snapshot" if int(rec["kind"]) == BOOK_SNAPSHOT else "delta",
+            })
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="market-data hub (WS → shared memory)")
+    ap.add_argument("--symbols", required=True, help="BTCUSDT,ETHUSDT")
+    args = ap.parse_args()
+    syms = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+
+    def _on_term(signum, frame):
+        raise KeyboardInterrupt  # כדי שה-finally ב-run_hub ישחרר את הסגמנטים
+
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, _on_term)
+    try:
+        asyncio.run(run_hub(syms))
+    except KeyboardInterrupt:
+        pass
@@ -1,10 +1,11 @@
 import asyncio, json, websockets
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 BYBIT_WS_URL_OB = "wss://stream.bybit.com/v5/public/linear"
 
-def _normalize_ob_msg(raw: Dict[str, Any]) -> Dict[str, Any]:
-    ts_ms = int(raw.get("ts") or raw.get("T") or 0)
+def _normalize_ob_msg(raw: Dict[str, Any], ts_ms: Optional[int] = None) -> Dict[str, Any]:
+    # ב-Bybit v5 ה-ts/cts יושבים ברמת ה-payload ולא בתוך data – הקורא מעביר אותו
+    ts_ms = int(ts_ms or raw.get("ts") or raw.get("T") or 0)
     bids  = raw.get("b", raw.get("bids", []))
     asks  = raw.get("a", raw.get("asks", []))
     bids = [(float(p), float(q)) for p, q in bids]
@@ -24,8 +25,12 @@ async def stream_orderbook(symbol: str, out_q: asyncio.Queue, *, reconnect_delay
                     if not data:
                         continue
                     items = data if isinstance(data, list) else [data]
+                    kind = str(payload.get("type") or "delta").lower()  # snapshot / delta
+                    ts_ms = int(payload.get("ts") or payload.get("cts") or 0)
                     for item in items:
-                        await out_q.put(_normalize_ob_msg(item))  # דוחף ל-Queue (בלי הדפסה)
+                        msg = _normalize_ob_msg(item, ts_ms)
+                        msg["type"] = kind
+                        await out_q.put(msg)  # דוחף ל-Queue (בלי הדפסה)
         except Exception:
             if reconnect_delay > 0:
                 await asyncio.sleep(reconnect_delay)
@@ -1,6 +1,8 @@
 
 from typing import List, Dict, Any, Tuple, Optional, Iterable
+from bisect import bisect_left, insort
 import time
+import numpy as np
 import pandas as pd
 
 try:
@@ -12,11 +14,22 @@ class OrderBookBuffer:
     """
     מאחסן את כל עדכוני הספר (bids/asks) כפי שהגיעו מהוובסוקט.
     לא מבצע ממוצעים/חישובים. רק שומר ומחזיר צילומים לפי צורך.
+    בנוסף מתחזק ספר חי (snapshot מחליף, delta מעדכן; qty=0 מוחק רמה) ורושם את ה-top of book
+    אחרי כל עדכון למערכי NumPy – ל-as-of join וקטורי (searchsorted) מול טריידים.
+    סולמות המחירים נשמרים ממוינים (bisect), כך ש-delta עולה O(רמות ששונו) ו-depth(n) עולה O(n).
     """
 
     def __init__(self) -> None:
         self._updates: List[Dict[str, Any]] = []   # [{ts: float, bids: [(p,q)], asks: [(p,q)]}, ...]
         self._window_start_ts: float = time.time() # תחילת חלון לאיסוף עבור flush()
+        # ספר חי + היסטוריית top of book: עמודות ts, bid, ask, bid_qty, ask_qty
+        self._book_bids: Dict[float, float] = {}
+        self._book_asks: Dict[float, float] = {}
+        self._bid_px: List[float] = []   # מחירי bid בסדר עולה (הטוב ביותר בסוף)
+        self._ask_px: List[float] = []   # מחירי ask בסדר עולה (הטוב ביותר בהתחלה)
+        self._tob = np.empty((1024, 5), dtype=float)
+        self._tob_n = 0
+        self.last_top: Optional[Tuple[float, float, float, float, float]] = None  # אחרי העדכון האחרון
 
     # ---------- Utils ----------
     @staticmethod
@@ -46,11 +59,13 @@ class OrderBookBuffer:
         bids: List[List[float]],
         asks: List[List[float]],
         ts: Optional[float] = None,
+        kind: Optional[str] = None,
     ) -> None:
         """
         מוסיף עדכון בודד לבאפר.
         - bids/asks בפורמט: [[price, qty], ...]
         - ts הוא timestamp (float seconds). אם None → time.time().
+        - kind: "snapshot" / "delta" (כמו ב-stream_orderbook). None → מתייחסים כ-snapshot.
         """
         # normalize ts: accept None, float epoch, or pandas Timestamp (naive or tz-aware)
         epoch_ts: float
@@ -67,11 +82,76 @@ class OrderBookBuffer:
             else:
                 epoch_ts = float(ts)
 
-        self._updates.append({
+        upd = {
             "ts": epoch_ts,
             "bids": [(float(p), float(q)) for p, q in bids],
             "asks": [(float(p), float(q)) for p, q in asks],
-        })
+        }
+        self._updates.append(upd)
+        self._apply_to_book(upd, kind)
+
+    # ---------- ספר חי + top of book ----------
+    def _apply_to_book(self, upd: Dict[str, Any], kind: Optional[str]) -> None:
+        if kind != "delta":
+            self._book_bids = {p: q for p, q in upd["bids"] if q > 0}
+            self._book_asks = {p: q for p, q in upd["asks"] if q > 0}
+            self._bid_px = sorted(self._book_bids)
+            self._ask_px = sorted(self._book_asks)
+        else:
+            for book, ladder, levels in ((self._book_bids, self._bid_px, upd["bids"]),
+                                         (self._book_asks, self._ask_px, upd["asks"])):
+                for p, q in levels:
+                    if q > 0:
+                        if p not in book:
+                            insort(ladder, p)
+                        book[p] = q
+                    elif book.pop(p, None) is not None:
+                        del ladder[bisect_left(ladder, p)]
+        bb = self._bid_px[-1] if self._bid_px else np.nan
+        ba = self._ask_px[0] if self._ask_px else np.nan
+        row = (upd["ts"], bb, ba,
+               self._book_bids.get(bb, np.nan) if bb == bb else np.nan,
+               self._book_asks.get(ba, np.nan) if ba == ba else np.nan)
+        self.last_top = row
+        if not upd["ts"] > 0:
+            return  # בלי ts אמיתי (0) – ה-quote היה "תקף" לכל טרייד ב-as-of join; לא נכנס להיסטוריה
+        if self._tob_n and upd["ts"] < self._tob[self._tob_n - 1, 0]:
+            return  # עדכון לא מסודר בזמן – הספר מתעדכן, ההיסטוריה נשארת ממוינת ל-searchsorted
+        if self._tob_n == len(self._tob):
+            self._tob = np.concatenate([self._tob, np.empty_like(self._tob)])
+        self._tob[self._tob_n] = row
+        self._tob_n += 1
+
+    @property
+    def book(self) -> Tuple[Dict[float, float], Dict[float, float]]:
+        """הספר החי הנוכחי (bids, asks) – price → qty."""
+        return self._book_bids, self._book_asks
+
+    def depth(self, n: int) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+        """n הרמות הטובות בכל צד מהספר החי: (bids יורד, asks עולה) כ-[(price, qty), ...]."""
+        bids = [(p, self._book_bids[p]) for p in reversed(self._bid_px[-n:])] if n > 0 else []
+        asks = [(p, self._book_asks[p]) for p in self._ask_px[:n]]
+        return bids, asks
+
+    def top_of_book(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """היסטוריית top of book (views): ts (שניות), best_bid, best_ask, bid_qty, ask_qty – ממוינת לפי ts."""
+        t = self._tob[:self._tob_n]
+        return t[:, 0], t[:, 1], t[:, 2], t[:, 3], t[:, 4]
+
+    def quotes_asof(self, t_sec) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        as-of join וקטורי: לכל זמן (שניות) – best_bid/best_ask האחרונים עם ts ≤ t.
+        זמן לפני העדכון הראשון → NaN.
+        """
+        t_sec = np.asarray(t_sec, dtype=float)
+        ts, bid, ask, _, _ = self.top_of_book()
+        idx = np.searchsorted(ts, t_sec, side="right") - 1
+        ok = idx >= 0
+        safe = np.where(ok, idx, 0)
+        if not len(ts):
+            nan = np.full(t_sec.shape, np.nan)
+            return nan, nan.copy()
+        return np.where(ok, bid[safe], np.nan), np.where(ok, ask[safe], np.nan)
 
     def add_update_dict(self, update: Dict[str, Any]) -> None:
         """
@@ -111,16 +191,10 @@ class OrderBookBuffer:
         מחזיר (best_bid_price, best_ask_price) לפי ה-snapshot האחרון ≤ t.
         אם אין עדכון מתאים → None.
         """
-        snap = self.last_at_or_before(t)
-        if not snap:
-            return None
-        bids = snap.get("bids") or []
-        asks = snap.get("asks") or []
-        if not bids or not asks:
+        bid, ask = self.quotes_asof([self._to_epoch_seconds(t)])
+        if not (np.isfinite(bid[0]) and np.isfinite(ask[0])):
             return None
-        best_bid = max(p for p, q in bids)
-        best_ask = min(p for p, q in asks)
-        return (best_bid, best_ask)
+        return (float(bid[0]), float(ask[0]))
 
     # ---------- Read (destructive) ----------
     def flush(self) -> Dict[str, Any]:
@@ -142,9 +216,20 @@ class OrderBookBuffer:
     def purge_older_than(self, cutoff_ts: Any) -> int:
         """
         מוחק עדכונים ישנים יותר מ-cutoff_ts (float seconds או pandas.Timestamp).
-        מחזיר כמה נמחקו.
+        העדכון האחרון לפני ה-cutoff נשאר – הוא ה-snapshot התקף ב-cutoff (last_at_or_before).
+        העדכונים נשמרים בסדר הגעה, אז נמחקת רק הרישא (בלי מעבר על כל הבאפר). מחזיר כמה נמחקו.
         """
         cutoff = self._to_epoch_seconds(cutoff_ts)
-        before = len(self._updates)
-        self._updates = [u for u in self._updates if u["ts"] >= cutoff]
-        return before - len(self._updates)
\ No newline at end of file
+        ups = self._updates
+        n_old = 0
+        while n_old + 1 < len(ups) and ups[n_old + 1]["ts"] < cutoff:
+            n_old += 1
+        if n_old:
+            del ups[:n_old]
+        # היסטוריית top of book: משאירים את השורה האחרונה לפני ה-cutoff (היא ה-quote התקף ב-cutoff)
+        ts = self._tob[:self._tob_n, 0]
+        k = max(int(np.searchsorted(ts, cutoff, side="left")) - 1, 0)
+        if k:
+            self._tob[:self._tob_n - k] = self._tob[k:self._tob_n]
+            self._tob_n -= k
+        return n_old
\ No newline at end of file
@@ -0,0 +1,166 @@
+# live_data/shm_ring.py
+# Ring buffer של רשומות בגודל קבוע מעל multiprocessing.shared_memory.
+# כותב יחיד (ה-hub), הרבה קוראים (בוטים). כל קורא מחזיק seq משלו – אין נעילות.
+#
+# פריסה בזיכרון:
+#   [header: int64 × 4] = capacity, record_size, write_seq, reserved
+#   [records: capacity × dtype]
+
+from __future__ import annotations
+import os
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+MAX_BOOK_LEVELS = 50  # orderbook.50 – מקסימום רמות לצד ברשומת ספר אחת
+
+SIDE_BUY, SIDE_SELL = 1, -1
+BOOK_SNAPSHOT, BOOK_DELTA = 0, 1
+
+TRADE_DTYPE = np.dtype([
+    ("ts_ms", "<i8"),
+    ("price", "<f8"),
+    ("qty", "<f8"),
+    ("side", "i1"),
+    ("trade_id", "S40"),
+])
+
+BOOK_DTYPE = np.dtype([
+    ("ts_ms", "<i8"),
+    ("kind", "i1"),
+    ("n_bids", "<i2"),
+    ("n_asks", "<i2"),
+    ("bids", "<f8", (MAX_BOOK_LEVELS, 2)),
+    ("asks", "<f8", (MAX_BOOK_LEVELS, 2)),
+])
+
+_HEADER = np.dtype("<i8")
+_HEADER_LEN = 4
+_HEADER_BYTES = _HEADER.itemsize * _HEADER_LEN
+
+
+def ring_name(symbol: str, stream: str) -> str:
+    """שם סטנדרטי לסגמנט: mbp_BTCUSDT_trades / mbp_BTCUSDT_book."""
+    return f"mbp_{symbol.upper()}_{stream}"
+
+
+class ShmRing:
+    """
+    צד הכותב. create=True יוצר סגמנט חדש (ומוחק ישן באותו שם אם נשאר מריצה קודמת).
+    """
+
+    def __init__(self, name: str, dtype: np.dtype, capacity: int = 65_536, *, create: bool = True):
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        size = _HEADER_BYTES + self.dtype.itemsize * int(capacity)
+        if create:
+            try:
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._header = np.ndarray((_HEADER_LEN,), dtype=_HEADER, buffer=self.shm.buf)
+        if create:
+            self._header[:] = (int(capacity), self.dtype.itemsize, 0, 0)
+        self.capacity = int(self._header[0])
+        self._records = np.ndarray((self.capacity,), dtype=self.dtype, buffer=self.shm.buf, offset=_HEADER_BYTES)
+
+    @property
+    def write_seq(self) -> int:
+        return int(self._header[2])
+
+    def publish(self, record: tuple) -> None:
+        """כותב רשומה ורק אחריה מקדם את write_seq (הקוראים לא רואים רשומה חצי-כתובה)."""
+        seq = int(self._header[2])
+        self._records[seq % self.capacity] = record
+        self._header[2] = seq + 1
+
+    def close(self, unlink: bool = True) -> None:
+        del self._header, self._records
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    """
+    בפייתון < 3.13 גם קורא נרשם ל-resource_tracker, שמוחק את הסגמנט כשהקורא יוצא.
+    הבעלים היחיד הוא ה-hub, ולכן מסירים את הרישום אצל הקוראים.
+    """
+    if os.name == "nt":
+        return
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:
+        pass
+
+
+class ShmRingReader:
+    """
+    צד הקורא. מתחבר לסגמנט קיים ומתחיל מהרשומה הבאה שתיכתב (לא מההיסטוריה).
+    אם הכותב עקף את הקורא – מדלגים קדימה ומעדכנים את dropped.
+    """
+
+    def __init__(self, name: str, dtype: np.dtype, *, from_start: bool = False):
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.shm = shared_memory.SharedMemory(name=name)
+        _untrack(self.shm)
+        self._header = np.ndarray((_HEADER_LEN,), dtype=_HEADER, buffer=self.shm.buf)
+        if int(self._header[1]) != self.dtype.itemsize:
+            raise ValueError(f"{name}: record size {int(self._header[1])} != {self.dtype.itemsize}")
+        self.capacity = int(self._header[0])
+        self._records = np.ndarray((self.capacity,), dtype=self.dtype, buffer=self.shm.buf, offset=_HEADER_BYTES)
+        self.read_seq = max(0, int(self._header[2]) - self.capacity) if from_start else int(self._header[2])
+        self.dropped = 0
+
+    def poll(self, max_n: int = 4096) -> np.ndarray:
+        """מחזיר עותק של הרשומות החדשות (עד max_n). מערך ריק אם אין חדש."""
+        w = int(self._header[2])
+        if w - self.read_seq >= self.capacity:
+            # ברינג מלא הסלוט הוותיק הוא הבא שייכתב (seq w) – מתחילים אחריו
+            skip = w - self.capacity + 1 - self.read_seq
+            self.dropped += skip
+            self.read_seq += skip
+        n = min(w - self.read_seq, int(max_n))
+        if n <= 0:
+            return self._records[:0].copy()
+
+        start = self.read_seq % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            out = self._records[start:end].copy()
+        else:
+            out = np.concatenate([self._records[start:], self._records[:end - self.capacity]])
+
+        # אם בזמן ההעתקה הכותב הספיק לדרוס חלק מהטווח – זורקים את החלק הדרוס.
+        # +1: הרשומה w_after אולי כבר בכתיבה (publish מקדם את write_seq רק אחריה), והסלוט שלה הוא של seq w_after - capacity
+        w_after = int(self._header[2])
+        torn = min(max(0, w_after - self.capacity - self.read_seq + 1), n)
+        if torn:
+            self.dropped += torn
+            out = out[torn:]
+        self.read_seq += n
+        return out
+
+    def close(self) -> None:
+        del self._header, self._records
+        self.shm.close()
+
+
+def attach_reader(symbol: str, stream: str) -> Optional[ShmRingReader]:
+    """מתחבר לסגמנט של ה-hub אם קיים; None אם ה-hub עוד לא עלה."""
+    dtype = TRADE_DTYPE if stream == "trades" else BOOK_DTYPE
+    try:
+        return ShmRingReader(ring_name(symbol, stream), dtype)
+    except FileNotFoundError:
+        return None
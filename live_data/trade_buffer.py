@@ -1,87 +1,125 @@
 # live_data/trade_buffer.py
-from collections import deque
+from typing import Any, Dict, List, Optional
+import numpy as np
 import pandas as pd
-from typing import Deque, Dict, Any, Optional
+
+_SLICE_COLUMNS = ["ts", "symbol", "price", "size", "side", "best_bid", "best_ask", "id"]
+
 
 class TradeBuffer:
     """
     שומר רשומות RAW שמגיעות מה-WS.
     עושה De-Dup לפי trade_id אם קיים, אחרת (ts, symbol, price, size, side).
     לא מבצע חישובי אינדיקטורים כאן.
+    הרשומות ממוינות לפי ts, ולצידן מערך int64 (ms) ממוין – slice/purge הם searchsorted, בלי מעבר על הבאפר.
     """
     def __init__(self, maxlen: int = 200_000):
-        self._maxlen = maxlen  
-        self._rows: Deque[Dict[str, Any]] = deque()
-        self._ids:  Deque[Any]= deque()
+        self._maxlen = maxlen
+        self._rows: List[Dict[str, Any]] = []
+        self._keys: List[Any] = []
         self._idset = set()
+        self._ts = np.empty(1024, dtype=np.int64)  # ms, מקביל ל-_rows; החיים ב-[_head, len(_rows))
+        self._head = 0
 
+    def __len__(self) -> int:
+        return len(self._rows) - self._head
 
     @staticmethod
     def _make_key(tr: Dict[str, Any]):
         return tr.get("id") or (tr.get("ts"), tr.get("symbol"), tr.get("price"), tr.get("size"), tr.get("side"))
 
-    def append(self, trade: Dict[str, Any]) -> None:
+    @staticmethod
+    def _ms(ts: pd.Timestamp) -> int:
+        return int(ts.value // 1_000_000)
+
+    def append(self, trade: Dict[str, Any]) -> bool:
+        """False כשהרשומה לא נכנסה (כפילות או בלי ts תקין) – הקורא לא מזין אותה הלאה."""
         k = self._make_key(trade)
         if k in self._idset:
-            return
-        if len(self._rows) >= self._maxlen:
-            old_key = self._ids.popleft()
-            self._rows.popleft()
-            self._idset.discard(old_key)
+            return False
         # Normalize incoming timestamp to UTC-aware pandas Timestamp to avoid
         # tz-naive vs tz-aware comparison errors later when slicing/purging.
-        if trade.get("ts") is not None:
-            try:
-                trade["ts"] = pd.to_datetime(trade.get("ts"), utc=True)
-            except Exception:
-                # If conversion fails, leave as-is; downstream code will coerce
-                # or drop invalid rows.
-                pass
+        try:
+            ts = pd.Timestamp(trade.get("ts"))
+            ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+        except Exception:
+            return False  # בלי ts תקין הרשומה לא תיחתך לאף חלון
+        if ts is pd.NaT:
+            return False
+        trade["ts"] = ts
+        ms = self._ms(ts)
+        if len(self) >= self._maxlen:
+            self._drop_head(1)
 
-        self._rows.append(trade)
-        self._ids.append(k)
+        n = len(self._rows)
+        if n == len(self._ts):
+            self._compact(grow=True)
+            n = len(self._rows)
+        if n == self._head or ms >= self._ts[n - 1]:
+            self._ts[n] = ms
+            self._rows.append(trade)
+            self._keys.append(k)
+        else:
+            # טרייד שהגיע מחוץ לסדר – הכנסה במקום (נדיר)
+            pos = self._head + int(np.searchsorted(self._ts[self._head:n], ms, side="right"))
+            self._ts[pos + 1:n + 1] = self._ts[pos:n]
+            self._ts[pos] = ms
+            self._rows.insert(pos, trade)
+            self._keys.insert(pos, k)
         self._idset.add(k)
-        # שמירה על סט ה-keys בגודל הבופר
-       #while len(self._idset) > len(self._ids):
-        #   old = self._ids.popleft()
-        #   self._idset.discard(old)
+        return True
+
+    def _drop_head(self, n: int) -> None:
+        for k in self._keys[self._head:self._head + n]:
+            self._idset.discard(k)
+        self._head += n
+        if self._head > 4096 and self._head * 2 > len(self._rows):
+            self._compact()
+
+    def _compact(self, grow: bool = False) -> None:
+        """מזיז את החלק החי לתחילת המערכים (ומגדיל את מערך ה-ts כשהוא מלא)."""
+        h, n = self._head, len(self._rows)
+        live = n - h
+        cap = len(self._ts)
+        if grow and live * 2 > cap:
+            cap *= 2
+        ts = np.empty(cap, dtype=np.int64) if cap != len(self._ts) else self._ts
+        ts[:live] = self._ts[h:n]
+        self._ts = ts
+        del self._rows[:h], self._keys[:h]
+        self._head = 0
+
+    def _span(self, t0_ms: int, t1_ms: int) -> tuple:
+        ts = self._ts[self._head:len(self._rows)]
+        a = int(np.searchsorted(ts, t0_ms, side="left"))
+        b = int(np.searchsorted(ts, t1_ms, side="left"))
+        return self._head + a, self._head + b
 
     def slice(self, t0: pd.Timestamp, t1: pd.Timestamp, symbol: Optional[str] = None) -> pd.DataFrame:
         """
         מחזיר DataFrame "שטוח" של כל העסקאות בטווח [t0, t1) ובסימבול (אם צוין).
         לא מוסיף כאן time=t0. זה ייעשה באגרגטור.
         """
-        # Ensure row timestamps are compared as UTC-aware timestamps.
-        rows = []
-        for r in self._rows:
-            if r.get("ts") is None:
-                continue
-            try:
-                r_ts = pd.to_datetime(r["ts"], utc=True)
-            except Exception:
-                continue
-            if t0 <= r_ts < t1 and (symbol is None or r.get("symbol") == symbol):
-                rows.append(r)
+        a, b = self._span(self._ms(pd.Timestamp(t0)), self._ms(pd.Timestamp(t1)))
+        rows = self._rows[a:b]
+        if symbol is not None:
+            rows = [r for r in rows if r.get("symbol") == symbol]
         if not rows:
-            return pd.DataFrame(columns=["ts", "symbol", "price", "size", "side", "best_bid", "best_ask", "id"])
+            return pd.DataFrame(columns=_SLICE_COLUMNS)
         df = pd.DataFrame(rows)
         # תקנון טיפוסים בסיסי
         if "price" in df: df["price"] = pd.to_numeric(df["price"], errors="coerce")
         if "size"  in df: df["size"]  = pd.to_numeric(df["size"],  errors="coerce")
-        return df.sort_values("ts").reset_index(drop=True)
+        return df
+
+    def purge_before_ms(self, cutoff_ms: int) -> int:
+        """מוחק רשומות עם ts < cutoff_ms; מחזיר כמה נמחקו."""
+        ts = self._ts[self._head:len(self._rows)]
+        n = int(np.searchsorted(ts, int(cutoff_ms), side="left"))
+        if n:
+            self._drop_head(n)
+        return n
 
     def purge_older_than(self, cutoff: pd.Timestamp) -> None:
         """ניקוי עדין: שומר רק רשומות מה-cutoff והלאה."""
-        keep = deque()
-        keep_ids = deque()
-        idset = set()
-        for row, k in zip(self._rows, self._ids):
-            if row.get("ts") is None:
-                continue
-            try:
-                r_ts = pd.to_datetime(row["ts"], utc=True)
-            except Exception:
-                continue
-            if r_ts >= cutoff:
-                keep.append(row); keep_ids.append(k); idset.add(k)
-        self._rows, self._ids, self._idset = keep, keep_ids, idset
+        self.purge_before_ms(self._ms(pd.Timestamp(cutoff)))
@@ -1,149 +1,153 @@
 import asyncio
-import pandas as pd
+import argparse
 import signal, sys, atexit, traceback
+from typing import Dict, List, Tuple
 
 from live_data.trade_history import stream_trades
 from live_data.orderbook import stream_orderbook
-from live_data.trade_buffer import TradeBuffer
-from live_data.orderbook_buffer import OrderBookBuffer
-from core.window_aggregator import ReusableAggregator
-
-from dataset.schema_registry import empty_df, ensure_target_cols
-from dataset.pipeline import on_candle_ready
-from io_utils.storage import load_df, save_df
-
-# מודולים לוגיים (כבר קיימים אצלך)
-from indicator.run_indikators import add_all_indicators
-from technical_analysis.run_technical import add_all_technical
-from dataset.feature_builder import build_feature_row
-from technical_live.orderbook_technical import process_orderbook  # אם צריך הרחבה
-from technical_live.trade_history_technical import compute_trade_history_technical as compute_th
-from technical_live.volume_technical_delta import compute_vd_for_chunk as compute_vd
-from dataset.target_filler import TargetFiller
-
-# ===== קונפיג =====
+from live_data.hub import stream_trades_shm, stream_orderbook_shm
+from core.symbol_pipeline import SymbolFeed, build_feeds
+from core.settings_manager import CFG
+
+# ===== קונפיג (ברירות מחדל; ניתן לדרוס משורת הפקודה) =====
 SYMBOL        = "BTCUSDT"
 INTERVAL      = "30s"
-INTERVAL_SEC  = 30
 HORIZONS      = [30, 60, 90, 120]
 SAVE_EVERY    = 50
+USE_HUB       = False   # True → קריאה מה-hub בזיכרון משותף במקום חיבור WS משלנו
+
+# ===== CLI =====
+def _split_csv(s: str | None) -> List[str]:
+    return [x.strip() for x in (s or "").split(",") if x.strip()]
+
+def parse_cli(argv: List[str] | None = None) -> argparse.Namespace:
+    """
+    תומך ב:
+      --symbol BTCUSDT --interval 30s            (כמו ש-proc_manager.spawn_run שולח)
+      --symbol BTCUSDT,ETHUSDT --interval 30s,1m (מכפלה: כל סימבול × כל אינטרוול)
+      --pairs BTCUSDT:30s,ETHUSDT:1m             (רשימה מפורשת)
+      --hub                                      (מקור נתונים: live_data.hub במקום WS)
+    """
+    ap = argparse.ArgumentParser(description="live bot – כמה (symbol, interval) בתהליך אחד")
+    ap.add_argument("--symbol", default=SYMBOL)
+    ap.add_argument("--interval", default=INTERVAL)
+    ap.add_argument("--pairs", default=None)
+    ap.add_argument("--hub", action="store_true")
+    return ap.parse_args(argv)
 
-# ===== Buffers & Aggregator =====
-trade_buf = TradeBuffer()
-ob_buf    = OrderBookBuffer()
-agg       = ReusableAggregator(trade_buf, symbol=SYMBOL, interval_sec=INTERVAL_SEC)
-filler    = TargetFiller(HORIZONS, commission_bps=5.0, slippage_bps=2.0)
-
-# ===== DataFrame =====
-schema = ensure_target_cols(schema={}, horizons=HORIZONS)  # נתחיל סכימה רזה, נגדל תוך כדי
-df_all = load_df(SYMBOL, INTERVAL)
-if df_all is None or df_all.empty:
-    df_all = empty_df(schema)
-else:
-    # הבטחת tz ל־ts אם קיים
-    if "ts" in df_all.columns:
-        df_all["ts"] = pd.to_datetime(df_all["ts"], utc=True)
+def pairs_from_args(args: argparse.Namespace) -> List[Tuple[str, str]]:
+    if args.pairs:
+        pairs = []
+        for item in _split_csv(args.pairs):
+            sym, _, itv = item.partition(":")
+            pairs.append((sym, itv or INTERVAL))
+        return pairs
+    return [(s, i) for s in _split_csv(args.symbol) for i in _split_csv(args.interval)]
+
+FEEDS: Dict[str, SymbolFeed] = {}
 
 # ===== persist on exit =====
-_persisted = False
-def _persist_df_all():
-    global _persisted, df_all
-    if _persisted: return
-    try:
-        save_df(df_all, SYMBOL, INTERVAL)
-        print(f"[persist] rows={len(df_all)} saved ({SYMBOL} {INTERVAL})")
-    except Exception:
-        traceback.print_exc()
-    _persisted = True
+def _persist_all():
+    for feed in FEEDS.values():
+        feed.checkpoint()
+        for p in feed.pipelines:
+            p.persist()
 
-atexit.register(_persist_df_all)
+atexit.register(_persist_all)
 for sig in (getattr(signal, "SIGINT", None), getattr(signal, "SIGTERM", None)):
     if sig:
         try:
-            signal.signal(sig, lambda s,f: (_persist_df_all(), sys.exit(0)))
+            signal.signal(sig, lambda s,f: (_persist_all(), sys.exit(0)))
         except Exception:
             pass
 
-# ===== lookup לצורך TargetFiller =====
-def price_lookup(ts_target: pd.Timestamp):
-    if df_all.empty or "ts" not in df_all.columns:
-        return None
-    ts_norm = pd.to_datetime(ts_target, utc=True)
-    m = df_all["ts"] == ts_norm
-    if not m.any():
-        return None
-    v = df_all.loc[m, "close"].iloc[0]
-    return None if pd.isna(v) else float(v)
-
-# ===== WS Producers/Consumers =====
-async def producer_trades(out_q: asyncio.Queue):
-    await stream_trades(SYMBOL, out_q)
-
-async def producer_orderbook(out_q: asyncio.Queue):
-    await stream_orderbook(SYMBOL, out_q)
-
-async def consumer_trades(in_q: asyncio.Queue):
+# ===== WS Producers/Consumers (חיבור אחד לכל סימבול, משותף לכל האינטרוולים) =====
+async def producer_trades(feed: SymbolFeed, out_q: asyncio.Queue):
+    if USE_HUB:
+        await stream_trades_shm(feed.symbol, out_q)
+    else:
+        await stream_trades(feed.symbol, out_q)
+
+async def producer_orderbook(feed: SymbolFeed, out_q: asyncio.Queue):
+    if USE_HUB:
+        await stream_orderbook_shm(feed.symbol, out_q)
+    else:
+        await stream_orderbook(feed.symbol, out_q)
+
+async def consumer_trades(feed: SymbolFeed, in_q: asyncio.Queue):
     while True:
         tr = await in_q.get()
-        ts = pd.to_datetime(tr.get("ts_ms"), unit="ms", utc=True)
-        trade_buf.append({
-            "ts": ts,
-            "symbol": SYMBOL,
-            "price": float(tr.get("price", 0.0)),
-            "size":  float(tr.get("qty", tr.get("size", 0.0))),
-            "side":  str(tr.get("side", "")).lower(),
-        })
-        for closed in agg.on_trade(ts):
-            await on_candle_ready(
-                t0=closed.t0, t1=closed.t1, df_chunk=closed.df_chunk,
-                ctx={
-                    "SYMBOL": SYMBOL, "INTERVAL": INTERVAL, "HORIZONS": HORIZONS,
-                    "df_all": df_all, "schema": schema, "price_lookup": price_lookup,
-                    "orderbook_buffer": ob_buf, "filler": filler,
-                    "add_all_indicators": add_all_indicators,
-                    "add_all_technical":  add_all_technical,
-                    "build_feature_row":  build_feature_row,
-                    "compute_th": compute_th, "compute_vd": compute_vd, "process_ob": process_orderbook,
-                    "save_df": save_df, "SAVE_EVERY": SAVE_EVERY,
-                }
-            )
-            # קבלת df מעודכן מתוך ctx
-            globals()["df_all"] = closed.ctx["df_all"] if hasattr(closed, "ctx") and "df_all" in getattr(closed, "ctx") else df_all
-        in_q.task_done()
-
-async def consumer_orderbook(in_q: asyncio.Queue):
+        try:
+            await feed.on_trade(tr)
+        finally:
+            in_q.task_done()
+
+async def consumer_orderbook(feed: SymbolFeed, in_q: asyncio.Queue):
     while True:
         up = await in_q.get()
-        ts = pd.to_datetime(up.get("ts_ms"), unit="ms", utc=True)
-        ob_buf.add_update(
-            bids=up.get("bids", []),
-            asks=up.get("asks", []),
-            ts=float(ts.timestamp()),
-        )
-        in_q.task_done()
+        try:
+            feed.on_orderbook(up)
+        finally:
+            in_q.task_done()
+
+async def window_timer(feed: SymbolFeed):
+    """
+    סוגר חלונות ב-t1 + grace לפי שעון הבורסה המוערך, כך שנר בשוק שקט לא מחכה לטרייד הבא.
+    ישן בדיוק עד הדדליין הקרוב (או עד התקרה כשעוד אין חלון פתוח).
+    """
+    max_sleep_ms = int(CFG("windows.timer_max_sleep_ms", 1000))
+    while True:
+        deadline = feed.next_deadline_ms()
+        if deadline is None:
+            await asyncio.sleep(max_sleep_ms / 1000.0)
+            continue
+        wait_ms = deadline - feed.exchange_clock.now_ms()
+        if wait_ms > 0:
+            await asyncio.sleep(min(wait_ms, max_sleep_ms) / 1000.0)
+            continue
+        await feed.on_timer()
+
+async def provisional_timer(feed: SymbolFeed, every_sec: float):
+    """כל every_sec שניות: שורת פיצ'רים זמנית לנר הפתוח של כל צינור → המנויים שלו (לא ל-df_all)."""
+    while True:
+        await asyncio.sleep(every_sec)
+        try:
+            feed.publish_provisional()
+        except Exception:
+            traceback.print_exc()
 
 # ===== BOOT =====
 async def main_async():
-    q_trades = asyncio.Queue(maxsize=20_000)
-    q_ob     = asyncio.Queue(maxsize=5_000)
-    tasks = [
-        asyncio.create_task(producer_trades(q_trades)),
-        asyncio.create_task(consumer_trades(q_trades)),
-        asyncio.create_task(producer_orderbook(q_ob)),
-        asyncio.create_task(consumer_orderbook(q_ob)),
-    ]
+    tasks = []
+    for feed in FEEDS.values():
+        q_trades = asyncio.Queue(maxsize=20_000)
+        q_ob     = asyncio.Queue(maxsize=5_000)
+        tasks += [
+            asyncio.create_task(producer_trades(feed, q_trades)),
+            asyncio.create_task(consumer_trades(feed, q_trades)),
+            asyncio.create_task(producer_orderbook(feed, q_ob)),
+            asyncio.create_task(consumer_orderbook(feed, q_ob)),
+            asyncio.create_task(window_timer(feed)),
+        ]
+        if CFG("provisional.enabled", True):
+            tasks.append(asyncio.create_task(provisional_timer(feed, float(CFG("provisional.every_sec", 5)))))
+        src = "hub" if USE_HUB else "ws"
+        print(f"[boot] {feed.symbol} ({src}): " + ", ".join(p.interval for p in feed.pipelines))
     try:
         await asyncio.gather(*tasks)
     except asyncio.CancelledError:
         pass
 
 if __name__ == "__main__":
+    ARGS = parse_cli()
+    USE_HUB = bool(ARGS.hub)
+    FEEDS.update(build_feeds(pairs_from_args(ARGS), horizons=HORIZONS, save_every=SAVE_EVERY))
     try:
         asyncio.run(main_async())
     except Exception as e:
         print("FATAL Exception:", e)
         traceback.print_exc()
-        _persist_df_all()
+        _persist_all()
     except BaseException as e:
         # Catch BaseException (KeyboardInterrupt / SystemExit / GeneratorExit) to
         # print a full traceback for diagnosis and ensure persistence.
@@ -152,6 +156,6 @@ if __name__ == "__main__":
             traceback.print_exc()
         except Exception:
             pass
-        _persist_df_all()
+        _persist_all()
         # Re-raise to preserve the original exit behaviour (non-zero exit code).
-        raise
\ No newline at end of file
+        raise
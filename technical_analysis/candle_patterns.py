@@ -0,0 +1,153 @@
+# technical_analysis/candle_patterns.py
+# זיהוי תבניות נרות מתוך k הנרות האחרונים בלבד.
+#   classify_patterns(o, h, l, c)   – NumPy וקטורי: כל ההיסטוריה (batch) או חלון קצר (stream)
+#   CandlePatternEngine             – ring buffer של K_BARS נרות; update() לכל נר שנסגר
+# שני המסלולים עוברים באותה פונקציה → תוצאה זהה לכל נר.
+
+from __future__ import annotations
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+K_BARS = 3  # התבנית הארוכה ביותר (morning/evening star, three soldiers/crows)
+
+PATTERN_DEFAULTS: Dict[str, float] = {
+    # ---- חד/דו-נריות (כמו candle_technical_update) ----
+    "doji_body_frac": 0.10,
+    "doji_min_range_pct": 0.002,
+    "hammer_shadow_ratio": 2.0,
+    "hammer_upper_to_body": 0.2,
+    "star_shadow_ratio": 2.0,
+    "star_lower_to_body": 0.2,
+    "engulf_lenient_tol": 0.002,
+    "min_body_pct_for_engulf": 0.05,
+    # ---- רב-נריות ----
+    "big_body_frac": 0.5,            # גוף "גדול" ≥ 50% מהטווח (נר 1 ב-star, כל נר ב-soldiers/crows)
+    "star_small_body_to_first": 0.3, # גוף הנר האמצעי ב-star ≤ 30% מגוף הנר הראשון
+}
+
+
+def _shift(x: np.ndarray, k: int) -> np.ndarray:
+    out = np.empty_like(x)
+    out[:k] = np.nan
+    out[k:] = x[:-k]
+    return out
+
+
+def classify_patterns(o, h, l, c, **params) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    מחזיר (candle_pattern, candle_pattern_multi) לכל נר.
+    candle_pattern – אותה לוגיקה ואותו סדר דריסה כמו candle_technical_update:
+        RED → GREEN → DOJI → SHOOTING_STAR → HAMMER → BEARISH_ENGULFING → BULLISH_ENGULFING
+    candle_pattern_multi ∈ {THREE_WHITE_SOLDIERS, THREE_BLACK_CROWS, MORNING_STAR, EVENING_STAR,
+                            OUTSIDE_BAR, INSIDE_BAR, NONE} (בסדר העדיפות הזה).
+    """
+    p = {**PATTERN_DEFAULTS, **params}
+    o = np.asarray(o, dtype=float)
+    h = np.asarray(h, dtype=float)
+    l = np.asarray(l, dtype=float)
+    c = np.asarray(c, dtype=float)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        body = np.abs(c - o)
+        rng0 = h - l
+        rng = np.where(rng0 != 0, rng0, np.nan)
+        top = np.fmax(o, c)      # כמו concat(...).max(axis=1) – מדלג על NaN
+        bottom = np.fmin(o, c)
+        upper_shadow = h - top
+        lower_shadow = bottom - l
+        mid_price = (h + l) / 2.0
+
+        is_green = c > o
+        is_red = c < o
+        is_equal = ~(is_green | is_red)
+
+        doji_by_body = body <= p["doji_body_frac"] * rng
+        doji_by_range = np.abs(rng / np.where(mid_price != 0, mid_price, np.nan)) >= p["doji_min_range_pct"]
+        is_doji = (doji_by_body & doji_by_range) | is_equal
+
+        is_hammer = (lower_shadow >= p["hammer_shadow_ratio"] * body) & (upper_shadow <= p["hammer_upper_to_body"] * body)
+        is_star = (upper_shadow >= p["star_shadow_ratio"] * body) & (lower_shadow <= p["star_lower_to_body"] * body)
+
+        po, pc, ph, pl = _shift(o, 1), _shift(c, 1), _shift(h, 1), _shift(l, 1)
+        tol = p["engulf_lenient_tol"]
+        body_frac = body / rng
+        prev_is_bull = pc > po
+        prev_is_bear = pc < po
+        engulf_bull = (prev_is_bear & is_green & (c >= po * (1 - tol)) & (o <= pc * (1 + tol))
+                       & (body_frac >= p["min_body_pct_for_engulf"]))
+        engulf_bear = (prev_is_bull & is_red & (c <= po * (1 + tol)) & (o >= pc * (1 - tol))
+                       & (body_frac >= p["min_body_pct_for_engulf"]))
+
+        pattern = np.select(
+            [engulf_bull, engulf_bear, is_hammer, is_star, is_doji, is_green, is_red],
+            ["BULLISH_ENGULFING", "BEARISH_ENGULFING", "HAMMER", "SHOOTING_STAR", "DOJI", "GREEN", "RED"],
+            default="DOJI",
+        ).astype(object)
+
+        # ---- רב-נריות ----
+        big = p["big_body_frac"]
+        ppo, ppc = _shift(o, 2), _shift(c, 2)
+        pbody, ppbody = _shift(body, 1), _shift(body, 2)
+        pbody_frac, ppbody_frac = _shift(body_frac, 1), _shift(body_frac, 2)
+        pgreen, ppgreen = _shift(is_green.astype(float), 1) == 1, _shift(is_green.astype(float), 2) == 1
+        pred, ppred = _shift(is_red.astype(float), 1) == 1, _shift(is_red.astype(float), 2) == 1
+        ptop, pbottom = _shift(top, 1), _shift(bottom, 1)
+
+        soldiers = (ppgreen & pgreen & is_green
+                    & (pc > ppc) & (c > pc)
+                    & (po >= ppo) & (po <= ppc) & (o >= po) & (o <= pc)
+                    & (ppbody_frac >= big) & (pbody_frac >= big) & (body_frac >= big))
+        crows = (ppred & pred & is_red
+                 & (pc < ppc) & (c < pc)
+                 & (po <= ppo) & (po >= ppc) & (o <= po) & (o >= pc)
+                 & (ppbody_frac >= big) & (pbody_frac >= big) & (body_frac >= big))
+
+        small_mid = pbody <= p["star_small_body_to_first"] * ppbody
+        morning = (ppred & (ppbody_frac >= big) & small_mid & (ptop <= ppc * (1 + tol))
+                   & is_green & (c > (ppo + ppc) / 2.0))
+        evening = (ppgreen & (ppbody_frac >= big) & small_mid & (pbottom >= ppc * (1 - tol))
+                   & is_red & (c < (ppo + ppc) / 2.0))
+
+        outside = (h > ph) & (l < pl)
+        inside = (h <= ph) & (l >= pl)
+
+        multi = np.select(
+            [soldiers, crows, morning, evening, outside, inside],
+            ["THREE_WHITE_SOLDIERS", "THREE_BLACK_CROWS", "MORNING_STAR", "EVENING_STAR", "OUTSIDE_BAR", "INSIDE_BAR"],
+            default="NONE",
+        ).astype(object)
+    return pattern, multi
+
+
+class CandlePatternEngine:
+    """
+    ring buffer של K_BARS נרות (OHLC). update() מחזיר את התבניות של הנר החדש בלבד –
+    בלי לגעת ב-DataFrame ובלי shift על כל ההיסטוריה.
+    key (למשל ts) זהה לקודם → הנר האחרון מוחלף (amend) במקום להידחף.
+    """
+
+    def __init__(self, **params):
+        self.params = {**PATTERN_DEFAULTS, **params}
+        self._buf = np.full((K_BARS, 4), np.nan)
+        self._n = 0
+        self._last_key: Any = None
+
+    def push(self, o: float, h: float, l: float, c: float, key: Any = None) -> None:
+        if key is None or key != self._last_key or self._n == 0:
+            self._buf[:-1] = self._buf[1:]
+            self._n = min(self._n + 1, K_BARS)
+        self._buf[-1] = (o, h, l, c)
+        self._last_key = key
+
+    def update(self, o: float, h: float, l: float, c: float, key: Any = None) -> Dict[str, str]:
+        self.push(o, h, l, c, key)
+        b = self._buf[K_BARS - self._n:]
+        pattern, multi = classify_patterns(b[:, 0], b[:, 1], b[:, 2], b[:, 3], **self.params)
+        return {"candle_pattern": pattern[-1], "candle_pattern_multi": multi[-1]}
+
+    def bootstrap(self, o, h, l, c, keys: Optional[list] = None) -> None:
+        """ממלא את ה-buffer מהנרות האחרונים בהיסטוריה (ללא הנר הנוכחי)."""
+        n = len(o)
+        for i in range(max(0, n - K_BARS), n):
+            self.push(float(o[i]), float(h[i]), float(l[i]), float(c[i]), None if keys is None else keys[i])
@@ -1,8 +1,12 @@
 # technical_analysis/candle_technical.py
 from __future__ import annotations
-import numpy as np
+from typing import Optional
+
 import pandas as pd
 
+from technical_analysis.candle_patterns import K_BARS, CandlePatternEngine, classify_patterns
+from technical_analysis.stream_technical import assign_last_row
+
 
 def candle_technical_update(
     df: pd.DataFrame,
@@ -27,125 +31,65 @@ def candle_technical_update(
 
     # ENGULFING (מקלה) – סבילות קטנה לחפיפה לא מושלמת
     engulf_lenient_tol: float = 0.002,    # ≈0.2%
-    min_body_pct_for_engulf: float = 0.05 # גוף ≥5% מן הטווח כדי לא לתפוס רעש
+    min_body_pct_for_engulf: float = 0.05, # גוף ≥5% מן הטווח כדי לא לתפוס רעש
+
+    # מצב stream מתמשך: ring buffer של הנרות האחרונים (בלי לקרוא מה-DF בכלל)
+    engine: Optional[CandlePatternEngine] = None,
 ) -> pd.DataFrame:
     """
-    מוסיף/מעדכן עמודה אחת: candle_pattern ∈ {
+    מוסיף/מעדכן שתי עמודות:
+      candle_pattern ∈ {
         "SHOOTING_STAR", "HAMMER",
         "BEARISH_ENGULFING", "BULLISH_ENGULFING",
         "DOJI", "RED", "GREEN"
-    }
-    סדר העדיפויות (גבוה → נמוך):
-        1) SHOOTING_STAR
-        2) HAMMER
-        3) BEARISH_ENGULFING
-        4) BULLISH_ENGULFING
+      }
+      candle_pattern_multi ∈ {
+        "THREE_WHITE_SOLDIERS", "THREE_BLACK_CROWS", "MORNING_STAR", "EVENING_STAR",
+        "OUTSIDE_BAR", "INSIDE_BAR", "NONE"
+      }
+    סדר העדיפויות של candle_pattern (גבוה → נמוך):
+        1) BULLISH_ENGULFING
+        2) BEARISH_ENGULFING
+        3) HAMMER
+        4) SHOOTING_STAR
         5) DOJI
-        6) RED
-        7) GREEN
+        6) GREEN
+        7) RED
+    החישוב עצמו ב-candle_patterns.classify_patterns (NumPy). mode="stream" מסתכל רק על
+    K_BARS הנרות האחרונים – או על ה-ring buffer של engine אם הועבר.
     """
     if df.empty:
         return df
     if mode not in ("stream", "batch"):
         raise ValueError("mode must be 'stream' or 'batch'")
 
-    # טווח העבודה
-    idx = df.index[-1:] if mode == "stream" else df.index
-
-    # עמודות מחיר
-    o = df.loc[idx, open_col].astype(float)
-    h = df.loc[idx, high_col].astype(float)
-    l = df.loc[idx, low_col ].astype(float)
-    c = df.loc[idx, close_col].astype(float)
-
-    # גדלים בסיסיים לנר
-    body = (c - o).abs()
-    rng  = (h - l).astype(float)
-    rng = rng.where(rng != 0, np.nan)     # להימנע מחלוקה באפס
-    upper_shadow = h - pd.concat([o, c], axis=1).max(axis=1)
-    lower_shadow = pd.concat([o, c], axis=1).min(axis=1) - l
-    mid_price = (h + l) / 2.0
-
-    # בסיס: ירוק/אדום/דו'גי (ללא NONE)
-    is_green = c > o
-    is_red   = c < o
-    is_equal = ~(is_green | is_red)       # close == open
-
-    # DOJI: גוף קטן יחסית לטווח + הטווח לא מיקרוסקופי
-    doji_by_body = (body <= doji_body_frac * rng)
-    doji_by_range = ((rng / mid_price.replace(0, np.nan)).abs() >= doji_min_range_pct)
-    is_doji = (doji_by_body & doji_by_range) | is_equal
-
-    # HAMMER: lower גדול, upper קטן
-    is_hammer = (
-        (lower_shadow >= hammer_shadow_ratio * body) &
-        (upper_shadow <= hammer_upper_to_body * body)
-    )
-
-    # SHOOTING STAR: upper גדול, lower קטן
-    is_star = (
-        (upper_shadow >= star_shadow_ratio * body) &
-        (lower_shadow <= star_lower_to_body * body)
-    )
-
-    # ---- Engulfing (מקלה) צריך גם נר קודם ----
-    prev_o = df[open_col].shift(1).astype(float)
-    prev_c = df[close_col].shift(1).astype(float)
-    prev_h = df[high_col].shift(1).astype(float)
-    prev_l = df[low_col ].shift(1).astype(float)
-
-    # גדלי גוף יחסיים כדי לסנן “רעש”
-    prev_rng  = (prev_h - prev_l).replace(0, np.nan)
-    prev_body = (prev_c - prev_o).abs()
-    body_pct_of_range      = (body / rng).replace([np.inf, -np.inf], np.nan)
-    prev_body_pct_of_range = (prev_body / prev_rng).replace([np.inf, -np.inf], np.nan)
-
-    tol = engulf_lenient_tol
-    # *שימי לב*: נבחן את תנאי הבליעה על כל ה-DF (כי צריך prev), ואז נשאב רק ל-idx
-    cur_is_bull = (df[close_col] > df[open_col])
-    cur_is_bear = (df[close_col] < df[open_col])
-    prev_is_bull = (prev_c > prev_o)
-    prev_is_bear = (prev_c < prev_o)
-
-    # בליעה שורית (מקלה): קודם דובי, עכשיו שורי, והגוף הנוכחי "כמעט בולע" את גוף הקודם
-    engulf_bull = (
-        prev_is_bear & cur_is_bull &
-        (df[close_col] >= prev_o * (1 - tol)) &
-        (df[open_col]  <= prev_c * (1 + tol)) &
-        ((body / (df[high_col] - df[low_col]).replace(0, np.nan)) >= min_body_pct_for_engulf)
-    )
-
-    # בליעה דובית (מקלה): קודם שורי, עכשיו דובי, והגוף הנוכחי "כמעט בולע" את גוף הקודם
-    engulf_bear = (
-        prev_is_bull & cur_is_bear &
-        (df[close_col] <= prev_o * (1 + tol)) &
-        (df[open_col]  >= prev_c * (1 - tol)) &
-        ((body / (df[high_col] - df[low_col]).replace(0, np.nan)) >= min_body_pct_for_engulf)
+    params = dict(
+        doji_body_frac=doji_body_frac, doji_min_range_pct=doji_min_range_pct,
+        hammer_shadow_ratio=hammer_shadow_ratio, hammer_upper_to_body=hammer_upper_to_body,
+        star_shadow_ratio=star_shadow_ratio, star_lower_to_body=star_lower_to_body,
+        engulf_lenient_tol=engulf_lenient_tol, min_body_pct_for_engulf=min_body_pct_for_engulf,
     )
-
-    # מצמצמים לאינדקס העבודה בלבד
-    engulf_bull = engulf_bull.reindex(idx, fill_value=False)
-    engulf_bear = engulf_bear.reindex(idx, fill_value=False)
-
-    # ===== יצירת תווית אחת לפי סדר עדיפויות (אין NONE) =====
-    pattern = pd.Series(index=idx, dtype=object)
-
-    # ברירת מחדל תחילה: RED/GREEN/DOJI (כדי שתמיד תהיה תוצאה)
-    pattern[is_red]   = "RED"
-    pattern[is_green] = "GREEN"
-    pattern[is_doji]  = "DOJI"
-
-    # עכשיו דורסים לפי עדיפויות גבוהות יותר:
-    # 1) SHOOTING_STAR
-    pattern[is_star] = "SHOOTING_STAR"
-    # 2) HAMMER
-    pattern[is_hammer] = "HAMMER"
-    # 3) BEARISH_ENGULFING
-    pattern[engulf_bear] = "BEARISH_ENGULFING"
-    # 4) BULLISH_ENGULFING
-    pattern[engulf_bull] = "BULLISH_ENGULFING"
-
-    # כתיבה ל-DF
-    df.loc[idx, "candle_pattern"] = pattern.values
+    cols = [open_col, high_col, low_col, close_col]
+
+    if mode == "stream" and engine is not None:
+        i = df.index[-1]
+        key = df.at[i, "ts"] if "ts" in df.columns else None
+        if engine._n == 0 and len(df) > 1:
+            hist = df[cols].iloc[-K_BARS:-1].to_numpy(dtype=float)
+            keys = df["ts"].iloc[-K_BARS:-1].tolist() if "ts" in df.columns else None
+            engine.bootstrap(hist[:, 0], hist[:, 1], hist[:, 2], hist[:, 3], keys)
+        o, h, l, c = (float(x) for x in df.loc[i, cols].to_numpy(dtype=float))
+        return assign_last_row(df, engine.update(o, h, l, c, key=key))
+
+    # stream בלי engine → רק K_BARS האחרונים; batch → כל הטבלה
+    part = df[cols].iloc[-K_BARS:] if mode == "stream" else df[cols]
+    arr = part.to_numpy(dtype=float)
+    pattern, multi = classify_patterns(arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3], **params)
+
+    if mode == "stream":
+        return assign_last_row(df, {"candle_pattern": pattern[-1], "candle_pattern_multi": multi[-1]})
+    else:
+        df["candle_pattern"] = pattern
+        df["candle_pattern_multi"] = multi
 
     return df
@@ -158,6 +158,7 @@ def ema_update(
             df[pair_abs_col]  = abs_diff.round(6)            # יותר ספרות כי זה במחיר
             df[pair_pct_col]  = spread_pct.round(2)
             df[pair_score_col]= df[pair_abs_col]             # ← הניקוד הוא ההפרש האבסולוטי
+            df[pair_status_col] = pair_status
 
             bad = ~np.isfinite(f) | ~np.isfinite(s)
             df.loc[bad, [pair_abs_col, pair_pct_col, pair_score_col]] = np.nan
@@ -1,21 +1,14 @@
 # technical_analysis/run_technical.py
 from __future__ import annotations
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import pandas as pd
 
 from technical_analysis.ema_technical import ema_update
 from technical_analysis.vwap_technical import vwap_update
 from technical_analysis.bb_technical import bb_update
 from technical_analysis.candle_technical import candle_technical_update  # ← ייבוא בלבד
-
-def _ema_col_name(df: pd.DataFrame, period: int) -> str:
-    no_underscore = f"ema{period}"
-    with_underscore = f"ema_{period}"
-    if no_underscore in df.columns:
-        return no_underscore
-    if with_underscore in df.columns:
-        return with_underscore
-    return no_underscore
+from technical_analysis.stream_technical import TechnicalStream, assign_last_row
+from indicator.feature_plan import ema_col
 
 def add_all_technical(
     df: pd.DataFrame,
@@ -30,10 +23,20 @@ def add_all_technical(
     ema_pairs: List[Tuple[int, int]] = ((12, 21),),
     # Candles
     include_candles: bool = True,   # אפשר לכבות אם תרצה
+    # מצב stream מתמשך (TechnicalStream) → VWAP/BB/EMA לנר האחרון ב-O(1), כתיבה אחת לשורה
+    state: Optional[TechnicalStream] = None,
 ) -> pd.DataFrame:
     if df.empty:
         return df
 
+    if state is not None and mode == "stream":
+        if not state.started:
+            state.bootstrap(df)
+        df = assign_last_row(df, state.update(df.iloc[-1]))
+        if include_candles:
+            df = candle_technical_update(df, mode=mode, engine=state.candles)
+        return df
+
     # ---- VWAP TECH ----
     df = vwap_update(df, mode=mode, on_tol_pct=vwap_on_tol_pct)
 
@@ -42,8 +45,8 @@ def add_all_technical(
 
     # ---- EMA TECH ----
     for fast, slow in ema_pairs:
-        fast_col = _ema_col_name(df, fast)
-        slow_col = _ema_col_name(df, slow)
+        fast_col = ema_col(fast)
+        slow_col = ema_col(slow)
         df = ema_update(
             df,
             mode=mode,
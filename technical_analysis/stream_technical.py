@@ -0,0 +1,200 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.rolling_stats import RollingMoments
+from technical_analysis.candle_patterns import CandlePatternEngine
+from indicator.feature_plan import ema_col
+
+
+def _f(x) -> float:
+    """ערך תא → float (None/NA/מחרוזת לא מספרית → NaN)."""
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _cross_status(prev_a: float, prev_b: float, a: float, b: float, labels: Tuple[str, str, str, str]) -> str:
+    """אותה לוגיקה כמו np.select בענפי batch: NaN בהשוואה → False (כמו shift(1) בשורה הראשונה)."""
+    prev_above = prev_a > prev_b
+    curr_above = a > b
+    if (not prev_above) and curr_above:
+        return labels[0]
+    if prev_above and (not curr_above):
+        return labels[1]
+    return labels[2] if curr_above else labels[3]
+
+
+def _level_dist_score(c: float, v: float, on_tol_pct: float) -> Tuple[float, float]:
+    """מחיר מול קו (VWAP/EMA) – dist_pct, score כמו בענף batch (כולל עיגול)."""
+    if not (np.isfinite(c) and np.isfinite(v)):
+        return np.nan, np.nan
+    dist = abs(c - v) / abs(v) * 100.0 if v != 0.0 else np.nan
+    score = min(max(100.0 - dist, 0.0), 100.0) if dist > on_tol_pct else 100.0
+    return float(np.round(dist, 2)), float(np.round(score, 2))
+
+
+_VWAP_LABELS = ("VWAP = CROSSOVER", "VWAP = CROSSUNDER", "VWAP < CLOSE", "VWAP > CLOSE")
+_EMA_LABELS = ("EMA = CROSSOVER", "EMA = CROSSUNDER", "EMA < CLOSE", "EMA > CLOSE")
+_PAIR_LABELS = ("EMA FAST = CROSSOVER", "EMA FAST = CROSSUNDER", "FAST_ABOVE_SLOW", "FAST_BELOW_SLOW")
+
+
+class TechnicalStream:
+    """
+    מעריך סטטוס/ציון של VWAP/BB/EMA לנר החדש בלבד, מתוך מצב זעיר של הנר הקודם
+    (close, vwap, EMAs) + חלון closes ל-BB כשאין עמודות בסיס. O(1) להיסטוריה.
+    התוצאות זהות לענפי mode="batch" של vwap_update / bb_update / ema_update.
+    אותו ts פעמיים ברצף (amend של הנר האחרון) → מחושב מחדש מול אותו נר קודם.
+    """
+
+    def __init__(
+        self,
+        *,
+        vwap_on_tol_pct: float = 0.02,
+        bb_window: int = 20,
+        bb_num_std: float = 2.0,
+        ema_pairs: Iterable[Tuple[int, int]] = ((12, 21),),
+        ema_on_tol_pct: float = 0.02,
+        close_col: str = "close",
+        vwap_col: str = "vwap",
+        eps: float = 1e-9,
+        tol: float = 1e-12,
+    ):
+        self.vwap_on_tol_pct = float(vwap_on_tol_pct)
+        self.bb_window = int(bb_window)
+        self.bb_num_std = float(bb_num_std)
+        self.ema_pairs = [(int(f), int(s)) for f, s in ema_pairs]
+        self.ema_on_tol_pct = float(ema_on_tol_pct)
+        self.close_col = close_col
+        self.vwap_col = vwap_col
+        self.eps = float(eps)
+        self.tol = float(tol)
+
+        self._ema_cols: Dict[int, str] = {p: ema_col(p) for pair in self.ema_pairs for p in pair}
+        self._prev: Dict[str, float] = {}
+        self._closes = RollingMoments(window=self.bb_window)  # BB כשאין עמודות בסיס – O(1)
+        self._saved: Optional[Dict[str, float]] = None
+        self._last_ts = None
+        self.started = False
+        self.candles = CandlePatternEngine()  # תבניות נרות – ring buffer משלו
+
+    # ---------- מצב ----------
+    def _tracked(self):
+        return [self.close_col, self.vwap_col, *self._ema_cols.values()]
+
+    def bootstrap(self, df: pd.DataFrame) -> None:
+        """אתחול חד-פעמי מהנר הלפני-אחרון של df (והחלון שלפניו), לפני update על הנר האחרון."""
+        self._prev = {}
+        if len(df) >= 2:
+            prev = df.iloc[-2]
+            self._prev = {c: _f(prev[c]) if c in df.columns else np.nan for c in self._tracked()}
+            tail = pd.to_numeric(df[self.close_col].iloc[-self.bb_window - 1:-1], errors="coerce")
+            for c in tail.astype(float).tolist():
+                self._closes.update(c)
+        self.started = True
+
+    # ---------- חישוב ----------
+    def _bb(self, c: float, row: Mapping[str, Any]) -> Tuple[Dict[str, Any], float, float, float]:
+        base: Dict[str, Any] = {}
+        if all(k in row for k in ("bb_mid", "bb_up", "bb_low")):
+            mid, up, low = _f(row["bb_mid"]), _f(row["bb_up"]), _f(row["bb_low"])
+        elif self._closes.ready:
+            mid = self._closes.mean
+            std = self._closes.std(ddof=0)
+            up, low = mid + self.bb_num_std * std, mid - self.bb_num_std * std
+            width = (up - low) / mid * 100 if mid else np.nan
+            base = {"bb_mid": mid, "bb_up": up, "bb_low": low,
+                    "bb_width": width if np.isfinite(width) else np.nan}
+        else:
+            mid = up = low = np.nan
+            base = {"bb_mid": np.nan, "bb_up": np.nan, "bb_low": np.nan, "bb_width": np.nan}
+        return base, mid, up, low
+
+    def update(self, row: Mapping[str, Any]) -> Dict[str, Any]:
+        """row = השורה של הנר החדש (אחרי אינדיקטורים). מחזיר {עמודה: ערך} של הטכניקל."""
+        ts = row.get("ts") if hasattr(row, "get") else None
+        amend = ts is not None and ts == self._last_ts and self._saved is not None
+        if amend:
+            self._prev = dict(self._saved)
+        self._saved = dict(self._prev)
+        self._last_ts = ts
+
+        prev = self._prev
+        c = _f(row.get(self.close_col))
+        pc = prev.get(self.close_col, np.nan)
+        out: Dict[str, Any] = {}
+
+        # ---- VWAP ----
+        v = _f(row.get(self.vwap_col))
+        out["vwap_dist_pct"], out["vwap_score"] = _level_dist_score(c, v, self.vwap_on_tol_pct)
+        out["vwap_status"] = _cross_status(pc, prev.get(self.vwap_col, np.nan), c, v, _VWAP_LABELS)
+
+        # ---- BB ----
+        if amend:
+            self._closes.replace_last(c)
+        else:
+            self._closes.update(c)
+        base, mid, up, low = self._bb(c, row)
+        out.update(base)
+        if not all(np.isfinite(x) for x in (c, mid, up, low)):
+            out["bb_status"], out["bb_score"] = "CENTER", np.nan
+        else:
+            half_up = max(abs(up - mid), self.eps)
+            half_low = max(abs(mid - low), self.eps)
+            out["bb_score"] = abs(c - mid) / (half_up if c >= mid else half_low) * 100.0
+            if c > up:
+                out["bb_status"] = "BREAK_UP"
+            elif c < low:
+                out["bb_status"] = "BREAK_DOWN"
+            elif abs(c - mid) <= self.tol:
+                out["bb_status"] = "CENTER"
+            elif c > mid:
+                out["bb_status"] = "UPPER_HALF"
+            else:
+                out["bb_status"] = "LOWER_HALF"
+
+        # ---- EMA (זוג + איטי מול המחיר) ----
+        emas = {p: _f(row.get(col)) if col in row else np.nan for p, col in self._ema_cols.items()}
+        for fast, slow in self.ema_pairs:
+            fcol, scol = self._ema_cols[fast], self._ema_cols[slow]
+            if fcol in row and scol in row:
+                f, s = emas[fast], emas[slow]
+                if np.isfinite(f) and np.isfinite(s):
+                    abs_diff = float(np.round(abs(f - s), 6))
+                    pct = float(np.round(abs(f - s) / abs(s) * 100.0, 2)) if s != 0.0 else np.nan
+                else:
+                    abs_diff = pct = np.nan
+                out[f"ema_pair_abs_diff_{fast}_{slow}"] = abs_diff
+                out[f"ema_pair_spread_pct_{fast}_{slow}"] = pct
+                out[f"ema_pair_score_{fast}_{slow}"] = abs_diff
+                out[f"ema_pair_status_{fast}_{slow}"] = _cross_status(
+                    prev.get(fcol, np.nan), prev.get(scol, np.nan), f, s, _PAIR_LABELS)
+            if scol in row:
+                e = emas[slow]
+                out[f"ema_dist_pct_{slow}"], out[f"ema_score_{slow}"] = _level_dist_score(c, e, self.ema_on_tol_pct)
+                out[f"ema_status_{slow}"] = _cross_status(pc, prev.get(scol, np.nan), c, e, _EMA_LABELS)
+
+        self._prev = {self.close_col: c, self.vwap_col: v,
+                      **{col: emas[p] for p, col in self._ema_cols.items()}}
+        return out
+
+
+def assign_last_row(df: pd.DataFrame, values: Mapping[str, Any]) -> pd.DataFrame:
+    """כותב dict לשורה האחרונה: עמודה חדשה נוצרת פעם אחת בטיפוס הנכון, אחר כך df.at בלבד."""
+    return assign_row(df, df.index[-1], values)
+
+
+def assign_row(df: pd.DataFrame, i, values: Mapping[str, Any]) -> pd.DataFrame:
+    """כמו assign_last_row לשורה עם label i (למשל שורה שמתעדכנת אחרי שנסגרה)."""
+    missing = [col for col in values if col not in df.columns]
+    if missing:
+        # כל העמודות החדשות ב-concat אחד (insert אחד-אחד מפצל את ה-frame לבלוקים)
+        df = pd.concat([df, pd.DataFrame(
+            {col: pd.Series(None, index=df.index, dtype=object) if isinstance(values[col], str) else np.nan
+             for col in missing}, index=df.index)], axis=1)
+    for col, val in values.items():
+        df.at[i, col] = val
+    return df
@@ -0,0 +1,271 @@
+# technical_live/book_accumulator.py
+# פיצ'רי top of book משוקללי-זמן לנר: כל עדכון ספר סוגר את המקטע הקודם (המצב שהיה בתוקף עד עכשיו)
+# ומוסיף אותו לאינטגרלים – O(1) לעדכון, בלי לסרוק את העדכונים בסגירה.
+#   spread (TWAP, min/max, אחוז הזמן בספרד הרחב ביותר), mid, queue imbalance ברמה 1,
+#   microprice = (ask·bid_qty + bid·ask_qty)/(bid_qty + ask_qty) וסטייתו מה-mid ב-bps.
+# הציר: ברי זמן – אותה רשת של WindowClock/CandleEngine (step_ms, epoch-aligned), החלון נחתך אוטומטית
+# כשמגיע עדכון מעבר לגבול; ברי אירועים – step_ms=None, החלון נחתך ב-take(t1).
+# המצב שבתוקף בתחילת החלון נספר מהתחלת החלון (carry), כמו שהספר באמת נראה.
+# OFI (order-flow imbalance, Cont–Kukanov–Stoikov; רב-רמתי כמו Xu et al.) מחושב פעם אחת לסימבול
+# ב-OrderFlowImbalance מול ה-n רמות הקודמות, ונסכם לכל נר באותם חלונות.
+
+from __future__ import annotations
+import math
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOB_FEATURES = (
+    "ob_spread_twap", "ob_spread_min", "ob_spread_max", "ob_spread_max_time_pct",
+    "ob_mid_twap", "ob_imbalance_tw", "ob_microprice_tw", "ob_micro_dev_bps_tw",
+    "ob_book_updates", "ob_quote_coverage",
+)
+
+
+def ofi_columns(levels: int) -> Tuple[str, ...]:
+    return ("ob_ofi_l1", f"ob_ofi_l{levels}", "ob_ofi_l1_norm", f"ob_ofi_l{levels}_norm")
+
+
+class OrderFlowImbalance:
+    """
+    OFI לכל עדכון ספר מול הרמות של העדכון הקודם, לכל רמה k=1..levels:
+      e_bid = q_new·[p_new ≥ p_old] − q_old·[p_new ≤ p_old]
+      e_ask = q_new·[p_new ≤ p_old] − q_old·[p_new ≥ p_old]
+      ofi_k = e_bid − e_ask
+    רמה חסרה = מחיר ‎-inf (bid) / ‎+inf (ask) וכמות 0. O(levels) לעדכון – רק n הרמות הטובות, בלי diff של כל הספר.
+    """
+
+    def __init__(self, levels: int = 5):
+        self.levels = max(int(levels), 1)
+        self._prev: Optional[Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]] = None
+
+    def update(self, bids: Sequence[Tuple[float, float]], asks: Sequence[Tuple[float, float]]
+               ) -> Optional[Tuple[float, float, float, float]]:
+        """bids יורד / asks עולה (OrderBookBuffer.depth). מחזיר (ofi_l1, ofi_lN, depth_l1, depth_lN) או None בעדכון הראשון."""
+        n = self.levels
+        bids, asks = list(bids[:n]), list(asks[:n])
+        prev, self._prev = self._prev, (bids, asks)
+        if prev is None:
+            return None
+        pb, pa = prev
+        ofi_1 = ofi_n = 0.0
+        for k in range(n):
+            nbp, nbq = bids[k] if k < len(bids) else (-math.inf, 0.0)
+            obp, obq = pb[k] if k < len(pb) else (-math.inf, 0.0)
+            nap, naq = asks[k] if k < len(asks) else (math.inf, 0.0)
+            oap, oaq = pa[k] if k < len(pa) else (math.inf, 0.0)
+            e_bid = (nbq if nbp >= obp else 0.0) - (obq if nbp <= obp else 0.0)
+            e_ask = (naq if nap <= oap else 0.0) - (oaq if nap >= oap else 0.0)
+            e = e_bid - e_ask
+            ofi_n += e
+            if k == 0:
+                ofi_1 = e
+        d1 = ((bids[0][1] if bids else 0.0) + (asks[0][1] if asks else 0.0)) / 2.0
+        dn = (sum(q for _, q in bids) + sum(q for _, q in asks)) / 2.0
+        return ofi_1, ofi_n, d1, dn
+
+
+class _Window:
+    __slots__ = ("start_ms", "end_ms", "covered", "s_spread", "s_mid", "s_imb", "s_micro", "s_dev",
+                 "spread_min", "spread_max", "t_at_max", "updates",
+                 "ofi_levels", "ofi_1", "ofi_n", "depth_1", "depth_n", "ofi_count")
+
+    def __init__(self, start_ms: int, end_ms: Optional[int], ofi_levels: int = 0):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.covered = 0.0          # ms עם quote תקין
+        self.s_spread = self.s_mid = self.s_imb = self.s_micro = self.s_dev = 0.0
+        self.spread_min = math.inf
+        self.spread_max = -math.inf
+        self.t_at_max = 0.0
+        self.updates = 0
+        self.ofi_levels = ofi_levels
+        self.ofi_1 = self.ofi_n = self.depth_1 = self.depth_n = 0.0
+        self.ofi_count = 0
+
+    def _ofi_features(self) -> Dict[str, float]:
+        if not self.ofi_levels:
+            return {}
+        c1, cn, n1, nn = ofi_columns(self.ofi_levels)
+        m1 = self.depth_1 / self.ofi_count if self.ofi_count else 0.0
+        mn = self.depth_n / self.ofi_count if self.ofi_count else 0.0
+        return {
+            c1: self.ofi_1, cn: self.ofi_n,
+            # מנורמל בעומק הממוצע של אותן רמות בזמן העדכונים
+            n1: self.ofi_1 / m1 if m1 > 0 else np.nan,
+            nn: self.ofi_n / mn if mn > 0 else np.nan,
+        }
+
+    def features(self, end_ms: int) -> Dict[str, float]:
+        span = max(end_ms - self.start_ms, 0)
+        c = self.covered
+        if c <= 0:
+            out = {k: np.nan for k in TOB_FEATURES}
+            out["ob_book_updates"] = float(self.updates)
+            out["ob_quote_coverage"] = 0.0
+            out.update(self._ofi_features())
+            return out
+        out = {
+            "ob_spread_twap": self.s_spread / c,
+            "ob_spread_min": self.spread_min,
+            "ob_spread_max": self.spread_max,
+            "ob_spread_max_time_pct": self.t_at_max / c * 100.0,
+            "ob_mid_twap": self.s_mid / c,
+            "ob_imbalance_tw": self.s_imb / c,
+            "ob_microprice_tw": self.s_micro / c,
+            "ob_micro_dev_bps_tw": self.s_dev / c,
+            "ob_book_updates": float(self.updates),
+            "ob_quote_coverage": c / span if span > 0 else 1.0,
+        }
+        out.update(self._ofi_features())
+        return out
+
+
+class TopOfBookAccumulator:
+    """
+    on_book(ts_ms, bid, ask, bid_qty, ask_qty, ofi=...) לכל עדכון; take(t0_ms, t1_ms) בסגירת הנר.
+    חלונות שנחתכו אוטומטית (ברי זמן) נשמרים עד keep_closed אחרונים – הסגירה מגיעה אחרי grace.
+    ofi_levels > 0 → גם סכומי OFI לנר (ofi = התוצאה של OrderFlowImbalance.update לאותו עדכון).
+    """
+
+    def __init__(self, step_ms: Optional[int] = None, *, keep_closed: int = 16, ofi_levels: int = 0):
+        self.step_ms = int(step_ms) if step_ms else None
+        self.ofi_levels = int(ofi_levels)
+        self.keep_closed = int(keep_closed)
+        self._state: Optional[Tuple[float, float, float, float, float]] = None  # spread, mid, imb, micro, dev
+        self._last_ms: Optional[int] = None
+        self._win: Optional[_Window] = None
+        self._closed: "OrderedDict[int, Dict[str, float]]" = OrderedDict()
+        self._taken: Optional[Tuple[int, Dict[str, float]]] = None
+
+    # ---------- עזר ----------
+    @staticmethod
+    def _derive(bid: float, ask: float, bq: float, aq: float):
+        if not (np.isfinite(bid) and np.isfinite(ask)) or ask < bid:
+            return None
+        mid = (bid + ask) / 2.0
+        spread = ask - bid
+        qsum = bq + aq if (np.isfinite(bq) and np.isfinite(aq)) else 0.0
+        if qsum > 0:
+            imb = (bq - aq) / qsum
+            micro = (ask * bq + bid * aq) / qsum
+        else:
+            imb, micro = 0.0, mid
+        dev = (micro - mid) / mid * 1e4 if mid else 0.0
+        return spread, mid, imb, micro, dev
+
+    def _bucket(self, ts_ms: int) -> int:
+        return ts_ms - ts_ms % self.step_ms
+
+    def _integrate(self, until_ms: int) -> None:
+        """המצב הנוכחי בתוקף מ-_last_ms עד until_ms → לאינטגרלים של החלון הפתוח."""
+        w = self._win
+        if w is None or self._last_ms is None:
+            return
+        dt = float(until_ms - self._last_ms)
+        if dt <= 0 or self._state is None:
+            return
+        spread, mid, imb, micro, dev = self._state
+        w.covered += dt
+        w.s_spread += spread * dt
+        w.s_mid += mid * dt
+        w.s_imb += imb * dt
+        w.s_micro += micro * dt
+        w.s_dev += dev * dt
+        w.spread_min = min(w.spread_min, spread)
+        tol = 1e-9 * mid  # ask-bid על רשת טיק לא יוצא מדויק ב-float
+        if spread > w.spread_max + tol:
+            w.spread_max, w.t_at_max = spread, dt
+        elif spread >= w.spread_max - tol:
+            w.spread_max = max(w.spread_max, spread)
+            w.t_at_max += dt
+
+    def _cut(self, end_ms: int) -> Dict[str, float]:
+        """סוגר את החלון הפתוח ב-end_ms ופותח חדש ממנו (המצב הנוכחי ממשיך)."""
+        self._integrate(end_ms)
+        w = self._win
+        feats = w.features(end_ms)
+        self._last_ms = max(self._last_ms or end_ms, end_ms)
+        self._win = _Window(end_ms, end_ms + self.step_ms if self.step_ms else None, self.ofi_levels)
+        return feats
+
+    def _roll_to(self, ts_ms: int) -> None:
+        """
+        סוגר חלונות עד זה שמכיל ts_ms (ברי זמן). חלונות ריקים באמצע – המצב האחרון נמשך בהם;
+        נשמרים רק keep_closed אחרונים, אז קופצים ישר לחלון הראשון שעוד יישמר במקום לחתוך אחד-אחד.
+        """
+        w = self._win
+        if ts_ms < w.end_ms:
+            return
+        self._store(w.start_ms, self._cut(w.end_ms))
+        first = max(self._win.start_ms, self._bucket(ts_ms) - self.keep_closed * self.step_ms)
+        if first > self._win.start_ms:
+            self._win = _Window(first, first + self.step_ms, self.ofi_levels)
+            self._last_ms = first
+        while ts_ms >= self._win.end_ms:
+            self._store(self._win.start_ms, self._cut(self._win.end_ms))
+
+    def _store(self, start_ms: int, feats: Dict[str, float]) -> None:
+        self._closed[start_ms] = feats
+        while len(self._closed) > self.keep_closed:
+            self._closed.popitem(last=False)
+
+    # ---------- API ----------
+    def on_book(self, ts_ms: int, bid: float, ask: float, bid_qty: float = np.nan, ask_qty: float = np.nan,
+                ofi: Optional[Tuple[float, float, float, float]] = None) -> None:
+        ts_ms = int(ts_ms)
+        if ts_ms <= 0:
+            return  # עדכון בלי ts אמיתי – היה פותח חלון ב-epoch 0
+        if self._last_ms is not None and ts_ms < self._last_ms:
+            ts_ms = self._last_ms  # עדכון לא מסודר – נכנס כרגע, לא משכתבים עבר
+        if self._win is None:
+            start = self._bucket(ts_ms) if self.step_ms else ts_ms
+            self._win = _Window(start, start + self.step_ms if self.step_ms else None, self.ofi_levels)
+            self._last_ms = ts_ms
+        elif self.step_ms:
+            self._roll_to(ts_ms)  # חציית גבול נר: סוגרים (גם נרות ריקים – המצב נמשך)
+        self._integrate(ts_ms)
+        self._last_ms = ts_ms
+        self._state = self._derive(float(bid), float(ask), float(bid_qty), float(ask_qty))
+        w = self._win
+        w.updates += 1
+        if ofi is not None and self.ofi_levels:
+            w.ofi_1 += ofi[0]
+            w.ofi_n += ofi[1]
+            w.depth_1 += ofi[2]
+            w.depth_n += ofi[3]
+            w.ofi_count += 1
+
+    def take(self, t0_ms: int, t1_ms: int) -> Dict[str, float]:
+        """פיצ'רי החלון [t0, t1). תיקון (amend) של אותו נר → אותה תוצאה."""
+        t0_ms, t1_ms = int(t0_ms), int(t1_ms)
+        if self._taken is not None and self._taken[0] == t0_ms:
+            return dict(self._taken[1])
+        if self._win is None:
+            return {}
+        if self.step_ms:
+            self._roll_to(t0_ms)  # אין עדכונים מאז – המצב נמשך עד הנר המבוקש
+            if t0_ms in self._closed:
+                feats = self._closed.pop(t0_ms)
+            elif self._win.start_ms == t0_ms:
+                feats = self._cut(self._win.end_ms)
+            else:
+                return {}  # נזרק (ישן מ-keep_closed) או לפני העדכון הראשון
+        else:
+            feats = self._cut(t1_ms)
+        self._taken = (t0_ms, feats)
+        return dict(feats)
+
+    def peek(self, now_ms: int) -> Dict[str, float]:
+        """פיצ'רי החלון הפתוח עד now (לשורה הזמנית) – בלי לשנות מצב."""
+        w = self._win
+        if w is None:
+            return {}
+        saved = (w.covered, w.s_spread, w.s_mid, w.s_imb, w.s_micro, w.s_dev,
+                 w.spread_min, w.spread_max, w.t_at_max)
+        self._integrate(int(now_ms))
+        feats = w.features(int(now_ms))
+        (w.covered, w.s_spread, w.s_mid, w.s_imb, w.s_micro, w.s_dev,
+         w.spread_min, w.spread_max, w.t_at_max) = saved
+        return feats
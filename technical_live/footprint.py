@@ -0,0 +1,177 @@
+# technical_live/footprint.py
+# footprint / volume profile לנר: נפח קונים ומוכרים לכל דלי מחיר (tick_size או bps מה-open),
+# בחישוב np.bincount על אינדקסי הדליים (בלי groupby). מהפרופיל:
+#   POC (הדלי עם הנפח הגדול), value area (VAH/VAL – מתרחבים מה-POC לצד הכבד עד value_area מהנפח),
+#   דלתא ב-POC.
+# לשורת הנר נכנס רק סיכום קבוע (th_fp_*); המערכים עצמם נשמרים בטבלת צד לפי ts של הנר (FootprintTable),
+# כך ש-df_all לא מתפוצץ בעמודות.
+
+from __future__ import annotations
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from io_utils.storage import append_side_table, load_side_table, save_side_table
+
+FOOTPRINT_FEATURES = (
+    "th_fp_poc_price", "th_fp_poc_vol_pct", "th_fp_poc_delta",
+    "th_fp_vah", "th_fp_val", "th_fp_va_width_bps", "th_fp_close_vs_poc_bps",
+    "th_fp_buckets", "th_fp_bucket_size",
+)
+
+
+def bucket_size_for(ref_price: float, tick_size: Optional[float] = None, bucket_bps: Optional[float] = None) -> float:
+    """tick_size (כשידוע) קודם; אחרת bucket_bps מה-ref (ה-open של הנר)."""
+    if tick_size:
+        return float(tick_size)
+    if bucket_bps and ref_price > 0:
+        return float(ref_price) * float(bucket_bps) / 10_000.0
+    return np.nan
+
+
+def value_area(vol: np.ndarray, poc: int, frac: float = 0.70) -> Tuple[int, int]:
+    """[lo, hi] סביב ה-POC שמכסה לפחות frac מהנפח – בכל צעד לדלי השכן הכבד יותר (שוויון → למעלה)."""
+    total = float(vol.sum())
+    target = frac * total
+    lo = hi = poc
+    covered = float(vol[poc])
+    n = len(vol)
+    while covered < target and (lo > 0 or hi < n - 1):
+        up = vol[hi + 1] if hi < n - 1 else -1.0
+        down = vol[lo - 1] if lo > 0 else -1.0
+        if up >= down:
+            hi += 1
+            covered += up
+        else:
+            lo -= 1
+            covered += down
+    return lo, hi
+
+
+def compute_footprint(
+    price,
+    size,
+    is_buy,
+    is_sell,
+    *,
+    ref_price: Optional[float] = None,
+    close: Optional[float] = None,
+    tick_size: Optional[float] = None,
+    bucket_bps: Optional[float] = 5.0,
+    value_area_frac: float = 0.70,
+) -> Tuple[Dict[str, float], Optional[Dict[str, Any]]]:
+    """
+    → (סיכום th_fp_* לשורה, פרופיל לטבלת הצד: base_price, bucket_size, buy[], sell[]).
+    טרייד בלי צד נספר בנפח הכולל (ל-POC/VA) אבל לא ב-buy/sell.
+    """
+    price = np.asarray(price, dtype=float)
+    size = np.asarray(size, dtype=float)
+    ok = np.isfinite(price) & np.isfinite(size) & (size > 0)
+    empty = {k: np.nan for k in FOOTPRINT_FEATURES}
+    empty["th_fp_buckets"] = 0.0
+    if not ok.any():
+        return empty, None
+    p, s = price[ok], size[ok]
+    b_mask = np.asarray(is_buy, dtype=bool)[ok]
+    s_mask = np.asarray(is_sell, dtype=bool)[ok]
+
+    ref = float(ref_price) if ref_price is not None and math.isfinite(ref_price) else float(p[0])
+    bucket = bucket_size_for(ref, tick_size, bucket_bps)
+    if not (bucket > 0):
+        return empty, None
+    # epsilon: מחיר על רשת הטיק מחולק בטיק לא יוצא שלם ב-float
+    raw = np.floor(p / bucket + 1e-9).astype(np.int64)
+    base = int(raw.min())
+    idx = raw - base
+    n = int(idx.max()) + 1
+    vol = np.bincount(idx, weights=s, minlength=n)
+    buy = np.bincount(idx, weights=np.where(b_mask, s, 0.0), minlength=n)
+    sell = np.bincount(idx, weights=np.where(s_mask, s, 0.0), minlength=n)
+
+    poc = int(np.argmax(vol))
+    lo, hi = value_area(vol, poc, value_area_frac)
+    base_price = base * bucket
+    poc_price = base_price + (poc + 0.5) * bucket  # מרכז הדלי
+    vah = base_price + (hi + 1) * bucket
+    val = base_price + lo * bucket
+    total = float(vol.sum())
+    close = float(close) if close is not None and math.isfinite(close) else float(p[-1])
+
+    feats = {
+        "th_fp_poc_price": poc_price,
+        "th_fp_poc_vol_pct": float(vol[poc]) / total * 100.0 if total > 0 else np.nan,
+        "th_fp_poc_delta": float(buy[poc] - sell[poc]),
+        "th_fp_vah": vah,
+        "th_fp_val": val,
+        "th_fp_va_width_bps": (vah - val) / poc_price * 1e4 if poc_price else np.nan,
+        "th_fp_close_vs_poc_bps": (close - poc_price) / poc_price * 1e4 if poc_price else np.nan,
+        "th_fp_buckets": float(np.count_nonzero(vol)),
+        "th_fp_bucket_size": bucket,
+    }
+    profile = {"base_price": base_price, "bucket_size": bucket, "buy": buy, "sell": sell}
+    return feats, profile
+
+
+class FootprintTable:
+    """
+    טבלת צד של פרופילי הנרות (symbol, interval): ts → base_price, bucket_size, buy[], sell[].
+    נשמרת לצד df_all (data/processed/<symbol>_<interval>_footprint.parquet). אותו ts שוב (amend) מחליף.
+    בזיכרון – max_rows האחרונות. save() כותב רק שורות חדשות/מתוקנות כ-part; כל compact_every parts
+    נכתבת הטבלה המלאה (החתוכה ל-max_rows) והחלקים נמחקים.
+    """
+
+    NAME = "footprint"
+    COLUMNS: List[str] = ["ts", "base_price", "bucket_size", "buy", "sell"]
+
+    def __init__(self, symbol: str, interval: str, max_rows: Optional[int] = None, compact_every: int = 64):
+        self.symbol = symbol
+        self.interval = interval
+        self.max_rows = max_rows
+        self.compact_every = max(int(compact_every), 1)
+        self._rows: Dict[pd.Timestamp, Dict[str, Any]] = {}
+        self._dirty: set = set()
+        old = load_side_table(symbol, interval, self.NAME)
+        if old is not None and not old.empty:
+            if max_rows:
+                old = old.tail(max_rows)
+            for r in old.to_dict("records"):
+                ts = pd.Timestamp(r["ts"])
+                self._rows[ts.tz_localize("UTC") if ts.tzinfo is None else ts] = r
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, ts, profile: Optional[Dict[str, Any]]) -> None:
+        if profile is None:
+            return
+        ts = pd.to_datetime(ts, utc=True)
+        self._rows[ts] = {
+            "ts": ts,
+            "base_price": float(profile["base_price"]),
+            "bucket_size": float(profile["bucket_size"]),
+            "buy": np.asarray(profile["buy"], dtype=float).tolist(),
+            "sell": np.asarray(profile["sell"], dtype=float).tolist(),
+        }
+        self._dirty.add(ts)
+        if self.max_rows and len(self._rows) > self.max_rows:
+            for k in list(self._rows)[:len(self._rows) - self.max_rows]:
+                del self._rows[k]
+
+    def get(self, ts) -> Optional[Dict[str, Any]]:
+        return self._rows.get(pd.to_datetime(ts, utc=True))
+
+    def to_frame(self) -> pd.DataFrame:
+        if not self._rows:
+            return pd.DataFrame(columns=self.COLUMNS)
+        return pd.DataFrame(sorted(self._rows.values(), key=lambda r: r["ts"]), columns=self.COLUMNS)
+
+    def save(self) -> None:
+        fresh = [self._rows[ts] for ts in sorted(self._dirty) if ts in self._rows]
+        self._dirty.clear()
+        if not fresh:
+            return
+        parts = append_side_table(pd.DataFrame(fresh, columns=self.COLUMNS), self.symbol, self.interval, self.NAME)
+        if parts >= self.compact_every:
+            save_side_table(self.to_frame(), self.symbol, self.interval, self.NAME)
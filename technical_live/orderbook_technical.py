@@ -7,6 +7,7 @@ from __future__ import annotations
 from typing import Dict, Any, List, Tuple, Optional
 from statistics import median
 import math
+import heapq
 import itertools
 
 # ---------- עזר סטטיסטי בסיסי ----------
@@ -22,10 +23,13 @@ def _percentile(values: List[float], q: float) -> float:
         return min(values)
     if q >= 100:
         return max(values)
-    arr = sorted(values)
-    k = math.ceil((q / 100.0) * len(arr)) - 1
-    k = max(0, min(k, len(arr)-1))
-    return arr[k]
+    n = len(values)
+    k = math.ceil((q / 100.0) * n) - 1
+    k = max(0, min(k, n-1))
+    # בחירה חלקית במקום מיון מלא: heap בגודל min(k+1, n-k) (לאחוזון 90 – רק העשירון העליון)
+    if k < n - k:
+        return heapq.nsmallest(k + 1, values)[-1]
+    return heapq.nlargest(n - k, values)[-1]
 
 def _nlargest_by_qty(d: Dict[float, float], n: int) -> List[Tuple[float, float]]:
     """Top-N לפי כמות (qty) מדיקט price->qty. מחזיר [(price, qty), ...]"""
@@ -0,0 +1,132 @@
+# technical_live/realized_vol.py
+# תנודתיות ממומשת לנר (ליחידת נר, לא משונתת – sqrt של השונות):
+#   rv_tick       – סכום ריבועי log-returns בין טריידים עוקבים
+#   rv_1s         – אותו דבר על רשת שנייה (המחיר האחרון בכל שנייה) – פחות רגיש לרעש bid/ask bounce
+#   vol_parkinson – (ln H/L)² / (4 ln 2)
+#   vol_gk        – Garman-Klass: ½(ln H/L)² − (2 ln 2 − 1)(ln C/O)²
+#   vol_rs        – Rogers-Satchell: ln(H/C)·ln(H/O) + ln(L/C)·ln(L/O)
+# שני הראשונים מצטברים טרייד-טרייד ב-LiveCandle (graphs_time) – כאן רק קוראים אותם; לנתיב בלי נר רץ
+# ולבקפיל יש trade_variances על הצ'אנק. הגרסאות המתגלגלות (sqrt של ממוצע השונות ב-N נרות) –
+# RollingMoments, O(1) לנר, כולל amend.
+
+from __future__ import annotations
+import math
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.rolling_stats import RollingMoments
+
+VOL_ESTIMATORS = ("rv_tick", "rv_1s", "vol_parkinson", "vol_gk", "vol_rs")
+_LN2 = math.log(2.0)
+
+
+def ohlc_variances(o: float, h: float, l: float, c: float) -> Dict[str, float]:
+    """שונויות Parkinson / Garman-Klass / Rogers-Satchell לנר אחד. מחיר לא חיובי → NaN."""
+    if not (o > 0 and h > 0 and l > 0 and c > 0):
+        return {"vol_parkinson": np.nan, "vol_gk": np.nan, "vol_rs": np.nan}
+    hl = math.log(h / l)
+    co = math.log(c / o)
+    return {
+        "vol_parkinson": hl * hl / (4.0 * _LN2),
+        "vol_gk": max(0.5 * hl * hl - (2.0 * _LN2 - 1.0) * co * co, 0.0),
+        "vol_rs": math.log(h / c) * math.log(h / o) + math.log(l / c) * math.log(l / o),
+    }
+
+
+def trade_variances(ts_ms, price, grid_ms: int = 1000) -> Dict[str, float]:
+    """
+    rv_tick / rv_1s מהצ'אנק (וקטורי) – אותן הגדרות כמו LiveCandle: סדר לפי ts (יציב),
+    רשת = המחיר האחרון בכל grid_ms, מעוגן במחיר הראשון.
+    """
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    price = np.asarray(price, dtype=float)
+    ok = np.isfinite(price) & (price > 0)
+    ts_ms, price = ts_ms[ok], price[ok]
+    if len(price) < 2:
+        return {"rv_tick": 0.0 if len(price) else np.nan, "rv_1s": 0.0 if len(price) else np.nan}
+    order = np.argsort(ts_ms, kind="stable")
+    ts_ms, lp = ts_ms[order], np.log(price[order])
+    r = np.diff(lp)
+    b = ts_ms // int(grid_ms)
+    last_in_bucket = np.r_[b[1:] != b[:-1], True]
+    grid = np.r_[lp[0], lp[last_in_bucket]]
+    g = np.diff(grid)
+    return {"rv_tick": float(np.dot(r, r)), "rv_1s": float(np.dot(g, g))}
+
+
+def candle_variances(bar=None, *, candle: Optional[Dict[str, float]] = None,
+                     df_chunk: Optional[pd.DataFrame] = None, grid_ms: int = 1000) -> Dict[str, float]:
+    """שונויות הנר: מהנר הרץ (O(1)) כשיש, אחרת מהצ'אנק."""
+    if bar is not None and bar.trades > 0:
+        out = {"rv_tick": bar.rv_tick, "rv_1s": bar.rv_grid}
+        out.update(ohlc_variances(bar.open, bar.high, bar.low, bar.close))
+        return out
+    out = {"rv_tick": np.nan, "rv_1s": np.nan}
+    if df_chunk is not None and not df_chunk.empty and "price" in df_chunk.columns:
+        ts = pd.to_datetime(df_chunk["ts"], utc=True).dt.as_unit("ms").astype("int64").to_numpy() \
+            if "ts" in df_chunk.columns else np.arange(len(df_chunk), dtype=np.int64)
+        out.update(trade_variances(ts, pd.to_numeric(df_chunk["price"], errors="coerce").to_numpy(), grid_ms))
+    if candle is not None:
+        out.update(ohlc_variances(candle["open"], candle["high"], candle["low"], candle["close"]))
+    return out
+
+
+def to_vols(variances: Dict[str, float]) -> Dict[str, float]:
+    """שונות → סטיית תקן לכל אומד (לשורת הנר)."""
+    out = {}
+    for e in VOL_ESTIMATORS:
+        v = float(variances.get(e, np.nan))
+        out[e] = math.sqrt(v) if v >= 0 else np.nan
+    return out
+
+
+def vol_columns(windows: Iterable[int]) -> list:
+    return list(VOL_ESTIMATORS) + [f"{e}_roll{w}" for w in windows for e in VOL_ESTIMATORS]
+
+
+class RealizedVolStream:
+    """
+    update(variances, key) לכל נר סגור → {estimator: vol, estimator_roll{w}: sqrt(mean var)}.
+    אותו key שוב = amend של הנר האחרון (replace_last). bootstrap(df_all) – מהעמודות השמורות (vol²).
+    """
+
+    def __init__(self, windows: Iterable[int] = (20,)):
+        self.windows = [int(w) for w in windows]
+        self._roll = {(e, w): RollingMoments(window=w) for e in VOL_ESTIMATORS for w in self.windows}
+        self._last_key = None
+        self.started = False
+
+    def columns(self) -> list:
+        return vol_columns(self.windows)
+
+    def update(self, variances: Dict[str, float], key=None) -> Dict[str, float]:
+        amend = key is not None and key == self._last_key
+        self._last_key = key
+        self.started = True
+        out = to_vols(variances)
+        for e in VOL_ESTIMATORS:
+            v = float(variances.get(e, np.nan))
+            for w in self.windows:
+                rm = self._roll[(e, w)]
+                if amend:
+                    rm.replace_last(v)
+                else:
+                    rm.update(v)
+                m = rm.mean
+                out[f"{e}_roll{w}"] = math.sqrt(m) if m >= 0 else np.nan
+        return out
+
+    def bootstrap(self, df_all: pd.DataFrame) -> None:
+        """ממלא את החלונות מ-N השורות האחרונות ב-df_all (אחרי ריסטארט)."""
+        self.started = True
+        if df_all is None or df_all.empty or not self.windows:
+            return
+        tail = df_all.tail(max(self.windows))
+        for e in VOL_ESTIMATORS:
+            vals = (pd.to_numeric(tail[e], errors="coerce").to_numpy(dtype=float) ** 2) if e in tail.columns \
+                else np.full(len(tail), np.nan)
+            for w in self.windows:
+                for v in vals[-w:]:
+                    self._roll[(e, w)].update(v)
@@ -0,0 +1,149 @@
+# technical_live/side_inference.py
+# הסקת צד האגרסור לטריידים בלי דגל מהבורסה – משותף ל-volume_technical_delta ול-trade_history_technical.
+#   quote rule (Lee-Ready): מחיר מעל ה-mid של ה-quote התקף → buy, מתחת → sell
+#   tick rule: מחיר עלה מול המחיר השונה הקודם → buy, ירד → sell (zero tick יורש את הכיוון הקודם)
+#   טרייד שנשאר בלי כיוון (ראשון בנר, zero tick בלי תנועה קודמת בנר) → sell, כמו ה-infer_tick המקורי
+#   (price > prev → buy, אחרת sell) – כל הנפח מסווג, buy+sell = total.
+# ה-quote התקף לכל טרייד נמצא ב-as-of join וקטורי (np.searchsorted) מול היסטוריית ה-top of book
+# של OrderBookBuffer – בלי merge_asof, בלי מיון/העתקה של הצ'אנק.
+
+from __future__ import annotations
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+SIDE_MODES = ("exchange", "auto", "lee_ready", "infer_mid", "infer_tick")
+
+
+def quote_rule(price, bid, ask) -> np.ndarray:
+    """+1 מעל ה-mid, ‎-1 מתחת, 0 בדיוק ב-mid או בלי quote תקין."""
+    price = np.asarray(price, dtype=float)
+    bid = np.asarray(bid, dtype=float)
+    ask = np.asarray(ask, dtype=float)
+    with np.errstate(invalid="ignore"):
+        mid = (bid + ask) / 2.0
+        valid = np.isfinite(mid) & (ask >= bid)
+        return np.where(valid, np.sign(price - mid), 0.0)
+
+
+def tick_rule(price, group: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    +1/-1 לפי השינוי מהמחיר השונה הקודם באותה קבוצה (נר), 0 כשאין עדיין שינוי.
+    price צריך להיות מסודר בזמן בתוך כל קבוצה.
+    """
+    price = np.asarray(price, dtype=float)
+    n = len(price)
+    if n == 0:
+        return np.zeros(0)
+    d = np.empty(n)
+    d[0] = 0.0
+    with np.errstate(invalid="ignore"):
+        d[1:] = np.sign(np.diff(price))
+    d[~np.isfinite(d)] = 0.0
+    start = np.zeros(n, dtype=bool)
+    start[0] = True
+    if group is not None:
+        g = np.asarray(group)
+        start[1:] = g[1:] != g[:-1]
+        d[start] = 0.0
+    # zero tick → הכיוון האחרון שאינו 0 (בתוך אותה קבוצה)
+    idx = np.where(d != 0, np.arange(n), -1)
+    last = np.maximum.accumulate(idx)
+    grp_start = np.maximum.accumulate(np.where(start, np.arange(n), 0))
+    ok = last >= grp_start
+    return np.where(ok & (last >= 0), d[np.maximum(last, 0)], 0.0)
+
+
+def lee_ready_sign(price, t_sec, quotes: Tuple[np.ndarray, np.ndarray, np.ndarray], *,
+                   group: Optional[np.ndarray] = None, quote_lag_sec: float = 0.0) -> np.ndarray:
+    """
+    quotes = (ts, best_bid, best_ask) ממוינים (OrderBookBuffer.top_of_book()[:3]).
+    לכל טרייד: ה-quote האחרון עם ts ≤ t - quote_lag_sec; quote rule, ובמחיר=mid או בלי quote → tick rule.
+    quotes בלי ts אמיתי (≤ 0) נזרקים – אחרת הם "קודמים" לכל טרייד וה-join מושך quote מהעתיד.
+    """
+    q_ts, q_bid, q_ask = (np.asarray(a, dtype=float) for a in quotes[:3])
+    if len(q_ts) and not q_ts[0] > 0:
+        keep = q_ts > 0
+        q_ts, q_bid, q_ask = q_ts[keep], q_bid[keep], q_ask[keep]
+    t = np.asarray(t_sec, dtype=float) - float(quote_lag_sec)
+    if len(q_ts):
+        idx = np.searchsorted(q_ts, t, side="right") - 1
+        ok = idx >= 0
+        safe = np.where(ok, idx, 0)
+        bid = np.where(ok, q_bid[safe], np.nan)
+        ask = np.where(ok, q_ask[safe], np.nan)
+    else:
+        bid = ask = np.full(len(t), np.nan)
+    sign = quote_rule(price, bid, ask)
+    return np.where(sign != 0, sign, tick_rule(price, group))
+
+
+def _sign_to_side(sign: np.ndarray, index) -> pd.Series:
+    """+1 → buy, אחרת sell (0 = בלי כיוון → sell, ה-fallback של infer_tick המקורי)."""
+    return pd.Series(np.where(sign > 0, "buy", "sell").astype(object), index=index)
+
+
+def _ts_seconds(ts: pd.Series) -> np.ndarray:
+    # עמודת datetime כבר מוכנה (הצ'אנק מה-TradeBuffer) – בלי to_datetime, שבודק cache איבר-איבר
+    t = ts if pd.api.types.is_datetime64_any_dtype(ts) else pd.to_datetime(ts, utc=True, errors="coerce")
+    return t.dt.as_unit("ms").astype("int64").to_numpy(dtype=float) / 1000.0
+
+
+def infer_side(
+    df: pd.DataFrame,
+    side_mode: str = "exchange",
+    price_col: str = "price",
+    side_col: str = "side",
+    bid_col: str = "best_bid",
+    ask_col: str = "best_ask",
+    candle_col: str = "time",
+    quotes: Optional[Sequence[np.ndarray]] = None,
+    quote_lag_sec: float = 0.0,
+) -> pd.Series:
+    """
+    Series של "buy"/"sell"/NaN לפי side_mode:
+      exchange   – הדגל מהבורסה (b/s → buy/sell), אחר → NaN
+      auto       – הדגל מהבורסה כשקיים, והשאר Lee-Ready
+      lee_ready  – quote rule מול quotes (או עמודות bid/ask אם יש) + tick rule
+      infer_mid  – כמו lee_ready (שם ישן; עמודות best_bid/best_ask או quotes)
+      infer_tick – tick rule בלבד
+    בהסקה (כל מה שאינו exchange) כל טרייד מקבל צד: בלי quote ובלי tick מכריע → sell.
+    """
+    n = len(df)
+    if n == 0:
+        return pd.Series([], index=df.index, dtype=object)
+
+    exch = None
+    if side_col in df.columns and side_mode in ("exchange", "auto"):
+        s = df[side_col].astype(str).str.lower().replace({"b": "buy", "s": "sell"})
+        exch = pd.Series(np.where(s.isin(["buy", "sell"]), s, np.nan), index=df.index, dtype=object)
+        if side_mode == "exchange" or exch.notna().all():
+            return exch
+
+    price = pd.to_numeric(df[price_col], errors="coerce").to_numpy(dtype=float)
+    # סדר זמן בתוך כל נר (בלי להעתיק את הצ'אנק – רק מערכי אינדקס)
+    t = _ts_seconds(df["ts"]) if "ts" in df.columns else np.arange(n, dtype=float)
+    group = pd.factorize(df[candle_col])[0] if candle_col in df.columns else None
+    order = np.lexsort((t, group)) if group is not None else np.argsort(t, kind="stable")
+    p_o, t_o = price[order], t[order]
+    g_o = group[order] if group is not None else None
+
+    if side_mode == "infer_tick":
+        sign_o = tick_rule(p_o, g_o)
+    else:
+        if bid_col in df.columns and ask_col in df.columns:
+            bid = pd.to_numeric(df[bid_col], errors="coerce").to_numpy(dtype=float)[order]
+            ask = pd.to_numeric(df[ask_col], errors="coerce").to_numpy(dtype=float)[order]
+            sign_o = quote_rule(p_o, bid, ask)
+            sign_o = np.where(sign_o != 0, sign_o, tick_rule(p_o, g_o))
+        else:
+            sign_o = lee_ready_sign(p_o, t_o, quotes if quotes is not None else ((), (), ()),
+                                    group=g_o, quote_lag_sec=quote_lag_sec)
+
+    sign = np.empty(n)
+    sign[order] = sign_o
+    inferred = _sign_to_side(sign, df.index)
+    if exch is not None:
+        return exch.where(exch.notna(), inferred)
+    return inferred
@@ -9,32 +9,23 @@ from typing import Optional, Dict, Any
 import numpy as np
 import pandas as pd
 
+from technical_live.side_inference import infer_side
+from technical_live.footprint import FOOTPRINT_FEATURES, compute_footprint
+
 
 # ---------- אינפרנס side אם חסר ----------
+# המימוש המשותף (quote rule מול top of book + tick rule) – technical_live/side_inference.py
 def _infer_side(
     df: pd.DataFrame,
-    side_mode: str = "exchange",          # "exchange" | "infer_mid" | "infer_tick"
+    side_mode: str = "exchange",          # "exchange" | "auto" | "lee_ready" | "infer_mid" | "infer_tick"
     price_col: str = "price",
     side_col: str = "side",
     bid_col: str = "best_bid",
     ask_col: str = "best_ask",
     candle_col: str = "time",
+    quotes=None,
 ) -> pd.Series:
-    if side_mode == "exchange" and side_col in df.columns:
-        s = df[side_col].astype(str).str.lower().replace({"b": "buy", "s": "sell"})
-        s = np.where(pd.Series(s).isin(["buy", "sell"]), s, np.nan)
-        return pd.Series(s, index=df.index)
-
-    if side_mode == "infer_mid" and bid_col in df.columns and ask_col in df.columns:
-        mid = (pd.to_numeric(df[bid_col], errors="coerce") + pd.to_numeric(df[ask_col], errors="coerce")) / 2.0
-        return pd.Series(np.where(pd.to_numeric(df[price_col], errors="coerce") >= mid, "buy", "sell"), index=df.index)
-
-    # fallback: infer_tick — מסדרים לפי time/ts ואז בודקים שינוי מחיר
-    sort_key = "ts" if "ts" in df.columns else price_col
-    df_sorted = df.sort_values([candle_col, sort_key]).copy()
-    prev_price = pd.to_numeric(df_sorted[price_col], errors="coerce").shift(1)
-    inferred = np.where(pd.to_numeric(df_sorted[price_col], errors="coerce") > prev_price, "buy", "sell")
-    return pd.Series(inferred, index=df_sorted.index).reindex(df.index)
+    return infer_side(df, side_mode, price_col, side_col, bid_col, ask_col, candle_col, quotes=quotes)
 
 
 # ---------- עזר: בחירת TOP PCT ----------
@@ -50,12 +41,15 @@ def compute_trade_history_technical(
     df_chunk: pd.DataFrame,
     t0: pd.Timestamp,
     *,
-    side_mode: str = "exchange",          # "exchange" | "infer_mid" | "infer_tick"
+    side_mode: str = "exchange",          # "exchange" | "auto" | "lee_ready" | "infer_mid" | "infer_tick"
     top_pct: float = 3.0,                 # קיר באחוזים לפי גודל טריידים (top pct)
     bps_band: float = 0.001,              # 0.1% לאזורי high/low
     min_trade_size: float = 0.0,          # סינון עסקאות קטנות
     epsilon: float = 1e-9,
     partial_first_flag: int = 0,          # 1 אם זה נר ראשון חלקי (אופציונלי מה-main)
+    bar: Optional[Any] = None,            # LiveCandle מ-graphs_time: סכומים/OHLC/טמפו ב-O(1) במקום מהצ'אנק
+    quotes=None,                          # (ts_sec, best_bid, best_ask) מ-OrderBookBuffer.top_of_book()
+    footprint: Optional[Dict[str, Any]] = None,  # {"tick_size","bucket_bps","value_area"} → th_fp_* + th_fp_profile
 ) -> pd.DataFrame:
     # הכנה
     df = df_chunk.copy()
@@ -76,11 +70,17 @@ def compute_trade_history_technical(
     # הוספת time לנר
     df["time"] = pd.Timestamp(t0)
 
-    # סידור לפי ts אם קיים (כדי להגדיר OPEN/CLOSE)
+    # הנר הרץ תקף רק כשהוא סופר בדיוק את אותם טריידים ואותו side
+    use_bar = (bar is not None and getattr(bar, "trades", 0) > 0 and min_trade_size <= 0
+               and side_mode == "exchange" and "side" in df.columns)
+
+    # סידור לפי ts אם קיים (כדי להגדיר OPEN/CLOSE) – מיותר כשה-OHLC מגיע מהנר הרץ
     sort_key = "ts" if "ts" in df.columns else "price"
-    if "ts" in df.columns:
+    if "ts" in df.columns and not use_bar:
         df["ts"] = pd.to_datetime(df["ts"], errors="coerce")
-    df = df.sort_values([sort_key]).reset_index(drop=True)
+    if not use_bar:
+        df = df.sort_values([sort_key])
+    df = df.reset_index(drop=True)
 
     # אם אין טריידים — מחזירים שורה ריקה עם דגלים
     if df.empty:
@@ -118,12 +118,16 @@ def compute_trade_history_technical(
             "th_side_inferred_flag": 0,
             "th_partial_first_flag": int(partial_first_flag),
         }
+        if footprint is not None:
+            row.update({k: np.nan for k in FOOTPRINT_FEATURES})
+            row["th_fp_buckets"] = 0.0
+            row["th_fp_profile"] = None
         return pd.DataFrame([row])
 
     # אינפרנס side אם צריך
     side_inferred = 0
     if side_mode != "exchange" or "side" not in df.columns:
-        df["_th_side"] = _infer_side(df, side_mode, "price", "side", "best_bid", "best_ask", "time")
+        df["_th_side"] = _infer_side(df, side_mode, "price", "side", "best_bid", "best_ask", "time", quotes=quotes)
         side_col = "_th_side"
         side_inferred = 1
     else:
@@ -138,19 +142,26 @@ def compute_trade_history_technical(
     sell_df = df.loc[is_sell]
 
     # נפחים / מונים
-    buy_vol  = float(buy_df["size"].sum())
-    sell_vol = float(sell_df["size"].sum())
+    if use_bar:
+        buy_vol, sell_vol = float(bar.buy_vol), float(bar.sell_vol)
+        buy_cnt, sell_cnt = int(bar.buy_count), int(bar.sell_count)
+    else:
+        buy_vol  = float(buy_df["size"].sum())
+        sell_vol = float(sell_df["size"].sum())
+        buy_cnt  = int(len(buy_df))
+        sell_cnt = int(len(sell_df))
     total_vol = buy_vol + sell_vol
-
-    buy_cnt  = int(len(buy_df))
-    sell_cnt = int(len(sell_df))
     total_cnt = buy_cnt + sell_cnt
 
     # מחיר/טווח
-    th_open  = float(df["price"].iloc[0])
-    th_close = float(df["price"].iloc[-1])
-    th_high  = float(df["price"].max())
-    th_low   = float(df["price"].min())
+    if use_bar:
+        th_open, th_close = float(bar.open), float(bar.close)
+        th_high, th_low = float(bar.high), float(bar.low)
+    else:
+        th_open  = float(df["price"].iloc[0])
+        th_close = float(df["price"].iloc[-1])
+        th_high  = float(df["price"].max())
+        th_low   = float(df["price"].min())
     th_range = th_high - th_low
     th_body  = abs(th_close - th_open)
     th_body_ratio = (th_body / (th_range + epsilon)) if th_range == th_range else np.nan  # שומר על NaN אם אין טווח
@@ -203,7 +214,10 @@ def compute_trade_history_technical(
     th_count_imbalance = (buy_cnt - sell_cnt) / (total_cnt + epsilon) if total_cnt > 0 else 0.0
 
     # טמפו/קצב
-    if "ts" in df.columns and df["ts"].notna().any():
+    if use_bar:
+        duration_sec = bar.duration_ms / 1000.0
+        max_gap_ms = float(bar.max_gap_ms)
+    elif "ts" in df.columns and df["ts"].notna().any():
         ts_sorted = df["ts"].sort_values()
         duration_sec = float((ts_sorted.iloc[-1] - ts_sorted.iloc[0]).total_seconds()) if len(ts_sorted) > 1 else 0.0
         gaps = ts_sorted.diff().dropna().dt.total_seconds() * 1000.0
@@ -214,8 +228,11 @@ def compute_trade_history_technical(
     trades_per_sec = (total_cnt / max(duration_sec, 1.0)) if total_cnt > 0 else 0.0
 
     # VWAP על טריידים
-    notional = (df["price"] * df["size"]).sum()
-    size_sum = df["size"].sum()
+    if use_bar:
+        notional, size_sum = bar.notional, bar.volume
+    else:
+        notional = (df["price"] * df["size"]).sum()
+        size_sum = df["size"].sum()
     th_vwap_trades = float(notional / (size_sum + epsilon)) if size_sum > 0 else 0.0
 
     # בניית שורה
@@ -270,6 +287,17 @@ def compute_trade_history_technical(
         "th_partial_first_flag": int(partial_first_flag),
     }
 
+    # Footprint: נפח buy/sell לכל דלי מחיר (bincount) – סיכום לשורה, הפרופיל לטבלת הצד
+    if footprint is not None:
+        fp_row, profile = compute_footprint(
+            df["price"].to_numpy(), df["size"].to_numpy(), is_buy.to_numpy(), is_sell.to_numpy(),
+            ref_price=th_open, close=th_close,
+            tick_size=footprint.get("tick_size"), bucket_bps=footprint.get("bucket_bps", 5.0),
+            value_area_frac=float(footprint.get("value_area", 0.70)),
+        )
+        row.update(fp_row)
+        row["th_fp_profile"] = profile
+
     return pd.DataFrame([row])
 
 
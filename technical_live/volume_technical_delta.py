@@ -5,6 +5,8 @@ import os
 import pandas as pd
 import numpy as np
 
+from technical_live.side_inference import infer_side
+
 
 # ------------------------------------------------------------
 # Utils: מיפוי לסטטוס וציון
@@ -21,7 +23,8 @@ def _vd_score_and_status(delta_ratio: pd.Series) -> pd.DataFrame:
 
 # ------------------------------------------------------------
 # אינפרנס side אם חסר
-# side_mode: "exchange" | "infer_mid" | "infer_tick"
+# side_mode: "exchange" | "auto" | "lee_ready" | "infer_mid" | "infer_tick"
+# (המימוש המשותף – technical_live/side_inference.py; quotes = top of book מ-OrderBookBuffer)
 # ------------------------------------------------------------
 def _infer_side(
     df: pd.DataFrame,
@@ -31,22 +34,9 @@ def _infer_side(
     bid_col: str = "best_bid",
     ask_col: str = "best_ask",
     candle_col: str = "time",
+    quotes=None,
 ) -> pd.Series:
-    if side_mode == "exchange" and side_col in df.columns:
-        s = df[side_col].astype(str).str.lower().replace({"b": "buy", "s": "sell"})
-        s = np.where(pd.Series(s).isin(["buy", "sell"]), s, np.nan)
-        return pd.Series(s, index=df.index)
-
-    if side_mode == "infer_mid" and bid_col in df.columns and ask_col in df.columns:
-        mid = (df[bid_col].astype(float) + df[ask_col].astype(float)) / 2.0
-        return pd.Series(np.where(df[price_col] >= mid, "buy", "sell"), index=df.index)
-
-    # fallback: infer_tick
-    df_sorted = df.sort_values([candle_col, "ts" if "ts" in df.columns else price_col]).copy()
-    prev_price = df_sorted.groupby(candle_col)[price_col].shift(1)
-    inferred = np.where(df_sorted[price_col] > prev_price, "buy", "sell")
-    s = pd.Series(inferred, index=df_sorted.index).reindex(df.index)
-    return s
+    return infer_side(df, side_mode, price_col, side_col, bid_col, ask_col, candle_col, quotes=quotes)
 
 
 # ------------------------------------------------------------
@@ -59,10 +49,12 @@ def add_volume_delta_features(
     price_col: str = "price",
     size_col: str = "size",
     side_col: str = "side",
-    side_mode: str = "exchange",        # "exchange" | "infer_mid" | "infer_tick"
+    side_mode: str = "exchange",        # "exchange" | "auto" | "lee_ready" | "infer_mid" | "infer_tick"
+    quotes=None,                        # (ts_sec, best_bid, best_ask) – OrderBookBuffer.top_of_book()
     min_trade_size: float = 0.0,        # סינון עסקאות זעירות
     large_trade_mode: str = "pctl",     # "pctl" | "abs"
     large_trade_threshold: float = 90.0,# פרצנטיל (כשpctl) או סף מוחלט (כשabs)
+    large_trade_thr: float | None = None,  # סף מוכן (למשל מ-RollingSketch) – גובר על האחוזון של הצ'אנק
     vol_norm_window: int = 20,          # לנרמולים אופציונליים
     epsilon: float = 1e-9,
 ) -> pd.DataFrame:
@@ -79,7 +71,8 @@ def add_volume_delta_features(
 
     # אינפרנס side אם צריך
     if side_mode != "exchange" or side_col not in df.columns:
-        df["_vd_side"] = _infer_side(df, side_mode, price_col, side_col, "best_bid", "best_ask", candle_col)
+        df["_vd_side"] = _infer_side(df, side_mode, price_col, side_col, "best_bid", "best_ask", candle_col,
+                                     quotes=quotes)
         side_use = "_vd_side"
     else:
         side_use = side_col
@@ -89,7 +82,9 @@ def add_volume_delta_features(
     is_sell = (df[side_use] == "sell")
 
     # Large trades threshold
-    if large_trade_mode == "pctl":
+    if large_trade_mode == "pctl" and large_trade_thr is not None and np.isfinite(large_trade_thr):
+        large_mask = df[size_col] >= float(large_trade_thr)
+    elif large_trade_mode == "pctl":
         thr = np.nanpercentile(df[size_col].values, large_trade_threshold) if len(df) else np.nan
         large_mask = df[size_col] >= (thr if np.isfinite(thr) else np.inf)
     else:  # "abs"
@@ -161,6 +156,8 @@ def compute_vd_for_chunk(
     df_chunk: pd.DataFrame,
     t0: pd.Timestamp,
     side_mode: str = "exchange",
+    large_trade_thr: float | None = None,
+    quotes=None,
 ) -> pd.DataFrame:
     if df_chunk.empty:
         return pd.DataFrame([{
@@ -172,7 +169,8 @@ def compute_vd_for_chunk(
 
     df = df_chunk.copy()
     df["time"] = pd.Timestamp(t0)
-    vd = add_volume_delta_features(df, candle_col="time", side_mode=side_mode)
+    vd = add_volume_delta_features(df, candle_col="time", side_mode=side_mode, large_trade_thr=large_trade_thr,
+                                   quotes=quotes)
     return vd  # טבלה עם שורה אחת עבור t0
 
 
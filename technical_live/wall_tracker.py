@@ -0,0 +1,186 @@
+# technical_live/wall_tracker.py
+# מעקב מתמשך אחרי קירות בספר (לעומת _detect_walls ב-orderbook_technical, שמזהה מאפס בכל snapshot):
+# קיר = רמה עם כמות ≥ max(k_median·median, percentile(perc)) של גדלי הרמות בצד – אבל הסף נלמד
+# בזרם (P² לחציון ולאחוזון, O(1) לעדכון) והקיר נשמר לפי (צד, מחיר) עם:
+#   גיל (מתי נולד), כמות שיא, כמה פעמים "נמשך" (ירידה חדה) ו"התמלא" (עלייה חדה), ומרחק מה-mid.
+# כל delta מעדכן רק את הרמות ששונו; snapshot מושווה רק לקירות הפעילים + סריקת הרמות מעל הסף.
+# פיצ'רי הנר נבנים מהקירות הפעילים (O(קירות פעילים)) ומיומן אירועים קצר (נולד/נעלם/נמשך/התמלא):
+# קיר שנעלם אחרי פחות מ-flash_ms נספר כ-"flash" – הסימן לספופינג.
+# אין כאן זיהוי fills מול טריידים: ירידה חדה בכמות נספרת כמשיכה בכל מקרה.
+
+from __future__ import annotations
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from core.rolling_stats import P2Quantile
+
+WALL_FEATURES = (
+    "ob_wall_bid_count", "ob_wall_ask_count",
+    "ob_wall_bid_max_qty", "ob_wall_ask_max_qty",
+    "ob_wall_bid_dist_bps", "ob_wall_ask_dist_bps",
+    "ob_wall_bid_max_age_sec", "ob_wall_ask_max_age_sec",
+    "ob_wall_born", "ob_wall_ended", "ob_wall_flash", "ob_wall_ended_mean_life_sec",
+    "ob_wall_pulls", "ob_wall_refills",
+)
+
+
+class _Wall:
+    __slots__ = ("side", "price", "born_ms", "qty", "peak", "pulls", "refills")
+
+    def __init__(self, side: str, price: float, ts_ms: int, qty: float):
+        self.side = side
+        self.price = price
+        self.born_ms = ts_ms
+        self.qty = qty
+        self.peak = qty
+        self.pulls = 0
+        self.refills = 0
+
+
+class WallTracker:
+    """
+    on_update(ts_ms, bids, asks, kind, book=None) לכל עדכון ספר (הרמות כפי שהגיעו);
+    features(t0_ms, t1_ms, mid) בסגירת נר.
+    """
+
+    def __init__(
+        self,
+        *,
+        median_k: float = 3.0,
+        percentile: float = 97.0,
+        exit_ratio: float = 0.5,
+        change_frac: float = 0.5,
+        flash_ms: int = 1000,
+        min_samples: int = 200,
+        event_horizon_ms: int = 3_600_000,
+    ):
+        self.median_k = float(median_k)
+        self.exit_ratio = float(exit_ratio)      # קיר נסגר כשהכמות יורדת מתחת ל-exit_ratio·סף (היסטרזיס)
+        self.change_frac = float(change_frac)    # שינוי יחסי שנחשב משיכה/מילוי
+        self.flash_ms = int(flash_ms)
+        self.min_samples = int(min_samples)
+        self.event_horizon_ms = int(event_horizon_ms)
+        self._q = {s: (P2Quantile(0.5), P2Quantile(float(percentile) / 100.0)) for s in ("bid", "ask")}
+        self._thr = {"bid": np.inf, "ask": np.inf}
+        self.active: Dict[Tuple[str, float], _Wall] = {}
+        # (ts_ms, kind, side, life_ms) – kind: born / ended / pull / refill
+        self._events: Deque[Tuple[int, str, str, int]] = deque()
+
+    # ---------- סף ----------
+    def threshold(self, side: str) -> float:
+        return self._thr[side]
+
+    def _observe(self, side: str, qty: float) -> None:
+        med, pct = self._q[side]
+        med.update(qty)
+        pct.update(qty)
+        if med.count >= self.min_samples:
+            self._thr[side] = max(self.median_k * med.value, pct.value)
+
+    # ---------- מחזור חיים ----------
+    def _event(self, ts_ms: int, kind: str, side: str, life_ms: int = 0) -> None:
+        self._events.append((ts_ms, kind, side, life_ms))
+        cutoff = ts_ms - self.event_horizon_ms
+        while self._events and self._events[0][0] < cutoff:
+            self._events.popleft()
+
+    def _level(self, ts_ms: int, side: str, price: float, qty: float) -> None:
+        key = (side, price)
+        w = self.active.get(key)
+        thr = self._thr[side]
+        if w is None:
+            if qty > 0 and qty >= thr:
+                self.active[key] = _Wall(side, price, ts_ms, qty)
+                self._event(ts_ms, "born", side)
+            return
+        if qty <= 0 or qty < self.exit_ratio * thr:
+            del self.active[key]
+            self._event(ts_ms, "ended", side, ts_ms - w.born_ms)
+            return
+        if qty < w.qty * (1.0 - self.change_frac):
+            w.pulls += 1
+            self._event(ts_ms, "pull", side)
+        elif qty > w.qty * (1.0 + self.change_frac):
+            w.refills += 1
+            self._event(ts_ms, "refill", side)
+        w.qty = qty
+        w.peak = max(w.peak, qty)
+
+    def on_update(
+        self,
+        ts_ms: int,
+        bids: Iterable[Tuple[float, float]],
+        asks: Iterable[Tuple[float, float]],
+        kind: Optional[str] = None,
+        book: Optional[Tuple[Dict[float, float], Dict[float, float]]] = None,
+    ) -> None:
+        """
+        delta → רק הרמות ששונו (O(רמות ששונו)).
+        snapshot (kind != "delta") → book = (bids, asks) החי אחרי ההחלפה: קירות שנעלמו נסגרים,
+        רמות מעל הסף נפתחות.
+        עדכון בלי ts אמיתי (≤ 0) לא נקלט – קיר שנפתח ב-epoch 0 מקבל "גיל" של עשרות שנים.
+        """
+        ts_ms = int(ts_ms or 0)
+        if ts_ms <= 0:
+            return
+        for side, levels in (("bid", bids), ("ask", asks)):
+            for p, q in levels:
+                q = float(q)
+                if q > 0:
+                    self._observe(side, q)
+                if kind == "delta":
+                    self._level(ts_ms, side, float(p), q)
+        if kind == "delta":
+            return
+        live_bids, live_asks = book if book is not None else (
+            {float(p): float(q) for p, q in bids if q > 0}, {float(p): float(q) for p, q in asks if q > 0})
+        for (side, price) in list(self.active):
+            live = live_bids if side == "bid" else live_asks
+            self._level(ts_ms, side, price, live.get(price, 0.0))
+        for side, live in (("bid", live_bids), ("ask", live_asks)):
+            thr = self._thr[side]
+            for p, q in live.items():
+                if q >= thr and (side, p) not in self.active:
+                    self._level(ts_ms, side, p, q)
+
+    # ---------- פיצ'רים לנר ----------
+    def features(self, t0_ms: int, t1_ms: int, mid: float = np.nan) -> Dict[str, Any]:
+        """
+        מצב הקירות ב-t1 (קירות שנולדו אחרי t1 – בזמן ה-grace – לא נספרים) + אירועי [t0, t1).
+        """
+        t0_ms, t1_ms = int(t0_ms), int(t1_ms)
+        out: Dict[str, Any] = {}
+        for side in ("bid", "ask"):
+            walls = [w for w in self.active.values() if w.side == side and w.born_ms < t1_ms]
+            out[f"ob_wall_{side}_count"] = float(len(walls))
+            if walls:
+                big = max(walls, key=lambda w: w.qty)
+                near = min(walls, key=lambda w: abs(w.price - mid)) if np.isfinite(mid) else None
+                out[f"ob_wall_{side}_max_qty"] = big.qty
+                out[f"ob_wall_{side}_dist_bps"] = (abs(near.price - mid) / mid * 1e4) if near is not None and mid else np.nan
+                out[f"ob_wall_{side}_max_age_sec"] = (t1_ms - min(w.born_ms for w in walls)) / 1000.0
+            else:
+                out[f"ob_wall_{side}_max_qty"] = 0.0
+                out[f"ob_wall_{side}_dist_bps"] = np.nan
+                out[f"ob_wall_{side}_max_age_sec"] = 0.0
+        counts = {"born": 0, "ended": 0, "pull": 0, "refill": 0}
+        flash = 0
+        life_sum = 0
+        for ts, kind, _side, life in reversed(self._events):  # מהחדש לישן – עוצרים לפני t0
+            if ts >= t1_ms:
+                continue
+            if ts < t0_ms:
+                break
+            counts[kind] += 1
+            if kind == "ended":
+                life_sum += life
+                flash += life < self.flash_ms
+        out["ob_wall_born"] = float(counts["born"])
+        out["ob_wall_ended"] = float(counts["ended"])
+        out["ob_wall_flash"] = float(flash)
+        out["ob_wall_ended_mean_life_sec"] = life_sum / counts["ended"] / 1000.0 if counts["ended"] else np.nan
+        out["ob_wall_pulls"] = float(counts["pull"])
+        out["ob_wall_refills"] = float(counts["refill"])
+        return out
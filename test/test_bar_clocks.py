@@ -0,0 +1,68 @@
+# ברי אירועים: גבולות הבר לפי סף tick/vol/dollar מול לולאה ישירה, t1 עולה ממש, וסגירה ריקה בלי שעון קיר
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.bar_clocks import BarClock, EventBarAggregator, parse_bar_spec
+from core.window_aggregator import _to_ms
+
+MEASURE = {"tick": lambda p, q: 1.0, "vol": lambda p, q: q, "dollar": lambda p, q: p * q}
+
+
+def _trades(n: int, seed: int, same_ms_every: int = 0):
+    rng = np.random.default_rng(seed)
+    t, px = 1_700_000_000_000, 100.0
+    for i in range(n):
+        if not same_ms_every or i % same_ms_every == 0:  # same_ms_every>0 – רצפים של טריידים באותה ms
+            t += int(rng.integers(1, 30))
+        px *= np.exp(rng.normal(0, 5e-4))
+        yield {"ts": pd.Timestamp(t * 1_000_000, tz="UTC"), "symbol": "X", "price": px,
+               "size": float(rng.uniform(0.01, 2.0)), "side": "buy", "id": str(i)}
+
+
+def _brute_bars(trades: list, kind: str, threshold: float) -> list:
+    bars, cur, acc = [], [], 0.0
+    for tr in trades:
+        cur.append(tr["id"])
+        acc += MEASURE[kind](tr["price"], tr["size"])
+        if acc >= threshold:
+            bars.append(cur)
+            cur, acc = [], 0.0
+    return bars
+
+
+@pytest.mark.parametrize("spec", ["tick50", "vol25", "dollar2.5e3", "dollar1e4"])
+def test_bars_close_at_threshold(spec):
+    trades = list(_trades(3000, seed=len(spec)))
+    clock = parse_bar_spec(spec)
+    agg = EventBarAggregator(clock, "X")
+    closed = [c for tr in trades for c in agg.on_trade(tr["ts"], dict(tr))]
+    expected = _brute_bars(trades, clock.kind, clock.threshold)
+    assert len(expected) > 10
+    assert [c.df_chunk["id"].tolist() for c in closed] == expected
+    for c in closed:
+        assert _to_ms(c.t0) == _to_ms(c.df_chunk["ts"].iloc[0])
+        assert _to_ms(c.t1) >= _to_ms(c.df_chunk["ts"].iloc[-1]) + 1
+
+
+def test_t1_strictly_increasing_within_one_ms():
+    agg = EventBarAggregator(parse_bar_spec("tick2"), "X")
+    closed = [c for tr in _trades(400, seed=3, same_ms_every=20) for c in agg.on_trade(tr["ts"], tr)]
+    t1 = np.array([_to_ms(c.t1) for c in closed])
+    assert (np.diff(t1) > 0).all()
+
+
+def test_empty_close_uses_trade_clock():
+    agg = EventBarAggregator(parse_bar_spec("tick3"), "X")
+    assert _to_ms(agg.force_close_current(now_ms=1_700_000_000_000).t1) == 1_700_000_000_000
+    closed = [c for tr in _trades(3, seed=1) for c in agg.on_trade(tr["ts"], tr)]
+    empty = agg.force_close_current(now_ms=1)
+    assert empty.df_chunk.empty and empty.t0 == empty.t1 == closed[-1].t1
+
+
+def test_bar_clock_is_abstract():
+    with pytest.raises(TypeError):
+        BarClock(1.0)
+    assert parse_bar_spec("30s") is None
+    with pytest.raises(ValueError):
+        parse_bar_spec("tick0")
@@ -0,0 +1,122 @@
+# פיצ'רי top of book משוקללי-זמן ו-OFI לנר: TopOfBookAccumulator/OrderFlowImbalance מול אינטגרציה ישירה על מקטעי הזמן
+import math
+
+import numpy as np
+import pytest
+
+from technical_live.book_accumulator import OrderFlowImbalance, TopOfBookAccumulator, ofi_columns
+
+STEP = 1000
+LEVELS = 3
+
+
+def _books(seed: int, n: int = 3000):
+    """(ts, bids יורד, asks עולה) על רשת טיק 0.5, עם פערים של כמה נרות ורמות חסרות."""
+    rng = np.random.default_rng(seed)
+    t, mid = 1_700_000_000_000 + 137, 1000.0
+    out = []
+    for _ in range(n):
+        t += int(rng.integers(2, 9)) * STEP if rng.random() < 0.01 else int(rng.integers(0, 90))
+        mid += 0.5 * int(rng.integers(-2, 3))
+        half = 0.5 * int(rng.integers(1, 4))
+        nb, na = int(rng.integers(1, LEVELS + 1)), int(rng.integers(1, LEVELS + 1))
+        bids = [(mid - half - 0.5 * k, float(rng.integers(1, 20))) for k in range(nb)]
+        asks = [(mid + half + 0.5 * k, float(rng.integers(1, 20))) for k in range(na)]
+        out.append((t, bids, asks))
+    return out
+
+
+def _ofi_ref(prev, cur) -> tuple:
+    """OFI רב-רמתי בצורה וקטורית: רמה חסרה = ∓inf וכמות 0."""
+    def pad(levels, fill):
+        p = np.full(LEVELS, fill)
+        q = np.zeros(LEVELS)
+        for k, (pk, qk) in enumerate(levels):
+            p[k], q[k] = pk, qk
+        return p, q
+    (pb, qb), (pa, qa) = pad(prev[0], -np.inf), pad(prev[1], np.inf)
+    (nb, nqb), (na, nqa) = pad(cur[0], -np.inf), pad(cur[1], np.inf)
+    e = (np.where(nb >= pb, nqb, 0) - np.where(nb <= pb, qb, 0)) - (np.where(na <= pa, nqa, 0) - np.where(na >= pa, qa, 0))
+    d1 = (cur[0][0][1] + cur[1][0][1]) / 2
+    dn = (sum(q for _, q in cur[0]) + sum(q for _, q in cur[1])) / 2
+    return e[0], e.sum(), d1, dn
+
+
+def _tob_ref(books, t0: int, t1: int) -> dict:
+    ts = [b[0] for b in books]
+    seg = {"spread": [], "mid": [], "imb": [], "micro": [], "dev": [], "dt": []}
+    for i, (t, bids, asks) in enumerate(books):
+        a, b = max(t, t0), min(ts[i + 1] if i + 1 < len(ts) else math.inf, t1)
+        if b <= a:
+            continue
+        (bp, bq), (ap, aq) = bids[0], asks[0]
+        mid = (bp + ap) / 2
+        micro = (ap * bq + bp * aq) / (bq + aq)
+        for k, v in (("spread", ap - bp), ("mid", mid), ("imb", (bq - aq) / (bq + aq)),
+                     ("micro", micro), ("dev", (micro - mid) / mid * 1e4), ("dt", b - a)):
+            seg[k].append(v)
+    s = {k: np.array(v, dtype=float) for k, v in seg.items()}
+    c = s["dt"].sum()
+    n_upd = sum(t0 <= t < t1 for t in ts)
+    if c == 0:
+        return {"ob_book_updates": n_upd, "ob_quote_coverage": 0.0}
+    mx = s["spread"].max()
+    return {
+        "ob_spread_twap": (s["spread"] * s["dt"]).sum() / c, "ob_spread_min": s["spread"].min(),
+        "ob_spread_max": mx, "ob_spread_max_time_pct": s["dt"][s["spread"] == mx].sum() / c * 100,
+        "ob_mid_twap": (s["mid"] * s["dt"]).sum() / c, "ob_imbalance_tw": (s["imb"] * s["dt"]).sum() / c,
+        "ob_microprice_tw": (s["micro"] * s["dt"]).sum() / c, "ob_micro_dev_bps_tw": (s["dev"] * s["dt"]).sum() / c,
+        "ob_book_updates": n_upd, "ob_quote_coverage": c / (t1 - t0),
+    }
+
+
+def test_windows_match_direct_integration():
+    books = _books(seed=4)
+    ofi = OrderFlowImbalance(LEVELS)
+    acc = TopOfBookAccumulator(STEP, ofi_levels=LEVELS)
+    flows, got = [], {}
+    nxt = books[0][0] - books[0][0] % STEP
+    for i, (t, bids, asks) in enumerate(books):
+        flow = ofi.update(bids, asks)
+        if i:
+            assert flow == pytest.approx(_ofi_ref(books[i - 1][1:], (bids, asks)))
+        else:
+            assert flow is None
+        flows.append((t, flow))
+        acc.on_book(t, bids[0][0], asks[0][0], bids[0][1], asks[0][1], ofi=flow)
+        while nxt + STEP <= t:
+            got[nxt] = acc.take(nxt, nxt + STEP)
+            assert acc.take(nxt, nxt + STEP) == got[nxt]  # amend של אותו נר → אותה תוצאה
+            nxt += STEP
+
+    c1, cn, n1, nn = ofi_columns(LEVELS)
+    assert len(got) > 100
+    for t0, feats in got.items():
+        ref = _tob_ref(books, t0, t0 + STEP)
+        for k, v in ref.items():
+            assert feats[k] == pytest.approx(v, rel=1e-9, abs=1e-9), (t0, k)
+        in_win = [f for t, f in flows if t0 <= t < t0 + STEP and f is not None]
+        assert feats[c1] == pytest.approx(sum(f[0] for f in in_win))
+        assert feats[cn] == pytest.approx(sum(f[1] for f in in_win))
+        if in_win:
+            assert feats[n1] == pytest.approx(sum(f[0] for f in in_win) / np.mean([f[2] for f in in_win]))
+            assert feats[nn] == pytest.approx(sum(f[1] for f in in_win) / np.mean([f[3] for f in in_win]))
+
+
+def test_event_bar_windows_and_peek():
+    books = _books(seed=5, n=400)
+    acc = TopOfBookAccumulator(None)
+    cuts = [books[k][0] + 1 for k in (99, 199, 299)]
+    start, got = books[0][0], []
+    for t, bids, asks in books:
+        while cuts and t >= cuts[0]:
+            got.append((start, cuts[0], acc.take(start, cuts[0])))
+            start = cuts.pop(0)
+        acc.on_book(t, bids[0][0], asks[0][0], bids[0][1], asks[0][1])
+    end = books[-1][0] + 50
+    peek = acc.peek(end)
+    assert peek == acc.take(start, end)
+    for t0, t1, feats in got + [(start, end, peek)]:
+        ref = _tob_ref(books, t0, t1)
+        for k, v in ref.items():
+            assert feats[k] == pytest.approx(v, rel=1e-9, abs=1e-9), (t0, k)
@@ -0,0 +1,113 @@
+# CrossSectionStage מול pandas: closes מיושרים as-of, ואז rolling corr/beta, corr מול reference מוזז ותשואה יחסית –
+# עם הגעה לא מסונכרנת של הסימבולים, נרות חסרים, amend של נר ה-target ו-reference תקוע
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.cross_section import CrossSectionStage, cross_prefix
+
+STEP = 1000
+W, LAGS, REL = 10, 3, (1, 5)
+
+
+def _pipe(symbol: str, interval: str = "1s"):
+    df = pd.DataFrame({"ts": pd.Series([], dtype="datetime64[ns, UTC]")})
+    return SimpleNamespace(symbol=symbol, interval=interval, ctx={"df_all": df})
+
+
+def _events(seed: int, n: int = 400):
+    """(symbol, ts_ms, close) בסדר הגעה: כל סימבול בסדר ts, עם עיכוב אקראי של 0–3 נרות ביניהם ונרות חסרים."""
+    rng = np.random.default_rng(seed)
+    t0 = 1_700_000_000_000
+    common = np.cumsum(rng.normal(0, 1e-3, n))
+    ev = []
+    for sym, keep, beta in (("T", 0.9, 1.3), ("R", 0.85, 1.0)):
+        px = 100 * np.exp(beta * common + np.cumsum(rng.normal(0, 5e-4, n)))
+        arrive = -1
+        for k in np.flatnonzero(rng.random(n) < keep):
+            ts = t0 + int(k) * STEP
+            arrive = max(arrive, ts + int(rng.integers(0, 3 * STEP)))
+            ev.append((arrive, sym, ts, float(px[k])))
+            if sym == "T" and rng.random() < 0.1:  # amend של אותו נר, לפני הנר הבא
+                ev.append((arrive, sym, ts, float(px[k] * np.exp(rng.normal(0, 1e-3)))))
+    ev.sort(key=lambda e: e[0])  # יציב: amend נשאר אחרי המקור
+    return [e[1:] for e in ev]
+
+
+def _reference(events) -> pd.DataFrame:
+    """סדרות סופיות (amend מחליף), ה-close של R as-of כל ts של T, והפיצ'רים ב-pandas rolling."""
+    t = {ts: c for s, ts, c in events if s == "T"}
+    r = {ts: c for s, ts, c in events if s == "R"}
+    t = pd.Series(t).sort_index()
+    r = pd.Series(r).sort_index()
+    t = t[t.index <= r.index.max()]  # נרות T אחרי ה-close האחרון של R – עוד ממתינים
+    c_r = r.reindex(r.index.union(t.index)).ffill().reindex(t.index)
+    r_t, r_r = np.log(t).diff(), np.log(c_r).diff()
+    p = cross_prefix("R")
+
+    def corr_beta(x, y):
+        m = x.notna() & y.notna()
+        x, y = x.where(m), y.where(m)
+        return x.rolling(W).corr(y), x.rolling(W).cov(y) / y.rolling(W).var()
+
+    out = pd.DataFrame(index=t.index)
+    out[f"{p}ret"] = r_r
+    out[f"{p}corr{W}"], out[f"{p}beta{W}"] = corr_beta(r_t, r_r)
+    for k in range(1, LAGS + 1):
+        out[f"{p}xcorr_lag{k}"] = corr_beta(r_t, r_r.shift(k))[0]
+    for n in REL:
+        out[f"{p}rel_ret{n}"] = (r_t - r_r).rolling(n).sum()
+    return out
+
+
+def _run(stage, events, pipes):
+    for sym, ts, c in events:
+        df = pipes[sym].ctx["df_all"]
+        row_ts = pd.Timestamp(ts * 1_000_000, tz="UTC")
+        if df.empty or df["ts"].iloc[-1] != row_ts:
+            pipes[sym].ctx["df_all"] = pd.concat([df, pd.DataFrame({"ts": [row_ts]})], ignore_index=True)
+        stage.on_close(sym, "1s", ts, c)
+
+
+def test_streamed_features_match_pandas_on_aligned_closes():
+    events = _events(seed=1)
+    stage = CrossSectionStage([("T", "R")], window=W, lags=LAGS, rel_windows=REL)
+    pipes = {s: _pipe(s) for s in ("T", "R")}
+    for p in pipes.values():
+        stage.register(p)
+    _run(stage, events, pipes)
+
+    ref = _reference(events)
+    df = pipes["T"].ctx["df_all"]
+    got = df.set_index(df["ts"].astype("int64") // 1_000_000)
+    cols = stage.columns("R")
+    assert list(ref.columns) == cols and set(cols) <= set(got.columns)
+    for c in cols:
+        assert ref[c].notna().sum() > 100, c
+        np.testing.assert_allclose(got.loc[ref.index, c].astype(float), ref[c], rtol=1e-8, atol=1e-12, err_msg=c)
+    pending = got.index.difference(ref.index)
+    assert got.loc[pending, cols].isna().all().all()  # מחכים ל-R, לא נכתב as-of ישן
+    assert not any(c.startswith("x_") for c in pipes["R"].ctx["df_all"].columns)
+
+
+def test_stuck_reference_and_unregistered_pair():
+    stage = CrossSectionStage([("T", "R"), ("T", "Q")], window=W, lags=LAGS, rel_windows=REL, max_pending=4)
+    pipes = {s: _pipe(s) for s in ("T", "R")}
+    for p in pipes.values():
+        stage.register(p)
+    t0 = 1_700_000_000_000
+    _run(stage, [("R", t0, 100.0)] + [("T", t0 + k * STEP, 50.0 + k) for k in range(10)], pipes)
+    pair = stage._state[("T", "R", "1s")]
+    assert [ts for ts, _ in pair.pending] == [t0 + k * STEP for k in range(6, 10)]  # רק max_pending האחרונים
+    _run(stage, [("R", t0 + 20 * STEP, 101.0)], pipes)
+    assert not pair.pending
+    df = pipes["T"].ctx["df_all"]
+    written = df[f"{cross_prefix('R')}ret"].notna() | df[f"{cross_prefix('R')}rel_ret1"].notna()
+    assert written.tolist() == [False] * 6 + [True] * 4  # נר 0 עובד מיד, בלי תשואה קודמת; 1–5 נזרקו
+    x = cross_prefix("R")
+    # as-of: ה-close של R ב-ts של נר 6 הוא עדיין של t0; התשואה של T – מהנר האחרון שעובד (0)
+    assert df.at[6, f"{x}ret"] == 0.0
+    assert df.at[6, f"{x}rel_ret1"] == pytest.approx(np.log(56 / 50))
+    assert ("T", "Q", "1s") not in stage._state and not any(c.startswith("x_q_") for c in df.columns)
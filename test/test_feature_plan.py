@@ -0,0 +1,51 @@
+# תוכנית הפיצ'רים: RSI/BB/EMA זהים ל-indicator/, ו-run(changed=...) מריץ רק את מה שתלוי בעמודות שהשתנו
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator.bb import add_bollinger
+from indicator.ema import add_ema
+from indicator.feature_plan import get_plan
+from indicator.rsi import add_rsi
+from indicator.run_indikators import add_all_indicators
+
+
+@pytest.fixture
+def df() -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    n = 300
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 2e-3, n)))
+    return pd.DataFrame({"ts": pd.date_range("2024-01-01", periods=n, freq="1min", tz="UTC"),
+                         "open": close, "high": close * 1.001, "low": close * 0.999, "close": close,
+                         "volume": rng.random(n)})
+
+
+def test_plan_matches_indicator_modules(df):
+    out = add_all_indicators(df.copy())
+    ref = add_bollinger(add_rsi(df.copy()))
+    for p in (5, 12, 21):
+        ref = add_ema(ref, p)
+    for c in ("rsi", "bb_mid", "bb_up", "bb_low", "bb_width", "ema_5", "ema_12", "ema_21"):
+        pd.testing.assert_series_equal(out[c], ref[c], check_exact=True)
+
+
+def test_run_only_recomputes_dependents(df):
+    base = add_all_indicators(df.copy())
+    moved = base.copy()
+    moved.loc[moved.index[-1], ["close", "volume"]] = [moved["close"].iloc[-1] * 1.01, 5.0]
+
+    only_vol = add_all_indicators(moved.copy(), changed={"volume"})
+    assert only_vol["rsi"].iloc[-1] == base["rsi"].iloc[-1]  # close "לא השתנה" – RSI לא רץ
+    assert only_vol["vwap"].iloc[-1] != base["vwap"].iloc[-1]
+
+    row_cols = {"ts", "open", "high", "low", "close", "volume"}  # מה ש-on_candle_ready מעביר: עמודות השורה
+    pd.testing.assert_frame_equal(add_all_indicators(moved.copy(), changed=row_cols),
+                                  add_all_indicators(moved.copy()))
+
+    missing = add_all_indicators(moved.drop(columns=["bb_mid", "bb_up", "bb_low", "bb_width"]), changed=set())
+    assert missing["bb_mid"].notna().iloc[-1]  # עמודות פלט חסרות מחושבות תמיד
+
+
+def test_plan_outputs_cover_config():
+    outs = get_plan().outputs("indicators")
+    assert {"rsi", "bb_mid", "bb_width", "ema_12", "vwap"} <= set(outs)
@@ -0,0 +1,137 @@
+# footprint לנר: compute_footprint (bincount) מול לולאה ישירה על dict של דליים, ו-FootprintTable (amend, parts, דחיסה)
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from technical_live.footprint import FOOTPRINT_FEATURES, FootprintTable, compute_footprint
+
+TICK = 0.5
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # data/processed יחסי
+
+
+def _trades(seed: int, n: int = 3000):
+    """מחירים על רשת טיק 0.5 (אינדקס טיק שלם), חלק מהטריידים בלי צד, חלק עם size לא תקין."""
+    rng = np.random.default_rng(seed)
+    k = 200 + np.cumsum(rng.integers(-2, 3, n))
+    size = rng.lognormal(0, 1, n)
+    size[rng.random(n) < 0.02] = 0.0
+    size[rng.random(n) < 0.01] = np.nan
+    r = rng.random(n)
+    return k, size, r < 0.45, (r >= 0.45) & (r < 0.9)
+
+
+def _brute(keys, size, is_buy, is_sell, bucket, frac, close):
+    """דלי → [vol, buy, sell] ב-dict; POC = הנפח הגדול (שוויון → הנמוך); VA מתרחב לשכן הכבד (שוויון → למעלה)."""
+    b = {}
+    for key, s, ib, is_ in zip(keys, size, is_buy, is_sell):
+        if not (math.isfinite(s) and s > 0):
+            continue
+        v = b.setdefault(int(key), [0.0, 0.0, 0.0])
+        v[0] += s
+        v[1] += s if ib else 0.0
+        v[2] += s if is_ else 0.0
+    lo_k, hi_k = min(b), max(b)
+    vol = lambda k: b.get(k, [0.0])[0]
+    poc = lo_k
+    for k in range(lo_k, hi_k + 1):
+        if vol(k) > vol(poc):
+            poc = k
+    total = sum(v[0] for v in b.values())
+    lo = hi = poc
+    covered = vol(poc)
+    while covered < frac * total and (lo > lo_k or hi < hi_k):
+        up = vol(hi + 1) if hi < hi_k else -1.0
+        down = vol(lo - 1) if lo > lo_k else -1.0
+        if up >= down:
+            hi, covered = hi + 1, covered + up
+        else:
+            lo, covered = lo - 1, covered + down
+    assert covered >= frac * total * (1 - 1e-12)
+    poc_price = (poc + 0.5) * bucket
+    vah, val = (hi + 1) * bucket, lo * bucket
+    feats = {
+        "th_fp_poc_price": poc_price, "th_fp_poc_vol_pct": vol(poc) / total * 100,
+        "th_fp_poc_delta": b[poc][1] - b[poc][2], "th_fp_vah": vah, "th_fp_val": val,
+        "th_fp_va_width_bps": (vah - val) / poc_price * 1e4,
+        "th_fp_close_vs_poc_bps": (close - poc_price) / poc_price * 1e4,
+        "th_fp_buckets": float(len(b)), "th_fp_bucket_size": bucket,
+    }
+    return feats, b, lo_k
+
+
+@pytest.mark.parametrize("frac", [0.5, 0.7, 0.95])
+def test_tick_buckets_match_direct_loop(frac):
+    k, size, is_buy, is_sell = _trades(seed=int(frac * 100))
+    for a, z in [(0, len(k)), (100, 160), (2000, 2001)]:  # נר שלם, נר קצר, טרייד יחיד
+        price = k[a:z] * TICK
+        feats, prof = compute_footprint(price, size[a:z], is_buy[a:z], is_sell[a:z],
+                                        ref_price=price[0], close=price[-1], tick_size=TICK, value_area_frac=frac)
+        if not np.isfinite(size[a:z]).any() or not (np.nan_to_num(size[a:z]) > 0).any():
+            continue
+        ref, b, lo_k = _brute(k[a:z], size[a:z], is_buy[a:z], is_sell[a:z], TICK, frac, price[-1])
+        assert set(feats) == set(FOOTPRINT_FEATURES)
+        for key in FOOTPRINT_FEATURES:
+            assert feats[key] == pytest.approx(ref[key], rel=1e-9, abs=1e-9), (a, key)
+        assert prof["base_price"] == lo_k * TICK and prof["bucket_size"] == TICK
+        n = max(b) - lo_k + 1
+        assert len(prof["buy"]) == len(prof["sell"]) == n
+        exp_buy = [b.get(lo_k + i, [0, 0, 0])[1] for i in range(n)]
+        exp_sell = [b.get(lo_k + i, [0, 0, 0])[2] for i in range(n)]
+        assert prof["buy"] == pytest.approx(exp_buy) and prof["sell"] == pytest.approx(exp_sell)
+
+
+def test_bps_buckets_from_open_match_direct_loop():
+    rng = np.random.default_rng(11)
+    price = 30_000 * np.exp(np.cumsum(rng.normal(0, 2e-4, 2000)))
+    size = rng.lognormal(0, 1, len(price))
+    side = rng.random(len(price)) < 0.5
+    bucket = price[0] * 5.0 / 10_000
+    keys = [math.floor(p / bucket + 1e-9) for p in price]
+    feats, prof = compute_footprint(price, size, side, ~side, ref_price=price[0], close=price[-1], bucket_bps=5.0)
+    ref, b, lo_k = _brute(keys, size, side, ~side, bucket, 0.7, price[-1])
+    for key in FOOTPRINT_FEATURES:
+        assert feats[key] == pytest.approx(ref[key], rel=1e-9), key
+    assert sum(prof["buy"]) + sum(prof["sell"]) == pytest.approx(size.sum())
+
+
+def test_empty_and_invalid_bars():
+    feats, prof = compute_footprint([], [], [], [], tick_size=TICK)
+    assert prof is None and feats["th_fp_buckets"] == 0 and np.isnan(feats["th_fp_poc_price"])
+    feats, prof = compute_footprint([1.0, 2.0], [0.0, np.nan], [True, True], [False, False], tick_size=TICK)
+    assert prof is None and feats["th_fp_buckets"] == 0
+    _, prof = compute_footprint([1.0], [1.0], [True], [False], tick_size=None, bucket_bps=None)
+    assert prof is None  # אין גודל דלי
+
+
+def test_table_amend_parts_and_compaction_round_trip():
+    k, size, is_buy, is_sell = _trades(seed=3, n=600)
+    ts0 = pd.Timestamp("2024-01-01", tz="UTC")
+    tab = FootprintTable("FP", "1s", compact_every=3)
+    ref = {}
+    for i in range(10):
+        a = 60 * i
+        _, prof = compute_footprint(k[a:a + 60] * TICK, size[a:a + 60], is_buy[a:a + 60], is_sell[a:a + 60],
+                                    tick_size=TICK)
+        ts = ts0 + pd.Timedelta(seconds=i)
+        tab.add(ts, prof)
+        ref[ts] = prof
+        if i % 2:  # amend של הנר הקודם – גרסה אחרת מחליפה
+            _, prof = compute_footprint(k[a:a + 30] * TICK, size[a:a + 30], is_buy[a:a + 30], is_sell[a:a + 30],
+                                        tick_size=TICK)
+            prev = ts - pd.Timedelta(seconds=1)
+            tab.add(prev, prof)
+            ref[prev] = prof
+        tab.save()
+    back = FootprintTable("FP", "1s")
+    assert len(back) == len(ref) == 10
+    for ts, prof in ref.items():
+        got = back.get(ts)
+        assert got["base_price"] == prof["base_price"] and got["bucket_size"] == prof["bucket_size"]
+        assert list(got["buy"]) == pytest.approx(prof["buy"]) and list(got["sell"]) == pytest.approx(prof["sell"])
+    assert len(FootprintTable("FP", "1s", max_rows=4)) == 4
@@ -0,0 +1,85 @@
+# HigherTimeframeJoin (נר בסיס אחרי נר בסיס) מול resample + אינדיקטורים + merge_asof על הטבלה המלאה
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.multi_timeframe import HigherTimeframeJoin
+from indicator.bb import add_bollinger
+from indicator.ema import add_ema
+from indicator.rsi import add_rsi
+
+BASE = 30
+STEP = pd.Timedelta(seconds=BASE)
+
+
+@pytest.fixture(scope="module")
+def base_df() -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    n = 3000
+    t1 = pd.date_range("2024-01-01 00:00:30", periods=n, freq="30s", tz="UTC")
+    keep = rng.random(n) > 0.05
+    keep[200:230] = False  # פער שמדלג על נר 5m שלם
+    t1 = t1[keep]
+    m = len(t1)
+    c = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, m)))
+    o = np.r_[c[0], c[:-1]]
+    return pd.DataFrame({"ts": t1, "open": o, "high": np.maximum(o, c) * 1.0005,
+                         "low": np.minimum(o, c) * 0.9995, "close": c, "volume": rng.uniform(1, 2, m)})
+
+
+def _candle(r) -> dict:
+    return {"open": r.open, "high": r.high, "low": r.low, "close": r.close, "volume": r.volume}
+
+
+def _stream(df: pd.DataFrame, join: HigherTimeframeJoin, amend_at: int = -1) -> list:
+    rows = []
+    for i, r in enumerate(df.itertuples(index=False)):
+        cd = _candle(r)
+        if i == amend_at:  # גרסה שגויה של הנר, ואז האמיתית עם אותו key
+            join.update(r.ts - STEP, r.ts, {**cd, "close": r.close * 1.01, "high": r.high * 1.01}, key=r.ts)
+        rows.append(join.update(r.ts - STEP, r.ts, cd, key=r.ts))
+    return rows
+
+
+def _batch(df: pd.DataFrame, tf: int) -> pd.DataFrame:
+    g = df.set_index(df.ts - STEP).resample(f"{tf}s").agg({"close": "last"}).dropna()
+    g["ts"] = g.index + pd.Timedelta(seconds=tf)  # הנר הגבוה זמין מה-t1 שלו
+    g = g.reset_index(drop=True)
+    for span in (5, 12, 21):
+        add_ema(g, span)
+    add_rsi(g)
+    add_bollinger(g)
+    return pd.merge_asof(df[["ts"]], g, on="ts")
+
+
+def test_closed_bars_match_batch(base_df):
+    got = pd.DataFrame(_stream(base_df, HigherTimeframeJoin(BASE, [300, 3600]), amend_at=1000))
+    for tf, label in ((300, "5m"), (3600, "1h")):
+        ref = _batch(base_df, tf)
+        for col in ("ema_5", "ema_21", "rsi", "bb_mid", "bb_width"):
+            a, b = ref[col].to_numpy(float), got[f"htf_{label}_{col}"].to_numpy(float)
+            assert np.allclose(a, b, rtol=0, atol=1e-9, equal_nan=True), (label, col)
+
+
+def test_in_progress_bar_matches_partial_resample(base_df):
+    i = 1503
+    rows = _stream(base_df.iloc[:i + 1], HigherTimeframeJoin(BASE, [300], in_progress=True))
+    past = base_df.iloc[:i + 1]
+    g = past.set_index(past.ts - STEP).resample("300s").agg({"close": "last"}).dropna().reset_index(drop=True)
+    add_ema(g, 12)
+    add_rsi(g)
+    add_bollinger(g)
+    assert rows[-1]["htf_5m_ema_12_live"] == pytest.approx(g.ema_12.iloc[-1], abs=1e-9)
+    assert rows[-1]["htf_5m_rsi_live"] == pytest.approx(g.rsi.iloc[-1], abs=1e-9)
+    assert rows[-1]["htf_5m_bb_up_live"] == pytest.approx(g.bb_up.iloc[-1], abs=1e-9)
+
+
+def test_bootstrap_continues_stream(base_df):
+    full = _stream(base_df.iloc[:2001], HigherTimeframeJoin(BASE, [300, 3600], in_progress=True))
+    join = HigherTimeframeJoin(BASE, [300, 3600], in_progress=True)
+    join.bootstrap(base_df.iloc[:2000])
+    r = base_df.iloc[2000]
+    row = join.update(r.ts - STEP, r.ts, _candle(r), key=r.ts)
+    assert set(row) == set(full[2000])
+    for k, v in full[2000].items():
+        assert np.isclose(row[k], v, equal_nan=True), k
@@ -0,0 +1,74 @@
+# מנוע ה-batch הדו-ממדי (סימבולים × זמן) מול add_all_indicators לכל סימבול בנפרד
+import numpy as np
+import pandas as pd
+
+from indicator.feature_plan import get_plan
+from indicator.matrix_engine import MatrixIndicatorEngine, add_indicators_matrix, matrix_engine_from_config
+from indicator.run_indikators import add_all_indicators
+from indicator.vwap import add_vwap, bar_time_ms, session_keys
+
+
+def _frames() -> dict:
+    rng = np.random.default_rng(0)
+
+    def mk(n: int) -> pd.DataFrame:
+        ts = pd.date_range("2024-01-01 20:00", periods=n, freq="1min", tz="UTC") + pd.Timedelta("1min")
+        c = 30000 * np.exp(np.cumsum(rng.normal(0, 1e-3, n)))
+        if n > 50:
+            c[40:45] = c[39]  # רצף שטוח – avg_loss = 0 ב-RSI
+        v = rng.uniform(0, 5, n)
+        v[5:6] = 0
+        return pd.DataFrame({"ts": ts, "open": c, "high": c * (1 + rng.uniform(0, 1e-3, n)),
+                             "low": c * (1 - rng.uniform(0, 1e-3, n)), "close": c, "volume": v})
+
+    # אורכים שונים (כולל 0 ו-1) – הסימבולים מיושרים לימין במטריצה
+    return {f"S{i}": mk(n) for i, n in enumerate([1500, 700, 1, 0, 1499])}
+
+
+def _exact_session_std(df: pd.DataFrame, starts) -> np.ndarray:
+    key = session_keys(bar_time_ms(df), starts=starts)
+    tp = ((df.high + df.low + df.close) / 3).to_numpy()
+    v = df.volume.to_numpy()
+    out = np.full(len(df), np.nan)
+    for i in range(len(df)):
+        m = (key == key[i]) & (np.arange(len(df)) <= i)
+        w, x = v[m], tp[m]
+        if w.sum() > 0:
+            mu = (w * x).sum() / w.sum()
+            out[i] = np.sqrt((w * (x - mu) ** 2).sum() / w.sum())
+    return out
+
+
+def _assert_close(a: np.ndarray, b: np.ndarray, rtol: float, name) -> None:
+    assert (np.isnan(a) == np.isnan(b)).all(), name
+    m = ~np.isnan(a)
+    if m.any():
+        assert np.max(np.abs(a[m] - b[m]) / np.maximum(1.0, np.abs(a[m]))) <= rtol, name
+
+
+def test_matrix_matches_per_symbol():
+    frames = _frames()
+    got = add_indicators_matrix({k: df.copy() for k, df in frames.items()}, engine=matrix_engine_from_config(chunk=257))
+    for k, df in frames.items():
+        if df.empty:
+            continue
+        ref = add_all_indicators(df.copy())
+        for c in get_plan().outputs("indicators"):
+            _assert_close(ref[c].to_numpy(float), got[k][c].to_numpy(float), 1e-9, (k, c))
+
+
+def test_matrix_sessions_and_bands():
+    frames = {k: df for k, df in _frames().items() if len(df)}
+    eng = MatrixIndicatorEngine(vwap_session_starts=("00:00", "08:00"), vwap_bands=(1, 2), ema_periods=(1, 2, 50), chunk=100)
+    got = add_indicators_matrix({k: df.copy() for k, df in frames.items()}, engine=eng)
+    for k, df in frames.items():
+        ref = add_vwap(df.copy(), starts=("00:00", "08:00"), bands=(1, 2))
+        _assert_close(ref["vwap"].to_numpy(float), got[k]["vwap"].to_numpy(float), 1e-9, (k, "vwap"))
+        # סטיית התקן מול חישוב דו-מעברי מדויק (add_vwap צובר E[x²]−E[x]² ומאבד דיוק ברמות מחיר גבוהות)
+        std = _exact_session_std(df, ("00:00", "08:00"))
+        assert np.allclose(got[k]["vwap_std"].to_numpy(float), std, rtol=0, atol=1e-8 * df.close.max(), equal_nan=True), k
+        up = ref["vwap"].to_numpy(float) + 2 * std
+        assert np.allclose(got[k]["vwap_up_2"].to_numpy(float), up, rtol=0, atol=1e-8 * df.close.max(), equal_nan=True), k
+        for p in (1, 2, 50):
+            ema = df.close.ewm(span=p, adjust=False).mean().to_numpy()
+            _assert_close(ema, got[k][f"ema_{p}"].to_numpy(float), 1e-12, (k, p))
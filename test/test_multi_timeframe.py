@@ -0,0 +1,82 @@
+# גלגול טיימפריימים: נרות בסיס שמוזגו (LiveCandle.merge) מול CandleEngine ישיר על האינטרוול הגבוה,
+# ו-amend של נר בסיס שמחליף (ולא מוסיף) את חלקו בנר הגבוה
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.multi_timeframe import MultiTimeframeAggregator
+from graphs.graphs_time import CandleEngine, LiveCandle
+from live_data.trade_buffer import TradeBuffer
+
+CANDLE_KEYS = ("open", "high", "low", "close", "volume", "buy_vol", "trades", "notional",
+               "max_gap_ms", "first_ts_ms", "last_ts_ms")
+
+
+@pytest.mark.parametrize("max_gap_ms", [400, 3000])
+def test_merged_base_candles_match_direct_engine(max_gap_ms):
+    rng = np.random.default_rng(max_gap_ms)
+    n = 3000
+    ts = 1_700_000_000_000 + np.cumsum(rng.integers(1, max_gap_ms, n))
+    px = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, n)))
+    qty = rng.random(n)
+    side = np.where(rng.random(n) < 0.5, "buy", "sell")
+    base, big = CandleEngine(5), CandleEngine(60)
+    base_closed, big_closed = [], []
+    for t, p, q, s in zip(ts.tolist(), px.tolist(), qty.tolist(), side.tolist()):
+        base_closed += base.on_trade(t, p, q, s)
+        big_closed += big.on_trade(t, p, q, s)
+
+    merged = {}
+    for c in base_closed:
+        b0 = c.start_ms - c.start_ms % 60_000
+        merged.setdefault(b0, LiveCandle(b0, b0 + 60_000)).merge(c)
+    assert big_closed
+    for g in big_closed:
+        m = merged[g.start_ms]
+        a, b = m.to_dict(), g.to_dict()
+        for k in CANDLE_KEYS:
+            assert a[k] == pytest.approx(b[k]), k
+        assert m.rv_tick == pytest.approx(g.rv_tick, rel=1e-12)
+        assert m.rv_grid == pytest.approx(g.rv_grid, rel=1e-12)
+
+
+def _aggregator():
+    buf = TradeBuffer()
+    return buf, MultiTimeframeAggregator(buf, "X", 30, [60])
+
+
+def _feed(buf, mtf, ms: int, qty: float, out: list) -> None:
+    ts = pd.Timestamp(ms * 1_000_000, tz="UTC")
+    buf.append({"ts": ts, "symbol": "X", "price": 100.0 + ms % 7, "size": qty, "side": "buy", "id": ms})
+    out.extend(mtf.on_trade(ts))
+
+
+def test_late_trade_replaces_last_base_bar_in_higher_bar():
+    buf, mtf = _aggregator()
+    t = 1_700_000_040_000 - 1_700_000_040_000 % 60_000
+    out = []
+    for ms, q in ((t + 1000, 1), (t + 31000, 2), (t + 61000, 3)):  # סוגר את [0,30), [30,60) ואת נר ה-60s
+        _feed(buf, mtf, ms, q, out)
+    _feed(buf, mtf, t + 59000, 1, out)  # טרייד מאוחר ל-[30,60) → amend של הבסיס ושל נר ה-60s
+    sixty = [b for b in out if b.interval_sec == 60]
+    assert [(b.volume, b.trades, b.amended) for b in sixty] == [(3.0, 2, False), (4.0, 3, True)]
+
+
+def test_higher_bars_equal_sum_of_final_base_bars():
+    rng = np.random.default_rng(7)
+    buf, mtf = _aggregator()
+    t = 1_700_000_040_000 - 1_700_000_040_000 % 60_000
+    out = []
+    for _ in range(3000):
+        t += int(rng.integers(50, 900))
+        ms = t - 20_000 if rng.random() < 0.05 else t  # חלק מאוחרים (לנר הבסיס הקודם, או ישנים מדי)
+        _feed(buf, mtf, ms, float(rng.uniform(0.1, 1.0)), out)
+    base, higher = {}, {}
+    for b in out:  # הגרסה האחרונה של כל נר (amend מחליף)
+        (base if b.interval_sec == 30 else higher)[b.t0] = b
+    assert any(b.amended for b in out if b.interval_sec == 60)
+    for t0, h in higher.items():
+        parts = [b for b in base.values() if t0 <= b.t0 < h.t1]
+        assert h.volume == pytest.approx(sum(b.volume for b in parts)), t0
+        assert h.trades == sum(b.trades for b in parts), t0
+        assert h.high == max(b.high for b in parts if b.trades), t0
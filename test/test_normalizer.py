@@ -0,0 +1,74 @@
+# OnlineNormalizer מול expanding/ewm של pandas מוזזים בשורה (z מהנרות הקודמים בלבד), checkpoint וטבלת הצד
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset.normalizer import NormalizedTable, OnlineNormalizer
+
+N = 600
+MIN_COUNT = 20
+
+
+@pytest.fixture(scope="module")
+def df() -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    d = pd.DataFrame({
+        "a": rng.normal(5, 2, N),
+        "b": rng.normal(0, 1, N) * np.linspace(1, 3, N),
+        "dpp_30s": rng.normal(0, 1, N),  # יעד – מוחרג
+        "s": ["x"] * N,                  # לא נומרי
+    })
+    d.loc[100:110, "b"] = np.nan
+    return d
+
+
+def _reference(s: pd.Series, nz: OnlineNormalizer) -> np.ndarray:
+    if nz.mode == "cumulative":
+        m, sd = s.expanding().mean().shift(1), s.expanding().std().shift(1)
+    else:
+        e = s.ewm(alpha=nz.alpha, adjust=False, ignore_na=True)
+        m, sd = e.mean().shift(1), np.sqrt(e.var(bias=True)).shift(1)
+    cnt = s.expanding().count().shift(1)
+    return ((s - m) / sd).where(cnt >= MIN_COUNT).to_numpy()
+
+
+@pytest.mark.parametrize("mode", ["cumulative", "ewm"])
+def test_stream_matches_shifted_pandas(df, mode):
+    nz = OnlineNormalizer(mode=mode, halflife=50, min_count=MIN_COUNT, clip=None)
+    out = []
+    for i in range(N):
+        if i == 400:  # גרסה שגויה של השורה, ואז האמיתית עם אותו key
+            nz.update_frame(df.iloc[:i + 1].assign(a=99.0), key=i)
+        out.append(nz.update_frame(df.iloc[:i + 1], key=i))
+    z = pd.DataFrame(out)
+    assert list(z.columns) == ["a_z", "b_z"]
+    for c in ("a", "b"):
+        assert np.allclose(z[c + "_z"].to_numpy(), _reference(df[c], nz), rtol=0, atol=1e-9, equal_nan=True), c
+
+
+def test_checkpoint_roundtrip(df, tmp_path):
+    nz = OnlineNormalizer(mode="ewm", halflife=50, min_count=MIN_COUNT, clip=None)
+    for i in range(N):
+        nz.update_frame(df.iloc[:i + 1], key=i)
+    path = str(tmp_path / "nz.json")
+    nz.save(path)
+    back = OnlineNormalizer.load(path, mode="ewm", halflife=50, min_count=MIN_COUNT, clip=None)
+    assert np.allclose(nz.transform(df).to_numpy(), back.transform(df).to_numpy(), equal_nan=True)
+    # פרמטרים אחרים מהקונפיג → נרמול ריק
+    assert OnlineNormalizer.load(path, mode="ewm", halflife=60, min_count=MIN_COUNT, clip=None).cols == []
+
+
+def test_table_appends_and_caps(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    base = pd.Timestamp("2024-01-01", tz="UTC")
+    t = NormalizedTable("NZT", "1s", max_rows=50, compact_every=4)
+    for i in range(120):
+        t.add(base + pd.Timedelta(seconds=i), {"a_z": float(i)})
+        if i % 10 == 9:
+            t.add(base + pd.Timedelta(seconds=i), {"a_z": 1000.0 + i})  # amend
+        if i % 7 == 6:
+            t.save()
+    t.save()
+    back = NormalizedTable("NZT", "1s", max_rows=50).to_frame()
+    pd.testing.assert_frame_equal(back, t.to_frame(), check_dtype=False)
+    assert len(back) == 50 and back["a_z"].iloc[-1] == 1119.0
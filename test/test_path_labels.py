@@ -0,0 +1,80 @@
+# יעדי מסלול: PathLabeler (stream) מול path_labels_batch מול לולאה ישירה על הטריידים, ו-add_path_labels בצ'אנקים
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset.path_labels import PathLabeler, add_path_labels, path_label_columns, path_labels_batch
+
+H = [5, 30, 60]
+PT, SL = 15e-4, 10e-4
+IV, GRACE = 1000, 250
+
+
+def _brute(t1: int, c: float, tts: np.ndarray, tpx: np.ndarray) -> dict:
+    up, dn = c * (1 + PT), c * (1 - SL)
+    d = {}
+    for h in H:
+        m = (tts >= t1) & (tts < t1 + h * 1000)
+        p, t = tpx[m], tts[m]
+        lab, tsec = 0.0, np.nan
+        for ti, pi in zip(t, p):
+            if pi >= up:
+                lab, tsec = 1.0, (ti - t1) / 1000
+                break
+            if pi <= dn:
+                lab, tsec = -1.0, (ti - t1) / 1000
+                break
+        d[f"tb_label_{h}s"], d[f"tb_touch_sec_{h}s"] = lab, tsec
+        d[f"mfe_{h}s"] = (p.max() - c) / c * 100 if len(p) else np.nan
+        d[f"mae_{h}s"] = (p.min() - c) / c * 100 if len(p) else np.nan
+    return d
+
+
+def _same(a: float, b: float) -> bool:
+    return (np.isnan(a) and np.isnan(b)) or abs(a - b) <= 1e-9
+
+
+@pytest.mark.parametrize("mean_gap_ms", [5, 40])
+def test_stream_batch_brute(mean_gap_ms):
+    rng = np.random.default_rng(mean_gap_ms)
+    n = 6000
+    gaps = rng.exponential(mean_gap_ms, n).astype(np.int64)
+    gaps[rng.random(n) < 0.01] += 8000  # פערים ארוכים מהאופק הקצר
+    tts = 1_700_000_000_000 + np.cumsum(gaps)
+    tpx = 100 * np.exp(np.cumsum(rng.normal(0, 3e-4, n)))
+
+    # stream: נר נסגר ב-t1 + grace (כמו בטיימר), לפעמים קודם גרסה שגויה (amend)
+    lab = PathLabeler(H, pt_bps=PT * 1e4, sl_bps=SL * 1e4)
+    rows = {}
+    nxt = (tts[0] // IV + 1) * IV
+    for t, p in zip(tts, tpx):
+        while t >= nxt + GRACE:
+            c = tpx[np.searchsorted(tts, nxt) - 1]
+            if rng.random() < 0.2:
+                lab.open_row(nxt, c * 1.001)
+            lab.open_row(nxt, c)
+            rows[nxt] = c
+            lab.advance(nxt)
+            nxt += IV
+        lab.on_trade(int(t), float(p))
+    lab.advance(int(tts[-1]) + 10 ** 9)
+    res = {}
+    for ts, d in lab.pop_resolved():
+        res.setdefault(ts, {}).update(d)
+
+    keys = np.array(sorted(rows))
+    c = np.array([rows[k] for k in keys])
+    batch = path_labels_batch(keys, c, c * (1 + PT), c * (1 - SL), tts, tpx, H)
+    for i, k in enumerate(keys):
+        brute = _brute(int(k), c[i], tts, tpx) if i < 200 else None
+        for col in path_label_columns(H):
+            assert _same(res[k][col], batch[col][i]), (k, col)
+            if brute is not None:
+                assert _same(brute[col], batch[col][i]), (k, col)
+
+    # add_path_labels בצ'אנקים קטנים = batch אחד
+    df = pd.DataFrame({"ts": pd.to_datetime(keys, unit="ms", utc=True), "close": c})
+    trades = pd.DataFrame({"ts": pd.to_datetime(tts, unit="ms", utc=True), "price": tpx})
+    out = add_path_labels(df, trades, H, pt_bps=PT * 1e4, sl_bps=SL * 1e4, chunk_rows=97)
+    for col in path_label_columns(H):
+        assert np.allclose(out[col].to_numpy(float), batch[col], equal_nan=True), col
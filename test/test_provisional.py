@@ -0,0 +1,39 @@
+# ProvisionalIndicators: הערך הזמני במחיר הסגירה של הנר הבא = השורה שלו ב-add_all_indicators, גם אחרי amend
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset.provisional import ProvisionalIndicators
+from indicator.run_indikators import add_all_indicators
+
+COLS = ["ema_5", "ema_12", "ema_21", "rsi", "bb_mid", "bb_up", "bb_low", "bb_width"]
+
+
+@pytest.fixture(scope="module")
+def df() -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    n = 160
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 2e-3, n)))
+    ts = pd.date_range("2024-01-01", periods=n, freq="1s", tz="UTC")
+    return pd.DataFrame({"ts": ts, "open": close, "high": close, "low": close, "close": close,
+                         "volume": rng.random(n)})
+
+
+def test_preview_matches_next_closed_row(df):
+    start = 40
+    ind = ProvisionalIndicators()
+    ind.on_close(add_all_indicators(df.iloc[:start].copy()))  # bootstrap מההיסטוריה
+    for i in range(start, len(df)):
+        ref = add_all_indicators(df.iloc[:i + 1].copy()).iloc[-1]
+        if i % 5 == 1:
+            continue  # הנר הזה נכנס יחד עם הבא – on_close אחד עם שתי שורות חדשות
+        if i % 5 != 2:  # אחרי נר שדולג המצב עוד לא כולל את i-1
+            got = ind.preview(float(df["close"].iloc[i]))
+            for c in COLS:
+                assert got[c] == pytest.approx(ref[c], rel=1e-9), (i, c)
+        if i % 17 == 0:  # קודם גרסה שגויה של הנר, ואז התיקון עם אותו ts
+            ind.on_close(df.iloc[:i + 1].assign(close=df["close"].where(df.index < i, 2 * df["close"])))
+        ind.on_close(df.iloc[:i + 1])
+        vals = ind.values()
+        for c in COLS:
+            assert vals[c] == pytest.approx(ref[c], rel=1e-9), (i, c)
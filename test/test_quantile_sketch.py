@@ -0,0 +1,73 @@
+# סקיצת האחוזונים: LogSketch מול np.sort (שגיאה יחסית ≤ rel_acc), אופק מתגלגל מול סינון ישיר, merge ו-checkpoint
+import numpy as np
+import pytest
+
+from core.quantile_sketch import LogSketch, RollingSketch
+
+QS = (0.0, 0.1, 0.5, 0.9, 0.99, 1.0)
+ACC = 0.01
+
+
+def _exact(xs: np.ndarray, q: float) -> float:
+    s = np.sort(xs)
+    return float(s[int(np.floor(q * (len(s) - 1)))])  # אותו rank כמו הסקיצה: q·(n-1)
+
+
+def _sizes(rng, n: int) -> np.ndarray:
+    x = rng.lognormal(-2, 1.5, n)
+    x[rng.random(n) < 0.02] = 0.0
+    return x
+
+
+def test_log_sketch_relative_error():
+    rng = np.random.default_rng(1)
+    xs = _sizes(rng, 20_000)
+    one, many = LogSketch(ACC), LogSketch(ACC)
+    for x in xs:
+        one.add(x)
+    many.add_many(xs)
+    assert np.array_equal(one.counts, many.counts) and one.count == many.count == len(xs)
+    for q in QS:
+        ref = _exact(xs, q)
+        assert one.quantile(q) == pytest.approx(ref, rel=ACC, abs=1e-12), q
+
+
+def test_rolling_horizon_matches_direct_filter():
+    rng = np.random.default_rng(2)
+    hour = 3_600_000
+    ts = np.sort(rng.integers(0, 30 * hour, 30_000)) + 1_700_000_000_000
+    xs = _sizes(rng, len(ts))
+    rs = RollingSketch(horizon_ms=6 * hour, slot_ms=hour, rel_acc=ACC)
+    for k, (t, x) in enumerate(zip(ts.tolist(), xs.tolist())):
+        rs.add(t, x)
+        if k % 5000 == 4999 or k == len(ts) - 1:
+            # בסלוטים: סלוט נשאר כל עוד הסוף שלו אחרי now - horizon
+            keep = (ts[:k + 1] - ts[:k + 1] % hour) + hour > t - 6 * hour
+            live = xs[:k + 1][keep]
+            assert rs.count == len(live)
+            for q in QS:
+                assert rs.quantile(q) == pytest.approx(_exact(live, q), rel=ACC, abs=1e-12), (k, q)
+
+
+def test_late_trade_and_merge_and_checkpoint(tmp_path):
+    rng = np.random.default_rng(3)
+    hour = 3_600_000
+    ts = np.sort(rng.integers(0, 10 * hour, 4000)) + 1_700_000_000_000
+    xs = _sizes(rng, len(ts))
+    whole = RollingSketch(horizon_ms=24 * hour, slot_ms=hour, rel_acc=ACC)
+    a = RollingSketch(horizon_ms=24 * hour, slot_ms=hour, rel_acc=ACC)
+    b = RollingSketch(horizon_ms=24 * hour, slot_ms=hour, rel_acc=ACC)
+    for i, (t, x) in enumerate(zip(ts.tolist(), xs.tolist())):
+        whole.add(t, x)
+        (a if i % 3 else b).add(t, x)
+    whole.add(int(ts[-1]) - 10, 123.0)  # מאוחר לסלוט הפתוח – נספר
+    a.add(int(ts[-1]) - 10, 123.0)
+    a.merge(b)
+    assert a.count == whole.count == len(ts) + 1
+    assert np.array_equal(a.total.counts, whole.total.counts)
+
+    path = str(tmp_path / "sk.json")
+    whole.save(path)
+    back = RollingSketch.load(path, horizon_ms=24 * hour, slot_ms=hour, rel_acc=ACC)
+    assert [back.quantile(q) for q in QS] == [whole.quantile(q) for q in QS]
+    assert RollingSketch.load(path, horizon_ms=12 * hour, slot_ms=hour, rel_acc=ACC).count == 0
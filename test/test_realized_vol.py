@@ -0,0 +1,115 @@
+# תנודתיות ממומשת: rv_tick/rv_1s המצטברים ב-LiveCandle ו-trade_variances מול groupby על הטריידים,
+# אומדי OHLC מול נוסחה וקטורית, ו-RealizedVolStream (amend, bootstrap) מול pandas rolling על השונויות
+import numpy as np
+import pandas as pd
+import pytest
+
+from graphs.graphs_time import CandleEngine
+from technical_live.realized_vol import (
+    VOL_ESTIMATORS, RealizedVolStream, candle_variances, ohlc_variances, trade_variances,
+)
+
+STEP_SEC = 5
+
+
+def _trades(seed: int, n: int = 5000) -> pd.DataFrame:
+    """טריידים בסדר ts (כולל כמה באותו ms) עם פערים של כמה נרות."""
+    rng = np.random.default_rng(seed)
+    dt = rng.integers(0, 300, n)
+    dt[rng.random(n) < 0.005] += 4 * STEP_SEC * 1000
+    ts = 1_700_000_000_000 + np.cumsum(dt)
+    px = 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n)))
+    return pd.DataFrame({"ts_ms": ts, "price": px, "qty": rng.random(n)})
+
+
+def _reference(tr: pd.DataFrame) -> pd.DataFrame:
+    """לכל נר: OHLC, rv_tick = Σ(Δ ln p)², rv_1s = Σ(Δ ln p)² על המחיר האחרון בכל שנייה, מעוגן ב-open."""
+    rows = {}
+    for b, g in tr.groupby(tr["ts_ms"] // (STEP_SEC * 1000)):
+        lp = np.log(g["price"].to_numpy())
+        grid = np.log(g.groupby(g["ts_ms"] // 1000)["price"].last().to_numpy())
+        grid = np.r_[lp[0], grid]
+        rows[int(b) * STEP_SEC * 1000] = {
+            "open": g["price"].iloc[0], "high": g["price"].max(), "low": g["price"].min(), "close": g["price"].iloc[-1],
+            "rv_tick": float((np.diff(lp) ** 2).sum()), "rv_1s": float((np.diff(grid) ** 2).sum()),
+        }
+    ref = pd.DataFrame.from_dict(rows, orient="index").sort_index()
+    o, h, l, c = (ref[k].to_numpy() for k in ("open", "high", "low", "close"))
+    ref["vol_parkinson"] = np.log(h / l) ** 2 / (4 * np.log(2))
+    ref["vol_gk"] = np.maximum(0.5 * np.log(h / l) ** 2 - (2 * np.log(2) - 1) * np.log(c / o) ** 2, 0)
+    ref["vol_rs"] = np.log(h / c) * np.log(h / o) + np.log(l / c) * np.log(l / o)
+    return ref
+
+
+def _candles(tr: pd.DataFrame):
+    eng = CandleEngine(STEP_SEC, fill_gaps=True)
+    out = []
+    for t, p, q in zip(tr["ts_ms"].tolist(), tr["price"].tolist(), tr["qty"].tolist()):
+        out += eng.on_trade(t, p, q, "buy")
+    return out
+
+
+def test_candle_variances_match_groupby_reference():
+    tr = _trades(seed=1)
+    ref = _reference(tr)
+    candles = _candles(tr)
+    n_flat = 0
+    for bar in candles:
+        if bar.trades == 0:  # נר ריק (fill_gaps): OHLC שטוח → 0, בלי טריידים → rv לא ידוע
+            v = candle_variances(bar, candle=bar.ohlcv())
+            assert np.isnan(v["rv_tick"]) and v["vol_parkinson"] == v["vol_gk"] == v["vol_rs"] == 0.0
+            n_flat += 1
+            continue
+        exp = ref.loc[bar.start_ms]
+        got = candle_variances(bar)
+        chunk = tr[(tr["ts_ms"] >= bar.start_ms) & (tr["ts_ms"] < bar.end_ms)]
+        vec = trade_variances(chunk["ts_ms"], chunk["price"])
+        for e in VOL_ESTIMATORS:
+            assert got[e] == pytest.approx(exp[e], rel=1e-9, abs=1e-15), (bar.start_ms, e)
+        for e in ("rv_tick", "rv_1s"):
+            assert vec[e] == pytest.approx(exp[e], rel=1e-9, abs=1e-15), (bar.start_ms, e)
+    assert n_flat > 5 and len(candles) - n_flat == len(ref) - 1  # הנר האחרון עוד פתוח
+
+
+def test_chunk_fallback_sorts_and_skips_bad_prices():
+    tr = _trades(seed=2, n=300)
+    exp = trade_variances(tr["ts_ms"], tr["price"])
+    shuffled = tr.sample(frac=1.0, random_state=0)
+    bad = pd.DataFrame({"ts_ms": [tr["ts_ms"].iloc[5]] * 2, "price": [np.nan, -1.0], "qty": [1.0, 1.0]})
+    got = trade_variances(pd.concat([shuffled, bad])["ts_ms"], pd.concat([shuffled, bad])["price"])
+    assert got == pytest.approx(exp)
+    assert trade_variances([1], [100.0]) == {"rv_tick": 0.0, "rv_1s": 0.0}
+    assert all(np.isnan(v) for v in trade_variances([], []).values())
+    assert all(np.isnan(v) for v in ohlc_variances(1.0, 2.0, 0.0, 1.5).values())
+
+
+@pytest.mark.parametrize("windows", [(3,), (5, 20)])
+def test_rolling_stream_matches_pandas_rolling(windows):
+    rng = np.random.default_rng(len(windows))
+    n = 300
+    var = pd.DataFrame({e: rng.lognormal(-12, 1, n) for e in VOL_ESTIMATORS})
+    var.loc[rng.random(n) < 0.05, "rv_tick"] = np.nan  # נר בלי טריידים
+    amended = var.copy()
+    amended.iloc[::7] = var.iloc[::7] * 1.5
+    st = RealizedVolStream(windows)
+    got = []
+    for i in range(n):
+        if i % 7 == 0:  # קודם גרסה ראשונה, אחר כך amend עם הסופית
+            st.update(var.iloc[i].to_dict(), key=i)
+        got.append(st.update(amended.iloc[i].to_dict(), key=i))
+    got = pd.DataFrame(got)
+    assert set(got.columns) == set(st.columns())
+    for e in VOL_ESTIMATORS:
+        assert np.allclose(got[e], np.sqrt(amended[e]), equal_nan=True)
+        for w in windows:
+            exp = np.sqrt(amended[e].rolling(w).mean())
+            assert np.allclose(got[f"{e}_roll{w}"], exp, rtol=1e-9, atol=0, equal_nan=True), (e, w)
+
+    # bootstrap מ-df_all (העמודות השמורות = סטיית תקן) ממשיך בדיוק כמו הריצה המלאה
+    cut = 200
+    back = RealizedVolStream(windows)
+    back.bootstrap(got.iloc[:cut])
+    for i in range(cut, n):
+        row = back.update(amended.iloc[i].to_dict(), key=i)
+        for k, v in row.items():
+            assert v == pytest.approx(got[k].iloc[i], rel=1e-9, nan_ok=True), (i, k)
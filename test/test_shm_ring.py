@@ -0,0 +1,110 @@
+# ring בזיכרון משותף: wrap, קורא שנעקף, רשומות שנדרסו בזמן ההעתקה, ומסלול ה-hub (רשומה → פריט בפורמט ה-WS)
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from live_data.hub import _book_records, _trade_record, stream_orderbook_shm, stream_trades_shm
+from live_data.shm_ring import BOOK_DTYPE, TRADE_DTYPE, ShmRing, ShmRingReader, ring_name
+
+SEQ_DTYPE = np.dtype([("seq", "<i8")])
+CAP = 8
+
+
+@pytest.fixture
+def ring(request):
+    r = ShmRing(f"mbp_test_{os.getpid()}_{request.node.name}"[:30], SEQ_DTYPE, CAP)
+    yield r
+    r.close(unlink=True)
+
+
+def _publish(ring: ShmRing, n: int) -> None:
+    for _ in range(n):
+        ring.publish((ring.write_seq,))
+
+
+def test_wrap_returns_records_in_order(ring):
+    reader = ShmRingReader(ring.name, SEQ_DTYPE)
+    got = []
+    for k in (5, 6, 3, 7):  # חוצה את סוף המערך כמה פעמים, בלי למלא את הרינג
+        _publish(ring, k)
+        got += reader.poll()["seq"].tolist()
+    assert got == list(range(21)) and reader.dropped == 0
+    assert not len(reader.poll())
+    reader.close()
+
+
+def test_overrun_skips_to_oldest_live_record(ring):
+    reader = ShmRingReader(ring.name, SEQ_DTYPE)
+    _publish(ring, 3 * CAP + 5)
+    # הסלוט הוותיק ברינג מלא (2*CAP+5) הוא הבא שהכותב דורס – גם הוא לא נקרא
+    assert reader.poll(max_n=3)["seq"].tolist() == [2 * CAP + 6, 2 * CAP + 7, 2 * CAP + 8]
+    assert reader.dropped == 2 * CAP + 6
+    assert reader.poll()["seq"].tolist() == list(range(2 * CAP + 9, 3 * CAP + 5))
+    reader.close()
+
+
+class _WriterDuringCopy:
+    """עוטף את מערך הרשומות של הקורא: הכותב מפרסם k רשומות בין החיתוך להעתקה."""
+
+    def __init__(self, records: np.ndarray, ring: ShmRing, k: int):
+        self.records, self.ring, self.k = records, ring, k
+
+    def __getitem__(self, sl):
+        view = self.records[sl]
+        _publish(self.ring, self.k)
+        self.k = 0
+        return view
+
+
+@pytest.mark.parametrize("k", [1, 3, CAP + 2])
+def test_torn_records_are_dropped(ring, k):
+    reader = ShmRingReader(ring.name, SEQ_DTYPE)
+    _publish(ring, 2)
+    reader.poll()
+    _publish(ring, CAP - 1)  # read_seq=2, write_seq=CAP+1 – כמעט מלא, בלי עקיפה
+    reader._records = _WriterDuringCopy(reader._records, ring, k)
+    out = reader.poll()["seq"].tolist()
+    # k-1 נדרסו בפועל (seq 2..k), ועוד הסלוט שהכותב אולי כבר כותב אליו
+    torn = min(k, CAP - 1)
+    assert out == list(range(2 + torn, CAP + 1))
+    assert reader.dropped == torn
+
+
+def test_hub_round_trip():
+    sym = f"T{os.getpid()}"
+    trades = [{"ts_ms": 1_700_000_000_000 + i, "price": 100.0 + i, "qty": 0.5 * i,
+               "side": "buy" if i % 2 else "sell", "trade_id": f"id{i}"} for i in range(5)]
+    book = {"ts_ms": 1_700_000_000_123, "type": "snapshot",
+            "bids": [(100.0 - 0.1 * i, 1.0 + i) for i in range(120)],
+            "asks": [(100.1 + 0.1 * i, 2.0 + i) for i in range(7)]}
+
+    async def run():
+        tr = ShmRing(ring_name(sym, "trades"), TRADE_DTYPE, 64)
+        bk = ShmRing(ring_name(sym, "book"), BOOK_DTYPE, 16)
+        q_tr, q_bk = asyncio.Queue(), asyncio.Queue()
+        tasks = [asyncio.create_task(stream_trades_shm(sym, q_tr)),
+                 asyncio.create_task(stream_orderbook_shm(sym, q_bk))]
+        try:
+            await asyncio.sleep(0.05)  # הקוראים מתחילים מ-write_seq הנוכחי
+            for t in trades:
+                tr.publish(_trade_record(t))
+            recs = _book_records(book)
+            for rec in recs:
+                bk.publish(rec)
+            got_tr = [await asyncio.wait_for(q_tr.get(), 2) for _ in trades]
+            got_bk = [await asyncio.wait_for(q_bk.get(), 2) for _ in recs]
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            tr.close(unlink=True)
+            bk.close(unlink=True)
+        return got_tr, got_bk
+
+    got_tr, got_bk = asyncio.run(run())
+    assert got_tr == [dict(t, symbol=sym) for t in trades]
+    assert [u["type"] for u in got_bk] == ["snapshot", "delta", "delta"]  # 120 רמות → 3 רשומות של 50
+    assert sum((u["bids"] for u in got_bk), []) == book["bids"]
+    assert sum((u["asks"] for u in got_bk), []) == book["asks"]
@@ -0,0 +1,59 @@
+# TechnicalStream (נר-נר) מול add_all_technical(mode="batch") על אותה טבלה – כולל amend ו-bootstrap מאמצע
+import numpy as np
+import pandas as pd
+
+from indicator.bb import add_bollinger
+from indicator.ema import add_ema
+from technical_analysis.run_technical import add_all_technical
+from technical_analysis.stream_technical import TechnicalStream
+
+
+def _frame(n: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    close = 100 + np.cumsum(rng.normal(0, 0.3, n))
+    close[50] = close[49]  # תיקו – סטטוס "ללא שינוי"
+    df = pd.DataFrame({
+        "ts": pd.date_range("2024-01-01", periods=n, freq="30s", tz="UTC"),
+        "close": close, "high": close + 0.2, "low": close - 0.2, "volume": rng.uniform(1, 3, n),
+    })
+    tp = (df.high + df.low + df.close) / 3
+    df["vwap"] = (tp * df.volume).cumsum() / df.volume.cumsum()
+    df.loc[100, "vwap"] = np.nan
+    for span in (5, 12, 21):
+        add_ema(df, span)
+    add_bollinger(df)
+    return df
+
+
+def _assert_same(batch: pd.DataFrame, stream: pd.DataFrame) -> None:
+    for c in stream.columns:
+        a, b = batch[c].reset_index(drop=True), stream[c].reset_index(drop=True)
+        if a.dtype.kind in "fiu" and b.dtype.kind in "fiu":
+            assert np.allclose(a.astype(float), b.astype(float), equal_nan=True, rtol=0, atol=1e-12), c
+        else:
+            assert (a.astype(str) == b.astype(str)).all(), c
+
+
+def test_stream_matches_batch_with_amend():
+    df = _frame()
+    batch = add_all_technical(df.copy(), mode="batch", include_candles=False)
+    st = TechnicalStream()
+    rows = []
+    for k in range(len(df)):
+        if k == 200:  # גרסה שגויה של אותו נר – ה-update הבא עם אותו ts מחליף אותה
+            bad = df.iloc[k].copy()
+            bad["close"] += 5
+            st.update(bad)
+        rows.append(st.update(df.iloc[k]))
+    _assert_same(batch, pd.DataFrame(rows))
+
+
+def test_state_continues_batch_prefix():
+    df = _frame()
+    batch = add_all_technical(df.copy(), mode="batch", include_candles=False)
+    st = TechnicalStream()
+    d = add_all_technical(df.iloc[:150].copy(), mode="batch", include_candles=False)
+    for k in range(150, len(df)):
+        d = add_all_technical(pd.concat([d, df.iloc[[k]]]), state=st, include_candles=False)
+    cols = list(TechnicalStream().update(df.iloc[0]))  # העמודות שה-stream כותב
+    _assert_same(batch[cols].iloc[150:], d[cols].iloc[150:])
@@ -0,0 +1,109 @@
+# SymbolFeed/SymbolPipeline מקצה לקצה: טריידים → df_all (בתיקייה זמנית, בלי קבצים קיימים)
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.symbol_pipeline import SymbolFeed, build_feeds
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # data/processed, data/state יחסיים
+
+
+def _trades(n: int, seed: int = 2):
+    rng = np.random.default_rng(seed)
+    t, px = 1_700_000_000_000, 100.0
+    for i in range(n):
+        t += int(rng.integers(1, 40))
+        px *= np.exp(rng.normal(0, 3e-4))
+        yield {"ts_ms": t, "price": px, "qty": float(rng.random()),
+               "side": "buy" if rng.random() < 0.5 else "sell", "trade_id": str(i)}
+
+
+def _feed(symbol: str, *intervals: str):
+    f = SymbolFeed(symbol)
+    pipes = [f.add_pipeline(itv, horizons=[], save_every=10 ** 6) for itv in intervals]
+    return f, pipes
+
+
+def test_duplicate_trade_is_not_fed_downstream():
+    async def run():
+        once, (p1,) = _feed("DUPA", "1s")
+        twice, (p2,) = _feed("DUPB", "1s")
+        for tr in _trades(800):
+            await once.on_trade(dict(tr))
+            await twice.on_trade(dict(tr))
+            await twice.on_trade(dict(tr))  # replay אחרי reconnect – אותו trade_id
+        return once, p1, twice, p2
+
+    once, p1, twice, p2 = asyncio.run(run())
+    assert len(p1.df_all) > 10
+    a, b = p1.df_all.drop(columns=["symbol"]), p2.df_all.drop(columns=["symbol"])
+    pd.testing.assert_frame_equal(a, b)
+    if once.size_sketch is not None:
+        assert twice.size_sketch.count == once.size_sketch.count
+
+
+def test_book_purge_keeps_quotes_for_closing_bars(monkeypatch):
+    # Lee-Ready על ה-chunk של נר ה-5s (גלגול) צריך quotes מתחילת הנר – לא רק מחלון הבסיס
+    async def run(symbol: str, purge: bool):
+        f, pipes = _feed(symbol, "1s", "5s")
+        if not purge:
+            monkeypatch.setattr(f.ob_buf, "purge_older_than", lambda cutoff: 0)
+        for p in pipes:
+            p.ctx["side_mode"] = "lee_ready"
+        peak = 0
+        for i, tr in enumerate(_trades(3000, seed=4)):
+            if i % 2 == 0:
+                px = tr["price"]
+                f.on_orderbook({"ts_ms": tr["ts_ms"] - 1, "type": "snapshot",
+                                "bids": [[px - 0.01 * (1 + i % 3), 1.0 + i % 5]], "asks": [[px + 0.01, 2.0]]})
+            await f.on_trade(tr)
+            peak = max(peak, len(f.ob_buf.top_of_book()[0]))
+        return pipes, peak
+
+    (a1, a5), peak = asyncio.run(run("OBPA", True))
+    (b1, b5), full = asyncio.run(run("OBPB", False))
+    assert len(a5.df_all) > 5
+    for a, b in ((a1, b1), (a5, b5)):
+        pd.testing.assert_frame_equal(a.df_all.drop(columns=["symbol"]), b.df_all.drop(columns=["symbol"]))
+    assert full == 1500 and peak < 400  # ~2 נרות 5s של עדכונים, לא כל ההיסטוריה
+
+
+def _ohlcv(trades: list, step_ms: int) -> pd.DataFrame:
+    t = pd.DataFrame(trades)
+    t["t1"] = pd.to_datetime((t["ts_ms"] // step_ms + 1) * step_ms, unit="ms", utc=True).astype("datetime64[ns, UTC]")
+    g = t.groupby("t1")
+    return pd.DataFrame({"open": g["price"].first(), "high": g["price"].max(), "low": g["price"].min(),
+                         "close": g["price"].last(), "volume": g["qty"].sum()})
+
+
+def test_many_pairs_in_one_loop_match_isolated_runs():
+    pairs = [("btcusdt", "1s"), ("ETHUSDT", "1s"), ("BTCUSDT", "5s"), ("BTCUSDT", "1s")]  # הכפילות נזרקת
+    btc = list(_trades(1500, seed=5))
+    eth = [dict(tr, price=tr["price"] * 0.05, ts_ms=tr["ts_ms"] + 3) for tr in _trades(1500, seed=6)]
+
+    async def run():
+        feeds = build_feeds(pairs, horizons=[], save_every=10 ** 6)
+        for a, b in zip(btc, eth):  # ingest משותף, טריידים של שני הסימבולים משולבים
+            await feeds["BTCUSDT"].on_trade(dict(a))
+            await feeds["ETHUSDT"].on_trade(dict(b))
+        alone, (p_alone,) = _feed("BTCALONE", "1s")  # אותם טריידים לבד, בלי צינור ה-5s ובלי ETH (שם אחר – קבצים נפרדים)
+        for a in btc:
+            await alone.on_trade(dict(a))
+        return feeds, p_alone
+
+    feeds, p_alone = asyncio.run(run())
+    assert sorted(feeds) == ["BTCUSDT", "ETHUSDT"]
+    assert [p.interval for p in feeds["BTCUSDT"].pipelines] == ["1s", "5s"]
+    btc1, btc5 = feeds["BTCUSDT"].pipelines
+    pd.testing.assert_frame_equal(btc1.df_all.drop(columns=["symbol"]), p_alone.df_all.drop(columns=["symbol"]))
+
+    for p, trades, step in ((btc1, btc, 1000), (btc5, btc, 5000), (feeds["ETHUSDT"].pipelines[0], eth, 1000)):
+        got = p.df_all.set_index("ts")[["open", "high", "low", "close", "volume"]]
+        assert len(got) >= 5 and (p.df_all["symbol"] == p.symbol).all()
+        ref = _ohlcv(trades, step).loc[got.index]
+        pd.testing.assert_frame_equal(got, ref, check_names=False, check_freq=False, rtol=1e-12)
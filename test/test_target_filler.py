@@ -0,0 +1,13 @@
+# TargetFiller: amend של הנר האחרון לא נרשם פעמיים להמתנה
+import pandas as pd
+
+from dataset.target_filler import TargetFiller
+
+
+def test_amended_row_registers_once():
+    df = pd.DataFrame({"ts": pd.date_range("2024-01-01", periods=4, freq="1s", tz="UTC"), "close": 1.0})
+    f = TargetFiller([5, 1])
+    for idx in (0, 1, 2, 2, 3, 3, 3):
+        f.register_row(df, idx)
+    assert f.waiting == {1: [0, 1, 2, 3], 5: [0, 1, 2, 3]}
+    assert (df["friction_pct_used"] == f.friction_pct).all()
@@ -0,0 +1,52 @@
+# VwapStream (נר-נר) מול add_vwap (batch) – סשנים, רצועות, עוגנים, amend ו-bootstrap מאמצע
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator.vwap import VwapStream, add_vwap
+
+N = 3000
+
+
+def _frame() -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    ts = pd.to_datetime(1_700_000_000_000 + np.arange(1, N + 1) * 60_000, unit="ms", utc=True)
+    c = 100 + np.cumsum(rng.normal(0, 0.1, N))
+    v = rng.uniform(0, 5, N)
+    v[::50] = np.nan
+    return pd.DataFrame({"ts": ts, "high": c + rng.uniform(0, 0.2, N), "low": c - rng.uniform(0, 0.2, N),
+                         "close": c, "volume": v, "anc": rng.random(N) < 0.01})
+
+
+CASES = [
+    dict(),
+    dict(tz="Asia/Jerusalem", starts=["00:00", "08:00", "16:30"], bands=[1, 2]),
+    dict(session="anchored", bands=[1.5]),
+]
+
+
+@pytest.mark.parametrize("anchor_col", [None, "anc"])
+@pytest.mark.parametrize("kw", CASES)
+def test_stream_matches_batch(kw, anchor_col):
+    df = _frame()
+    batch = add_vwap(df.copy(), anchors=anchor_col, **kw)
+    t_ms = (df["ts"].dt.as_unit("ms").astype("int64") - 1).to_numpy()  # bar_time_ms: ts-1ms
+    h, l, c, v = (df[k].to_numpy() for k in ("high", "low", "close", "volume"))
+    anc = df["anc"].to_numpy() if anchor_col else np.zeros(N, dtype=bool)
+
+    st = VwapStream(**kw)
+    rows = []
+    for i in range(N):
+        if i and i % 37 == 0:  # גרסה שגויה של הנר – אותו key שוב מחליף
+            st.update(int(t_ms[i]), h[i] + 1, l[i], c[i], 7.0, anchor=bool(anc[i]))
+        rows.append(st.update(int(t_ms[i]), h[i], l[i], c[i], v[i], anchor=bool(anc[i])))
+    out = pd.DataFrame(rows)
+    for k in out.columns:
+        assert np.array_equal(out[k].to_numpy(), batch[k].to_numpy(), equal_nan=True), k
+
+    boot = VwapStream(anchor_col=anchor_col, **kw)
+    boot.bootstrap(df.iloc[:2000])
+    tail = pd.DataFrame([boot.update(int(t_ms[i]), h[i], l[i], c[i], v[i], anchor=bool(anc[i]))
+                         for i in range(2000, N)])
+    for k in out.columns:
+        assert np.array_equal(tail[k].to_numpy(), batch[k].to_numpy()[2000:], equal_nan=True), k
@@ -0,0 +1,117 @@
+# WallTracker מול מודל ישיר: ספר מלא שנבנה מחדש בכל עדכון ומכונת מצבים לכל רמה (סף קבוע), והסף הנלמד מול חציון/אחוזון מדויקים
+import numpy as np
+import pytest
+
+from technical_live.wall_tracker import WALL_FEATURES, WallTracker
+
+THR = 40.0
+EXIT, CHANGE, FLASH = 0.5, 0.5, 1000
+
+
+def _updates(seed: int, n: int = 4000):
+    rng = np.random.default_rng(seed)
+    t = 1_700_000_000_000
+    prices = [100.0 + 0.5 * k for k in range(-20, 21)]
+    for i in range(n):
+        t += int(rng.integers(1, 120))
+        if i % 700 == 0:
+            kind = "snapshot"
+            bids = [(p, float(rng.integers(1, 60))) for p in prices if p < 100 and rng.random() < 0.8]
+            asks = [(p, float(rng.integers(1, 60))) for p in prices if p > 100 and rng.random() < 0.8]
+        else:
+            kind = "delta"
+            side = rng.random() < 0.5
+            lv = [(p, 0.0 if rng.random() < 0.2 else float(rng.integers(1, 80)))
+                  for p in rng.choice([p for p in prices if (p < 100) == side], size=int(rng.integers(1, 4)), replace=False)]
+            bids, asks = (lv, []) if side else ([], lv)
+        yield t, bids, asks, kind
+
+
+class _Brute:
+    """ספר מלא + כל הרמות נבדקות בכל עדכון (O(ספר)), אותם כללים: נולד ≥ סף, נגמר < exit·סף, משיכה/מילוי ±change."""
+
+    def __init__(self):
+        self.book = {"bid": {}, "ask": {}}
+        self.walls = {}   # (side, price) → [born, qty]
+        self.events = []  # (ts, kind, life)
+
+    def update(self, ts, bids, asks, kind):
+        for side, lv in (("bid", bids), ("ask", asks)):
+            if kind != "delta":
+                self.book[side] = {}
+            for p, q in lv:
+                if q > 0:
+                    self.book[side][float(p)] = q
+                else:
+                    self.book[side].pop(float(p), None)
+        keys = set(self.walls) | {(s, p) for s in ("bid", "ask") for p in self.book[s]}
+        for side, p in sorted(keys):
+            q = self.book[side].get(p, 0.0)
+            w = self.walls.get((side, p))
+            if w is None:
+                if q >= THR:
+                    self.walls[(side, p)] = [ts, q]
+                    self.events.append((ts, "born", 0))
+            elif q < EXIT * THR:
+                del self.walls[(side, p)]
+                self.events.append((ts, "ended", ts - w[0]))
+            elif q != w[1]:
+                if q < w[1] * (1 - CHANGE):
+                    self.events.append((ts, "pull", 0))
+                elif q > w[1] * (1 + CHANGE):
+                    self.events.append((ts, "refill", 0))
+                w[1] = q
+
+    def features(self, t0, t1, mid):
+        out = {}
+        for side in ("bid", "ask"):
+            ws = [(p, b, q) for (s, p), (b, q) in self.walls.items() if s == side]
+            out[f"ob_wall_{side}_count"] = len(ws)
+            out[f"ob_wall_{side}_max_qty"] = max((q for _, _, q in ws), default=0.0)
+            out[f"ob_wall_{side}_dist_bps"] = min((abs(p - mid) for p, _, _ in ws), default=np.nan) / mid * 1e4
+            out[f"ob_wall_{side}_max_age_sec"] = max(((t1 - b) / 1000 for _, b, _ in ws), default=0.0)
+        ev = [e for e in self.events if t0 <= e[0] < t1]
+        ended = [life for _, k, life in ev if k == "ended"]
+        out.update({
+            "ob_wall_born": sum(k == "born" for _, k, _ in ev), "ob_wall_ended": len(ended),
+            "ob_wall_flash": sum(life < FLASH for life in ended),
+            "ob_wall_ended_mean_life_sec": np.mean(ended) / 1000 if ended else np.nan,
+            "ob_wall_pulls": sum(k == "pull" for _, k, _ in ev), "ob_wall_refills": sum(k == "refill" for _, k, _ in ev),
+        })
+        return out
+
+
+def test_lifecycle_and_features_match_full_book_model(monkeypatch):
+    wt = WallTracker(exit_ratio=EXIT, change_frac=CHANGE, flash_ms=FLASH)
+    monkeypatch.setattr(wt, "_observe", lambda side, qty: None)  # סף קבוע – המודל הישיר לא לומד סף
+    wt._thr = {"bid": THR, "ask": THR}
+    ref = _Brute()
+    step, nxt, n_feat = 1000, None, 0
+    for ts, bids, asks, kind in _updates(seed=6):
+        nxt = nxt or ts - ts % step + step
+        while ts >= nxt:  # סגירת הנר לפני העדכון הראשון שאחריו
+            got, exp = wt.features(nxt - step, nxt, 100.0), ref.features(nxt - step, nxt, 100.0)
+            assert set(got) == set(WALL_FEATURES)
+            for k in WALL_FEATURES:
+                assert got[k] == pytest.approx(exp[k], nan_ok=True), (nxt, k)
+            nxt += step
+            n_feat += 1
+        wt.on_update(ts, bids, asks, kind)
+        ref.update(ts, bids, asks, kind)
+        assert {k: w.qty for k, w in wt.active.items()} == {k: w[1] for k, w in ref.walls.items()}
+    kinds = {k for _, k, _ in ref.events}
+    assert n_feat > 100 and kinds == {"born", "ended", "pull", "refill"}
+    assert any(life < FLASH for _, k, life in ref.events if k == "ended")
+
+
+def test_learned_threshold_tracks_exact_quantiles():
+    rng = np.random.default_rng(7)
+    sizes = rng.lognormal(1.0, 1.0, 20_000)
+    wt = WallTracker(median_k=3.0, percentile=97.0, min_samples=200)
+    for i in range(0, len(sizes), 10):
+        wt.on_update(1_700_000_000_000 + i, [(100.0 - k, q) for k, q in enumerate(sizes[i:i + 10])], [], "delta")
+    exact = max(3.0 * np.median(sizes), np.percentile(sizes, 97))
+    assert wt.threshold("bid") == pytest.approx(exact, rel=0.05)
+    assert wt.threshold("ask") == np.inf  # עוד אין מספיק דגימות בצד
+    wt.on_update(0, [(1.0, 1e9)], [], "delta")  # בלי ts אמיתי – לא נקלט
+    assert not any(w.born_ms == 0 for w in wt.active.values())
@@ -0,0 +1,109 @@
+# ReusableAggregator/WindowClock מול סימולציה ישירה: קפיצות על כמה חלונות, חלונות ריקים, טריידים מאוחרים (amend/next)
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.window_aggregator import ReusableAggregator, WindowClock
+from live_data.trade_buffer import TradeBuffer
+
+STEP = 1000
+
+
+def _arrivals(seed: int):
+    """טריידים בסדר הגעה: רובם עולים בזמן, חלק קופצים כמה חלונות קדימה, חלק מאוחרים."""
+    rng = np.random.default_rng(seed)
+    t, out = 1_700_000_000_000, []
+    for i in range(4000):
+        r = rng.random()
+        if r < 0.01:
+            t += int(rng.integers(2, 9)) * STEP  # פער של כמה חלונות
+        else:
+            t += int(rng.integers(1, 60))
+        ts = t - int(rng.integers(1, 2500)) if rng.random() < 0.04 else t  # מאוחר: לקודם או ישן ממנו
+        out.append((ts, str(i)))
+    return out
+
+
+def _brute(arrivals, policy: str) -> dict:
+    """t0 → ids, לפי הכלל: חלון פתוח עד טרייד עם ts ≥ t1; מאוחר לחלון הקודם – amend, ישן מזה – נזנח."""
+    bars, cur = {}, None
+    for ts, tid in arrivals:
+        w = ts - ts % STEP
+        if cur is None or w > cur:
+            for k in range(cur + STEP if cur is not None else w, w + STEP, STEP):
+                bars.setdefault(k, [])
+            cur = w
+        if w == cur:
+            bars[cur].append(tid)
+        elif policy == "next":
+            bars[cur].append(tid)
+        elif w == cur - STEP:
+            bars[w].append(tid)
+    bars.pop(cur)  # החלון הפתוח לא נסגר
+    return bars
+
+
+@pytest.mark.parametrize("policy", ["amend", "next"])
+def test_closed_windows_match_direct_simulation(policy):
+    arrivals = _arrivals(seed=len(policy))
+    buf = TradeBuffer()
+    agg = ReusableAggregator(buf, "X", 1, late_policy=policy)
+    got, amended = {}, 0
+    for ts, tid in arrivals:
+        tr = {"ts": pd.Timestamp(ts * 1_000_000, tz="UTC"), "symbol": "X", "price": 1.0, "size": 1.0,
+              "side": "buy", "id": tid}
+        buf.append(tr)
+        for c in agg.on_trade(ts, tr):
+            t0 = int(c.t0.value // 1_000_000)
+            assert int(c.t1.value // 1_000_000) - t0 == STEP
+            assert (t0 in got) == c.amended  # amend רק לחלון שכבר נסגר
+            amended += c.amended
+            got[t0] = sorted(c.df_chunk["id"].tolist()) if not c.df_chunk.empty else []
+    ref = {k: sorted(v) for k, v in _brute(arrivals, policy).items()}
+    keys = sorted(got)
+    assert keys == list(range(keys[0], keys[-1] + STEP, STEP))  # כל חלון נפלט, גם ריק
+    assert sum(not v for v in got.values()) > 10
+    assert got == ref
+    assert agg.late_trades > 50 and (amended > 0) == (policy == "amend")
+
+
+def test_timer_close_equals_trade_close():
+    # סגירה בטיימר (t1 + grace) נותנת אותם חלונות כמו סגירה בטרייד הבא
+    arrivals = sorted(_arrivals(seed=9))
+    buf = TradeBuffer()
+    by_trade = ReusableAggregator(buf, "X", 1)
+    by_timer = ReusableAggregator(buf, "X", 1, grace_ms=250)
+    a, b, timed = {}, {}, 0
+    for ts, tid in arrivals:
+        buf.append({"ts": pd.Timestamp(ts * 1_000_000, tz="UTC"), "symbol": "X", "price": 1.0, "size": 1.0,
+                    "side": "buy", "id": tid})
+        for c in by_timer.close_due(ts):  # הטיימר רץ בזמן הבורסה של הטרייד
+            b[c.t0] = len(c.df_chunk)
+            timed += 1
+        for c in by_timer.on_trade(ts):
+            b[c.t0] = len(c.df_chunk)
+        for c in by_trade.on_trade(ts):
+            a[c.t0] = len(c.df_chunk)
+    assert timed > 50 and a == b
+    assert by_timer.next_deadline_ms() == by_timer.clock.t1_ms + 250
+
+
+def test_clock_jumps_in_one_step():
+    c = WindowClock(5)
+    assert c.advance_to_ms(12_345) == 0 and (c.t0_ms, c.t1_ms) == (10_000, 15_000)
+    assert c.advance_to_ms(14_999) == 0
+    assert c.advance_to_ms(15_000 + 7 * 5000 + 1) == 8 and c.t0_ms == 50_000
+
+
+def test_gap_closes_all_windows_with_one_slice(monkeypatch):
+    buf = TradeBuffer()
+    agg = ReusableAggregator(buf, "X", 1)
+    calls = []
+    real = buf.slice
+    monkeypatch.setattr(buf, "slice", lambda *a, **kw: calls.append(a) or real(*a, **kw))
+    for ms in (1_700_000_000_100, 1_700_000_000_900, 1_700_000_009_500):
+        buf.append({"ts": pd.Timestamp(ms * 1_000_000, tz="UTC"), "symbol": "X", "price": 1.0, "size": 1.0,
+                    "side": "buy", "id": str(ms)})
+        closed = agg.on_trade(ms)
+    assert len(calls) == 1 and len(closed) == 9
+    assert [len(c.df_chunk) for c in closed] == [2] + [0] * 8